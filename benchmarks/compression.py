@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Reports the compression ratio and compression and decompression throughput of each engine and level on the documents sent to
+miners in each state update: the books blob, the individual books of a book-indexed container and the per-miner payloads.
+
+zstd is additionally measured with a fresh context per call (as before contexts were reused), and with a dictionary trained on
+documents from other states (`zstd_dict`), as well as the cost of the Base64 and Base85 text transports.
+
+States are read from a directory of recorded msgpack-encoded simulator states if given (the first half being used to train the
+dictionary), and are otherwise generated with `benchmarks.payloads.build_state`.
+
+Usage:
+    python -m benchmarks.compression [--states <directory>] [--uids 64] [--books 32] [--levels 1,3,9]
+"""
+import os
+import time
+import argparse
+import msgspec
+import zstandard as zstd
+
+from taos.im.utils.compress import encode, compressors, decompressors, transports, _zstd_compressor
+from taos.im.utils.dictionary import state_samples, train_dictionary, DEFAULT_SIZE
+from benchmarks.payloads import build_state
+
+def load_states(args) -> list[dict]:
+    if args.states:
+        states = []
+        for name in sorted(os.listdir(args.states)):
+            with open(os.path.join(args.states, name), "rb") as f:
+                states.append(msgspec.msgpack.decode(f.read()))
+        return states
+    return [msgspec.msgpack.decode(build_state(args.uids, args.books, seed=seed)) for seed in range(args.count)]
+
+def documents(states : list[dict]) -> dict[str, list[bytes]]:
+    """
+    Returns the encoded documents compressed by the validator for the given states, by kind.
+    """
+    return {
+        "books blob" : [encode(state["books"]) for state in states],
+        "single book" : [encode(book) for state in states for book in state["books"].values()],
+        "miner payload" : [sample for state in states for sample in state_samples({"accounts" : state["accounts"], "notices" : state.get("notices")})],
+    }
+
+def measure(docs : list[bytes], compress, decompress, repeat : int) -> tuple[float, float, float]:
+    """
+    Returns the compression ratio, and the best compression and decompression throughput (MB/s) over `repeat` passes.
+    """
+    size = sum(len(doc) for doc in docs)
+    compress_time, decompress_time = float("inf"), float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = [compress(doc) for doc in docs]
+        compress_time = min(compress_time, time.perf_counter() - start)
+        start = time.perf_counter()
+        restored = [decompress(doc) for doc in compressed]
+        decompress_time = min(decompress_time, time.perf_counter() - start)
+    assert restored == docs, "Round trip failed"
+    return size / sum(len(doc) for doc in compressed), size / compress_time / 1e6, size / decompress_time / 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=str, default=None, help="Directory of recorded msgpack-encoded simulator states.")
+    parser.add_argument("--uids", type=int, default=64)
+    parser.add_argument("--books", type=int, default=32)
+    parser.add_argument("--count", type=int, default=4, help="Number of states to generate if no states are given.")
+    parser.add_argument("--levels", type=str, default="1,3,9")
+    parser.add_argument("--dict-size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    states = load_states(args)
+    split = max(1, len(states) // 2)
+    train, test = states[:split], states[split:] or states
+    start = time.perf_counter()
+    dictionary = train_dictionary([sample for state in train for sample in state_samples(state)], size=args.dict_size)
+    print(f"{len(states)} states | dictionary trained on {len(train)} states ({len(dictionary.as_bytes())} bytes | {time.perf_counter() - start:.2f}s)")
+    dict_decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+
+    for kind, docs in documents(test).items():
+        print(f"\n{kind} : {len(docs)} documents | mean {sum(len(doc) for doc in docs) / len(docs) / 1e3:.1f}KB")
+        print(f"{'engine':<16}{'level':>6}{'ratio':>8}{'compress MB/s':>16}{'decompress MB/s':>18}")
+        for engine in ["zlib", "lz4", "zstd", "zstd (fresh)", "zstd_dict"]:
+            for level in levels:
+                match engine:
+                    case "zstd (fresh)":
+                        compress = lambda raw: zstd.ZstdCompressor(level=level).compress(raw)
+                        decompress = lambda raw: zstd.ZstdDecompressor().decompress(raw)
+                    case "zstd_dict":
+                        compress = lambda raw: _zstd_compressor(level, dictionary).compress(raw)
+                        decompress = dict_decompressor.decompress
+                    case _:
+                        compress = lambda raw: compressors[engine](raw, level)
+                        decompress = decompressors[engine]
+                ratio, compress_speed, decompress_speed = measure(docs, compress, decompress, args.repeat)
+                print(f"{engine:<16}{level:>6}{ratio:>8.2f}{compress_speed:>16.1f}{decompress_speed:>18.1f}")
+
+    compressed = [compressors["zstd"](doc, levels[0]) for doc in documents(test)["books blob"]]
+    print(f"\ntransport (zstd level {levels[0]} books blob)")
+    for transport, (text_encode, text_decode) in transports.items():
+        ratio, encode_speed, decode_speed = measure(compressed, text_encode, text_decode, args.repeat)
+        print(f"{transport:<8}: size x{1 / ratio:.3f} | encode {encode_speed:8.1f}MB/s | decode {decode_speed:8.1f}MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares the fixed 2ms stagger with which the validator previously started its queries to miners, waiting for all responses,
+against the configurations of `DispatchScheduler`, with simulated miners.
+
+Each query spends `--prepare` milliseconds of CPU time in the event loop before it is sent (as the dendrite does in preparing and
+signing the request) and the miner then responds after its own latency, drawn once per miner from a log-normal distribution.
+The process time measured for each query runs from the moment it is sent to the moment its response is handled by the event loop,
+and so exceeds the latency of the miner wherever the event loop is busy with other queries when the response arrives.  For each
+configuration, over `--rounds` dispatches, the following are reported:
+
+    total     : time until the collection of responses ended
+    collected : fraction of the responses collected (the remainder being late)
+    offset    : time from the start of the dispatch until each query is sent
+    distortion: excess of the measured process time over the latency of the miner, which is carried into the delays applied to
+                its instructions by `set_delays`
+
+Usage:
+    python -m benchmarks.dispatch [--uids 256] [--prepare 0.2] [--rounds 10]
+"""
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from taos.im.utils.dispatch import DispatchScheduler
+
+def busy(seconds : float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def miner(latencies : np.ndarray, prepare : float, measured : dict):
+    """
+    Returns a coroutine function simulating the query of a miner, recording the measured process time of each UID in `measured`.
+    """
+    async def send(uid : int) -> int:
+        busy(prepare)
+        sent = time.perf_counter()
+        await asyncio.sleep(latencies[uid])
+        measured[uid] = time.perf_counter() - sent
+        return uid
+    return send
+
+async def legacy(uids : list[int], send) -> tuple[dict[int, float], int]:
+    """
+    Starts the queries as `forward` previously did, with a 2ms sleep following the creation of each task.
+    """
+    start = time.perf_counter()
+    offsets = {}
+    async def query(uid):
+        offsets[uid] = time.perf_counter() - start
+        return await send(uid)
+    tasks = []
+    for uid in uids:
+        tasks.append(asyncio.create_task(query(uid)))
+        await asyncio.sleep(0.002)
+    await asyncio.gather(*tasks)
+    return offsets, len(tasks)
+
+def run(name : str, dispatch, latencies : np.ndarray, prepare : float, rounds : int) -> None:
+    totals, offsets, distortions, collected = [], [], [], []
+    for _ in range(rounds):
+        measured = {}
+        send = miner(latencies, prepare, measured)
+        start = time.perf_counter()
+        round_offsets, round_collected = asyncio.run(dispatch(send))
+        totals.append(time.perf_counter() - start)
+        collected.append(round_collected / len(latencies))
+        offsets.extend(round_offsets.values())
+        distortions.extend(measured[uid] - latencies[uid] for uid in measured)
+    offsets, distortions = np.array(offsets) * 1000, np.array(distortions) * 1000
+    print(f"{name:<28} : total {np.mean(totals) * 1000:8.2f}ms | collected {np.mean(collected) * 100:5.1f}% | offset {offsets.mean():7.2f}ms mean {offsets.max():7.2f}ms max"
+          f" | distortion {distortions.mean():6.2f}ms mean {np.percentile(distortions, 99):6.2f}ms p99")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--prepare", type=float, default=0.2, help="CPU time in milliseconds spent preparing each query.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Median miner latency in seconds.")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    latencies = np.minimum(rng.lognormal(np.log(args.latency), 0.5, args.uids), 2.5)
+    uids = list(range(args.uids))
+    prepare = args.prepare / 1000
+
+    run("legacy (2ms stagger)", lambda send: legacy(uids, send), latencies, prepare, args.rounds)
+    configurations = {
+        "uid" : dict(order='uid'),
+        "random" : dict(order='random', seed=0),
+        "fastest" : dict(order='fastest'),
+        "random, 2000/s burst 32" : dict(order='random', rate=2000, burst=32, seed=0),
+        "random, 64 concurrent" : dict(order='random', concurrency=64, seed=0),
+        "random, quorum 95%" : dict(order='random', quorum=0.95, seed=0),
+        "random, p99 deadline" : dict(order='random', deadline_percentile=99, seed=0)
+    }
+    for name, kwargs in configurations.items():
+        scheduler = DispatchScheduler(args.uids, **kwargs)
+        # The process times of the previous round are observed, as `update_stats` does, to order the `fastest` dispatch
+        for uid in uids:
+            scheduler.observe(uid, latencies[uid])
+        async def dispatch(send, scheduler=scheduler):
+            results = await scheduler.dispatch(uids, send)
+            return scheduler.offsets, len(results)
+        run(name, dispatch, latencies, prepare, args.rounds)
+
+if __name__ == "__main__":
+    main()
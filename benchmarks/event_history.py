@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares loading of an agent's event history from a 24h event journal using the columnar loader against the previous row-wise
+CSV loader, which parsed every row with `csv.DictReader` and constructed every event before applying retention.
+
+Usage:
+    python -m benchmarks.event_history [--hours 24] [--events-per-minute 600] [--lookback 60]
+"""
+import os
+import csv
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+from taos.im.utils import timestamp_from_duration
+from taos.im.utils.journal import EventJournal, CSV_FILES, ORDER, CANCELLATION, TRADE
+from taos.im.protocol.events import AgentEventHistory, CSV_FACTORIES
+
+UID = 0
+
+def write_journal(directory : str, format : str, hours : int, events_per_minute : int, seed : int = 0) -> int:
+    """
+    Writes a synthetic journal of order, cancellation and trade events spread uniformly over the given number of hours.
+    """
+    rng = np.random.default_rng(seed)
+    count = hours * 60 * events_per_minute
+    timestamps = np.sort(rng.choice(hours * 3600 * 1_000_000_000, size=count, replace=False))
+    kinds = rng.choice([ORDER, CANCELLATION, TRADE], size=count, p=[0.5, 0.3, 0.2])
+    prices = np.round(rng.uniform(290, 310, size=count), 2).tolist()
+    quantities = np.round(rng.uniform(0.1, 10, size=count), 4).tolist()
+    sides = rng.integers(2, size=count).tolist()
+    books = rng.integers(128, size=count).tolist()
+    journal = EventJournal(directory, format, flush_interval=60)
+    for i, (timestamp, kind) in enumerate(zip(timestamps.tolist(), kinds.tolist())):
+        if kind == ORDER:
+            row = [timestamp, books[i], i, None, sides[i], prices[i] if i % 4 else None, None if i % 4 else 0, quantities[i], 0.0, -2, True, '']
+        elif kind == CANCELLATION:
+            row = [timestamp, books[i], i, quantities[i], True, '']
+        else:
+            row = [timestamp, books[i], i, None, UID, i, 0.0001, UID + 1, i + 1, 0.0, sides[i], prices[i], quantities[i]]
+        journal.record(kind, row)
+        # Flush at the rate a miner would, so that the index has an entry per state update
+        if i % 50 == 0:
+            journal.flush()
+    journal.close()
+    return count
+
+def load_legacy(directory : str, retention_mins : int) -> AgentEventHistory:
+    """
+    Loads the history as the previous implementation did: every CSV row is read with `csv.DictReader` and converted to a
+    validated event, and retention is applied only once all events are in memory.
+    """
+    events = []
+    for kind, factory in CSV_FACTORIES.items():
+        with open(os.path.join(directory, CSV_FILES[kind]), newline="") as f:
+            for row in csv.DictReader(f):
+                row['timestamp'] = timestamp_from_duration(row['timestamp'])
+                events.append(factory(UID, list(row.values())))
+    events.sort(key=lambda e: e.timestamp)
+    history = AgentEventHistory(UID, events[0].timestamp, events[-1].timestamp, events, 1_000_000_000, retention_mins)
+    history._evict(history.end - retention_mins * 60_000_000_000)
+    return history
+
+def load_columnar(directory : str, format : str, retention_mins : int) -> AgentEventHistory:
+    history = AgentEventHistory.from_journal(UID, directory, format, 1_000_000_000, retention_mins)
+    history._evict(history.end - retention_mins * 60_000_000_000)
+    return history
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--events-per-minute", type=int, default=600)
+    parser.add_argument("--lookback", type=int, default=60)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        for format in ['csv', 'msgpack']:
+            directory = os.path.join(root, format)
+            start = time.perf_counter()
+            count = write_journal(directory, format, args.hours, args.events_per_minute)
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            print(f"{format:<8}: wrote {count} events ({size / 1e6:.1f}MB) in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        legacy = load_legacy(os.path.join(root, 'csv'), args.lookback)
+        print(f"Legacy CSV loader   : {time.perf_counter() - start:.3f}s ({len(legacy)} events retained)")
+        for format in ['csv', 'msgpack']:
+            start = time.perf_counter()
+            history = load_columnar(os.path.join(root, format), format, args.lookback)
+            loaded = time.perf_counter() - start
+            start = time.perf_counter()
+            features = (history.trade_prices, history.trade_imbalance, history.order_volume, history.order_imbalances)
+            derived = time.perf_counter() - start
+            print(f"Columnar {format:<8}   : {loaded:.3f}s ({len(history)} events retained) | derived series {derived:.3f}s without constructing events")
+            assert features == (legacy.trade_prices, legacy.trade_imbalance, legacy.order_volume, legacy.order_imbalances), f"Derived series mismatch ({format})"
+            for kind in ['trades', 'orders', 'cancellations']:
+                assert [e.model_dump() for e in history.partitions[kind].events] == [e.model_dump() for e in legacy.partitions[kind].events], f"Event mismatch in {kind} ({format})"
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
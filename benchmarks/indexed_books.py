@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares preparation and decoding of the books sent to miners as a single compressed blob against the book-indexed container, in
+which each book is compressed separately and can be decompressed and decoded alone or in parallel.
+
+Usage:
+    python -m benchmarks.indexed_books [--books 128] [--subscribed 8] [--engine lz4] [--workers 8]
+"""
+import time
+import argparse
+import msgspec
+
+from taos.im.utils.compress import encode, compress_encoded, compress_books, decompress
+from benchmarks.payloads import build_state
+
+def best(fn, repeat : int) -> tuple[float, object]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=128)
+    parser.add_argument("--subscribed", type=int, default=8)
+    parser.add_argument("--engine", type=str, default="lz4", choices=["zlib", "lz4", "zstd"])
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fields = msgspec.msgpack.decode(build_state(1, args.books), type=dict[str, msgspec.Raw])
+    raw_books = msgspec.msgpack.decode(fields["books"], type=dict[int, msgspec.Raw])
+    subscribed = list(range(0, args.books, max(1, args.books // args.subscribed)))[:args.subscribed]
+
+    # Validator: the books are compressed once per update
+    blob_time, blob = best(lambda: compress_encoded(encode(raw_books), args.level, args.engine), args.repeat)
+    indexed_time, indexed = best(lambda: compress_books({book_id : encode(book) for book_id, book in raw_books.items()}, args.level, args.engine), args.repeat)
+    parallel_time, _ = best(lambda: compress_books({book_id : encode(book) for book_id, book in raw_books.items()}, args.level, args.engine, args.workers), args.repeat)
+    print(f"{args.books} books | {len(fields['books']) / 1e6:.2f}MB encoded | {args.engine}")
+    print(f"Compress  : blob {blob_time * 1000:7.2f}ms ({len(blob) / 1e6:.2f}MB) | indexed {indexed_time * 1000:7.2f}ms ({len(indexed) / 1e6:.2f}MB) | indexed {args.workers} workers {parallel_time * 1000:7.2f}ms")
+
+    # Miner: decode all books, or only the subscribed books
+    def blob_all():
+        return decompress({"books" : blob, "payload" : compress_encoded(encode({}), args.level, args.engine)}, args.engine)["books"]
+    def indexed_books():
+        return decompress({"books" : indexed, "payload" : compress_encoded(encode({}), args.level, args.engine)}, args.engine)["books"]
+    def indexed_all(workers):
+        books = indexed_books()
+        books.prefetch(workers=workers)
+        return dict(books.items())
+    def indexed_subset(workers):
+        books = indexed_books()
+        books.prefetch(subscribed, workers=workers)
+        return {book_id : books[book_id] for book_id in subscribed}
+
+    expected = blob_all()
+    assert indexed_all(0) == expected, "Indexed books differ from blob"
+    assert indexed_subset(args.workers) == {book_id : expected[book_id] for book_id in subscribed}, "Subscribed books differ from blob"
+    results = {
+        "blob (all books)" : best(blob_all, args.repeat)[0],
+        "indexed (all books)" : best(lambda: indexed_all(0), args.repeat)[0],
+        f"indexed (all books, {args.workers} workers)" : best(lambda: indexed_all(args.workers), args.repeat)[0],
+        f"indexed ({len(subscribed)} books)" : best(lambda: indexed_subset(0), args.repeat)[0],
+    }
+    for name, t in results.items():
+        print(f"Decode {name:<32}: {t * 1000:7.2f}ms")
+
+if __name__ == "__main__":
+    main()
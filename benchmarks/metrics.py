@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares publishing the agent metrics through a labelled gauge child per sample (as `report` did previously) against replacing the
+snapshot of the `MetricsCollector`, and the cost of a scrape of each.
+
+Usage:
+    python -m benchmarks.metrics [--uids 256] [--books 128]
+"""
+import time
+import argparse
+import numpy as np
+from prometheus_client import CollectorRegistry, Gauge, generate_latest
+
+from taos.im.utils.metrics import MetricsSnapshot, MetricsCollector, AGENT_METRICS
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--books", type=int, default=128)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    agents = rng.random((args.uids, args.books, len(AGENT_METRICS)))
+    samples = agents.size
+
+    registry = CollectorRegistry()
+    gauge = Gauge('agent_gauges', 'Gauge summaries for agent-related metrics.', ['wallet', 'netuid', 'book_id', 'agent_id', 'agent_gauge_name'], registry=registry)
+    start = time.perf_counter()
+    values = agents.tolist()
+    for agentId in range(args.uids):
+        for bookId in range(args.books):
+            for metric, name in enumerate(AGENT_METRICS):
+                gauge.labels('wallet', 0, bookId, agentId, name).set(values[agentId][bookId][metric])
+    publish_time = time.perf_counter() - start
+    start = time.perf_counter()
+    generate_latest(registry)
+    print(f"Gauges    : publish {publish_time * 1000:9.2f}ms | scrape {(time.perf_counter() - start) * 1000:9.2f}ms ({samples} samples)")
+
+    registry = CollectorRegistry()
+    collector = MetricsCollector('wallet', 0)
+    registry.register(collector)
+    snapshot = MetricsSnapshot.empty(args.uids, args.books)
+    snapshot.agents = agents
+    start = time.perf_counter()
+    collector.update(snapshot)
+    publish_time = time.perf_counter() - start
+    start = time.perf_counter()
+    generate_latest(registry)
+    print(f"Collector : publish {publish_time * 1000:9.2f}ms | scrape {(time.perf_counter() - start) * 1000:9.2f}ms ({samples} samples)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares preparation of the per-miner compressed payloads from pre-encoded state entries against encoding and compressing fully decoded payloads for each UID.
+
+Usage:
+    python -m benchmarks.payloads [--uids 256] [--books 128] [--engine lz4] [--workers 8]
+"""
+import time
+import argparse
+import msgspec
+import numpy as np
+
+from taos.im.utils.compress import compress, encode, compress_encoded, batch_compress_encoded, decompress
+
+def build_state(uids : int, books : int, levels : int = 21, seed : int = 0) -> bytes:
+    """
+    Returns a msgpack-encoded simulator state with the same structure and approximate size as the state published by the simulator.
+    """
+    rng = np.random.default_rng(seed)
+    def level(price):
+        return {"p" : round(price, 2), "q" : round(float(rng.uniform(0.1, 50)), 4), "o" : None}
+    def order(i):
+        return {"y" : "o", "i" : i, "c" : None, "t" : 1_000_000_000, "a" : int(rng.integers(uids)), "s" : int(rng.integers(2)), "p" : round(float(rng.uniform(290, 310)), 2), "q" : round(float(rng.uniform(0.1, 10)), 4)}
+    state_books = {
+        book_id : {
+            "i" : book_id,
+            "b" : [level(300 - 0.01 * i) for i in range(levels)],
+            "a" : [level(300.01 + 0.01 * i) for i in range(levels)],
+            "e" : [order(i) for i in range(20)]
+        } for book_id in range(books)
+    }
+    def balance(total):
+        return {"t" : total, "f" : total, "r" : 0.0}
+    accounts = {
+        uid : {
+            book_id : {
+                "i" : uid, "b" : book_id,
+                "bb" : balance(round(float(rng.uniform(0, 1000)), 4)), "qb" : balance(round(float(rng.uniform(0, 300000)), 2)),
+                "bl" : 0.0, "ql" : 0.0, "bc" : 0.0, "qc" : 0.0,
+                "o" : [order(i) for i in range(int(rng.integers(0, 5)))],
+                "l" : {}, "f" : {"v" : 0.0, "m" : 0.0002, "t" : 0.0005}
+            } for book_id in range(books)
+        } for uid in range(uids)
+    }
+    notices = {uid : [{"y" : "t", "i" : i, "t" : 1_000_000_000, "b" : int(rng.integers(books))} for i in range(int(rng.integers(0, 50)))] for uid in range(uids)}
+    return msgspec.msgpack.encode({"timestamp" : 1_000_000_000, "logDir" : "", "books" : state_books, "accounts" : accounts, "notices" : notices})
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--books", type=int, default=128)
+    parser.add_argument("--engine", type=str, default="lz4", choices=["zlib", "lz4", "zstd"])
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    buffer = build_state(args.uids, args.books)
+    config = {"simulation_id" : "benchmark", "book_count" : args.books, "duration" : 86400_000_000_000, "publish_interval" : 5_000_000_000}
+    print(f"State size : {len(buffer) / 1e6:.2f}MB | {args.uids} UIDs | {args.books} books")
+
+    # Legacy: every payload is encoded from fully decoded state
+    state = msgspec.msgpack.decode(buffer)
+    def legacy():
+        compressed_books = compress(state["books"], args.level, args.engine)
+        return compressed_books, {uid : compress({"accounts" : {uid : state["accounts"][uid]}, "notices" : {uid : state["notices"][uid]}, "config" : config, "response" : None}, args.level, args.engine) for uid in range(args.uids)}
+
+    # Pre-encoded: the shared entries are encoded once and the undecoded entries of each UID are written through verbatim
+    fields = msgspec.msgpack.decode(buffer, type=dict[str, msgspec.Raw])
+    raw_accounts = msgspec.msgpack.decode(fields["accounts"], type=dict[int, msgspec.Raw])
+    raw_notices = msgspec.msgpack.decode(fields["notices"], type=dict[int, msgspec.Raw])
+    def preencoded():
+        stages = {}
+        start = time.perf_counter()
+        compressed_books = compress_encoded(fields["books"], args.level, args.engine)
+        stages["books"] = time.perf_counter() - start
+        start = time.perf_counter()
+        encoded_config = msgspec.Raw(encode(config))
+        payloads = {uid : encode({"accounts" : {uid : raw_accounts[uid]}, "notices" : {uid : raw_notices[uid]}, "config" : encoded_config, "response" : None}) for uid in range(args.uids)}
+        stages["encode"] = time.perf_counter() - start
+        start = time.perf_counter()
+        compressed_payloads = batch_compress_encoded(payloads, args.level, args.engine, args.workers)
+        stages["compress"] = time.perf_counter() - start
+        return compressed_books, compressed_payloads, payloads, stages
+
+    legacy_books, legacy_payloads = legacy()
+    books, compressed_payloads, payloads, _ = preencoded()
+    for uid in range(args.uids):
+        expected = decompress({"books" : legacy_books, "payload" : legacy_payloads[uid]}, args.engine)
+        assert decompress({"books" : books, "payload" : compressed_payloads[uid]}, args.engine) == expected, f"Payload mismatch for UID {uid}"
+    print(f"Payloads : {sum(len(p) for p in payloads.values()) / 1e6:.2f}MB encoded -> {sum(len(p) for p in compressed_payloads.values()) / 1e6:.2f}MB compressed | Books : {len(fields['books']) / 1e6:.2f}MB -> {len(books) / 1e6:.2f}MB")
+
+    legacy_times, preencoded_times = [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        legacy()
+        legacy_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        *_, stages = preencoded()
+        preencoded_times.append(time.perf_counter() - start)
+    print(f"Legacy      : {min(legacy_times) * 1000:.1f}ms")
+    print(f"Pre-encoded : {min(preencoded_times) * 1000:.1f}ms ({' | '.join(f'{stage} {t * 1000:.1f}ms' for stage, t in stages.items())})")
+
+if __name__ == "__main__":
+    main()
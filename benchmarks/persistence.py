@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares saving and restoring the validator state by rewriting the full msgpack state files at every step (as `_save_state` did
+previously) against the write-ahead log and periodic checkpoints of `StateLog`, at full subnet size.
+
+The state of a validator which has run for `--lookback` steps is generated, and then `--interval` further steps are simulated, each
+appending an inventory row and volumes and recording the step.  The following are reported:
+
+    legacy save      : packing and writing the simulation and validator state files
+    legacy restart   : reading and unpacking the state files and reconstructing the inventory history and volume ledger
+    record           : capture of the log record of a step (in the reward thread)
+    record write     : writing of the record by the log writer thread
+    capture          : capture of a checkpoint (in the reward thread)
+    checkpoint write : writing of the checkpoint (in a background thread)
+    copy on write    : the first append to the inventory history while a checkpoint is being written
+    restart          : loading the checkpoint and replaying the `--interval` records which follow it, after which the validator
+                       is ready to process state updates
+    trades           : materializing the recent trades of the checkpoint (in the background, following the restart)
+
+Usage:
+    python -m benchmarks.persistence [--uids 256] [--books 128] [--lookback 3600] [--interval 100]
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import msgpack
+import numpy as np
+import torch
+from types import SimpleNamespace
+
+from taos.im.utils.inventory import InventoryHistory
+from taos.im.utils.volume import VolumeLedger, ROLES
+from taos.im.utils.persistence import StateLog, decode_trades
+from taos.im.protocol.models import TradeInfo
+from taos.im.protocol.events import TradeEvent
+
+PUBLISH_INTERVAL = 1_000_000_000
+SAMPLING_INTERVAL = 600_000_000_000
+ASSESSMENT_PERIOD = 86400_000_000_000
+
+def build_validator(uids : int, books : int, lookback : int, seed : int = 0) -> SimpleNamespace:
+    """
+    Generates the persisted state of a validator whose inventory history is full, with all UIDs having traded recently.
+    """
+    rng = np.random.default_rng(seed)
+    history = InventoryHistory(uids, lookback, books)
+    history.values[:] = rng.normal(0, 100, size=history.values.shape)
+    history.timestamps[:] = np.arange(1, lookback + 1) * PUBLISH_INTERVAL
+    history.counts[:] = lookback
+    history.size = lookback
+    ledger = VolumeLedger(uids, books, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+    for timestamp in range(SAMPLING_INTERVAL, SAMPLING_INTERVAL * ledger.capacity, SAMPLING_INTERVAL):
+        ledger.advance(timestamp)
+        ledger.volumes[..., (ledger.head - 1) % ledger.capacity] = np.round(rng.random((uids, books, len(ROLES))) * 1000, 4)
+    ledger.advance(lookback * PUBLISH_INTERVAL)
+    trade = {'y' : 't', 'i' : 1, 's' : 0, 't' : 0, 'q' : 1.0, 'p' : 300.0, 'Ti' : 1, 'Ta' : 1, 'Tf' : 0.0005, 'Mi' : 0, 'Ma' : 2, 'Mf' : 0.0002}
+    event = {'y' : 'ET', 'b' : 0, 'i' : 1, 's' : 0, 't' : 0, 'q' : 1.0, 'p' : 300.0, 'Ti' : 1, 'Ta' : 1, 'Tf' : 0.0005, 'Mi' : 0, 'Ma' : 2, 'Mf' : 0.0002}
+    return SimpleNamespace(
+        simulation=SimpleNamespace(label=lambda: 'benchmark', logDir=None),
+        step=lookback, simulation_timestamp=lookback * PUBLISH_INTERVAL,
+        start_time=time.time(), start_timestamp=0, step_rates=rng.random(10000).tolist(),
+        hotkeys=[f"hotkey{uid}" for uid in range(uids)], deregistered_uids=[],
+        scores=torch.tensor(rng.random(uids), dtype=torch.float32),
+        inventory_history=history, trade_volumes=ledger,
+        initial_balances={uid : {book : {'BASE' : 1.0, 'QUOTE' : 300.0, 'WEALTH' : 600.0} for book in range(books)} for uid in range(uids)},
+        activity_factors={uid : dict(enumerate(rng.random(books).tolist())) for uid in range(uids)},
+        sharpe_values={uid : {
+            'books' : dict(enumerate(rng.random(books).tolist())), 'books_weighted' : dict(enumerate(rng.random(books).tolist())),
+            'total' : 0.0, 'average' : 0.0, 'median' : 0.0, 'normalized_average' : 0.0, 'normalized_total' : 0.0, 'normalized_median' : 0.0,
+            'activity_weighted_normalized_median' : 0.0, 'penalty' : 0.0, 'score' : 0.0
+        } for uid in range(uids)},
+        unnormalized_scores={uid : 0.0 for uid in range(uids)},
+        recent_trades={book : [TradeInfo.model_construct(**trade) for _ in range(25)] for book in range(books)},
+        recent_miner_trades={uid : {book : [[TradeEvent.model_construct(**event), 'maker'] for _ in range(5)] for book in range(books)} for uid in range(uids)},
+        pending_notices={uid : [] for uid in range(uids)}
+    )
+
+def advance(validator : SimpleNamespace, rng : np.random.Generator) -> None:
+    """
+    Applies the changes made to the state by a reward pass.
+    """
+    history, ledger = validator.inventory_history, validator.trade_volumes
+    validator.step += 1
+    validator.simulation_timestamp += PUBLISH_INTERVAL
+    ledger.advance(validator.simulation_timestamp)
+    n = history.uids * 4
+    ledger.record(rng.integers(0, history.uids, n), rng.integers(0, history.books, n), rng.integers(0, len(ROLES), n), rng.random(n) * 100)
+    history.append(validator.simulation_timestamp, rng.normal(0, 100, size=(history.uids, history.books)))
+    validator.scores = torch.tensor(rng.random(history.uids), dtype=torch.float32)
+    validator.activity_factors = {uid : dict(enumerate(rng.random(history.books).tolist())) for uid in range(history.uids)}
+
+def legacy_save(validator : SimpleNamespace, directory : str) -> None:
+    with open(os.path.join(directory, "simulation.mp"), 'wb') as file:
+        file.write(msgpack.packb({
+            "start_time": validator.start_time,
+            "start_timestamp": validator.start_timestamp,
+            "step_rates": validator.step_rates,
+            "initial_balances": validator.initial_balances,
+            "recent_trades": {book_id : [t.model_dump(mode='json') for t in book_trades] for book_id, book_trades in validator.recent_trades.items()},
+            "recent_miner_trades": {uid : {book_id : [[t.model_dump(mode='json'), r] for t, r in trades] for book_id, trades in uid_miner_trades.items()} for uid, uid_miner_trades in validator.recent_miner_trades.items()},
+            "pending_notices": validator.pending_notices,
+            "simulation.logDir": validator.simulation.logDir
+        }, use_bin_type=True))
+    with open(os.path.join(directory, "validator.mp"), 'wb') as file:
+        file.write(msgpack.packb({
+            "step": validator.step,
+            "simulation_timestamp": validator.simulation_timestamp,
+            "hotkeys": validator.hotkeys,
+            "scores": [score.item() for score in validator.scores],
+            "activity_factors": validator.activity_factors,
+            "inventory_history": validator.inventory_history.to_dict(),
+            "sharpe_values": validator.sharpe_values,
+            "unnormalized_scores": validator.unnormalized_scores,
+            "trade_volumes" : validator.trade_volumes.to_dict(),
+            "deregistered_uids" : validator.deregistered_uids
+        }, use_bin_type=True))
+
+def legacy_restart(directory : str, uids : int, books : int) -> None:
+    with open(os.path.join(directory, "simulation.mp"), 'rb') as file:
+        simulation_state = msgpack.unpackb(file.read(), use_list=True, strict_map_key=False)
+    {book_id : [TradeInfo.model_construct(**t) for t in book_trades] for book_id, book_trades in simulation_state["recent_trades"].items()}
+    {uid : {book_id : [[TradeEvent.model_construct(**t), r] for t, r in trades] for book_id, trades in uid_miner_trades.items()} for uid, uid_miner_trades in simulation_state["recent_miner_trades"].items()}
+    with open(os.path.join(directory, "validator.mp"), 'rb') as file:
+        validator_state = msgpack.unpackb(file.read(), use_list=False, strict_map_key=False)
+    InventoryHistory.from_state(validator_state["inventory_history"], uids, validator_state["inventory_history"]["shape"][1], books)
+    VolumeLedger.from_state(validator_state["trade_volumes"], uids, books, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+
+def restart(directory : str, uids : int, books : int) -> tuple[SimpleNamespace, int]:
+    """
+    Restores the state from the checkpoint and log as `Validator.load_state`, leaving the recent trades encoded in `trades`.
+    """
+    log = StateLog(directory)
+    state = log.load()
+    simulation_state, validator_state = state["simulation"], state["validator"]
+    validator = SimpleNamespace(
+        step=validator_state["step"], simulation_timestamp=validator_state["simulation_timestamp"],
+        hotkeys=validator_state["hotkeys"], deregistered_uids=validator_state["deregistered_uids"],
+        scores=torch.tensor(validator_state["scores"]),
+        initial_balances=simulation_state["initial_balances"],
+        trades=simulation_state["trades"],
+        activity_factors=validator_state["activity_factors"], unnormalized_scores=validator_state["unnormalized_scores"],
+        inventory_history=InventoryHistory.from_state(validator_state["inventory_history"], uids, validator_state["inventory_history"]["shape"][1], books),
+        trade_volumes=VolumeLedger.from_state(validator_state["trade_volumes"], uids, books, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+    )
+    replayed = log.replay(validator)
+    log.close()
+    return validator, replayed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--books", type=int, default=128)
+    parser.add_argument("--lookback", type=int, default=3600)
+    parser.add_argument("--interval", type=int, default=100)
+    parser.add_argument("--directory", type=str, default=None, help="Directory in which to write the state (a temporary directory by default).")
+    args = parser.parse_args()
+    rng = np.random.default_rng(1)
+    directory = tempfile.mkdtemp(dir=args.directory)
+    try:
+        validator = build_validator(args.uids, args.books, args.lookback)
+
+        start = time.perf_counter()
+        legacy_save(validator, directory)
+        print(f"Legacy save      : {(time.perf_counter() - start) * 1000:9.2f}ms")
+        start = time.perf_counter()
+        legacy_restart(directory, args.uids, args.books)
+        print(f"Legacy restart   : {(time.perf_counter() - start) * 1000:9.2f}ms")
+
+        log = StateLog(os.path.join(directory, "state"))
+        start = time.perf_counter()
+        checkpoint = log.capture(validator)
+        capture_time = time.perf_counter() - start
+        start = time.perf_counter()
+        log.write(checkpoint)
+        write_time = time.perf_counter() - start
+        print(f"Capture          : {capture_time * 1000:9.2f}ms")
+        print(f"Checkpoint write : {write_time * 1000:9.2f}ms ({checkpoint.size / 1e6:.1f}MB)")
+
+        # A checkpoint is captured but not yet written, so that the next append copies the inventory values and volumes
+        checkpoint = log.capture(validator)
+        start = time.perf_counter()
+        advance(validator, rng)
+        print(f"Copy on write    : {(time.perf_counter() - start) * 1000:9.2f}ms (append and volumes, including copies)")
+        log.record(validator)
+        log.write(checkpoint)
+
+        record_times, write_times, size = [], [], 0
+        for _ in range(args.interval):
+            advance(validator, rng)
+            start = time.perf_counter()
+            log.record(validator)
+            record_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            log.flush()
+            write_times.append(time.perf_counter() - start)
+        size = sum(os.path.getsize(os.path.join(log.directory, name)) for name in os.listdir(log.directory) if name.endswith('.wal'))
+        print(f"Record           : {np.mean(record_times) * 1000:9.2f}ms mean | {np.max(record_times) * 1000:9.2f}ms max")
+        print(f"Record write     : {np.mean(write_times) * 1000:9.2f}ms mean | {np.max(write_times) * 1000:9.2f}ms max ({size / args.interval / 1e6:.2f}MB per record)")
+        log.close()
+
+        start = time.perf_counter()
+        restored, replayed = restart(log.directory, args.uids, args.books)
+        print(f"Restart          : {(time.perf_counter() - start) * 1000:9.2f}ms ({replayed} records replayed)")
+        start = time.perf_counter()
+        restored.recent_trades, restored.recent_miner_trades = decode_trades(restored.trades)
+        print(f"Trades           : {(time.perf_counter() - start) * 1000:9.2f}ms")
+        assert np.array_equal(restored.inventory_history.values, validator.inventory_history.values)
+        assert np.array_equal(restored.trade_volumes.volumes, validator.trade_volumes.volumes)
+        assert restored.step == validator.step
+        assert sum(len(trades) for trades in restored.recent_trades.values()) == sum(len(trades) for trades in validator.recent_trades.values())
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares the vectorized ring buffer Sharpe kernel and the incremental `RollingSharpe` estimator against the per-UID `sharpe_batch` implementation.
+
+Usage:
+    python -m benchmarks.sharpe [--uids 256] [--books 40] [--lookback 600] [--steps 900]
+"""
+import time
+import argparse
+import numpy as np
+
+from taos.im.utils.inventory import InventoryHistory
+from taos.im.utils.sharpe import sharpe_batch, sharpe_ring, RollingSharpe
+
+GRACE_PERIOD = 120_000_000_000
+
+def build_history(uids : int, books : int, lookback : int, steps : int, seed : int = 0) -> tuple[InventoryHistory, RollingSharpe, float]:
+    """
+    Populates an inventory history with random walks, including a simulation changeover and a reset UID so that all masking paths are exercised.
+    UID 3 holds a constant inventory throughout, UID 4 goes idle within the final window and UID 5 goes idle before it, so that the
+    window of UID 5 is constant although its statistics have seen activity since they were last recomputed.
+    The incremental estimator is updated alongside, and the mean time taken by its updates is returned with it.
+    """
+    rng = np.random.default_rng(seed)
+    history = InventoryHistory(uids, lookback, books)
+    rolling = RollingSharpe(history, GRACE_PERIOD)
+    values = np.zeros((uids, books))
+    active = np.ones((uids, 1))
+    active[3] = 0.0
+    timestamp = 0
+    update_time = 0.0
+    for step in range(steps):
+        timestamp += 1_000_000_000 if step != steps // 2 else 3600_000_000_000
+        if step == steps - lookback - lookback // 3:
+            active[5] = 0.0
+        if step == steps - lookback // 3:
+            active[4] = 0.0
+        values += rng.normal(0, 10, size=(uids, books)) * active
+        start = time.perf_counter()
+        rolling.update(history, timestamp, values)
+        update_time += time.perf_counter() - start
+        history.append(timestamp, values)
+        if step == steps - lookback // 4:
+            history.reset(1)
+            rolling.reset(1)
+    return history, rolling, update_time / steps
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--books", type=int, default=40)
+    parser.add_argument("--lookback", type=int, default=600)
+    parser.add_argument("--steps", type=int, default=900)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    history, rolling, update_time = build_history(args.uids, args.books, args.lookback, args.steps)
+    uids = np.arange(args.uids)
+    params = dict(lookback=args.lookback, norm_min=-10.0, norm_max=10.0, min_lookback=args.lookback // 2, grace_period=GRACE_PERIOD, deregistered_uids=[2])
+    rolling_params = {k : v for k, v in params.items() if k != 'grace_period'}
+
+    # The legacy implementation operates on the dictionary representation of the history
+    legacy_input = {}
+    for uid in uids:
+        timestamps, values = history.window(uid)
+        legacy_input[int(uid)] = {int(t) : dict(enumerate(v.tolist())) for t, v in zip(timestamps, values)}
+
+    legacy_times, ring_times, rolling_times = [], [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        expected = sharpe_batch(legacy_input, **params)
+        legacy_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        result = sharpe_ring(history.values, history.timestamps, history.counts, history.head, uids, **params)
+        ring_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        incremental = rolling.sharpe(history, uids, **rolling_params)
+        rolling_times.append(time.perf_counter() - start)
+
+    for name, candidate in [('sharpe_ring', result), ('RollingSharpe', incremental)]:
+        for uid in uids:
+            a, b = expected[int(uid)], candidate[int(uid)]
+            assert (a is None) == (b is None), f"{name} : Eligibility mismatch for UID {uid}"
+            if a is None: continue
+            assert np.allclose(list(a['books'].values()), list(b['books'].values())), f"{name} : Book Sharpe mismatch for UID {uid}"
+            for key in ['average', 'median', 'total', 'normalized_average', 'normalized_median', 'normalized_total']:
+                assert np.isclose(a[key], b[key]), f"{name} : {key} mismatch for UID {uid}"
+
+    print(f"uids={args.uids} books={args.books} lookback={args.lookback} steps={args.steps}")
+    print(f"sharpe_batch : {min(legacy_times):.4f}s")
+    print(f"sharpe_ring  : {min(ring_times):.4f}s ({min(legacy_times) / min(ring_times):.1f}x)")
+    print(f"RollingSharpe: {min(rolling_times):.4f}s + {update_time:.4f}s/update ({min(legacy_times) / (min(rolling_times) + update_time):.1f}x)")
+    print("Results match.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Generator of synthetic simulator states and reader of recorded state fixtures for the validator benchmarks.
+
+States are msgpack-encoded in the form published by the simulator to the validator: each book holds `depth` levels either side of
+a price which follows a random walk from state to state, with `events_per_book` order placement, trade and cancellation events, and
+each agent holds an account in every book and receives `notices` placement, cancellation and trade notices per state.  As in
+`simulate/trading/test/cpp-tests/data/data_tool.py`, orders and trades are placed at random prices around the book price, by randomly
+chosen miner and background agents.
+
+Real states can be recorded by a validator with `--simulation.capture_dir` and replayed in place of the synthetic states.
+
+To write a sequence of synthetic states as fixtures:
+
+    python -m benchmarks.states --output <directory> [--count 10] [--uids 256] [--books 128] [--depth 21] [--events 50] [--notices 20]
+"""
+import os
+import argparse
+import msgspec
+import numpy as np
+
+PUBLISH_INTERVAL = 1_000_000_000
+
+def generate_state(uids : int, books : int, depth : int = 21, events_per_book : int = 50, notices : int = 20,
+                   timestamp : int = PUBLISH_INTERVAL, prices : np.ndarray | None = None, seed : int = 0) -> bytes:
+    """
+    Returns a msgpack-encoded synthetic simulator state.
+
+    Args:
+        uids (int): Number of miner agents (UIDs) holding accounts.
+        books (int): Number of books.
+        depth (int): Number of levels on each side of each book.
+        events_per_book (int): Number of events recorded in each book since the previous state.
+        notices (int): Number of notices for each agent.
+        timestamp (int): Simulation timestamp of the state.
+        prices (np.ndarray | None): Midquote price of each book; 300 if None.
+        seed (int): Random seed.
+
+    Returns:
+        bytes: The encoded state.
+    """
+    rng = np.random.default_rng(seed)
+    prices = np.full(books, 300.0) if prices is None else prices
+    start = timestamp - PUBLISH_INTERVAL
+    def quantity():
+        return round(float(rng.uniform(0.1, 10)), 4)
+    def order(i, side, price, agent_id):
+        return {"y" : "o", "i" : i, "c" : None, "t" : int(rng.integers(start, timestamp)), "a" : agent_id, "s" : side, "p" : price, "q" : quantity()}
+    def trade(i, side, price, taker, maker):
+        return {"y" : "t", "i" : i, "s" : side, "t" : int(rng.integers(start, timestamp)), "q" : quantity(), "p" : price,
+                "Ti" : i, "Ta" : taker, "Tf" : 0.0005, "Mi" : i - 1, "Ma" : maker, "Mf" : 0.0002}
+    def agent():
+        # Miner agents hold non-negative IDs; background agents are identified by negative IDs
+        return int(rng.integers(uids)) if rng.random() < 0.5 else -int(rng.integers(1, 1000))
+
+    state_books = {}
+    for book_id in range(books):
+        mid = round(float(prices[book_id]), 2)
+        events = []
+        for i in range(events_per_book):
+            side, price = int(rng.integers(2)), round(mid + float(rng.uniform(-0.5, 0.5)), 2)
+            match i % 3:
+                case 0 | 1:
+                    events.append(order(i, side, price, agent()) if i % 3 == 0 else trade(i, side, price, agent(), agent()))
+                case 2:
+                    events.append({"y" : "c", "i" : i - 2, "t" : int(rng.integers(start, timestamp)), "p" : price, "q" : None})
+        state_books[book_id] = {
+            "i" : book_id,
+            "b" : [{"p" : round(mid - 0.01 * (level + 1), 2), "q" : round(float(rng.uniform(0.1, 50)), 4), "o" : None} for level in range(depth)],
+            "a" : [{"p" : round(mid + 0.01 * level, 2), "q" : round(float(rng.uniform(0.1, 50)), 4), "o" : None} for level in range(depth)],
+            "e" : events
+        }
+
+    def balance(total, currency):
+        return {"c" : currency, "t" : total, "f" : total, "r" : 0.0, "i" : total}
+    accounts = {
+        uid : {
+            book_id : {
+                "i" : uid, "b" : book_id,
+                "bb" : balance(round(float(rng.uniform(0, 1000)), 4), "BASE"), "qb" : balance(round(float(rng.uniform(0, 300000)), 2), "QUOTE"),
+                "bl" : 0.0, "ql" : 0.0, "bc" : 0.0, "qc" : 0.0,
+                "o" : [order(i, int(rng.integers(2)), round(float(prices[book_id]) + float(rng.uniform(-1, 1)), 2), uid) for i in range(int(rng.integers(0, 5)))],
+                "l" : {}, "f" : {"v" : 0.0, "m" : 0.0002, "t" : 0.0005}
+            } for book_id in range(books)
+        } for uid in range(uids)
+    }
+
+    def notice(uid, i):
+        book_id, side = int(rng.integers(books)), int(rng.integers(2))
+        price = round(float(prices[book_id]) + float(rng.uniform(-1, 1)), 2)
+        t = int(rng.integers(start, timestamp))
+        match i % 3:
+            case 0:
+                return {"y" : "RDPOL", "t" : t, "a" : uid, "b" : book_id, "o" : i, "c" : None, "s" : side, "q" : quantity(), "u" : True, "m" : "", "l" : 0.0, "f" : -2, "p" : price}
+            case 1:
+                return {"y" : "RDCO", "t" : t, "a" : uid, "b" : book_id, "c" : [{"y" : "RDCO1", "t" : t, "b" : book_id, "o" : i - 1, "q" : None, "u" : True, "m" : ""}]}
+            case 2:
+                maker = bool(rng.integers(2))
+                return {"y" : "ET", "t" : t, "a" : uid, "b" : book_id, "i" : i, "c" : None, "Ta" : -1 if maker else uid, "Ti" : i, "Tf" : 0.0005,
+                        "Ma" : uid if maker else -1, "Mi" : i + 1, "Mf" : 0.0002, "s" : side, "p" : price, "q" : quantity()}
+    state_notices = {uid : [notice(uid, i) for i in range(notices)] for uid in range(uids)}
+    return msgspec.msgpack.encode({"timestamp" : timestamp, "logDir" : "", "books" : state_books, "accounts" : accounts, "notices" : state_notices})
+
+def generate_states(count : int, uids : int, books : int, depth : int = 21, events_per_book : int = 50, notices : int = 20, seed : int = 0) -> list[bytes]:
+    """
+    Returns a sequence of `count` consecutive synthetic states published at `PUBLISH_INTERVAL`, with the price of each book
+    following an independent random walk.
+    """
+    rng = np.random.default_rng(seed)
+    prices = np.full(books, 300.0)
+    states = []
+    for step in range(count):
+        prices = np.maximum(prices * np.exp(rng.normal(0, 0.001, books)), 1.0)
+        states.append(generate_state(uids, books, depth, events_per_book, notices, (step + 1) * PUBLISH_INTERVAL, prices, seed + step))
+    return states
+
+def load_states(directory : str) -> list[bytes]:
+    """
+    Reads the encoded states recorded in a directory, in the order of their file names.
+    """
+    states = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            states.append(f.read())
+    return states
+
+def write_states(directory : str, states : list[bytes]) -> None:
+    """
+    Writes encoded states to a directory, named such that `load_states` returns them in order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for i, state in enumerate(states):
+        with open(os.path.join(directory, f"state_{i:06d}.msgpack"), "wb") as f:
+            f.write(state)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, required=True, help="Directory to which the states are written.")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--books", type=int, default=128)
+    parser.add_argument("--depth", type=int, default=21)
+    parser.add_argument("--events", type=int, default=50, help="Events per book.")
+    parser.add_argument("--notices", type=int, default=20, help="Notices per agent.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    states = generate_states(args.count, args.uids, args.books, args.depth, args.events, args.notices, args.seed)
+    write_states(args.output, states)
+    print(f"Wrote {len(states)} states ({sum(len(state) for state in states) / 1e6:.2f}MB) to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Benchmarks the stages of the validator hot path for a sequence of state updates, entirely offline.
+
+The validator is assembled from the mock wallet, subtensor and metagraph used by `--mock` (see `taos/mock.py`), without the simulator,
+repository and chain connections required by its constructor; its scoring state is initialized by `load_state` as for a new validator.
+Miners are simulated by `MockDendrite`, each decompressing the state update and responding with limit orders in
+`--instructions` random books, as a miner would.
+
+For each state, the stages are run in the order in which the validator processes a state update:
+
+    ingest     : `MarketSimulationStateUpdate.from_buffer`
+    reward     : `reward` (inventory valuation, volume ledger, Sharpe scoring)
+    record     : `StateLog.record` (capture of the write-ahead log record of the step)
+    prepare    : `prepare_axon_synapses` (encoding and compression of the synapses for each miner)
+    query      : the mock dendrite queries dispatched by `DispatchScheduler`, including the simulated miners' decompression and compression of the synapses
+    validate   : `validate_responses`
+    stats      : `update_stats`
+    delays     : `set_delays`
+    serialize  : serialization of the responses for the simulator
+    report     : `report` (publishing of the Prometheus metrics)
+    release    : `detach` of the state from the received buffer
+
+The mean and maximum time of each stage are reported, and with `--memory` the peak memory allocated during each stage (measured in a
+separate pass with `tracemalloc`, so as not to affect the timings).  States are generated with `benchmarks.states` unless a
+directory of recorded states is given with `--states`.
+
+Results can be appended to a JSON-lines file with `--record`, keyed by the current commit and the benchmark parameters.  With
+`--compare`, the results are compared against the last result recorded in that file with the same parameters, and the benchmark
+exits with a non-zero status if any stage is slower by more than `--threshold`.
+
+Usage:
+    python -m benchmarks.validator [--states <directory>] [--uids 256] [--books 128] [--count 10] [--memory] [--record results.jsonl] [--compare results.jsonl]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import xml.etree.ElementTree as ET
+import msgpack
+import numpy as np
+import torch
+import bittensor as bt
+
+from taos.mock import MockSubtensor, MockMetagraph, MockDendrite
+from taos.common.utils.prometheus import prometheus
+from taos.im.neurons.validator import Validator
+from taos.im.protocol import MarketSimulationStateUpdate, FinanceAgentResponse
+from taos.im.protocol.models import MarketSimulationConfig
+from taos.im.protocol.simulator import SimulatorResponseBatch
+from taos.im.utils.persistence import StateLog
+from taos.im.utils.dispatch import DispatchScheduler
+from taos.im.validator.forward import prepare_axon_synapses, validate_responses, update_stats
+from taos.im.validator.reward import reward, set_delays
+from taos.im.validator.report import init_metrics, report
+from benchmarks.states import generate_states, load_states
+
+XML_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simulate", "trading", "run", "config", "simulation_0.xml")
+STAGES = ["ingest", "reward", "record", "prepare", "query", "validate", "stats", "delays", "serialize", "report", "release"]
+
+def validator_config(args, workdir : str) -> "bt.config":
+    parser = argparse.ArgumentParser()
+    bt.wallet.add_args(parser)
+    bt.subtensor.add_args(parser)
+    bt.logging.add_args(parser)
+    bt.axon.add_args(parser)
+    prometheus.add_args(parser)
+    Validator.add_args(parser)
+    config = bt.config(parser, args=[
+        "--mock", "--neuron.reset", "--neuron.axon_off", "--prometheus.level", "OFF",
+        "--compression.engine", args.engine, "--compression.parallel_workers", str(args.workers)
+    ] + (["--compression.book_deltas"] if args.book_deltas else []))
+    config.neuron.full_path = workdir
+    return config
+
+def miner(books : int, instructions : int, seed : int = 0):
+    """
+    Returns a function simulating the handling of a state update by a miner, for use as the responder of `MockDendrite`.
+    """
+    rng = random.Random(seed)
+    def respond(uid : int, synapse : MarketSimulationStateUpdate) -> MarketSimulationStateUpdate:
+        synapse.decompress(views=True)
+        response = FinanceAgentResponse(agent_id=uid)
+        for book_id in rng.sample(range(books), min(instructions, books)):
+            book = synapse.books[book_id]
+            direction = rng.randint(0, 1)
+            price = book.bids[0].price if direction == 0 else book.asks[0].price
+            response.limit_order(book_id=book_id, direction=direction, quantity=round(rng.uniform(0.1, 1.0), 4), price=price)
+        synapse.response = response
+        return synapse.clear_inputs().compress()
+    return respond
+
+def build_validator(args, books : int, uids : int, workdir : str, metrics : Validator | None = None) -> Validator:
+    """
+    Assembles a validator with mock network components and a newly initialized scoring state.
+
+    Prometheus metrics can only be registered once in a process, so those of a previously built validator are reused if given.
+    """
+    config = validator_config(args, workdir)
+    # The full constructor requires a running simulator, the repository and a chain connection; only the state used by the hot path is initialized
+    self = Validator.__new__(Validator)
+    self.config = config
+    self.device = "cpu"
+    self.wallet = bt.MockWallet(config=config)
+    self.subtensor = MockSubtensor(config.netuid, n=uids - 1, wallet=self.wallet)
+    self.metagraph = MockMetagraph(config.netuid, subtensor=self.subtensor)
+    self.uid = self.metagraph.hotkeys.index(self.wallet.hotkey.ss58_address)
+    uid_by_hotkey = {hotkey : uid for uid, hotkey in enumerate(self.metagraph.hotkeys)}
+    respond = miner(books, args.instructions)
+    timings = np.random.default_rng(0)
+    self.dendrite = MockDendrite(
+        self.wallet,
+        responder=lambda axon, synapse: respond(uid_by_hotkey[axon.hotkey], synapse),
+        process_time=lambda axon: float(timings.uniform(0, config.neuron.timeout))
+    )
+    self.hotkeys = list(self.metagraph.hotkeys)
+    self.deregistered_uids = []
+    self.scores = torch.zeros(self.metagraph.n, dtype=torch.float32)
+    self.current_block = 0
+    self.step = 0
+
+    self.simulation = MarketSimulationConfig.from_xml(ET.parse(args.xml_config).getroot())
+    self.simulation.block_count, self.simulation.books_per_block, self.simulation.book_count = 1, books, books
+    self.subnet_info = argparse.Namespace(max_uids=uids)
+    self.last_state = None
+    self.last_response = None
+    self.book_reference = None
+    self.book_delta_uids = set()
+    self.simulation_timestamp = 0
+    self.reward_weights = {"sharpe" : 1.0}
+    self.start_time = time.time()
+    self.start_timestamp = 0
+    self.last_state_time = None
+    self.step_rates = []
+    self.maintaining = self.rewarding = self.reporting = self.saving = self.compressing = False
+    self._trades_loader = None
+    self.validator_state_file = os.path.join(workdir, "validator.mp")
+    self.simulation_state_file = os.path.join(workdir, "simulation.mp")
+    self.state_log = StateLog(os.path.join(workdir, "state"))
+    self.load_state()
+    self.miner_stats = {uid : {'requests' : 0, 'timeouts' : 0, 'failures' : 0, 'rejections' : 0, 'call_time' : [], 'send_offset' : []} for uid in range(uids)}
+    self.dispatch_scheduler = DispatchScheduler(uids, rate=config.neuron.dispatch.rate, burst=config.neuron.dispatch.burst,
+                                                concurrency=config.neuron.dispatch.concurrency, host_limit=config.neuron.dispatch.host_limit,
+                                                order=config.neuron.dispatch.order,
+                                                quorum=config.neuron.dispatch.quorum, deadline_percentile=config.neuron.dispatch.deadline_percentile, seed=0)
+    if metrics is None:
+        init_metrics(self)
+    else:
+        for name, metric in vars(metrics).items():
+            if name.startswith("prometheus_"):
+                setattr(self, name, metric)
+    return self
+
+async def query(self : Validator, axon_synapses : dict[int, MarketSimulationStateUpdate]) -> dict[int, MarketSimulationStateUpdate]:
+    async def send(uid):
+        return await self.dendrite(axons=self.metagraph.axons[uid], synapse=axon_synapses[uid], timeout=self.config.neuron.timeout, deserialize=False)
+    return await self.dispatch_scheduler.dispatch(list(axon_synapses), send)
+
+def step(self : Validator, buffer : bytes, measure) -> None:
+    """
+    Processes a state update through each stage of the hot path, calling `measure(stage, fn)` to execute and measure each stage.
+    """
+    _, state = measure("ingest", lambda: MarketSimulationStateUpdate.from_buffer(buffer))
+    self.step += 1
+    self.simulation_timestamp = state.timestamp
+    self.last_state = state
+    state.config = self.simulation.model_copy()
+    measure("reward", lambda: reward(self, state))
+    measure("record", lambda: self.state_log.record(self))
+    axon_synapses = measure("prepare", lambda: prepare_axon_synapses(self, state))
+    responses = measure("query", lambda: asyncio.run(query(self, axon_synapses)))
+    measure("validate", lambda: validate_responses(self, responses))
+    if self.config.compression.book_deltas:
+        self.book_delta_uids = {uid for uid, response in responses.items() if response.is_success and not response.keyframe_required}
+    measure("stats", lambda: update_stats(self, responses))
+    delayed = measure("delays", lambda: set_delays(self, responses))
+    measure("serialize", lambda: msgpack.packb(SimulatorResponseBatch(delayed).serialize(), use_bin_type=True))
+    measure("report", lambda: asyncio.run(report(self)))
+    measure("release", lambda: state.detach())
+
+def run(self : Validator, states : list[bytes], memory : bool) -> dict[str, list[float]]:
+    """
+    Processes the states in sequence, returning the times (or with `memory`, the peak allocations in bytes) of each stage for each state.
+    """
+    results = {stage : [] for stage in STAGES}
+    def timed(stage, fn):
+        start = time.perf_counter()
+        result = fn()
+        results[stage].append(time.perf_counter() - start)
+        return result
+    def traced(stage, fn):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        results[stage].append(tracemalloc.get_traced_memory()[1] - baseline)
+        return result
+    if memory:
+        tracemalloc.start()
+    try:
+        for buffer in states:
+            step(self, buffer, traced if memory else timed)
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return results
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(summary : dict, params : dict, path : str, threshold : float) -> bool:
+    """
+    Compares the stage timings against the last result recorded with the same parameters, returning False if any stage has regressed.
+    """
+    baseline = None
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["params"] == params:
+                    baseline = record
+    if baseline is None:
+        print(f"No baseline with the same parameters in {path}.")
+        return True
+    print(f"\nComparison with {baseline['commit']} ({baseline['time']}) | threshold {threshold:.0%}")
+    passed = True
+    for stage, result in summary.items():
+        if stage not in baseline["stages"]:
+            continue
+        before, after = baseline["stages"][stage]["mean_ms"], result["mean_ms"]
+        change = after / before - 1 if before > 0 else 0.0
+        regressed = change > threshold
+        passed &= not regressed
+        print(f"{stage:<10}: {before:9.2f}ms -> {after:9.2f}ms ({change:+.1%}){' REGRESSION' if regressed else ''}")
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=str, default=None, help="Directory of recorded msgpack-encoded simulator states to replay.")
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--books", type=int, default=128)
+    parser.add_argument("--depth", type=int, default=21)
+    parser.add_argument("--events", type=int, default=50, help="Events per book.")
+    parser.add_argument("--notices", type=int, default=20, help="Notices per agent.")
+    parser.add_argument("--count", type=int, default=10, help="Number of states to generate if no states are given.")
+    parser.add_argument("--instructions", type=int, default=8, help="Instructions submitted by each simulated miner.")
+    parser.add_argument("--engine", type=str, default="lz4", choices=["zlib", "lz4", "zstd"])
+    parser.add_argument("--workers", type=int, default=0, help="Compression workers (-1 => half available cores).")
+    parser.add_argument("--book-deltas", action="store_true")
+    parser.add_argument("--xml-config", type=str, default=XML_CONFIG)
+    parser.add_argument("--memory", action="store_true", help="Also measure the peak memory allocated by each stage.")
+    parser.add_argument("--record", type=str, default=None, help="JSON-lines file to which the results are appended.")
+    parser.add_argument("--compare", type=str, default=None, help="JSON-lines file of recorded results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown of a stage considered a regression.")
+    args = parser.parse_args()
+
+    if args.states:
+        states = load_states(args.states)
+        fields = msgpack.unpackb(states[0], strict_map_key=False)
+        uids, books = len(fields["accounts"]), len(fields["books"])
+        params = {"states" : os.path.abspath(args.states), "count" : len(states)}
+    else:
+        uids, books = args.uids, args.books
+        states = generate_states(args.count, uids, books, args.depth, args.events, args.notices)
+        params = {"uids" : uids, "books" : books, "depth" : args.depth, "events" : args.events, "notices" : args.notices, "count" : args.count}
+    params |= {"instructions" : args.instructions, "engine" : args.engine, "workers" : args.workers, "book_deltas" : args.book_deltas}
+    print(f"{len(states)} states | {uids} UIDs | {books} books | {sum(len(state) for state in states) / len(states) / 1e6:.2f}MB per state")
+
+    bt.logging.off()
+    with tempfile.TemporaryDirectory() as workdir:
+        validator = build_validator(args, books, uids, workdir)
+        timings = run(validator, states, False)
+        allocations = run(build_validator(args, books, uids, workdir, validator), states, True) if args.memory else None
+
+    summary = {}
+    print(f"\n{'stage':<10}{'mean ms':>10}{'max ms':>10}{'peak MB' if allocations else '':>10}")
+    for stage in STAGES:
+        summary[stage] = {"mean_ms" : float(np.mean(timings[stage])) * 1000, "max_ms" : float(np.max(timings[stage])) * 1000}
+        if allocations:
+            summary[stage]["peak_mb"] = float(np.max(allocations[stage])) / 1e6
+        print(f"{stage:<10}{summary[stage]['mean_ms']:>10.2f}{summary[stage]['max_ms']:>10.2f}" + (f"{summary[stage]['peak_mb']:>10.2f}" if allocations else ""))
+    total = sum(result["mean_ms"] for result in summary.values())
+    print(f"{'total':<10}{total:>10.2f}")
+
+    passed = compare(summary, params, args.compare, args.threshold) if args.compare else True
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps({"commit" : commit(), "time" : time.strftime("%Y-%m-%dT%H:%M:%S"), "python" : platform.python_version(),
+                                "machine" : platform.machine(), "params" : params, "stages" : summary}) + "\n")
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Compares the time taken by a miner from receipt of a compressed state update to the point at which it can generate its first
+instruction, when the state is decoded into pydantic models (eager), into the lazily-parsed classes (lazy) or into the read-only
+views of `taos.im.protocol.views` (views).
+
+Before its first instruction, the benchmark strategy reads the best bid and ask of every book, the free balances of its account
+in every book, and the type, book and quantity of each of its notices, as `FinanceSimulationAgent.update` and a simple strategy
+would.  In eager mode, any books, accounts or notices left as dicts by the synapse are validated into their models so that the
+same attribute access is available.
+
+Usage:
+    python -m benchmarks.views [--books 128] [--notices 200] [--engine lz4] [--repeat 10]
+"""
+import time
+import argparse
+import msgspec
+import numpy as np
+from pydantic import TypeAdapter
+
+from taos.im.protocol import MarketSimulationStateUpdate, FinanceNotice
+from taos.im.protocol.models import Book, Account
+from taos.im.protocol.views import parse
+from benchmarks.payloads import build_state
+
+UID = 0
+
+def build_notices(books : int, count : int, seed : int = 0) -> list[dict]:
+    """
+    Returns order placement, cancellation and trade notices for the benchmark agent, in the form transmitted by the validator.
+    """
+    rng = np.random.default_rng(seed)
+    notices = []
+    for i in range(count):
+        book_id, side, price, quantity = int(rng.integers(books)), int(rng.integers(2)), round(float(rng.uniform(290, 310)), 2), round(float(rng.uniform(0.1, 10)), 4)
+        match i % 3:
+            case 0:
+                notices.append({"y" : "RDPOL", "t" : i, "a" : UID, "b" : book_id, "o" : i, "c" : None, "s" : side, "q" : quantity, "u" : True, "m" : "", "l" : 0.0, "f" : -2, "p" : price})
+            case 1:
+                notices.append({"y" : "RDCO", "t" : i, "a" : UID, "b" : book_id, "c" : [{"y" : "RDCO1", "t" : i, "b" : book_id, "o" : i - 1, "q" : None, "u" : True, "m" : ""}]})
+            case 2:
+                notices.append({"y" : "ET", "t" : i, "a" : UID, "b" : book_id, "i" : i, "c" : None, "Ta" : UID, "Ti" : i, "Tf" : 0.0005, "Ma" : UID + 1, "Mi" : i + 1, "Mf" : 0.0002, "s" : side, "p" : price, "q" : quantity})
+    return notices
+
+def compressed_state(books : int, notices : int, engine : str) -> dict:
+    """
+    Returns the compressed fields of a state update for the benchmark agent, as received by a miner.
+    """
+    state = msgspec.msgpack.decode(build_state(1, books))
+    for account in state["accounts"][UID].values():
+        for balance, currency in [(account["bb"], "BASE"), (account["qb"], "QUOTE")]:
+            balance["c"], balance["i"] = currency, balance["t"]
+    update = MarketSimulationStateUpdate(
+        version=60, timestamp=state["timestamp"], compression_engine=engine,
+        books=state["books"], accounts={UID : state["accounts"][UID]}, notices={UID : build_notices(books, notices)}
+    )
+    return update.compress(level=1).compressed
+
+notice_adapter = TypeAdapter(list[FinanceNotice])
+
+def materialize(state : MarketSimulationStateUpdate) -> None:
+    # The synapse may leave validated fields as dicts; attribute access requires the models
+    state.books = {book_id : Book.model_validate(book) if isinstance(book, dict) else book for book_id, book in state.books.items()}
+    state.accounts = {UID : {book_id : Account.model_validate(account) if isinstance(account, dict) else account for book_id, account in state.accounts[UID].items()}}
+    state.notices = {UID : notice_adapter.validate_python(state.notices[UID])}
+
+def first_instruction(state : MarketSimulationStateUpdate) -> float:
+    """Reads the data required by the benchmark strategy before its first instruction."""
+    total = 0.0
+    accounts = state.accounts[UID]
+    for book_id in range(len(state.books)):
+        book = state.books[book_id]
+        account = accounts[book_id]
+        total += book.bids[0].price + book.asks[0].price + account.base_balance.free + account.quote_balance.free
+    for event in state.notices[UID]:
+        if event.type in ("RDPOL", "ET"):
+            total += event.bookId + event.quantity
+    return total
+
+def run(compressed : dict, engine : str, mode : str) -> tuple[float, float, float]:
+    state = MarketSimulationStateUpdate(version=60, timestamp=0, compression_engine=engine, compressed=dict(compressed))
+    start = time.perf_counter()
+    state.decompress(lazy=mode == "lazy", views=mode == "views")
+    if mode == "eager":
+        materialize(state)
+    decoded = time.perf_counter() - start
+    result = first_instruction(state)
+    return decoded, time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=128)
+    parser.add_argument("--notices", type=int, default=200)
+    parser.add_argument("--engine", type=str, default="lz4", choices=["zlib", "lz4", "zstd"])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    compressed = compressed_state(args.books, args.notices, args.engine)
+    print(f"State : {args.books} books | {args.notices} notices | {sum(len(v) for v in compressed.values()) / 1e6:.2f}MB compressed ({args.engine})")
+
+    # The views must hold the same data as the models
+    eager = MarketSimulationStateUpdate(version=60, timestamp=0, compression_engine=args.engine, compressed=dict(compressed)).decompress()
+    materialize(eager)
+    views = MarketSimulationStateUpdate(version=60, timestamp=0, compression_engine=args.engine, compressed=dict(compressed)).decompress(views=True)
+    assert parse(dict(views.books)) == eager.books, "Book mismatch"
+    assert parse(dict(views.accounts[UID])) == eager.accounts[UID], "Account mismatch"
+    assert parse(views.notices[UID]) == eager.notices[UID], "Notice mismatch"
+
+    results = {}
+    for mode in ["eager", "lazy", "views"]:
+        times = [run(compressed, args.engine, mode) for _ in range(args.repeat)]
+        results[mode] = times[0][2]
+        decoded, total = min(t[0] for t in times), min(t[1] for t in times)
+        print(f"{mode:<6}: decode {decoded * 1000:8.2f}ms | decode to first instruction {total * 1000:8.2f}ms")
+    assert len(set(results.values())) == 1, f"Strategy inputs differ between modes : {results}"
+
+if __name__ == "__main__":
+    main()
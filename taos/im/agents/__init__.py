@@ -1,10 +1,10 @@
 # SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
 # SPDX-License-Identifier: MIT
 import os
+import logging
 import msgpack
 import traceback
 import time
-import csv
 import bittensor as bt
 from threading import Thread
 from abc import ABC, abstractmethod
@@ -12,7 +12,9 @@ from taos.common.agents import SimulationAgent
 from taos.im.protocol import MarketSimulationStateUpdate, FinanceAgentResponse, FinanceEventNotification
 from taos.im.protocol.events import *
 from taos.im.protocol.models import *
-from taos.im.utils import duration_from_timestamp, timestamp_from_duration
+from taos.im.utils import duration_from_timestamp
+from taos.im.utils.journal import EventJournal, ORDER, CANCELLATION, TRADE
+from taos.im.utils.worker import BackgroundWorker
 
 # Base class for agents operating in intelligent market simulations
 class FinanceSimulationAgent(SimulationAgent):
@@ -30,15 +32,42 @@ class FinanceSimulationAgent(SimulationAgent):
         self.history = []
         self.accounts = {}
         self.event_history : dict[str, AgentEventHistory | None] = {}
+        self.book_cache : dict[str, tuple[int, dict[int, dict]]] = {}
+        self.journals : dict[str, EventJournal] = {}
+        self._output_dirs : set[str] = set()
         if not hasattr(config, "lazy_load"):
             config.lazy_load = False
         else:
             config.lazy_load = bool(config.lazy_load)
+        config.views = str(getattr(config, "views", 0)).lower() in ("1", "true")
+        config.journal_format = str(getattr(config, "journal_format", "csv"))
+        config.journal_flush_interval = float(getattr(config, "journal_flush_interval", 1.0))
+        config.async_update = str(getattr(config, "async_update", 0)).lower() in ("1", "true")
+        self.worker = BackgroundWorker(name=f'agent_update_{uid}')
         super().__init__(uid, config, log_dir)
 
     def handle(self, state: MarketSimulationStateUpdate) -> FinanceAgentResponse:
         return super().handle(state)    
 
+    def decompress(self, state: MarketSimulationStateUpdate) -> bool:
+        """
+        Method to decompress a received state update, reconstructing the full books where the validator has sent delta-encoded books.
+
+        The full books of the latest update received from each validator are retained as the reference for the next delta.
+        If the agent is configured with `views=1`, the books, accounts and notices are decoded as the read-only views defined in
+        `taos.im.protocol.views` rather than pydantic models.
+        If the reference books for a delta are not available (e.g. because an update was missed), the state is left without books
+        and `keyframe_required` is set on the synapse so that the validator will send the full books in the next update.
+
+        Args:
+            state (taos.im.protocol.MarketSimulationStateUpdate): The compressed state update.
+
+        Returns:
+            bool: True if the full state was reconstructed.
+        """
+        state.decompress(lazy=self.config.lazy_load, book_cache=self.book_cache, views=self.config.views)
+        return not state.keyframe_required
+
     def process(self, notification: FinanceEventNotification) -> FinanceEventNotification:
         """
         Method to handle a new event notification.
@@ -50,124 +79,56 @@ class FinanceSimulationAgent(SimulationAgent):
     
     def simulation_output_dir(self, state : MarketSimulationStateUpdate):
         simulation_output_dir = os.path.join(self.output_dir, state.dendrite.hotkey, state.config.simulation_id)
-        os.makedirs(simulation_output_dir, exist_ok=True)
+        if simulation_output_dir not in self._output_dirs:
+            os.makedirs(simulation_output_dir, exist_ok=True)
+            self._output_dirs.add(simulation_output_dir)
         return simulation_output_dir
-    
+
+    def journal(self, state : MarketSimulationStateUpdate) -> EventJournal:
+        """
+        Returns the event journal for the simulation run by the validator which sent the state update.
+
+        A new journal is opened when the validator starts a new simulation, and the journal of the previous simulation is closed.
+        """
+        directory = self.simulation_output_dir(state)
+        journal = self.journals.get(state.dendrite.hotkey)
+        if not journal or journal.directory != directory:
+            if journal:
+                journal.close()
+            journal = EventJournal(directory, self.config.journal_format, self.config.journal_flush_interval)
+            self.journals[state.dendrite.hotkey] = journal
+        return journal
+
     def load_event_history(self, state) -> None:
         """
-        Load per-agent event history from CSV files into an AgentEventHistory object.
+        Load per-agent event history from the event journal into an AgentEventHistory object.
 
         This method:
-        - Loads CSVs (orders, cancellations, trades).
-        - Constructs event objects directly from CSV columns (no from_json).
-        - Aggregates into an AgentEventHistory instance.
-        - Applies optional retention logic based on `event_lookback_minutes`.
+        - Loads only the journal rows within `event_lookback_minutes` of the latest recorded event, located using the journal index.
+        - Parses the CSV files (orders, cancellations, trades) column-wise, or the memory-mapped msgpack journal if `journal_format=msgpack`.
+        - Aggregates into an AgentEventHistory instance, deferring construction of the event objects until they are accessed.
 
         Populates:
             self.event_history[state.dendrite.hotkey] (AgentEventHistory | None)
         """
+        start = time.time()
         self.event_lookback_minutes = getattr(self.config, "event_lookback_minutes", 60)
 
-        base_dir = self.simulation_output_dir(state)
-
-        def _load_orders(path: str):
-            events = []
-            if os.path.isfile(path):
-                with open(path, newline="") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        try:
-                            if row['price']:
-                                ev = LimitOrderPlacementEvent(
-                                    timestamp=timestamp_from_duration(row["timestamp"]),
-                                    agentId=self.uid,
-                                    bookId=int(row["bookId"]),
-                                    orderId=int(row["orderId"]) if row["orderId"] else None,
-                                    clientOrderId=int(row["clientOrderId"]) if row["clientOrderId"] else None,
-                                    side=int(row["side"]),
-                                    p=float(row["price"]),
-                                    quantity=float(row["quantity"]),
-                                    leverage=float(row["leverage"]),
-                                    settleFlag=row.get("settleFlag"),
-                                    success=row["success"].lower() == "true",
-                                    message=row.get("message", ""),
-                                )
-                            else:
-                                ev = MarketOrderPlacementEvent(
-                                    timestamp=timestamp_from_duration(row["timestamp"]),
-                                    agentId=self.uid,
-                                    bookId=int(row["bookId"]),
-                                    orderId=int(row["orderId"]) if row["orderId"] else None,
-                                    clientOrderId=int(row["clientOrderId"]) if row["clientOrderId"] else None,
-                                    side=int(row["side"]),
-                                    r=(row["currency"] if row["currency"].isnumeric() else OrderCurrency[row["currency"].split('.')[1]]) if "currency" in row and row["currency"] else OrderCurrency.BASE,
-                                    quantity=float(row["quantity"]),
-                                    leverage=float(row["leverage"]),
-                                    settleFlag=row.get("settleFlag"),
-                                    success=row["success"].lower() == "true",
-                                    message=row.get("message", ""),
-                                )
-                            events.append(ev)
-                        except Exception as e:
-                            bt.logging.warning(f"Failed to parse order row: {e}")
-            return events
-
-        def _load_cancellations(path: str):
-            events = []
-            if os.path.isfile(path):
-                with open(path, newline="") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        try:
-                            ev = OrderCancellationEvent(
-                                t=timestamp_from_duration(row["timestamp"]),
-                                b=int(row["bookId"]),
-                                o=int(row["orderId"]),
-                                q=float(row["quantity"]) if row["quantity"] else None,
-                                u=row["success"].lower() == "true",
-                                m=row.get("message", ""),
-                            )
-                            events.append(ev)
-                        except Exception as e:
-                            bt.logging.warning(f"Failed to parse cancellation row: {e}")
-            return events
-
-        def _load_trades(path: str):
-            events = []
-            if os.path.isfile(path):
-                with open(path, newline="") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        try:
-                            ev = TradeEvent(
-                                timestamp=timestamp_from_duration(row["timestamp"]),
-                                agentId=self.uid,
-                                b=int(row["bookId"]) if row["bookId"] else None,
-                                i=int(row["tradeId"]),
-                                c=int(row["clientOrderId"]) if row["clientOrderId"] else None,
-                                Ta=int(row["takerAgentId"]),
-                                Ti=int(row["takerOrderId"]),
-                                Tf=float(row["takerFee"]),
-                                Ma=int(row["makerAgentId"]),
-                                Mi=int(row["makerOrderId"]),
-                                Mf=float(row["makerFee"]),
-                                s=int(row["side"]),
-                                p=float(row["price"]),
-                                q=float(row["quantity"]),
-                            )
-                            events.append(ev)
-                        except Exception as e:
-                            bt.logging.warning(f"Failed to parse trade row: {e}")
-            return events
-
-        # Load everything
-        orders = _load_orders(os.path.join(base_dir, "orders.csv"))
-        cancels = _load_cancellations(os.path.join(base_dir, "cancellations.csv"))
-        trades = _load_trades(os.path.join(base_dir, "trades.csv"))
-
-        all_events = orders + cancels + trades
-        if not all_events:
-            self.event_history[state.dendrite.hotkey] = AgentEventHistory(
+        # Write out any events still queued for the background worker or buffered by the journal before loading
+        if self.config.async_update:
+            self.worker.join()
+        if state.dendrite.hotkey in self.journals:
+            self.journals[state.dendrite.hotkey].flush()
+
+        history = AgentEventHistory.from_journal(
+            uid=self.uid,
+            directory=self.simulation_output_dir(state),
+            format=self.config.journal_format,
+            publish_interval=getattr(self.config, "publish_interval", 1_000_000_000),
+            retention_mins=self.event_lookback_minutes,
+        )
+        if not history:
+            history = AgentEventHistory(
                 uid=self.uid,
                 start=state.timestamp - state.config.publish_interval,
                 end=state.timestamp,
@@ -175,146 +136,229 @@ class FinanceSimulationAgent(SimulationAgent):
                 publish_interval=self.simulation_config.publish_interval,
                 retention_mins=self.event_lookback_minutes,
             )
-        else:
-            # Sort by timestamp
-            all_events.sort(key=lambda e: e.timestamp)
+        self.event_history[state.dendrite.hotkey] = history
+        bt.logging.info(f"Loaded {len(history)} events for {state.dendrite.hotkey} ({time.time() - start:.4f}s)")
 
-            start = all_events[0].timestamp
-            end = all_events[-1].timestamp
-            self.event_history[state.dendrite.hotkey] = AgentEventHistory(
-                uid=self.uid,
-                start=start,
-                end=end,
-                events=all_events,
-                publish_interval=getattr(self.config, "publish_interval", 1_000_000_000),
-                retention_mins=self.event_lookback_minutes,
-            )
-        
-    
     def log_order_event(self, event : LimitOrderPlacementEvent | MarketOrderPlacementEvent, state : MarketSimulationStateUpdate):
-        """Log LimitOrderPlacementEvent or MarketOrderPlacementEvent to CSV."""
-        orders_log_file = os.path.join(self.simulation_output_dir(state), 'orders.csv')
-        file_exists = os.path.exists(orders_log_file)
-        with open(orders_log_file, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow([
-                    'timestamp', 'bookId', 'orderId', 'clientOrderId',
-                    'side', 'price', 'currency', 'quantity', 'leverage', 'settleFlag',
-                    'success', 'message'
-                ])
-            writer.writerow([
-                duration_from_timestamp(event.timestamp),
-                getattr(event, 'bookId', None),
-                getattr(event, 'orderId', None),
-                getattr(event, 'clientOrderId', None),
-                getattr(event, 'side', None),
-                getattr(event, 'price', None),
-                getattr(event, 'currency', None),
-                getattr(event, 'quantity', None),
-                getattr(event, 'leverage', None),
-                getattr(event, 'settleFlag', None),
-                event.success,
-                event.message
-            ])
+        """Record LimitOrderPlacementEvent or MarketOrderPlacementEvent in the event journal."""
+        self.journal(state).record(ORDER, [
+            event.timestamp,
+            getattr(event, 'bookId', None),
+            getattr(event, 'orderId', None),
+            getattr(event, 'clientOrderId', None),
+            getattr(event, 'side', None),
+            getattr(event, 'price', None),
+            getattr(event, 'currency', None),
+            getattr(event, 'quantity', None),
+            getattr(event, 'leverage', None),
+            getattr(event, 'settleFlag', None),
+            event.success,
+            event.message
+        ])
 
     def log_cancellation_event(self, event : OrderCancellationEvent, state : MarketSimulationStateUpdate):
-        """Log OrderCancellationEvent to CSV."""
-        cancellations_log_file = os.path.join(self.simulation_output_dir(state), 'cancellations.csv')
-        file_exists = os.path.exists(cancellations_log_file)
-        with open(cancellations_log_file, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow([
-                    'timestamp', 'bookId', 'orderId', 'quantity', 'success', 'message'
-                ])
-            writer.writerow([
-                duration_from_timestamp(event.timestamp),
-                event.bookId,
-                event.orderId,
-                event.quantity,
-                event.success,
-                event.message
-            ])
+        """Record OrderCancellationEvent in the event journal."""
+        self.journal(state).record(CANCELLATION, [
+            event.timestamp,
+            event.bookId,
+            event.orderId,
+            event.quantity,
+            event.success,
+            event.message
+        ])
 
     def log_trade_event(self, event : TradeEvent, state : MarketSimulationStateUpdate):
-        """Log TradeEvent to CSV."""
-        trades_log_file = os.path.join(self.simulation_output_dir(state), 'trades.csv')
-        file_exists = os.path.exists(trades_log_file)
-        with open(trades_log_file, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow([
-                    'timestamp', 'bookId', 'tradeId', 'clientOrderId',
-                    'takerAgentId', 'takerOrderId', 'takerFee',
-                    'makerAgentId', 'makerOrderId', 'makerFee',
-                    'side', 'price', 'quantity'
-                ])
-            writer.writerow([
-                duration_from_timestamp(event.timestamp),
-                event.bookId,
-                event.tradeId,
-                event.clientOrderId,
-                event.takerAgentId,
-                event.takerOrderId,
-                event.takerFee,
-                event.makerAgentId,
-                event.makerOrderId,
-                event.makerFee,
-                event.side,
-                event.price,
-                event.quantity
-            ])
+        """Record TradeEvent in the event journal."""
+        self.journal(state).record(TRADE, [
+            event.timestamp,
+            event.bookId,
+            event.tradeId,
+            event.clientOrderId,
+            event.takerAgentId,
+            event.takerOrderId,
+            event.takerFee,
+            event.makerAgentId,
+            event.makerOrderId,
+            event.makerFee,
+            event.side,
+            event.price,
+            event.quantity
+        ])
 
     def update(self, state : MarketSimulationStateUpdate) -> None:
         """
         Method to update the stored agent data, print relevant state information and trigger handlers for reported events.
 
+        If the agent is configured with `async_update=1`, only the update of the agent data and event history and the dispatch of
+        events to the handlers are performed here; recording of the state in `self.history`, logging of events to the journal and
+        rendering of the state information are performed by a background worker after the update returns, so that they do not
+        delay the response.  The time taken by each stage is logged at debug level.
+
         Args:
             state (taos.im.protocol.MarketSimulationStateUpdate): The UID of the agent in the subnet.
 
         Returns:
             None
         """
-        self.history.append(state.model_copy())
-        self.history = self.history[-10:]
+        start = time.time()
+        if not self.config.async_update:
+            self._snapshot(state)
         self.simulation_config = state.config
         self.accounts = state.accounts[self.uid]
         self.events = state.notices[self.uid]
-        
-        if not state.dendrite.hotkey in self.event_history or not self.event_history[state.dendrite.hotkey]:            
-            self.load_event_history(state)        
+
+        if not state.dendrite.hotkey in self.event_history or not self.event_history[state.dendrite.hotkey]:
+            self.load_event_history(state)
         self.event_history[state.dendrite.hotkey].append(state)
-        
-        simulation_ended = False
+        stages = {'history' : time.time() - start}
+
+        start = time.time()
+        end_event = self._dispatch(state)
+        stages['dispatch'] = time.time() - start
+
+        if self.config.async_update:
+            self.worker.submit(self._report, state, end_event, stages, time.time())
+        else:
+            self._report(state, end_event, stages)
+
+    def _book_events(self, state : MarketSimulationStateUpdate) -> dict[int, list]:
+        """Groups the events received by the agent in a state update by book ID, retaining the order in which they were reported."""
+        book_events = {}
+        for event in state.notices[self.uid]:
+            if hasattr(event, 'bookId') and event.bookId is not None:
+                book_events.setdefault(event.bookId, []).append(event)
+        return book_events
+
+    def _dispatch(self, state : MarketSimulationStateUpdate) -> SimulationEndEvent | None:
+        """
+        Triggers the handlers for the events received in the latest state update.
+
+        Args:
+            state (taos.im.protocol.MarketSimulationStateUpdate): The latest state update.
+
+        Returns:
+            SimulationEndEvent | None: The simulation end event, if the update reported the end of the simulation.
+        """
+        end_event = None
+        for event in self.events:
+            match event.type:
+                case "EVENT_SIMULATION_START" | "ESS":
+                    self.onStart(event)
+                case "EVENT_SIMULATION_END" | "ESE":
+                    end_event = event
+                case _:
+                    pass
+        book_events = self._book_events(state)
+        for book_id in range(state.config.book_count):
+            for event in book_events.get(book_id, []):
+                match event.type:
+                    case "RESPONSE_DISTRIBUTED_PLACE_ORDER_LIMIT" | "RESPONSE_DISTRIBUTED_PLACE_ORDER_MARKET" | "RDPOL" | "RDPOM":
+                        self.onOrderAccepted(event)
+                    case "ERROR_RESPONSE_DISTRIBUTED_PLACE_ORDER_LIMIT" | "ERROR_RESPONSE_DISTRIBUTED_PLACE_ORDER_MARKET" | "ERDPOL" | "ERDPOM":
+                        self.onOrderRejected(event)
+                    case "RESPONSE_DISTRIBUTED_CANCEL_ORDERS" | "RDCO":
+                        for cancellation in event.cancellations:
+                            self.onOrderCancelled(cancellation)
+                    case "ERROR_RESPONSE_DISTRIBUTED_CANCEL_ORDERS" | "ERDCO":
+                        for cancellation in event.cancellations:
+                            self.onOrderCancellationFailed(cancellation)
+                    case "RESPONSE_DISTRIBUTED_CLOSE_POSITIONS" | "RDCP":
+                        for close in event.closes:
+                            self.onPositionClosed(close)
+                    case "ERROR_RESPONSE_DISTRIBUTED_CLOSE_POSITIONS" | "ERDCP":
+                        for close in event.closes:
+                            self.onPositionCloseFailed(close)
+                    case "EVENT_TRADE" | "ET":
+                        self.onTrade(event)
+                    case _:
+                        bt.logging.warning(f"Unknown event : {event}")
+        if end_event:
+            self.onEnd(end_event)
+        return end_event
+
+    def _snapshot(self, state : MarketSimulationStateUpdate) -> None:
+        """Records a copy of the state update in `self.history`, retaining the latest 10 updates."""
+        self.history.append(state.model_copy())
+        self.history = self.history[-10:]
+
+    def _report(self, state : MarketSimulationStateUpdate, end_event : SimulationEndEvent | None, stages : dict[str, float], queued : float | None = None) -> None:
+        """
+        Completes the processing of a state update after the handlers have been triggered: logs the reported events to the journal
+        and renders the state information if info logging is enabled, and, if executed by the background worker, records the state
+        in `self.history`.
+
+        Args:
+            state (taos.im.protocol.MarketSimulationStateUpdate): The state update.
+            end_event (SimulationEndEvent | None): The simulation end event, if the update reported the end of the simulation.
+            stages (dict[str, float]): Time in seconds taken by the stages of the update already completed.
+            queued (float | None): Time at which the task was submitted, if executed by the background worker.
+        """
+        if queued:
+            stages['queued'] = time.time() - queued
+            start = time.time()
+            self._snapshot(state)
+            stages['snapshot'] = time.time() - start
+
+        start = time.time()
+        book_events = self._book_events(state)
+        for book_id in range(state.config.book_count):
+            for event in book_events.get(book_id, []):
+                match event.type:
+                    case "RESPONSE_DISTRIBUTED_PLACE_ORDER_LIMIT" | "RESPONSE_DISTRIBUTED_PLACE_ORDER_MARKET" | "RDPOL" | "RDPOM":
+                        self.log_order_event(event, state)
+                    case "RESPONSE_DISTRIBUTED_CANCEL_ORDERS" | "RDCO":
+                        for cancellation in event.cancellations:
+                            self.log_cancellation_event(cancellation, state)
+                    case "EVENT_TRADE" | "ET":
+                        self.log_trade_event(event, state)
+        if end_event:
+            self.journal(state).flush()
+        stages['journal'] = time.time() - start
+
+        if bt.logging.get_level() <= logging.INFO:
+            start = time.time()
+            self._render(state, book_events, end_event)
+            stages['render'] = time.time() - start
+        bt.logging.debug(f"Update stages{' (async)' if queued else ''} : " + " | ".join(f"{stage} {t:.4f}s" for stage, t in stages.items()))
+
+    def _render(self, state : MarketSimulationStateUpdate, book_events : dict[int, list], end_event : SimulationEndEvent | None) -> None:
+        """
+        Renders and logs the state information and the events received by the agent in a state update.
+        The levels, balances, orders and loans of each book are only rendered where debug logging is enabled.
+
+        Args:
+            state (taos.im.protocol.MarketSimulationStateUpdate): The state update.
+            book_events (dict[int, list]): Events received by the agent, grouped by book ID.
+            end_event (SimulationEndEvent | None): The simulation end event, if the update reported the end of the simulation.
+        """
+        events = state.notices[self.uid]
+        debug = bt.logging.get_level() <= logging.DEBUG
         update_text = ''
         debug_text = ''
         update_text += "\n" + '-' * 50 + "\n"
         update_text += f'VALIDATOR : {state.dendrite.hotkey} | SIMULATION TIME : {duration_from_timestamp(state.timestamp)} (T={state.timestamp})' + "\n"
         update_text += '-' * 50 + "\n"
-        if len(self.events) > 0:
+        if len(events) > 0:
             update_text += 'EVENTS' + "\n"
             update_text += '-' * 50 + "\n"
-            for event in self.events:
+            for event in events:
                 match event.type:
                     case"RESET_AGENTS" | "RA":
                         update_text += f"{event}" + "\n"
                     case "EVENT_SIMULATION_START" | "ESS":
                         update_text += f"{event}" + "\n"
-                        self.onStart(event)
-                    case "EVENT_SIMULATION_END" | "ESE":
-                        simulation_ended = True
                     case _:
                         pass
         else:
             update_text += 'NO EVENTS' + "\n"
             update_text += '-' * 50 + "\n"
-        for book_id in range(self.simulation_config.book_count):
+        accounts = state.accounts[self.uid]
+        for book_id in range(state.config.book_count):
             debug_text += '-' * 50 + "\n"
             debug_text += f"BOOK {book_id}" + "\n"
                      
-            if not self.config.lazy_load:
-                account= self.accounts[book_id]
+            if debug and not self.config.lazy_load:
+                account= accounts[book_id]
                 debug_text += '-' * 50 + "\n"
                 debug_text += f"TOP LEVELS" + "\n"
                 debug_text += '-' * 50 + "\n"
@@ -344,48 +388,24 @@ class FinanceSimulationAgent(SimulationAgent):
             debug_text += '-' * 50 + "\n"
             debug_text += 'EVENTS' + "\n"
             debug_text += '-' * 50 + "\n"
-            for event in self.events:
-                if hasattr(event, 'bookId') and event.bookId == book_id:
-                    if not event.type in ["EVENT_TRADE", "ET"]:
-                        debug_text += f"{event}" + "\n"
-                        update_text += f"BOOK {book_id} : {event}" + "\n"
-                    match event.type:
-                        case "RESPONSE_DISTRIBUTED_PLACE_ORDER_LIMIT" | "RESPONSE_DISTRIBUTED_PLACE_ORDER_MARKET" | "RDPOL" | "RDPOM":
-                            self.onOrderAccepted(event)
-                            self.log_order_event(event, state)
-                        case "ERROR_RESPONSE_DISTRIBUTED_PLACE_ORDER_LIMIT" | "ERROR_RESPONSE_DISTRIBUTED_PLACE_ORDER_MARKET" | "ERDPOL" | "ERDPOM":
-                            self.onOrderRejected(event)
-                        case "RESPONSE_DISTRIBUTED_CANCEL_ORDERS" | "RDCO":
-                            for cancellation in event.cancellations:
-                                self.onOrderCancelled(cancellation)
-                                self.log_cancellation_event(cancellation, state)
-                        case "ERROR_RESPONSE_DISTRIBUTED_CANCEL_ORDERS" | "ERDCO":
-                            for cancellation in event.cancellations:
-                                self.onOrderCancellationFailed(cancellation)
-                        case "RESPONSE_DISTRIBUTED_CLOSE_POSITIONS" | "RDCP":
-                            for close in event.closes:
-                                self.onPositionClosed(close)
-                        case "ERROR_RESPONSE_DISTRIBUTED_CLOSE_POSITIONS" | "ERDCP":
-                            for close in event.closes:
-                                self.onPositionCloseFailed(close)
-                        case "EVENT_TRADE" | "ET":
-                            role = "taker" if self.uid == event.takerAgentId else "maker"
-                            trade_text = f"{'BUY ' if event.side == 0 else 'SELL'} TRADE #{event.tradeId} : YOUR {'AGGRESSIVE' if role=='taker' else 'PASSIVE'} " + \
-                                f"ORDER #{event.takerOrderId if role=='taker' else event.makerOrderId} (AGENT {event.takerAgentId if role=='taker' else event.makerAgentId}) " + \
-                                f"MATCHED AGAINST #{event.makerOrderId if role=='taker' else event.takerOrderId} (AGENT {event.makerAgentId if role=='taker' else event.takerAgentId}) " + \
-                                f"FOR {event.quantity}@{event.price} AT {duration_from_timestamp(event.timestamp)} (T={event.timestamp})"
-                            debug_text += f"{trade_text}" + "\n"
-                            update_text += f"BOOK {book_id} : {trade_text}" + "\n"
-                            self.onTrade(event)
-                            self.log_trade_event(event, state)
-                        case _:
-                            bt.logging.warning(f"Unknown event : {event}")
+            for event in book_events.get(book_id, []):
+                if not event.type in ["EVENT_TRADE", "ET"]:
+                    debug_text += f"{event}" + "\n"
+                    update_text += f"BOOK {book_id} : {event}" + "\n"
+                else:
+                    role = "taker" if self.uid == event.takerAgentId else "maker"
+                    trade_text = f"{'BUY ' if event.side == 0 else 'SELL'} TRADE #{event.tradeId} : YOUR {'AGGRESSIVE' if role=='taker' else 'PASSIVE'} " + \
+                        f"ORDER #{event.takerOrderId if role=='taker' else event.makerOrderId} (AGENT {event.takerAgentId if role=='taker' else event.makerAgentId}) " + \
+                        f"MATCHED AGAINST #{event.makerOrderId if role=='taker' else event.takerOrderId} (AGENT {event.makerAgentId if role=='taker' else event.takerAgentId}) " + \
+                        f"FOR {event.quantity}@{event.price} AT {duration_from_timestamp(event.timestamp)} (T={event.timestamp})"
+                    debug_text += f"{trade_text}" + "\n"
+                    update_text += f"BOOK {book_id} : {trade_text}" + "\n"
             debug_text += '-' * 50 + "\n"
-        if simulation_ended:
-            update_text += f"{event}" + "\n"
+        if end_event:
+            update_text += f"{end_event}" + "\n"
             update_text += '-' * 50 + "\n"
-            self.onEnd(event)
-        bt.logging.debug("." + debug_text)
+        if debug:
+            bt.logging.debug("." + debug_text)
         bt.logging.info("." + update_text)
 
     # Handler functions for various simulation events, to be overridden in agent implementations.
@@ -640,8 +660,13 @@ class StateHistoryManager:
                 # Validate and process histories
                 processed_histories = {
                     book_id: state.books[book_id].process_history(
-                        {t: L2Snapshot.model_validate(snapshot).sort(self.depth) for t, snapshot in hist.items()},
-                        {t: TradeInfo.model_validate(trade) for t, trade in trades.items()},
+                        L2History.from_arrays(
+                            *hist.arrays(self.depth),
+                            trades={t: TradeInfo.model_validate(trade) for t, trade in trades.items()},
+                            publish_interval=state.config.publish_interval,
+                            retention_mins=self.history_retention_mins
+                        ),
+                        None,
                         state.timestamp,
                         state.config,
                         self.history_retention_mins,
@@ -726,7 +751,7 @@ class StateHistoryManager:
                     snapshot = self.last_snapshot[validator][book_id]
                 else:
                     if self.history[validator][book_id].end == state.timestamp - state.config.publish_interval:
-                        snapshot = list(self.history[validator][book_id].snapshots.values())[-1]
+                        snapshot = self.history[validator][book_id].latest()
                     else:
                         snapshot = self.last_snapshot[validator][book_id]
 
@@ -834,7 +859,7 @@ class StateHistoryManager:
             "history": {
                 validator: {
                     book_id: {
-                        'snapshots': {t: snapshot.model_dump() for t, snapshot in history.snapshots.items()},
+                        'snapshots': {t: snapshot.model_dump() for t, snapshot in history.level_snapshots.items()},
                         'trades': {t: trade.model_dump() for t, trade in history.trades.items()}
                     }
                     for book_id, history in validator_history.items()
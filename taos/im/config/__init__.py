@@ -72,6 +72,76 @@ def add_im_validator_args(cls, parser):
         default=60,
     )
 
+    parser.add_argument(
+        "--neuron.checkpoint_interval",
+        type=int,
+        help="Number of steps between checkpoints of the validator state; the changes made at each step in between are recorded in a write-ahead log.",
+        default=100,
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.rate",
+        type=float,
+        help="Maximum number of miner queries started per second with each state update (see `taos.im.utils.dispatch`); unlimited if 0.",
+        default=0.0,
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.burst",
+        type=int,
+        help="Number of miner queries which may be started at once before `neuron.dispatch.rate` applies.",
+        default=32,
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.concurrency",
+        type=int,
+        help="Maximum number of miner queries in flight; unlimited if 0.",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.host_limit",
+        type=int,
+        help="Maximum number of miner queries in flight to a single host; unlimited if 0.",
+        default=32,
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.order",
+        choices=['uid', 'random', 'fastest'],
+        help="Order in which miner queries are started: by `uid`, in a new `random` order for each state update, or `fastest` miners first by smoothed process time.",
+        default="random",
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.quorum",
+        type=float,
+        help="Fraction of miner queries (greater than 0 and at most 1) which, once answered, ends the collection of responses to a state update; all responses are awaited (up to `neuron.global_query_timeout`) if 1.",
+        default=1.0,
+    )
+
+    parser.add_argument(
+        "--neuron.dispatch.deadline_percentile",
+        type=float,
+        help="If set, the collection of responses ends this percentile of the recent miner process times after the last query is sent.  Responses arriving later are only counted in the miner statistics.",
+        default=0.0,
+    )
+
+    parser.add_argument(
+        "--simulation.capture_dir",
+        type=str,
+        help="If set, the state updates received from the simulator are recorded to this directory for replay in benchmarks.",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--simulation.capture_count",
+        type=int,
+        help="Maximum number of state updates to record to `simulation.capture_dir`.",
+        default=100,
+    )
+
     parser.add_argument(
         "--simulation.xml_config",
         type=str,
@@ -88,10 +158,17 @@ def add_im_validator_args(cls, parser):
     
     parser.add_argument(
         "--compression.engine",
-        choices=['zlib', 'lz4', 'zstd'],
-        help="Compression engine to apply, either `zlib` or `lz4` or `zstd`.",
+        choices=['zlib', 'lz4', 'zstd', 'zstd_dict'],
+        help="Compression engine to apply, either `zlib` or `lz4` or `zstd`, or `zstd_dict` to use zstd with the pre-trained dictionary for the current version (see `taos.im.utils.dictionary`; the validator will not start if no dictionary has been installed for the version).",
         default="lz4",
     )
+
+    parser.add_argument(
+        "--compression.transport",
+        choices=['base64', 'base85'],
+        help="Text encoding of compressed synapse data, either `base64` or `base85` (smaller, but slower to encode and decode).",
+        default="base64",
+    )
     
     parser.add_argument(
         "--compression.level",
@@ -107,6 +184,27 @@ def add_im_validator_args(cls, parser):
         default=-1,
     )
     
+    parser.add_argument(
+        "--compression.book_deltas",
+        action="store_true",
+        help="If set, books are sent to miners as deltas against the previous state update, with the full books sent periodically and on request.",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--compression.indexed_books",
+        action="store_true",
+        help="If set, the full books are sent to miners as a book-indexed container of individually compressed books, which miners can decode selectively.",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--compression.keyframe_interval",
+        type=int,
+        help="Number of steps between sending the full books to all miners when book deltas are enabled.",
+        default=60,
+    )
+    
     parser.add_argument(
         "--scoring.max_instructions_per_book",
         type=int,
@@ -118,7 +216,7 @@ def add_im_validator_args(cls, parser):
         "--scoring.sharpe.parallel_workers",
         type=int,
         help="Number of parallel workers to use in Sharpe calculation. (0 => no parallelization)",
-        default=4,
+        default=0,
     )
 
     parser.add_argument(
@@ -225,3 +323,31 @@ def add_im_validator_args(cls, parser):
         help="If set, the validator will not publish metrics.",
         default=False,
     )
+
+    parser.add_argument(
+        "--reporting.exporter",
+        action="store_true",
+        help="If set, book, agent and miner metrics are published by a separate exporter process (`taos/im/neurons/exporter.py`) from snapshots written to `reporting.snapshot_dir`, rather than by the validator.  Requires state updates to be received through shared memory.",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--reporting.snapshot_dir",
+        type=str,
+        help="Directory in which the snapshot rings read by the metrics exporter are created.",
+        default="/dev/shm/taos",
+    )
+
+    parser.add_argument(
+        "--reporting.snapshot_slots",
+        type=int,
+        help="Number of snapshots held in each snapshot ring.",
+        default=4,
+    )
+
+    parser.add_argument(
+        "--reporting.snapshot_size",
+        type=int,
+        help="Maximum size in bytes of a snapshot.",
+        default=256 * 1024 * 1024,
+    )
@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Metrics exporter for the intelligent markets validator.
+
+When the validator is run with `--reporting.exporter`, the book, agent and miner metrics are published by this process rather than
+by the validator, so that decoding the state updates and assembling and serving the metrics do not contend with the validator for
+its interpreter.  The validator publishes each raw state update received from the simulator to the state snapshot ring, and its
+scoring state following each reward calculation to the validator snapshot ring (see `taos.im.utils.snapshot`).  The exporter
+decodes every state update to maintain the recent trades, and on each new validator snapshot assembles the metrics for the
+corresponding state update with the same functions as the validator (`taos.im.utils.metrics`), serving them through a
+`MetricsCollector` on its own port.
+
+Usage (alongside a validator run with `--reporting.exporter`):
+
+    python exporter.py [--snapshot_dir /dev/shm/taos] [--port 9002] [--poll_interval 0.1]
+"""
+import os
+import time
+import argparse
+import traceback
+import msgspec
+import numpy as np
+import bittensor as bt
+from types import SimpleNamespace
+from collections import defaultdict
+from prometheus_client import REGISTRY, start_http_server
+
+from taos.im.utils import duration_from_timestamp, load_fundamental_prices
+from taos.im.utils.inventory import InventoryHistory
+from taos.im.utils.snapshot import SnapshotRing, STATE_RING, VALIDATOR_RING, decode_array
+from taos.im.utils.metrics import (
+    MetricsSnapshot, MetricsCollector, book_metrics, agent_metrics, trade_labels, record_trades, record_miner_trade
+)
+from taos.im.protocol.models import TradeInfo
+from taos.im.protocol.events import TradeEvent
+
+class MetricsExporter:
+    """
+    Assembles and serves the validator metrics from the snapshots published by the validator.
+
+    The validator attributes read by `book_metrics`, `agent_metrics` and `trade_labels` are reconstructed from the snapshots, so
+    that the exporter is passed to these functions in place of the validator.
+
+    Args:
+        snapshot_dir (str): Directory containing the snapshot rings.
+        history (int): Number of decoded state updates retained for matching with the validator snapshots.
+    """
+    def __init__(self, snapshot_dir : str, history : int = 8):
+        self.snapshot_dir = snapshot_dir
+        self.history = history
+        self.state_ring = None
+        self.validator_ring = None
+        self.state_sequence = 0
+        self.validator_sequence = 0
+        # Decoded state updates by timestamp, and the latest validator snapshot awaiting its state update
+        self.states = {}
+        self.pending = None
+        self.collector = None
+        self.recent_trades = defaultdict(list)
+        self.recent_miner_trades = defaultdict(lambda: defaultdict(list))
+        self.miner_stats = {}
+        self.fundamental_price = {}
+
+    def open(self) -> bool:
+        """
+        Opens the snapshot rings once they have been created by the validator, re-opening them if they are re-created.
+
+        Returns:
+            bool: True if the rings are open.
+        """
+        if self.state_ring and (self.state_ring.replaced() or self.validator_ring.replaced()):
+            bt.logging.info(f"Snapshot rings in {self.snapshot_dir} were re-created; re-opening.")
+            self.state_ring.close()
+            self.validator_ring.close()
+            self.state_ring = self.validator_ring = None
+        if not self.state_ring:
+            try:
+                self.state_ring = SnapshotRing(os.path.join(self.snapshot_dir, STATE_RING))
+                self.validator_ring = SnapshotRing(os.path.join(self.snapshot_dir, VALIDATOR_RING))
+            except FileNotFoundError:
+                self.state_ring = self.validator_ring = None
+                return False
+            self.state_sequence = self.validator_sequence = 0
+            self.states, self.pending = {}, None
+        return True
+
+    def ingest_state(self, raw : bytes) -> None:
+        """
+        Decodes a state update, recording the trades which it contains.
+        """
+        state = msgspec.msgpack.decode(raw)
+        for bookId, book in state['books'].items():
+            record_trades(self.recent_trades, bookId, [TradeInfo.model_construct(**event) for event in book['e'] or [] if event['y'] == 't'])
+        for uid, notices in state['notices'].items():
+            if uid < 0: continue
+            for notice in notices:
+                if notice['y'] in ['EVENT_TRADE', 'ET']:
+                    record_miner_trade(self.recent_miner_trades, uid, TradeEvent.model_construct(**notice))
+        self.states[state['timestamp']] = state
+        while len(self.states) > self.history:
+            del self.states[next(iter(self.states))]
+
+    def poll(self) -> bool:
+        """
+        Reads any new snapshots from the rings, publishing the metrics if the state update corresponding to the latest validator
+        snapshot is available.
+
+        Returns:
+            bool: True if new metrics were published.
+        """
+        if not self.open():
+            return False
+        # Every state update still held in the ring is read, so that no trades are missed
+        latest = self.state_ring.sequence
+        if latest < self.state_sequence:
+            self.state_sequence = 0
+        for sequence in range(max(self.state_sequence + 1, latest - self.state_ring.slots + 1), latest + 1):
+            raw = self.state_ring.read(sequence)
+            if raw is None:
+                bt.logging.warning(f"State snapshot {sequence} was overwritten before it could be read.")
+                continue
+            self.ingest_state(raw)
+        self.state_sequence = latest
+
+        latest = self.validator_ring.sequence
+        if latest != self.validator_sequence:
+            raw = self.validator_ring.read(latest)
+            if raw is not None:
+                self.pending = msgspec.msgpack.decode(raw)
+                self.validator_sequence = latest
+        if self.pending and self.pending['timestamp'] in self.states:
+            self.publish(self.pending, self.states[self.pending['timestamp']])
+            self.pending = None
+            return True
+        return False
+
+    def publish(self, snapshot : dict, state : dict) -> None:
+        """
+        Assembles the metrics from a validator snapshot and the state update for which it was produced, and replaces the snapshot
+        of the collector.
+        """
+        start = time.time()
+        uids, simulation = snapshot['uids'], SimpleNamespace(**snapshot['simulation'])
+        self.simulation = simulation
+        self.subnet_info = SimpleNamespace(max_uids=uids)
+        self.simulation_timestamp = snapshot['timestamp']
+        self.last_state = SimpleNamespace(books=state['books'], accounts=state['accounts'], notices=state['notices'])
+        self.initial_balances = snapshot['initial_balances']
+        self.activity_factors = snapshot['activity_factors']
+        self.sharpe_values = snapshot['sharpe_values']
+        self.unnormalized_scores = snapshot['unnormalized_scores']
+        self.metagraph = SimpleNamespace(**snapshot['metagraph'])
+        if snapshot['miner_stats'] is not None:
+            self.miner_stats = snapshot['miner_stats']
+        # The first, penultimate and latest inventory values of each UID are held as a history with a lookback of 3
+        self.inventory_history = InventoryHistory(uids, 3, simulation.book_count)
+        self.inventory_history.values[:] = decode_array(snapshot['inventory'])
+        self.inventory_history.counts[:] = np.minimum(decode_array(snapshot['inventory_counts']), 3)
+        self.inventory_history.size = 3
+        if simulation.logDir:
+            self.fundamental_price = load_fundamental_prices(simulation.logDir, simulation.block_count, simulation.books_per_block)
+        if not self.collector:
+            self.collector = MetricsCollector(snapshot['wallet'], snapshot['netuid'])
+            REGISTRY.register(self.collector)
+
+        previous = self.collector.snapshot
+        levels, books = book_metrics(self, previous)
+        trades, miner_trades = trade_labels(self)
+        agents, miners = agent_metrics(self, previous, decode_array(snapshot['volumes']), decode_array(snapshot['scores']))
+        self.collector.update(MetricsSnapshot(self.simulation_timestamp, levels, books, agents, miners, trades, miner_trades))
+        bt.logging.info(f"Metrics Published for {duration_from_timestamp(self.simulation_timestamp)} ({time.time()-start:.4f}s).")
+
+    def run(self, poll_interval : float) -> None:
+        """
+        Polls the snapshot rings for new snapshots every `poll_interval` seconds.
+        """
+        while True:
+            try:
+                if not self.poll():
+                    time.sleep(poll_interval)
+            except Exception as ex:
+                bt.logging.error(f"Unable to publish metrics : {ex}\n{traceback.format_exc()}")
+                self.pending = None
+                time.sleep(poll_interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot_dir", type=str, default="/dev/shm/taos", help="Directory containing the snapshot rings (the validator `reporting.snapshot_dir`).")
+    parser.add_argument("--port", type=int, default=9002, help="Port on which the metrics are served.")
+    parser.add_argument("--poll_interval", type=float, default=0.1, help="Interval in seconds at which the snapshot rings are polled.")
+    args = parser.parse_args()
+    bt.logging.set_info()
+    start_http_server(args.port)
+    bt.logging.info(f"Serving metrics on port {args.port} from snapshots in {args.snapshot_dir}.")
+    MetricsExporter(args.snapshot_dir).run(args.poll_interval)
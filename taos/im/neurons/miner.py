@@ -45,7 +45,9 @@ if __name__ != "__mp_main__":
                 taos.im.protocol.MarketSimulationStateUpdate: The synapse object with the 'response' field updated with any instructions generated by the agent.
             """
             start = time.time()
-            synapse.decompress(lazy=self.config.agent.params.lazy_load)
+            if not self.agent.decompress(synapse):
+                bt.logging.warning(f"Requested keyframe from validator {synapse.dendrite.hotkey} ({time.time() - start}s)")
+                return synapse.clear_inputs().compress()
             bt.logging.info(f"Decompressed ({time.time() - start}s)")
             synapse.response = self.agent.handle(synapse)
             start = time.time()
@@ -26,6 +26,7 @@ if __name__ != "__mp_main__":
     import traceback
     import xml.etree.ElementTree as ET
     import pandas as pd
+    import numpy as np
     import msgspec
     import math
     import shutil
@@ -43,7 +44,8 @@ if __name__ != "__mp_main__":
     from typing import Tuple
     from fastapi import FastAPI, APIRouter
     from fastapi import Request
-    from threading import Thread
+    from threading import Thread, Lock, RLock
+    from concurrent.futures import ThreadPoolExecutor
 
     import subprocess
     import psutil
@@ -52,13 +54,19 @@ if __name__ != "__mp_main__":
 
     from taos import __spec_version__
     from taos.common.neurons.validator import BaseValidatorNeuron
-    from taos.im.utils import duration_from_timestamp
+    from taos.im.utils import duration_from_timestamp, load_fundamental_prices
+    from taos.im.utils.inventory import InventoryHistory
+    from taos.im.utils.sharpe import RollingSharpe
+    from taos.im.utils.volume import VolumeLedger, ROLE_INDEX
+    from taos.im.utils.persistence import StateLog, Checkpoint, SCHEMA_VERSION, decode_trades
+    from taos.im.utils.dispatch import DispatchScheduler
+    from taos.im.utils.dictionary import load_dictionary, dictionary_path, DICTIONARY_ID
 
     from taos.im.config import add_im_validator_args
     from taos.im.protocol.simulator import SimulatorResponseBatch
     from taos.im.protocol import MarketSimulationStateUpdate, FinanceEventNotification
-    from taos.im.protocol.models import MarketSimulationConfig, TradeInfo
-    from taos.im.protocol.events import SimulationStartEvent, TradeEvent
+    from taos.im.protocol.models import MarketSimulationConfig
+    from taos.im.protocol.events import SimulationStartEvent
 
     class Validator(BaseValidatorNeuron):
         """
@@ -212,69 +220,131 @@ if __name__ != "__mp_main__":
             if not self.compressing:
                 Thread(target=self._compress_outputs, args=(start,), daemon=True, name=f'compress_{self.step}').start()
 
-        def _save_state(self) -> None:
-            """Saves the state of the validator to a file."""
-            self.saving = True
+        def _save_state(self, checkpoint : Checkpoint) -> None:
+            """
+            Writes a checkpoint of the state of the validator captured by `save_state`, releasing `save_lock` once complete.
+            Changes made between checkpoints are recorded in the write-ahead log of `state_log` following each reward pass.
+            """
             try:
-                bt.logging.info("Saving simulation state...")
-                start = time.time()
-                # Save the state of the simulation to file.
-                with open(self.simulation_state_file + ".tmp", 'wb') as file:
-                    packed_data = msgpack.packb(
-                        {
-                            "start_time": self.start_time,
-                            "start_timestamp": self.start_timestamp,
-                            "step_rates": self.step_rates,
-                            "initial_balances": self.initial_balances,
-                            "recent_trades": {book_id : [t.model_dump(mode='json') for t in book_trades] for book_id, book_trades in self.recent_trades.items()},
-                            "recent_miner_trades": {uid : {book_id : [[t.model_dump(mode='json'), r] for t, r in trades] for book_id, trades in uid_miner_trades.items()} for uid, uid_miner_trades in self.recent_miner_trades.items()},
-                            "pending_notices": self.pending_notices,
-                            "simulation.logDir": self.simulation.logDir
-                        }, use_bin_type=True
-                    )
-                    file.write(packed_data)
-                if os.path.exists(self.simulation_state_file):
-                    os.remove(self.simulation_state_file)
-                os.rename(self.simulation_state_file + ".tmp", self.simulation_state_file)
-                bt.logging.success(f"Simulation state saved to {self.simulation_state_file} ({time.time()-start:.4f}s)")
-                bt.logging.info("Saving validator state...")
+                bt.logging.info("Saving validator state checkpoint...")
                 start = time.time()
-                # Save the state of the validator to file.
-                with open(self.validator_state_file + ".tmp", 'wb') as file:
-                    packed_data = msgpack.packb(
-                        {
-                            "step": self.step,
-                            "simulation_timestamp": self.simulation_timestamp,
-                            "hotkeys": self.hotkeys,
-                            "scores": [score.item() for score in self.scores],
-                            "activity_factors": self.activity_factors,
-                            "inventory_history": self.inventory_history,
-                            "sharpe_values": self.sharpe_values,
-                            "unnormalized_scores": self.unnormalized_scores,
-                            "trade_volumes" : self.trade_volumes,
-                            "deregistered_uids" : self.deregistered_uids
-                        }, use_bin_type=True
-                    )
-                    file.write(packed_data)
-                if os.path.exists(self.validator_state_file):
-                    os.remove(self.validator_state_file)
-                os.rename(self.validator_state_file + ".tmp", self.validator_state_file)
-                bt.logging.success(f"Validator state saved to {self.validator_state_file} ({time.time()-start:.4f}s)")
+                self.state_log.write(checkpoint)
+                bt.logging.success(f"Validator state checkpoint saved to {self.state_log.checkpoint_path} ({checkpoint.size / 1e6:.1f}MB, {time.time()-start:.4f}s)")
             except Exception as ex:
-                if os.path.exists(self.simulation_state_file + ".tmp"):
-                    os.remove(self.simulation_state_file + ".tmp")
-                if os.path.exists(self.validator_state_file + ".tmp"):
-                    os.remove(self.validator_state_file + ".tmp")
+                if os.path.exists(self.state_log.checkpoint_path + ".tmp"):
+                    os.remove(self.state_log.checkpoint_path + ".tmp")
                 self.pagerduty_alert(f"Failed to save state : {ex}", details={"trace" : traceback.format_exc()})
             finally:
                 self.saving = False
+                self.save_lock.release()
+
+        def save_state(self, wait : bool = False) -> None:
+            """
+            Captures a checkpoint of the state of the validator and writes it in a background thread, unless a checkpoint is already being written.
+            The large arrays of the state are shared with the checkpoint rather than copied, and are only copied if written to before the checkpoint is complete.
+
+            Args:
+                wait (bool): If True, waits for any checkpoint being written to complete and writes the new checkpoint in the calling thread.
+                    Used where the state has been changed outside of a reward pass (on the start and end of a simulation), as such changes are
+                    not recorded in the write-ahead log and would otherwise be lost on restart.
+            """
+            if not self.save_lock.acquire(blocking=wait):
+                return
+            self.saving = True
+            try:
+                # The state is captured under `state_lock` so that it is not taken part way through a reward pass
+                with self.state_lock:
+                    checkpoint = self.state_log.capture(self)
+            except Exception as ex:
+                self.saving = False
+                self.save_lock.release()
+                self.pagerduty_alert(f"Failed to capture state : {ex}", details={"trace" : traceback.format_exc()})
+                return
+            if wait:
+                self._save_state(checkpoint)
+            else:
+                Thread(target=self._save_state, args=(checkpoint,), daemon=True, name=f'save_{self.step}').start()
+
+        def record_state(self) -> None:
+            """
+            Records the changes made to the state of the validator by the latest reward pass to the write-ahead log, and starts writing a checkpoint every `neuron.checkpoint_interval` steps.
+            Called from the reward thread on completion of the pass, so that the state recorded is consistent.
+            """
+            try:
+                start = time.time()
+                self.state_log.record(self)
+                bt.logging.info(f"Validator State Recorded ({time.time()-start:.4f}s)")
+            except Exception as ex:
+                self.pagerduty_alert(f"Failed to record state : {ex}", details={"trace" : traceback.format_exc()})
+            if self.step % self.config.neuron.checkpoint_interval == 0:
+                self.save_state()
+
+        @property
+        def recent_trades(self) -> dict:
+            """
+            Recent trades of each book, awaiting their materialization if they are being loaded in the background.
+            """
+            self._await_trades()
+            return self._recent_trades
+
+        @recent_trades.setter
+        def recent_trades(self, recent_trades : dict) -> None:
+            self._await_trades()
+            self._recent_trades = recent_trades
 
-        def save_state(self) -> None:
-            if not self.saving:
-                Thread(target=self._save_state, args=(), daemon=True, name=f'save_{self.step}').start()
+        @property
+        def recent_miner_trades(self) -> dict:
+            """
+            Recent trades of each miner, awaiting their materialization if they are being loaded in the background.
+            """
+            self._await_trades()
+            return self._recent_miner_trades
+
+        @recent_miner_trades.setter
+        def recent_miner_trades(self, recent_miner_trades : dict) -> None:
+            self._await_trades()
+            self._recent_miner_trades = recent_miner_trades
+
+        def _load_trades(self, trades) -> None:
+            """
+            Materializes the recent trades held in the simulation state in a background thread, so that loading the state does not
+            wait on the construction of every trade.  Access to `recent_trades` or `recent_miner_trades` waits for the thread.
+
+            Args:
+                trades (np.ndarray | dict): The recent trades, in either form accepted by `taos.im.utils.persistence.decode_trades`.
+            """
+            def materialize():
+                try:
+                    start = time.time()
+                    self._recent_trades, self._recent_miner_trades = decode_trades(trades)
+                    bt.logging.success(f"Loaded recent trades ({time.time()-start:.4f}s).")
+                except Exception as ex:
+                    bt.logging.error(f"Failed to load recent trades : {ex}\n{traceback.format_exc()}")
+                    self._recent_trades = {bookId : [] for bookId in range(self.simulation.book_count)}
+                    self._recent_miner_trades = {uid : {bookId : [] for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
+            self._await_trades()
+            self._trades_loader = Thread(target=materialize, daemon=True, name='load_trades')
+            self._trades_loader.start()
+
+        def _await_trades(self) -> None:
+            loader = self._trades_loader
+            if loader:
+                loader.join()
+                self._trades_loader = None
 
         def load_state(self) -> None:
-            """Loads the state of the validator from a file."""
+            """
+            Loads the state of the validator from the latest checkpoint, replaying the write-ahead log records which follow it.
+            The legacy simulation and validator state files are loaded in place of the checkpoint if none has yet been written.
+            The arrays of the checkpoint are mapped from the file rather than read, and the recent trades are materialized in the
+            background, so that the validator is ready to process state updates as soon as the records have been replayed.
+            """
+            checkpoint = None
+            if self.config.neuron.reset:
+                self.state_log.clear()
+            else:
+                checkpoint = self.state_log.load()
+
             if os.path.exists(self.simulation_state_file.replace('.mp', '.pt')):
                 bt.logging.info("Pytorch simulation state file exists - converting to msgpack...")
                 pt_simulation_state = torch.load(self.simulation_state_file.replace('.mp', '.pt'), weights_only=False)
@@ -295,29 +365,40 @@ if __name__ != "__mp_main__":
                 os.rename(self.simulation_state_file.replace('.mp', '.pt'), self.simulation_state_file.replace('.mp', '.pt') + ".bak")
                 bt.logging.info(f"Pytorch simulation state file converted to msgpack at {self.simulation_state_file}")
                 
-            if not self.config.neuron.reset and os.path.exists(self.simulation_state_file):
+            simulation_state = None
+            if checkpoint and checkpoint["simulation"]["label"] == self.simulation.label():
+                bt.logging.info(f"Loading simulation state variables from {self.state_log.checkpoint_path}...")
+                simulation_state = checkpoint["simulation"]
+            elif not checkpoint and not self.config.neuron.reset and os.path.exists(self.simulation_state_file):
                 bt.logging.info(f"Loading simulation state variables from {self.simulation_state_file}...")
                 with open(self.simulation_state_file, 'rb') as file:
                     byte_data = file.read()
                 simulation_state = msgpack.unpackb(byte_data, use_list=True, strict_map_key=False)
+            if simulation_state:
                 self.start_time = simulation_state["start_time"]
                 self.start_timestamp = simulation_state["start_timestamp"]
                 self.step_rates = simulation_state["step_rates"]
                 self.pending_notices = simulation_state["pending_notices"]
                 self.initial_balances = simulation_state["initial_balances"] if 'initial_balances' in simulation_state else {uid : {bookId : {'BASE' : None, 'QUOTE' : None, 'WEALTH' : None} for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
-                for uid, initial_balances in self.initial_balances.items():
-                    if not 'WEALTH' in initial_balances[0]:
-                        self.initial_balances[uid] = {bookId : initial_balance | {'WEALTH' : self.simulation.miner_wealth} for bookId, initial_balance in initial_balances.items()}
-                self.recent_trades = {book_id : [TradeInfo.model_construct(**t) for t in book_trades] for book_id, book_trades in simulation_state["recent_trades"].items()} 
-                self.recent_miner_trades = {uid : {book_id : [[TradeEvent.model_construct(**t), r] for t, r in trades] for book_id, trades in uid_miner_trades.items()} for uid, uid_miner_trades in simulation_state["recent_miner_trades"].items()}  if "recent_miner_trades" in simulation_state else {uid : {bookId : [] for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
+                if "trades" in simulation_state:
+                    trades = simulation_state["trades"]
+                else:
+                    for uid, initial_balances in self.initial_balances.items():
+                        if not 'WEALTH' in initial_balances[0]:
+                            self.initial_balances[uid] = {bookId : initial_balance | {'WEALTH' : self.simulation.miner_wealth} for bookId, initial_balance in initial_balances.items()}
+                    trades = {
+                        "recent_trades" : simulation_state["recent_trades"],
+                        "recent_miner_trades" : simulation_state["recent_miner_trades"] if "recent_miner_trades" in simulation_state else {uid : {bookId : [] for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
+                    }
+                self._load_trades(trades)
                 self.simulation.logDir = simulation_state["simulation.logDir"]
                 bt.logging.success(f"Loaded simulation state.")
             else:
                 # If no state exists or the neuron.reset flag is set, re-initialize the simulation state
-                if self.config.neuron.reset and os.path.exists(self.simulation_state_file):
-                    bt.logging.warning(f"`neuron.reset is True, ignoring previous state info at {self.simulation_state_file}.")
+                if self.config.neuron.reset:
+                    bt.logging.warning(f"`neuron.reset is True, ignoring previous state info.")
                 else:
-                    bt.logging.info(f"No previous state information at {self.simulation_state_file}, initializing new simulation state.")
+                    bt.logging.info(f"No previous state information for simulation {self.simulation.label()}, initializing new simulation state.")
                 self.pending_notices = {uid : [] for uid in range(self.subnet_info.max_uids)}
                 self.initial_balances = {uid : {bookId : {'BASE' : None, 'QUOTE' : None, 'WEALTH' : None} for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
                 self.recent_trades = {bookId : [] for bookId in range(self.simulation.book_count)}
@@ -336,11 +417,17 @@ if __name__ != "__mp_main__":
                 os.rename(self.validator_state_file.replace('.mp', '.pt'), self.validator_state_file.replace('.mp', '.pt') + ".bak")
                 bt.logging.info(f"Pytorch validator state file converted to msgpack at {self.validator_state_file}")
 
-            if not self.config.neuron.reset and os.path.exists(self.validator_state_file):
+            validator_state = None
+            if checkpoint:
+                bt.logging.info(f"Loading validator state variables from {self.state_log.checkpoint_path}...")
+                validator_state = checkpoint["validator"]
+            elif not self.config.neuron.reset and os.path.exists(self.validator_state_file):
                 bt.logging.info(f"Loading validator state variables from {self.validator_state_file}...")
                 with open(self.validator_state_file, 'rb') as file:
                     byte_data = file.read()
                 validator_state = msgpack.unpackb(byte_data, use_list=False, strict_map_key=False)
+            reorg = False
+            if validator_state:
                 self.step = validator_state["step"]
                 self.simulation_timestamp = validator_state["simulation_timestamp"] if "simulation_timestamp" in validator_state else 0
                 self.hotkeys = validator_state["hotkeys"]
@@ -349,62 +436,60 @@ if __name__ != "__mp_main__":
                 self.activity_factors = validator_state["activity_factors"] if "activity_factors" in validator_state else {uid : {bookId : 0.0 for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
                 if isinstance(self.activity_factors[0], float):
                     self.activity_factors = {uid : {bookId : self.activity_factors[uid] for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
-                self.inventory_history = validator_state["inventory_history"] if "inventory_history" in validator_state else {uid : {} for uid in range(self.subnet_info.max_uids)}
-                for uid in self.inventory_history:
-                    for timestamp in self.inventory_history[uid]:
-                        if len(self.inventory_history[uid][timestamp]) < self.simulation.book_count:
-                            for bookId in range(len(self.inventory_history[uid][timestamp]),self.simulation.book_count):
-                                self.inventory_history[uid][timestamp][bookId] = 0.0
-                        if len(self.inventory_history[uid][timestamp]) > self.simulation.book_count:
-                            self.inventory_history[uid][timestamp] = {k : v for k, v in self.inventory_history[uid][timestamp].items() if k < self.simulation.book_count}
+                if "inventory_history" in validator_state:
+                    self.inventory_history = InventoryHistory.from_state(validator_state["inventory_history"], self.subnet_info.max_uids, self.config.scoring.sharpe.lookback, self.simulation.book_count)
+                else:
+                    self.inventory_history = InventoryHistory(self.subnet_info.max_uids, self.config.scoring.sharpe.lookback, self.simulation.book_count)
                 self.sharpe_values = validator_state["sharpe_values"]
-                for uid in self.sharpe_values:
-                    if self.sharpe_values[uid] and len(self.sharpe_values[uid]['books']) < self.simulation.book_count:
-                        for bookId in range(len(self.sharpe_values[uid]['books']),self.simulation.book_count):
-                            self.sharpe_values[uid]['books'][bookId] = 0.0
-                            self.sharpe_values[uid]['books_weighted'][bookId] = 0.0
-                    if self.sharpe_values[uid] and len(self.sharpe_values[uid]['books']) > self.simulation.book_count:
-                        self.sharpe_values[uid]['books'] = {k : v for k, v in self.sharpe_values[uid]['books'].items() if k < self.simulation.book_count}
-                        if 'books_weighted' in self.sharpe_values[uid]:
-                            self.sharpe_values[uid]['books_weighted'] = {k : v for k, v in self.sharpe_values[uid]['books_weighted'].items() if k < self.simulation.book_count}
+                # The per-book structures are only padded or truncated if the state was saved with a different number of books
+                conform = validator_state.get("books") != self.simulation.book_count
+                if conform:
+                    for uid in self.sharpe_values:
+                        if self.sharpe_values[uid] and len(self.sharpe_values[uid]['books']) < self.simulation.book_count:
+                            for bookId in range(len(self.sharpe_values[uid]['books']),self.simulation.book_count):
+                                self.sharpe_values[uid]['books'][bookId] = 0.0
+                                self.sharpe_values[uid]['books_weighted'][bookId] = 0.0
+                        if self.sharpe_values[uid] and len(self.sharpe_values[uid]['books']) > self.simulation.book_count:
+                            self.sharpe_values[uid]['books'] = {k : v for k, v in self.sharpe_values[uid]['books'].items() if k < self.simulation.book_count}
+                            if 'books_weighted' in self.sharpe_values[uid]:
+                                self.sharpe_values[uid]['books_weighted'] = {k : v for k, v in self.sharpe_values[uid]['books_weighted'].items() if k < self.simulation.book_count}
                 self.unnormalized_scores = validator_state["unnormalized_scores"]
-                self.trade_volumes = validator_state["trade_volumes"] if "trade_volumes" in validator_state else {uid : {bookId : {'total' : {}, 'maker' : {}, 'taker' : {}, 'self' : {}} for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
-                reorg = False
-                for uid in self.trade_volumes:
-                    for bookId in self.trade_volumes[uid]:
-                        if not 'total' in self.trade_volumes[uid][bookId]:
-                            if not reorg:
-                                bt.logging.info(f"Optimizing miner volume history structures...")
-                                reorg = True
-                            volumes = {'total' : {}, 'maker' : {}, 'taker' : {}, 'self' : {}}
-                            for time, role_volume in self.trade_volumes[uid][bookId].items():
-                                sampled_time = math.ceil(time / self.config.scoring.activity.trade_volume_sampling_interval) * self.config.scoring.activity.trade_volume_sampling_interval
-                                for role, volume in role_volume.items():
-                                    if not sampled_time in volumes[role]:
-                                        volumes[role][sampled_time] = 0.0
-                                    volumes[role][sampled_time] += volume
-                            self.trade_volumes[uid][bookId] = {role : {time : round(volumes[role][time], self.simulation.volumeDecimals) for time in volumes[role]} for role in volumes}
-                    if len(self.trade_volumes[uid]) < self.simulation.book_count:
-                        for bookId in range(len(self.trade_volumes[uid]),self.simulation.book_count):
-                            self.trade_volumes[uid][bookId] = {'total' : {}, 'maker' : {}, 'taker' : {}, 'self' : {}}
-                    if len(self.trade_volumes[uid]) > self.simulation.book_count:
-                        self.trade_volumes[uid] = {k : v for k, v in self.trade_volumes[uid].items() if k < self.simulation.book_count}
-                    if len(self.activity_factors[uid]) < self.simulation.book_count:
-                        for bookId in range(len(self.activity_factors[uid]),self.simulation.book_count):
-                            self.activity_factors[uid][bookId] = 0.0
-                    if len(self.activity_factors[uid]) > self.simulation.book_count:
-                        self.activity_factors[uid] = {k : v for k, v in self.activity_factors[uid].items() if k < self.simulation.book_count}
-                if reorg:
-                    self._save_state()
+                trade_volumes = validator_state["trade_volumes"] if "trade_volumes" in validator_state else {}
+                if not "volumes" in trade_volumes:
+                    # Legacy dictionary volume histories are re-bucketed if necessary before being loaded into the ledger
+                    trade_volumes = {uid : dict(uid_volumes) for uid, uid_volumes in trade_volumes.items()}
+                    for uid in trade_volumes:
+                        for bookId in trade_volumes[uid]:
+                            if not 'total' in trade_volumes[uid][bookId]:
+                                if not reorg:
+                                    bt.logging.info(f"Optimizing miner volume history structures...")
+                                    reorg = True
+                                volumes = {'total' : {}, 'maker' : {}, 'taker' : {}, 'self' : {}}
+                                for time, role_volume in trade_volumes[uid][bookId].items():
+                                    sampled_time = math.ceil(time / self.config.scoring.activity.trade_volume_sampling_interval) * self.config.scoring.activity.trade_volume_sampling_interval
+                                    for role, volume in role_volume.items():
+                                        if not sampled_time in volumes[role]:
+                                            volumes[role][sampled_time] = 0.0
+                                        volumes[role][sampled_time] += volume
+                                trade_volumes[uid][bookId] = {role : {time : round(volumes[role][time], self.simulation.volumeDecimals) for time in volumes[role]} for role in volumes}
+                self.trade_volumes = VolumeLedger.from_state(trade_volumes, self.subnet_info.max_uids, self.simulation.book_count,
+                                                             self.config.scoring.activity.trade_volume_sampling_interval, self.config.scoring.activity.trade_volume_assessment_period, self.simulation.volumeDecimals)
+                if conform:
+                    for uid in self.activity_factors:
+                        if len(self.activity_factors[uid]) < self.simulation.book_count:
+                            for bookId in range(len(self.activity_factors[uid]),self.simulation.book_count):
+                                self.activity_factors[uid][bookId] = 0.0
+                        if len(self.activity_factors[uid]) > self.simulation.book_count:
+                            self.activity_factors[uid] = {k : v for k, v in self.activity_factors[uid].items() if k < self.simulation.book_count}
                 bt.logging.success(f"Loaded validator state.")
             else:
                 # If no state exists or the neuron.reset flag is set, re-initialize the validator state
-                if self.config.neuron.reset and os.path.exists(self.validator_state_file):
-                    bt.logging.warning(f"`neuron.reset is True, ignoring previous state info at {self.validator_state_file}.")
+                if self.config.neuron.reset:
+                    bt.logging.warning(f"`neuron.reset is True, ignoring previous state info.")
                 else:
-                    bt.logging.info(f"No previous state information at {self.validator_state_file}, initializing new simulation state.")
+                    bt.logging.info(f"No previous state information at {self.state_log.directory}, initializing new validator state.")
                 self.activity_factors = {uid : {bookId : 0.0 for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
-                self.inventory_history = {uid : {} for uid in range(self.subnet_info.max_uids)}
+                self.inventory_history = InventoryHistory(self.subnet_info.max_uids, self.config.scoring.sharpe.lookback, self.simulation.book_count)
                 self.sharpe_values = {uid :
                     {
                         'books' : {
@@ -425,7 +510,21 @@ if __name__ != "__mp_main__":
                     } for uid in range(self.subnet_info.max_uids)
                 }
                 self.unnormalized_scores = {uid : 0.0 for uid in range(self.subnet_info.max_uids)}
-                self.trade_volumes = {uid : {bookId : {'total' : {}, 'maker' : {}, 'taker' : {}, 'self' : {}} for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
+                self.trade_volumes = VolumeLedger(self.subnet_info.max_uids, self.simulation.book_count,
+                                                  self.config.scoring.activity.trade_volume_sampling_interval, self.config.scoring.activity.trade_volume_assessment_period, self.simulation.volumeDecimals)
+
+            # Apply the changes recorded in the write-ahead log since the checkpoint
+            if not self.config.neuron.reset:
+                start = time.time()
+                replayed = self.state_log.replay(self)
+                if replayed:
+                    bt.logging.success(f"Replayed {replayed} validator state records to step {self.step} ({time.time()-start:.4f}s).")
+            self.sharpe_statistics = RollingSharpe(self.inventory_history, self.simulation.grace_period)
+            # A checkpoint is written in the background if the state was re-organized while loading, if it was loaded from a
+            # checkpoint of an earlier schema version, or if legacy state files are present without a checkpoint, so that the
+            # migrations are not repeated on the next start
+            if reorg or (checkpoint and checkpoint["version"] < SCHEMA_VERSION) or (not checkpoint and (os.path.exists(self.validator_state_file) or os.path.exists(self.simulation_state_file))):
+                self.save_state()
 
         def load_simulation_config(self) -> None:
             """
@@ -435,6 +534,8 @@ if __name__ != "__mp_main__":
             self.simulation = MarketSimulationConfig.from_xml(self.xml_config)
             self.validator_state_file = self.config.neuron.full_path + f"/validator.mp"
             self.simulation_state_file = self.config.neuron.full_path + f"/{self.simulation.label()}.mp"
+            if not hasattr(self, 'state_log'):
+                self.state_log = StateLog(os.path.join(self.config.neuron.full_path, "state"))
             self.load_state()
 
         def __init__(self, config=None) -> None:
@@ -446,12 +547,20 @@ if __name__ != "__mp_main__":
 
             if not os.path.exists(self.config.simulation.xml_config):
                 raise Exception(f"Simulator config does not exist at {self.config.simulation.xml_config}!")
+            if self.config.compression.engine == 'zstd_dict' and load_dictionary() is None:
+                raise Exception(f"No zstd dictionary is available for version {__spec_version__} at {dictionary_path(DICTIONARY_ID)}; select another compression engine!")
             self.simulator_config_file = os.path.realpath(Path(self.config.simulation.xml_config))
             # Initialize subnet info and other basic validator/simulation properties
             self.subnet_info = self.subtensor.get_metagraph_info(self.config.netuid)
             self.last_state = None
             self.last_response = None
             self.msgpack_error_counter = 0
+            # Number of state updates recorded to `simulation.capture_dir`
+            self.captured_states = 0
+            # Timestamp and raw books of the last state update sent to miners, against which book deltas are encoded
+            self.book_reference = None
+            # UIDs which successfully received the reference books, and can therefore be sent book deltas
+            self.book_delta_uids = set()
             self.simulation_timestamp = 0
             self.reward_weights = {"sharpe" : 1.0}
             self.start_time = None
@@ -463,7 +572,13 @@ if __name__ != "__mp_main__":
             self.reporting = False
             self.saving = False
             self.compressing = False
-            self.initial_balances_published = {uid : False for uid in range(self.subnet_info.max_uids)}
+            # Held while a checkpoint is captured and written, so that only one is written at a time
+            self.save_lock = Lock()
+            # Held across each reward pass and any other change to the scoring state made outside of it, so that checkpoints and
+            # write-ahead log records are captured from a consistent state
+            self.state_lock = RLock()
+            # Thread materializing the recent trades loaded with the simulation state
+            self._trades_loader = None
 
             self.load_simulation_config()
 
@@ -476,23 +591,19 @@ if __name__ != "__mp_main__":
             self.repo = Repo(self.repo_path)
             self.update_repo()
 
-            self.miner_stats = {uid : {'requests' : 0, 'timeouts' : 0, 'failures' : 0, 'rejections' : 0, 'call_time' : []} for uid in range(self.subnet_info.max_uids)}
+            self.miner_stats = {uid : {'requests' : 0, 'timeouts' : 0, 'failures' : 0, 'rejections' : 0, 'call_time' : [], 'send_offset' : []} for uid in range(self.subnet_info.max_uids)}
+            self.dispatch_scheduler = DispatchScheduler(self.subnet_info.max_uids, rate=self.config.neuron.dispatch.rate, burst=self.config.neuron.dispatch.burst,
+                                                        concurrency=self.config.neuron.dispatch.concurrency, host_limit=self.config.neuron.dispatch.host_limit,
+                                                        order=self.config.neuron.dispatch.order,
+                                                        quorum=self.config.neuron.dispatch.quorum, deadline_percentile=self.config.neuron.dispatch.deadline_percentile)
+            # Responses are validated and delayed on a single thread as they are collected, in order of arrival, leaving the event loop free for the queries in flight
+            self.response_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='responses')
             init_metrics(self)
             publish_info(self)
 
         def load_fundamental(self):
             if self.simulation.logDir:
-                prices = {}
-                for block in range(self.simulation.block_count):
-                    block_file = os.path.join(self.simulation.logDir, f'fundamental.{block * self.simulation.books_per_block}-{self.simulation.books_per_block * (block + 1) - 1}.csv')
-                    fp_line = None
-                    book_ids = None
-                    for line in open(block_file, 'r').readlines():
-                        if not book_ids:
-                            book_ids = [int(col) for col in line.split(',') if col != "Timestamp\n"]
-                        if line.strip() != '':
-                            fp_line = line
-                    prices = prices | {book_ids[i] : float(price) for i, price in enumerate(fp_line.strip().split(',')[:-1])}
+                prices = load_fundamental_prices(self.simulation.logDir, self.simulation.block_count, self.simulation.books_per_block)
             else:
                 prices = {bookId : None for bookId in range(self.simulation.book_count)}
             self.fundamental_price = prices
@@ -502,40 +613,35 @@ if __name__ != "__mp_main__":
             Triggered when start of simulation event is published by simulator.
             Sets the simulation output directory and retrieves any fundamental price values already written.
             """
-            self.load_simulation_config()
-            self.trade_volumes = {
-                uid : {
-                    bookId : {
-                        role : {
-                            prev_time - self.simulation_timestamp : volume for prev_time, volume in self.trade_volumes[uid][bookId][role].items() if prev_time - self.simulation_timestamp < self.simulation_timestamp
-                        } for role in self.trade_volumes[uid][bookId]
-                    } for bookId in range(self.simulation.book_count)
-                } for uid in range(self.subnet_info.max_uids)
-            }
-            self.inventory_history = {
-                uid : {
-                    prev_time - self.simulation_timestamp : values for prev_time, values in self.inventory_history[uid].items() if prev_time - self.simulation_timestamp < self.simulation_timestamp
-                } for uid in range(self.subnet_info.max_uids)
-            }
-            self.start_time = time.time()
-            self.simulation_timestamp = timestamp
-            self.start_timestamp = self.simulation_timestamp
-            self.last_state_time = None
-            self.step_rates = []
-            self.simulation.logDir = event.logDir
-            self.compress_outputs(start=True)
-            bt.logging.info("-"*40)
-            bt.logging.info("SIMULATION STARTED")
-            bt.logging.info("-"*40)
-            bt.logging.info(f"START TIME: {self.start_time}")
-            bt.logging.info(f"TIMESTAMP : {self.start_timestamp}")
-            bt.logging.info(f"OUT DIR   : {self.simulation.logDir}")
-            bt.logging.info("-"*40)
-            self.load_fundamental()
-            self.initial_balances = {uid : {bookId : {'BASE' : None, 'QUOTE' : None, 'WEALTH' : self.simulation.miner_wealth} for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
-            self.recent_trades = {bookId : [] for bookId in range(self.simulation.book_count)}
-            self.recent_miner_trades = {uid : {bookId : [] for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
-            self.save_state()
+            with self.state_lock:
+                self.load_simulation_config()
+                self.trade_volumes.reshape(self.subnet_info.max_uids, self.simulation.book_count)
+                self.trade_volumes.rebase(self.simulation_timestamp)
+                self.inventory_history.reshape(self.subnet_info.max_uids, self.config.scoring.sharpe.lookback, self.simulation.book_count)
+                self.inventory_history.rebase(self.simulation_timestamp)
+                self.sharpe_statistics.resync(self.inventory_history)
+                self.start_time = time.time()
+                self.simulation_timestamp = timestamp
+                self.start_timestamp = self.simulation_timestamp
+                self.last_state_time = None
+                self.step_rates = []
+                self.book_reference = None
+                self.book_delta_uids = set()
+                self.simulation.logDir = event.logDir
+                self.compress_outputs(start=True)
+                bt.logging.info("-"*40)
+                bt.logging.info("SIMULATION STARTED")
+                bt.logging.info("-"*40)
+                bt.logging.info(f"START TIME: {self.start_time}")
+                bt.logging.info(f"TIMESTAMP : {self.start_timestamp}")
+                bt.logging.info(f"OUT DIR   : {self.simulation.logDir}")
+                bt.logging.info("-"*40)
+                self.load_fundamental()
+                self.initial_balances = {uid : {bookId : {'BASE' : None, 'QUOTE' : None, 'WEALTH' : self.simulation.miner_wealth} for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
+                self.recent_trades = {bookId : [] for bookId in range(self.simulation.book_count)}
+                self.recent_miner_trades = {uid : {bookId : [] for bookId in range(self.simulation.book_count)} for uid in range(self.subnet_info.max_uids)}
+                # The rebased state is not recorded in the write-ahead log, so a checkpoint is written before any further reward pass is recorded
+                self.save_state(wait=True)
             publish_info(self)
 
         def onEnd(self) -> None:
@@ -544,10 +650,11 @@ if __name__ != "__mp_main__":
             Resets quantities as necessary, updates, rebuilds and launches simulator with the latest configuration.
             """
             bt.logging.info("SIMULATION ENDED")
-            self.simulation.logDir = None
-            self.fundamental_price = {bookId : None for bookId in range(self.simulation.book_count)}
-            self.pending_notices = {uid : [] for uid in range(self.subnet_info.max_uids)}
-            self.save_state()
+            with self.state_lock:
+                self.simulation.logDir = None
+                self.fundamental_price = {bookId : None for bookId in range(self.simulation.book_count)}
+                self.pending_notices = {uid : [] for uid in range(self.subnet_info.max_uids)}
+                self.save_state(wait=True)
             self.update_repo(end=True)
 
         def handle_deregistration(self, uid) -> None:
@@ -589,12 +696,14 @@ if __name__ != "__mp_main__":
                                 }
                                 self.unnormalized_scores[reset['a']] = 0.0
                                 self.activity_factors[reset['a']] = {bookId : 0.0 for bookId in range(self.simulation.book_count)}
-                                self.inventory_history[reset['a']] = {}
-                                self.trade_volumes[reset['a']] = {bookId : {'total' : {}, 'maker' : {}, 'taker' : {}, 'self' : {}} for bookId in range(self.simulation.book_count)}
+                                self.inventory_history.reset(reset['a'])
+                                self.sharpe_statistics.reset(reset['a'])
+                                self.trade_volumes.reset(reset['a'])
+                                self.state_log.reset(reset['a'])
                                 self.initial_balances[reset['a']] = {bookId : {'BASE' : None, 'QUOTE' : None, 'WEALTH' : None} for bookId in range(self.simulation.book_count)}
-                                self.initial_balances_published[reset['a']] = False
                                 self.deregistered_uids.remove(reset['a'])
-                                self.miner_stats[reset['a']] = {'requests' : 0, 'timeouts' : 0, 'failures' : 0, 'rejections' : 0, 'call_time' : []}
+                                self.miner_stats[reset['a']] = {'requests' : 0, 'timeouts' : 0, 'failures' : 0, 'rejections' : 0, 'call_time' : [], 'send_offset' : []}
+                                self.dispatch_scheduler.reset(reset['a'])
                                 self.recent_miner_trades[reset['a']] = {bookId : [] for bookId in range(self.simulation.book_count)}
                         else:
                             self.pagerduty_alert(f"Failed to Reset Agent {reset['a']} : {reset['m']}")
@@ -623,12 +732,16 @@ if __name__ != "__mp_main__":
             try:
                 bt.logging.info(f"Updating Agent Scores at Step {self.step} (Workers={self.config.scoring.sharpe.parallel_workers})...")
                 self.rewarding = True
-                start = time.time()
-                rewards = get_rewards(self, state)
-                bt.logging.debug(f"Agent Rewards Recalculated:\n{rewards}")
-                # Update the miner scores.
-                self.update_scores(rewards, self.metagraph.uids)
-                bt.logging.info(f"Agent Scores Updated ({time.time()-start:.4f}s)")
+                with self.state_lock:
+                    start = time.time()
+                    rewards = get_rewards(self, state)
+                    bt.logging.debug(f"Agent Rewards Recalculated:\n{rewards}")
+                    # Update the miner scores.
+                    self.update_scores(rewards, self.metagraph.uids)
+                    bt.logging.info(f"Agent Scores Updated ({time.time()-start:.4f}s)")
+                    self.record_state()
+                if self.config.reporting.exporter and not self.config.reporting.disabled:
+                    publish_snapshot(self, state.timestamp)
                 bt.logging.debug(f"{self.scores}")
             finally:
                 self.rewarding = False
@@ -647,9 +760,11 @@ if __name__ != "__mp_main__":
                 self.update_repo()
             state.version = __spec_version__
             start = time.time()
+            volume_totals = np.round(self.trade_volumes.totals()[..., ROLE_INDEX['total']], self.simulation.volumeDecimals)
             for uid, accounts in state.accounts.items():
+                uid_volumes = volume_totals[uid].tolist()
                 for book_id in accounts:
-                    state.accounts[uid][book_id]['v'] = round(sum([volume for volume in self.trade_volumes[uid][book_id]['total'].values()]), self.simulation.volumeDecimals)
+                    state.accounts[uid][book_id]['v'] = uid_volumes[book_id]
             bt.logging.info(f"Volumes added to state ({time.time()-start:.4f}s).")
 
             # Update variables
@@ -684,14 +799,21 @@ if __name__ != "__mp_main__":
                         debug_text += "EMPTY" + "\n"
                 bt.logging.debug("\n" + debug_text.strip("\n"))
 
-            # Process deregistration notices
-            self.process_resets(state)
+            # Process deregistration notices, which change the scoring state and so must not interleave with a reward pass
+            with self.state_lock:
+                self.process_resets(state)
 
             # Await state saving, rewarding and metagraph maintenance to complete before proceeding with next step
             while self.rewarding or self.maintaining:
                 bt.logging.info(f"Waiting for {'rewarding' if self.rewarding else ''}{', ' if self.rewarding and self.maintaining else ''}{'maintaining' if self.maintaining else ''} to complete before querying...")
                 time.sleep(0.5)
 
+            # The state is copied out of the shared memory before it is handed to the reward and reporting threads, which may still be
+            # reading it after the response has been returned and the simulator has overwritten the buffer
+            start = time.time()
+            copied = state.detach()
+            bt.logging.info(f"Detached state from buffer ({time.time() - start:.4f}s) | Decoded {sum(len(field) for field in [state.books, state.accounts, state.notices])} entries lazily ({state.decode_time():.4f}s) | Copied {copied} undecoded bytes")
+
             # Calculate latest rewards and update miner scores
             self.maintain()
             self.reward(state)
@@ -704,27 +826,62 @@ if __name__ != "__mp_main__":
             bt.logging.info(f"RATE : {(self.step_rates[-1] if self.step_rates != [] else 0) / 1e9:.2f} STEPS/s | AVG : {(sum(self.step_rates) / len(self.step_rates) / 1e9 if self.step_rates != [] else 0):.2f}  STEPS/s")
             self.step_rates = self.step_rates[-10000:]
             self.last_state_time = time.time()
-            self.save_state()
             self.report()
             bt.logging.info(f"State update handled ({time.time()-receive_start}s)")
 
             return response
 
         async def _listen(self):
-            def receive(mq_req) -> dict:
+            def receive(mq_req) -> tuple[dict, MarketSimulationStateUpdate, mmap.mmap, memoryview, float]:
                 msg, priority = mq_req.receive()
                 receive_start = time.time()
                 bt.logging.info(f"Received state update from simulator (msgpack)")
                 byte_size_req = int.from_bytes(msg, byteorder="little")
                 shm_req = posix_ipc.SharedMemory("/state", flags=posix_ipc.O_CREAT)
-                with mmap.mmap(shm_req.fd, byte_size_req, mmap.MAP_SHARED, mmap.PROT_READ) as mm:
-                    shm_req.close_fd()
-                    packed_data = mm.read(byte_size_req)
-                bt.logging.info(f"Retrieved State Update ({time.time() - receive_start}s)")
-                start = time.time()
-                result = msgpack.unpackb(packed_data, raw=False, use_list=False, strict_map_key=False)
-                bt.logging.info(f"Unpacked state update ({time.time() - start}s)")
-                return result, receive_start
+                mm = mmap.mmap(shm_req.fd, byte_size_req, mmap.MAP_SHARED, mmap.PROT_READ)
+                shm_req.close_fd()
+                buffer = memoryview(mm)[:byte_size_req]
+                bt.logging.info(f"Mapped State Update ({time.time() - receive_start:.4f}s)")
+                if self.config.simulation.capture_dir and self.captured_states < self.config.simulation.capture_count:
+                    # Raw state updates are recorded for replay by the benchmarks (see `benchmarks/states.py`)
+                    os.makedirs(self.config.simulation.capture_dir, exist_ok=True)
+                    with open(os.path.join(self.config.simulation.capture_dir, f"state_{self.captured_states:06d}.msgpack"), "wb") as f:
+                        f.write(buffer)
+                    self.captured_states += 1
+                if self.config.reporting.exporter and not self.config.reporting.disabled:
+                    # The raw state is published for the metrics exporter, which decodes it in its own process
+                    try:
+                        sequence = self.state_snapshots.publish(buffer)
+                        bt.logging.info(f"Published State Snapshot {sequence} ({time.time() - receive_start:.4f}s)")
+                    except Exception as ex:
+                        bt.logging.warning(f"Unable to publish state snapshot : {ex}")
+                # The state is decoded directly from shared memory; books, accounts and notices are decoded lazily as they are accessed
+                try:
+                    message, state = MarketSimulationStateUpdate.from_buffer(buffer)
+                except Exception:
+                    buffer.release()
+                    mm.close()
+                    raise
+                return message, state, mm, buffer, receive_start
+
+            # Mappings of state buffers which could not yet be released, retried on each step
+            unreleased = []
+            def release(state : MarketSimulationStateUpdate | None, mm : mmap.mmap | None, buffer : memoryview | None) -> None:
+                # The state is normally detached from the buffer in `handle_state`; it is detached here in case handling failed before then,
+                # since the simulator may overwrite the shared memory once it has received the response.
+                if state is not None:
+                    state.detach()
+                if mm is not None:
+                    unreleased.append((mm, buffer))
+                for held in list(unreleased):
+                    held_mm, held_buffer = held
+                    try:
+                        if held_buffer is not None:
+                            held_buffer.release()
+                        held_mm.close()
+                        unreleased.remove(held)
+                    except BufferError as ex:
+                        bt.logging.warning(f"Unable to release state buffer - retrying on next step : {ex}")
 
             def respond(response) -> dict:
                 import random
@@ -741,16 +898,17 @@ if __name__ != "__mp_main__":
 
             while True:
                 response = {"responses" : []}
+                state, mm, buffer = None, None, None
                 try:
                     mq_req = posix_ipc.MessageQueue("/taosim-req", flags=posix_ipc.O_CREAT, max_messages=1, max_message_size=8)
                     # This blocks until the queue can provide a message
-                    message, receive_start = receive(mq_req)
-                    state = MarketSimulationStateUpdate.parse_dict(message)
+                    message, state, mm, buffer, receive_start = receive(mq_req)
                     response = await self.handle_state(message, state, receive_start)
                 except Exception as ex:
                     traceback.print_exc()
                     self.pagerduty_alert(f"Exception in posix listener loop : {ex}", details={"trace" : traceback.format_exc()})
                 finally:
+                    release(state, mm, buffer)
                     respond(response)
                     mq_req.close()
 
@@ -831,7 +989,7 @@ if __name__ != "__mp_main__":
 if __name__ == "__main__":
     from taos.im.validator.update import check_repo, update_validator, check_simulator, rebuild_simulator, restart_simulator
     from taos.im.validator.forward import forward, notify
-    from taos.im.validator.report import report, publish_info, init_metrics
+    from taos.im.validator.report import report, publish_info, init_metrics, publish_snapshot
     from taos.im.validator.reward import get_rewards
     if float(platform.freedesktop_os_release()['VERSION_ID']) < 22.04:
         raise Exception(f"taos validator requires Ubuntu >= 22.04!")
@@ -2,16 +2,19 @@
 # SPDX-License-Identifier: MIT
 import time
 import traceback
+import msgspec
 import bittensor as bt
 from ypyjson import YpyObject
-from typing import Annotated, Optional, ClassVar, Literal
+from typing import Annotated, Any, Optional, ClassVar, Literal
 from taos.im.protocol.simulator import *
 from taos.im.protocol.models import *
 from taos.common.protocol import SimulationStateUpdate, EventNotification
 from taos.im.protocol.events import *
 from taos.im.protocol.models import Book, Account, Balance, Order
 from taos.im.protocol.response import FinanceAgentResponse
-from taos.im.utils.compress import compress, decompress
+from taos.im.protocol.views import BookView, BooksView, PayloadView
+from taos.im.utils.compress import compress, decompress, encode, compress_books, BookIndex
+from taos.im.utils.delta import apply_books_delta
 
 """
 The core intelligent market simulation protocol classes are defined here.
@@ -48,7 +51,11 @@ class MarketSimulationStateUpdate(SimulationStateUpdate):
             Mapping from agent IDs to lists of market events relevant to them since the last state update.
         response (Optional[FinanceAgentResponse] | None): Mutable field to be populated by the miner agent with instructions to execute.
         compressed (str | dict | None): Compressed format of the state data to reduce message size during transmission.
-        compression_engine (str): Compression library used by the validator; one of `zlib` or `lz4`  or `zstd` (default is `lz4`).
+        compression_engine (str): Compression library used by the validator; one of `zlib` or `lz4`  or `zstd` or `zstd_dict` (default is `lz4`).
+        compression_transport (str): Text encoding of the compressed data; one of `base64` or `base85` (default is `base64`).
+        books_reference (int | None): Timestamp of the state update against which the books are delta-encoded; None where the full books are sent.
+        keyframe_required (bool): Flag set by the miner where delta-encoded books could not be reconstructed, to request that the full books are sent in the next update.
+        book_deltas (bool): Flag set by the miner on its response to declare that it is able to reconstruct delta-encoded books; miners which do not set it are only sent the full books.
     """
     version : int | None = None
     timestamp : int
@@ -59,6 +66,10 @@ class MarketSimulationStateUpdate(SimulationStateUpdate):
     response: Optional[FinanceAgentResponse] | None  = None
     compressed : str | dict | None = None
     compression_engine : str = "lz4"
+    compression_transport : str = "base64"
+    books_reference : int | None = None
+    keyframe_required : bool = False
+    book_deltas : bool = False
 
     required_fields: ClassVar[list[str]] = None
     def get_required_fields(self) -> list[str]:
@@ -232,21 +243,34 @@ class MarketSimulationStateUpdate(SimulationStateUpdate):
         self.config = None
         return self
 
-    def compress(self, level=-1, engine : Literal["zlib", "lz4", "zstd"] | None = None, compressed_books : str = None):
+    def compress(self, level=-1, engine : Literal["zlib", "lz4", "zstd", "zstd_dict"] | None = None, compressed_books : str = None, indexed_books : bool = False,
+                 transport : Literal["base64", "base85"] | None = None):
         """
         Method to compress large synapse fields for transmission over the network.
 
         Note this method DOES NOT modify the synapse in place, so that the original synapse data can be referenced after sending without requiring decompression.
+
+        Args:
+            level (int): Compression level.
+            engine (str | None): Compression library to use; the current `compression_engine` if None.
+            compressed_books (str | None): Pre-compressed books to send, if already prepared.
+            indexed_books (bool): If True, the books are sent as a book-indexed container (see `taos.im.utils.compress.compress_books`),
+                allowing each book to be decompressed and decoded individually.  Requires msgpack serialization (version >= 45).
+            transport (str | None): Text encoding of the compressed data; the current `compression_transport` if None.
         """
         try:
             if engine:
                 self.compression_engine = engine
+            if transport:
+                self.compression_transport = transport
             if not self.compressed:
                 if self.response:
                     agent_id = self.response.agent_id
                 compressed = self.model_copy()
+                if not compressed_books and indexed_books and compressed.books:
+                    compressed_books = compress_books({bookId : encode(book.model_dump(mode='json') if isinstance(book, Book) else book, self.version) for bookId, book in compressed.books.items()}, level, compressed.compression_engine, transport=compressed.compression_transport)
                 if not compressed_books:
-                    compressed_books = compress({bookId : book.model_dump(mode='json') if isinstance(book, Book) else book for bookId, book in compressed.books.items()} if compressed.books else None, level, compressed.compression_engine, self.version)
+                    compressed_books = compress({bookId : book.model_dump(mode='json') if isinstance(book, Book) else book for bookId, book in compressed.books.items()} if compressed.books else None, level, compressed.compression_engine, self.version, compressed.compression_transport)
                 payload = {
                     "accounts" : {accountId : {bookId : account.model_dump(mode='json') if isinstance(account, Account) else account for bookId, account in accounts.items()} for accountId, accounts in compressed.accounts.items()} if compressed.accounts else None,
                     "notices" : {agentId : [notice if isinstance(notice, dict) else notice.model_dump(mode='json') for notice in notices] for agentId, notices in compressed.notices.items()} if compressed.notices else None,
@@ -255,7 +279,7 @@ class MarketSimulationStateUpdate(SimulationStateUpdate):
                 }
                 compressed.compressed = {
                     "books" : compressed_books,
-                    "payload" : compress(payload, level, compressed.compression_engine, self.version)
+                    "payload" : compress(payload, level, compressed.compression_engine, self.version, compressed.compression_transport)
                 }
                 compressed.books = None
                 compressed.accounts = None
@@ -280,24 +304,117 @@ class MarketSimulationStateUpdate(SimulationStateUpdate):
         bt.logging.info(f"Parsed state dict ({time.time() - start:.4f}s)")
         return ret
 
-    def decompress(self, lazy=False):
+    @classmethod
+    def from_buffer(cls, buffer : bytes | memoryview) -> tuple[dict, 'MarketSimulationStateUpdate']:
+        """
+        Constructs a state update directly from a msgpack-encoded simulator state buffer without copying or fully decoding it.
+
+        Only the top-level map is indexed; the scalar fields are decoded into the returned message dict, while the books, accounts and notices
+        are wrapped in `LazyMsgpackMapping` instances which decode the entry for each book or agent on first access.  The undecoded entries
+        reference `buffer` directly, so `detach` must be called before the underlying memory is released or overwritten.
+
+        Args:
+            buffer (bytes | memoryview): Msgpack-encoded state as published by the simulator.
+
+        Returns:
+            tuple[dict, MarketSimulationStateUpdate]: The decoded scalar fields of the message, and the lazily-decoded state update.
+        """
+        start = time.time()
+        fields = msgspec.msgpack.decode(buffer, type=dict[str, msgspec.Raw])
+        message = {key : msgspec.msgpack.decode(raw) for key, raw in fields.items() if key not in ['books', 'accounts', 'notices']}
+        ret = MarketSimulationStateUpdate(timestamp=message['timestamp'])
+        for key in ['books', 'accounts', 'notices']:
+            object.__setattr__(ret, key, LazyMsgpackMapping(fields[key]) if key in fields else {})
+        bt.logging.info(f"Indexed state buffer ({time.time() - start:.4f}s)")
+        return message, ret
+
+    def detach(self) -> int:
+        """
+        Copies any state data which still references the buffer passed to `from_buffer` so that the buffer can be released.
+
+        Returns:
+            int: Number of bytes copied.
+        """
+        return sum(field.detach() for field in [self.books, self.accounts, self.notices] if isinstance(field, LazyMsgpackMapping))
+
+    def decode_time(self) -> float:
+        """
+        Returns the total time spent decoding lazily-ingested state fields.
+        """
+        return sum(field.decode_time for field in [self.books, self.accounts, self.notices] if isinstance(field, LazyMsgpackMapping))
+
+    def rebuild_books(self, books : dict[int, dict], book_cache : dict[str, tuple[int, dict[int, dict]]]) -> dict[int, dict]:
+        """
+        Method to reconstruct the full raw books from delta-encoded books using the books last received from the same validator.
+
+        Args:
+            books (dict[int, dict]): Raw books as transmitted; delta-encoded where `books_reference` is set.
+            book_cache (dict[str, tuple[int, dict[int, dict]]]): Mapping from validator hotkey to the timestamp and full raw books of the last update received; updated in place.
+
+        Returns:
+            dict[int, dict]: The full raw books, or an empty dict if the reference books are not available, in which case `keyframe_required` is set.
+        """
+        hotkey = self.dendrite.hotkey if self.dendrite else None
+        # Holding a book cache, the miner can reconstruct deltas against the books it retains from this update
+        self.book_deltas = True
+        if self.books_reference is not None:
+            reference = book_cache.get(hotkey)
+            try:
+                if reference is None or reference[0] != self.books_reference:
+                    raise KeyError(f"Reference books for T={self.books_reference} not available (held T={reference[0] if reference else None})")
+                books = apply_books_delta(reference[1], books)
+            except KeyError as ex:
+                bt.logging.warning(f"Unable to reconstruct delta-encoded books - requesting keyframe : {ex}")
+                book_cache.pop(hotkey, None)
+                self.keyframe_required = True
+                return {}
+        book_cache[hotkey] = (self.timestamp, books)
+        return books
+
+    def decompress(self, lazy=False, book_cache : dict[str, tuple[int, dict[int, dict]]] | None = None, views=False):
         """
         Method to decompress large synapse fields after transmission over the network.
 
         Note this method DOES modify the synapse in place, so that the synapse can be used normally after decompression.
+
+        Args:
+            lazy (bool): If True, books and accounts are parsed lazily on access.
+            book_cache (dict[str, tuple[int, dict[int, dict]]] | None): Cache of the books last received from each validator, required to reconstruct delta-encoded books.
+            views (bool): If True, books, accounts and notices are decoded directly into the read-only views defined in `taos.im.protocol.views`
+                instead of pydantic models; views can be converted to the pydantic models with `parse`.  Takes precedence over `lazy`.
         """
         try:
             if not self.compressed:
                 return self
 
             start = time.time()
-            decompressed = decompress(self.compressed, self.compression_engine, self.version)
-            bt.logging.debug(f"Decompressed state update ({time.time() - start:.4f}s)")
+            decompressed = None
+            if views:
+                # Delta-encoded books are reconstructed from the raw books and converted to views afterwards
+                decompressed = decompress(self.compressed, self.compression_engine, self.version,
+                                          books_type=BooksView if book_cache is None else Any, payload_type=PayloadView, transport=self.compression_transport)
+                if decompressed is None:
+                    bt.logging.warning(f"Unable to decode state update as views - falling back to {'lazy' if lazy else 'eager'} parsing.")
+                    views = False
+            if decompressed is None:
+                decompressed = decompress(self.compressed, self.compression_engine, self.version, transport=self.compression_transport)
+            bt.logging.debug(f"Decompressed state update{' [Views]' if views else ''} ({time.time() - start:.4f}s)")
             self.compressed = None
 
-            if not lazy:
+            if book_cache is not None:
+                sstart = time.time()
+                decompressed['books'] = self.rebuild_books(decompressed['books'], book_cache)
+                if views:
+                    books = decompressed['books']
+                    decompressed['books'] = books.as_type(BookView) if isinstance(books, BookIndex) else msgspec.convert(books, BooksView, strict=False)
+                bt.logging.debug(f"Rebuilt books{' [Delta]' if self.books_reference is not None else ''} ({time.time() - sstart:.4f}s)")
+
+            if views:
+                for key in ['books', 'accounts', 'notices']:
+                    object.__setattr__(self, key, decompressed[key] if decompressed[key] is not None else {})
+            elif not lazy:
                 sstart = time.time()
-                self.books = decompressed['books']
+                self.books = dict(decompressed['books'].items()) if isinstance(decompressed['books'], BookIndex) else decompressed['books']
                 bt.logging.debug(f"Populated books ({time.time() - sstart:.4f}s)")
 
                 sstart = time.time()
@@ -316,9 +433,10 @@ class MarketSimulationStateUpdate(SimulationStateUpdate):
                 )
                 bt.logging.debug(f"Prepared accounts [Lazy] ({time.time() - sstart:.4f}s)")
 
-            sstart = time.time()
-            self.notices = decompressed['notices']
-            bt.logging.debug(f"Populated notices ({time.time() - sstart:.4f}s)")
+            if not views:
+                sstart = time.time()
+                self.notices = decompressed['notices']
+                bt.logging.debug(f"Populated notices ({time.time() - sstart:.4f}s)")
 
             sstart = time.time()
             self.config = decompressed['config']
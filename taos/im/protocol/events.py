@@ -607,8 +607,122 @@ class ResetAgentsEvent(FinanceEvent):
         return "\n".join([f"{r}" for r in self.resets])
     
                 
+import os
+import msgspec
+import numpy as np
+import pandas as pd
+from functools import partial
 from typing import Optional
-from taos.im.protocol.models import EventHistory
+from taos.im.protocol.models import EventHistory, EventPartition
+from taos.im.utils.journal import (
+    COLUMNS, CSV_FILES, MSGPACK_FILE, ORDER, CANCELLATION, TRADE,
+    read_journal, read_csv, latest_timestamp
+)
+
+# Types of event recorded in the journal, with the `AgentEventHistory` partition to which each is loaded
+JOURNAL_PARTITIONS = {ORDER : 'orders', CANCELLATION : 'cancellations', TRADE : 'trades'}
+
+# Columns of the CSV journals which must contain a number for the row to be loaded, and those which may be empty
+CSV_REQUIRED = {
+    ORDER : ['bookId', 'side', 'quantity', 'leverage'],
+    CANCELLATION : ['bookId', 'orderId'],
+    TRADE : ['tradeId', 'takerAgentId', 'takerOrderId', 'takerFee', 'makerAgentId', 'makerOrderId', 'makerFee', 'side', 'price', 'quantity']
+}
+CSV_OPTIONAL = {
+    ORDER : ['orderId', 'clientOrderId', 'price'],
+    CANCELLATION : ['quantity'],
+    TRADE : ['bookId', 'clientOrderId']
+}
+
+def _order_from_csv(uid : int, row : list[str]) -> LimitOrderPlacementEvent | MarketOrderPlacementEvent:
+    row = dict(zip(COLUMNS[ORDER], row))
+    if row['price']:
+        return LimitOrderPlacementEvent(
+            timestamp=row["timestamp"],
+            agentId=uid,
+            bookId=int(row["bookId"]),
+            orderId=int(row["orderId"]) if row["orderId"] else None,
+            clientOrderId=int(row["clientOrderId"]) if row["clientOrderId"] else None,
+            side=int(row["side"]),
+            p=float(row["price"]),
+            quantity=float(row["quantity"]),
+            leverage=float(row["leverage"]),
+            settleFlag=row.get("settleFlag"),
+            success=row["success"].lower() == "true",
+            message=row.get("message", ""),
+        )
+    return MarketOrderPlacementEvent(
+        timestamp=row["timestamp"],
+        agentId=uid,
+        bookId=int(row["bookId"]),
+        orderId=int(row["orderId"]) if row["orderId"] else None,
+        clientOrderId=int(row["clientOrderId"]) if row["clientOrderId"] else None,
+        side=int(row["side"]),
+        r=(row["currency"] if row["currency"].isnumeric() else OrderCurrency[row["currency"].split('.')[1]]) if "currency" in row and row["currency"] else OrderCurrency.BASE,
+        quantity=float(row["quantity"]),
+        leverage=float(row["leverage"]),
+        settleFlag=row.get("settleFlag"),
+        success=row["success"].lower() == "true",
+        message=row.get("message", ""),
+    )
+
+def _cancellation_from_csv(uid : int, row : list[str]) -> OrderCancellationEvent:
+    row = dict(zip(COLUMNS[CANCELLATION], row))
+    return OrderCancellationEvent(
+        t=row["timestamp"],
+        b=int(row["bookId"]),
+        o=int(row["orderId"]),
+        q=float(row["quantity"]) if row["quantity"] else None,
+        u=row["success"].lower() == "true",
+        m=row.get("message", ""),
+    )
+
+def _trade_from_csv(uid : int, row : list[str]) -> TradeEvent:
+    row = dict(zip(COLUMNS[TRADE], row))
+    return TradeEvent(
+        timestamp=row["timestamp"],
+        agentId=uid,
+        b=int(row["bookId"]) if row["bookId"] else None,
+        i=int(row["tradeId"]),
+        c=int(row["clientOrderId"]) if row["clientOrderId"] else None,
+        Ta=int(row["takerAgentId"]),
+        Ti=int(row["takerOrderId"]),
+        Tf=float(row["takerFee"]),
+        Ma=int(row["makerAgentId"]),
+        Mi=int(row["makerOrderId"]),
+        Mf=float(row["makerFee"]),
+        s=int(row["side"]),
+        p=float(row["price"]),
+        q=float(row["quantity"]),
+    )
+
+def _order_from_record(uid : int, row : list) -> LimitOrderPlacementEvent | MarketOrderPlacementEvent:
+    timestamp, bookId, orderId, clientOrderId, side, price, currency, quantity, leverage, settleFlag, success, message = row
+    if price is not None:
+        return LimitOrderPlacementEvent.model_construct(
+            t=timestamp, a=uid, b=bookId, o=orderId, c=clientOrderId, s=side, p=price,
+            q=quantity, l=leverage, f=settleFlag, u=success, m=message
+        )
+    return MarketOrderPlacementEvent.model_construct(
+        t=timestamp, a=uid, b=bookId, o=orderId, c=clientOrderId, s=side,
+        r=OrderCurrency(currency) if currency is not None else OrderCurrency.BASE,
+        q=quantity, l=leverage, f=settleFlag, u=success, m=message
+    )
+
+def _cancellation_from_record(uid : int, row : list) -> OrderCancellationEvent:
+    timestamp, bookId, orderId, quantity, success, message = row
+    return OrderCancellationEvent.model_construct(t=timestamp, b=bookId, o=orderId, q=quantity, u=success, m=message)
+
+def _trade_from_record(uid : int, row : list) -> TradeEvent:
+    timestamp, bookId, tradeId, clientOrderId, takerAgentId, takerOrderId, takerFee, makerAgentId, makerOrderId, makerFee, side, price, quantity = row
+    return TradeEvent.model_construct(
+        t=timestamp, a=uid, b=bookId, i=tradeId, c=clientOrderId,
+        Ta=takerAgentId, Ti=takerOrderId, Tf=takerFee, Ma=makerAgentId, Mi=makerOrderId, Mf=makerFee,
+        s=side, p=price, q=quantity
+    )
+
+CSV_FACTORIES = {ORDER : _order_from_csv, CANCELLATION : _cancellation_from_csv, TRADE : _trade_from_csv}
+RECORD_FACTORIES = {ORDER : _order_from_record, CANCELLATION : _cancellation_from_record, TRADE : _trade_from_record}
 
 class AgentEventHistory(EventHistory):
     """
@@ -623,8 +737,6 @@ class AgentEventHistory(EventHistory):
     a configurable retention window.
     """
 
-    events: dict[int, MarketOrderPlacementEvent | LimitOrderPlacementEvent | OrderCancellationEvent | TradeEvent]
-
     def __init__(
         self,
         uid:int,
@@ -632,7 +744,8 @@ class AgentEventHistory(EventHistory):
         end: int,
         events: list[MarketOrderPlacementEvent | LimitOrderPlacementEvent | OrderCancellationEvent | TradeEvent],
         publish_interval: int,
-        retention_mins: Optional[int] = None
+        retention_mins: Optional[int] = None,
+        partitions: Optional[dict[str | None, EventPartition]] = None
     ):
         """
         Initializes the AgentEventHistory object.
@@ -644,28 +757,105 @@ class AgentEventHistory(EventHistory):
             publish_interval (int): Interval at which states are published.
             retention_mins (int | None): Optional retention window in minutes. If set,
                                          events older than this window are discarded.
+            partitions (dict[str | None, EventPartition] | None): Optional pre-built partitions (e.g. loaded from the event
+                                         journal) holding further initial events.
         """
         self.uid = uid
-        self.events = {e.timestamp: e for e in events}
-        self.start = start
-        self.end = end
-        self.retention_mins = retention_mins
-        self.publish_interval = publish_interval
+        super().__init__(start, end, events, publish_interval, retention_mins, partitions)
 
-    @property
-    def trades(self) -> dict[int, TradeEvent]:
-        """Return all trades indexed by timestamp."""
-        return {ts: e for ts, e in self.events.items() if isinstance(e, TradeEvent)}
+    @classmethod
+    def from_journal(
+        cls,
+        uid: int,
+        directory: str,
+        format: str,
+        publish_interval: int,
+        retention_mins: Optional[int] = None
+    ) -> Optional['AgentEventHistory']:
+        """
+        Load the history from the event journal written by `taos.im.utils.journal.EventJournal`.
 
-    @property
-    def orders(self) -> dict[int, MarketOrderPlacementEvent | LimitOrderPlacementEvent]:
-        """Return all order placements (limit or market) indexed by timestamp."""
-        return {ts: e for ts, e in self.events.items() if isinstance(e, (LimitOrderPlacementEvent, MarketOrderPlacementEvent))}
+        Only rows within the retention window of the latest recorded event are loaded, with reading starting from the
+        position located using the journal index where one is available.  The rows are parsed column-wise, the arrays used
+        for derived series are built directly from the loaded columns, and the event objects are only constructed when first
+        accessed.  Rows of the CSV journal with missing or invalid numeric values are skipped.
 
-    @property
-    def cancellations(self) -> dict[int, OrderCancellationEvent]:
-        """Return all order cancellations indexed by timestamp."""
-        return {ts: e for ts, e in self.events.items() if isinstance(e, OrderCancellationEvent)}
+        Args:
+            uid (int): UID of the agent.
+            directory (str): Directory containing the journal files.
+            format (str): Format of the journal; one of `csv` or `msgpack`.
+            publish_interval (int): Interval at which states are published.
+            retention_mins (int | None): Optional retention window in minutes.
+
+        Returns:
+            AgentEventHistory | None: The loaded history, or None if no events have been recorded.
+        """
+        if format == 'msgpack':
+            paths = {kind: os.path.join(directory, MSGPACK_FILE) for kind in JOURNAL_PARTITIONS}
+        else:
+            paths = {kind: os.path.join(directory, CSV_FILES[kind]) for kind in JOURNAL_PARTITIONS}
+        # Retention on the next append is relative to the latest loaded event; any earlier threshold only loads extra rows
+        latest = [timestamp for timestamp in map(latest_timestamp, set(paths.values())) if timestamp is not None]
+        threshold = max(latest) - retention_mins * 60_000_000_000 if latest and retention_mins is not None else None
+
+        columns = {}
+        if format == 'msgpack':
+            for kind, rows in read_journal(paths[ORDER], threshold).items():
+                fields = cls.PARTITION_FIELDS[JOURNAL_PARTITIONS[kind]]
+                positions = {field: COLUMNS[kind].index(field) for field in fields}
+                columns[kind] = (
+                    np.array([row[0] for row in rows], dtype=np.int64),
+                    {field: np.array([row[position] for row in rows], dtype=np.float64) for field, position in positions.items()},
+                    rows,
+                    partial(RECORD_FACTORIES[kind], uid)
+                )
+        else:
+            for kind, path in paths.items():
+                timestamps, frame = read_csv(path, kind, threshold)
+                numbers = {name: pd.to_numeric(frame[name], errors='coerce') for name in CSV_REQUIRED[kind] + CSV_OPTIONAL[kind]}
+                valid = np.ones(len(frame), dtype=bool)
+                for name in CSV_REQUIRED[kind]:
+                    valid &= numbers[name].notna().to_numpy()
+                for name in CSV_OPTIONAL[kind]:
+                    valid &= ((frame[name] == '') | numbers[name].notna()).to_numpy()
+                timestamps = timestamps[valid]
+                rows = frame[valid].to_numpy(dtype=object).tolist()
+                for row, timestamp in zip(rows, timestamps.tolist()):
+                    row[0] = timestamp
+                fields = cls.PARTITION_FIELDS[JOURNAL_PARTITIONS[kind]]
+                columns[kind] = (
+                    timestamps,
+                    {field: numbers[field].to_numpy(dtype=np.float64)[valid] for field in fields},
+                    rows,
+                    partial(CSV_FACTORIES[kind], uid)
+                )
+
+        if not any(len(timestamps) for timestamps, *_ in columns.values()):
+            return None
+        partitions = {
+            JOURNAL_PARTITIONS[kind]: EventPartition.from_rows(cls.PARTITION_FIELDS[JOURNAL_PARTITIONS[kind]], *column)
+            for kind, column in columns.items()
+        }
+        loaded = [timestamps for timestamps, *_ in columns.values() if len(timestamps)]
+        return cls(
+            uid=uid,
+            start=int(min(timestamps.min() for timestamps in loaded)),
+            end=int(max(timestamps.max() for timestamps in loaded)),
+            events=[],
+            publish_interval=publish_interval,
+            retention_mins=retention_mins,
+            partitions=partitions
+        )
+
+    def partition_of(self, event) -> str | None:
+        """Return the partition to which an agent event belongs."""
+        if isinstance(event, TradeEvent):
+            return 'trades'
+        if isinstance(event, (LimitOrderPlacementEvent, MarketOrderPlacementEvent)):
+            return 'orders'
+        if isinstance(event, OrderCancellationEvent):
+            return 'cancellations'
+        return None
 
     def append(self, state: 'MarketSimulationStateUpdate') -> 'AgentEventHistory':
         """
@@ -680,32 +870,24 @@ class AgentEventHistory(EventHistory):
         Returns:
             AgentEventHistory: Self, with updated events and time range.
         """
+        # Notices decoded as views (see `taos.im.protocol.views`) are converted to their models for retention in the history
         new_events = [
-            e for e in state.notices[self.uid]
+            e.parse() if isinstance(e, msgspec.Struct) else e for e in state.notices[self.uid]
             if e.type in {"RDPOL", "RDPOM", "RDCO", "ET"}
         ]
 
-        for event in new_events:
-            ts = event.timestamp
-            self.events[ts] = event
-            if self.start is None:
-                self.start = ts
-            else:
-                self.start = min(self.start, ts)
-            self.end = max(self.end, ts)
+        if new_events:
+            self._extend(self._partition(new_events))
+            first = min(event.timestamp for event in new_events)
+            self.start = first if self.start is None else min(self.start, first)
+            self.end = max([self.end] + [event.timestamp for event in new_events])
 
         # Apply retention logic once per batch
-        if self.retention_mins is not None and self.events:
+        if self.retention_mins is not None and len(self):
             retention_threshold = self.end - self.retention_mins * 60_000_000_000
-
-            # Pop from the left until within threshold
-            while self.events:
-                first_ts = next(iter(self.events))
-                if first_ts >= retention_threshold:
-                    break
-                self.events.pop(first_ts)
+            self._evict(retention_threshold)
 
             # Update start based on remaining events
-            self.start = next(iter(self.events), self.end)
+            self.start = min((int(p.timestamps[0]) for p in self.partitions.values() if len(p)), default=self.end)
 
         return self
\ No newline at end of file
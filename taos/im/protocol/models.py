@@ -9,6 +9,7 @@ from enum import IntEnum
 from itertools import accumulate
 from typing import Literal, Any
 from taos.common.protocol import BaseModel
+from taos.im.utils import resample
 """
 Classes representing models of objects occurring within intelligent market simulations are defined here.
 """
@@ -912,29 +913,14 @@ class History:
         Returns:
             dict[int, list[Any]]: Buckets indexed by upper-bound timestamps.
         """
-        interval_ns = int(interval * 1_000_000_000)
-        bucketed: dict[int, list[Any]] = {}
-
-        for timestamp, value in series.items():
-            if timestamp < self.start or timestamp > self.end:
-                continue  # ignore out-of-range timestamps
-
-            # Compute upper bound of bucket interval
-            bucket_index = ((timestamp - self.start) // interval_ns) + 1
-            bucket_ts = self.start + bucket_index * interval_ns
-
-            if bucket_ts not in bucketed:
-                bucketed[bucket_ts] = []
-
-            bucketed[bucket_ts].append(value)
-
-        return bucketed
+        timestamps = np.fromiter(series.keys(), dtype=np.int64, count=len(series))
+        return resample.bucket(timestamps, list(series.values()), self.start, self.end, interval)
 
     def sample(
         self,
         series: dict[int, float],
         interval: float,
-        method: Literal['open', 'high', 'low', 'close', 'ohlc'] = 'close'
+        method: Literal['open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count'] = 'close'
     ) -> dict[int, Any]:
         """
         Sample a time series at regular intervals.
@@ -942,51 +928,166 @@ class History:
         Args:
             series (dict[int, float]): Original time series (timestamp → value).
             interval (float): Interval between samples in seconds.
-            method (str): Sampling method; one of 'open', 'high', 'low', 'close', 'ohlc'.
+            method (str): Sampling method; one of 'open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count'.
 
         Returns:
             dict[int, float | dict]: Sampled series with requested method.
         """
-        buckets = self.bucket(series, interval)
-        sampled: dict[int, Any] = {}
-        last_val = None
-
-        if method == 'ohlc':
-            for ts, bucket in buckets.items():
-                if bucket:
-                    open_ = last_val if last_val is not None else bucket[0]
-                    high = max(bucket + [open_])
-                    low = min(bucket + [open_])
-                    close = bucket[-1]
-                    sampled[ts] = {'open': open_, 'high': high, 'low': low, 'close': close}
-                    last_val = close
-                elif last_val is not None:
-                    sampled[ts] = {'open': last_val, 'high': last_val, 'low': last_val, 'close': last_val}
-                else:
-                    sampled[ts] = None
-        else:
-            pick_fn = {
-                'open': lambda b: b[0],
-                'high': max,
-                'low': min,
-                'close': lambda b: b[-1]
-            }[method]
-
-            for ts, bucket in buckets.items():
-                if bucket:
-                    sampled[ts] = pick_fn(bucket)
-                    last_val = sampled[ts]
-                elif last_val is not None:
-                    sampled[ts] = last_val
-                else:
-                    sampled[ts] = None
+        timestamps = np.fromiter(series.keys(), dtype=np.int64, count=len(series))
+        return self.resample(timestamps, list(series.values()), interval, method)
 
-        return sampled
+    def resample(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        interval: float,
+        method: Literal['open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count'] = 'close'
+    ) -> dict[int, Any]:
+        """
+        Sample a time series held as arrays of timestamps and values at regular intervals.
+
+        Args:
+            timestamps (np.ndarray): Timestamps of the series.
+            values (np.ndarray): Values of the series.
+            interval (float): Interval between samples in seconds.
+            method (str): Sampling method; one of 'open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count'.
+
+        Returns:
+            dict[int, float | dict]: Sampled series with requested method.
+        """
+        return resample.sample(timestamps, values, self.start, self.end, interval, method)
                 
-from typing import Union, Optional
-from itertools import accumulate
+from typing import Union, Optional, Callable
+import time
+import msgspec
 import numpy as np
 
+class EventPartition:
+    """
+    The events of a single type within an `EventHistory`, sorted by timestamp.
+
+    The timestamps and selected numeric attributes of the events are held in arrays alongside the events themselves, so that
+    derived series can be computed without iterating over the event objects.  Events with the same timestamp as an existing event
+    replace it.  Partitions loaded from storage with `from_rows` hold the stored rows in place of the earliest events, and only
+    construct the event objects from the rows when `events` is first accessed.
+
+    Attributes:
+        fields (tuple[str, ...]): Names of the event attributes held in arrays.
+        timestamps (np.ndarray): Timestamps of the events in ascending order.
+        events (list): The events, ordered as `timestamps`.
+        values (dict[str, np.ndarray]): Values of each of `fields`, ordered as `timestamps`.
+    """
+    def __init__(self, fields: tuple[str, ...] = (), events: list | None = None):
+        self.fields = fields
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self._events = []
+        # Number of leading entries of `_events` which are rows still to be passed to `_factory`
+        self._rows = 0
+        self._factory = None
+        self.values = {field: np.empty(0, dtype=np.float64) for field in fields}
+        if events:
+            self._set({e.timestamp: e for e in events})
+
+    @classmethod
+    def from_rows(
+        cls,
+        fields: tuple[str, ...],
+        timestamps: np.ndarray,
+        values: dict[str, np.ndarray],
+        rows: list,
+        factory: Callable[[Any], Any]
+    ) -> 'EventPartition':
+        """
+        Creates a partition from stored rows, deferring construction of the event objects until they are accessed.
+
+        Args:
+            fields (tuple[str, ...]): Names of the event attributes held in arrays.
+            timestamps (np.ndarray): Timestamp of each row.
+            values (dict[str, np.ndarray]): Values of each of `fields` for each row.
+            rows (list): The stored rows, in any order; where rows share a timestamp, the last is retained.
+            factory (Callable): Constructs the event object from a row.
+
+        Returns:
+            EventPartition: The partition.
+        """
+        partition = cls(fields)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        sorted_timestamps = timestamps[order]
+        order = order[np.r_[sorted_timestamps[1:] != sorted_timestamps[:-1], True]] if len(order) else order
+        partition.timestamps = timestamps[order]
+        partition.values = {field: np.asarray(values[field], dtype=np.float64)[order] for field in fields}
+        partition._events = [rows[i] for i in order.tolist()]
+        partition._rows = len(partition._events)
+        partition._factory = factory
+        return partition
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    @property
+    def events(self) -> list:
+        """The events, ordered as `timestamps`."""
+        if self._rows:
+            self._events[:self._rows] = [self._factory(row) for row in self._events[:self._rows]]
+            self._rows = 0
+        return self._events
+
+    def _set(self, events: dict[int, Any]) -> None:
+        timestamps = sorted(events)
+        self.timestamps = np.array(timestamps, dtype=np.int64)
+        self._events = [events[ts] for ts in timestamps]
+        self._rows = 0
+        self.values = {field: np.array([getattr(e, field) for e in self._events], dtype=np.float64) for field in self.fields}
+
+    def as_dict(self) -> dict[int, Any]:
+        """Returns the events indexed by timestamp."""
+        return dict(zip(self.timestamps.tolist(), self.events))
+
+    def extend(self, other: 'EventPartition') -> None:
+        """
+        Adds the events of another partition of the same type.
+
+        Args:
+            other (EventPartition): Partition holding the new events.
+        """
+        if not len(other):
+            return
+        if not len(self):
+            # Adopt the contents of the other partition, leaving any stored rows unconstructed
+            self.timestamps = other.timestamps
+            self._events = list(other._events)
+            self._rows = other._rows
+            self._factory = other._factory
+            self.values = dict(other.values)
+        elif other.timestamps[0] > self.timestamps[-1]:
+            # New events all follow the existing events; the arrays are concatenated without re-sorting
+            self.timestamps = np.concatenate([self.timestamps, other.timestamps])
+            self._events.extend(other.events)
+            self.values = {field: np.concatenate([self.values[field], other.values[field]]) for field in self.fields}
+        else:
+            events = self.as_dict()
+            events.update(other.as_dict())
+            self._set(events)
+
+    def evict(self, threshold: int) -> int:
+        """
+        Removes the events occurring before the threshold timestamp.
+
+        Args:
+            threshold (int): Earliest timestamp to retain.
+
+        Returns:
+            int: Number of events removed.
+        """
+        count = int(np.searchsorted(self.timestamps, threshold, side='left'))
+        if count:
+            self.timestamps = self.timestamps[count:]
+            self._events = self._events[count:]
+            self._rows = max(self._rows - count, 0)
+            self.values = {field: values[count:] for field, values in self.values.items()}
+        return count
+
 class EventHistory(History):
     """
     EventHistory is a specialized history tracker for market events, including:
@@ -996,9 +1097,19 @@ class EventHistory(History):
 
     It allows filtering and analysis of these events for use in modeling,
     feature extraction, and simulation.
+
+    Events are held in a time-sorted `EventPartition` per type, which are extended as new events are appended and trimmed to the
+    retention window by slicing.  Derived series are computed from the arrays of the partitions and memoized until the history is
+    next modified; each access returns a copy of a memoized mapping, so the series returned may be modified freely.
     """
 
-    events: dict[int, Union[Order, TradeInfo, Cancellation]]
+    # Event attributes held in arrays for each partition; events which are not trades, orders or cancellations are kept under `None`
+    PARTITION_FIELDS: dict[str | None, tuple[str, ...]] = {
+        'trades': ('price', 'quantity', 'side'),
+        'orders': ('quantity', 'side'),
+        'cancellations': (),
+        None: ()
+    }
 
     def __init__(
         self,
@@ -1006,7 +1117,8 @@ class EventHistory(History):
         end: int,
         events: list[Union[Order, TradeInfo, Cancellation]],
         publish_interval: int,
-        retention_mins: Optional[int] = None
+        retention_mins: Optional[int] = None,
+        partitions: Optional[dict[str | None, EventPartition]] = None
     ):
         """
         Initializes the EventHistory object.
@@ -1017,37 +1129,94 @@ class EventHistory(History):
             events (list[Order | TradeInfo | Cancellation]): Initial market events.
             publish_interval (int): Interval at which states are published.
             retention_mins (int | None): Optional retention window in minutes.
+            partitions (dict[str | None, EventPartition] | None): Optional pre-built partitions (e.g. loaded from storage) holding
+                further initial events.
         """
-        self.events = {e.timestamp: e for e in events}
+        self.partitions = self._partition(events)
+        self._cache = {}
+        for kind, partition in (partitions or {}).items():
+            self.partitions[kind].extend(partition)
         self.start = start
         self.end = end
         self.retention_mins = retention_mins
         self.publish_interval = publish_interval
 
+    def partition_of(self, event) -> str | None:
+        """
+        Returns the partition to which an event belongs.
+
+        Args:
+            event: The event.
+
+        Returns:
+            str | None: One of 'trades', 'orders' or 'cancellations', or None for other events.
+        """
+        return {'t': 'trades', 'o': 'orders', 'c': 'cancellations'}.get(event.type)
+
+    def _partition(self, events: list) -> dict[str | None, EventPartition]:
+        grouped = {kind: [] for kind in self.PARTITION_FIELDS}
+        for event in events:
+            grouped[self.partition_of(event)].append(event)
+        return {kind: EventPartition(self.PARTITION_FIELDS[kind], grouped[kind]) for kind in self.PARTITION_FIELDS}
+
+    def _extend(self, partitions: dict[str | None, EventPartition]) -> None:
+        for kind, partition in partitions.items():
+            self.partitions[kind].extend(partition)
+        self._cache.clear()
+
+    def _evict(self, threshold: int) -> int:
+        evicted = sum(partition.evict(threshold) for partition in self.partitions.values())
+        if evicted:
+            self._cache.clear()
+        return evicted
+
+    def _cached(self, key: str, compute: Callable[[], Any]) -> Any:
+        # Callers receive copies of memoized mappings and read-only memoized arrays, so that the memoized values cannot be modified
+        if key not in self._cache:
+            value = compute()
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+            self._cache[key] = value
+        value = self._cache[key]
+        return dict(value) if isinstance(value, dict) else value
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in self.partitions.values())
+
+    @property
+    def events(self) -> dict[int, Union[Order, TradeInfo, Cancellation]]:
+        """Returns all events indexed by timestamp, in time order."""
+        def merge():
+            items = [item for partition in self.partitions.values() for item in zip(partition.timestamps.tolist(), partition.events)]
+            items.sort(key=lambda item: item[0])
+            return dict(items)
+        return self._cached('events', merge)
+
     @property
     def trades(self) -> dict[int, TradeInfo]:
         """Returns all trades indexed by timestamp."""
-        return {ts: t for ts, t in self.events.items() if t.type == 't'}
+        return self._cached('trades', self.partitions['trades'].as_dict)
 
     @property
     def orders(self) -> dict[int, Order]:
         """Returns all orders indexed by timestamp."""
-        return {ts: o for ts, o in self.events.items() if o.type == 'o'}
+        return self._cached('orders', self.partitions['orders'].as_dict)
 
     @property
     def cancellations(self) -> dict[int, Cancellation]:
         """Returns all cancellations indexed by timestamp."""
-        return {ts: c for ts, c in self.events.items() if c.type == 'c'}
+        return self._cached('cancellations', self.partitions['cancellations'].as_dict)
 
     @property
     def last_trade(self) -> TradeInfo:
         """Returns the most recent trade."""
-        return self.trades[max(self.trades)]
+        return self.partitions['trades'].events[-1]
 
     @property
     def trade_prices(self) -> dict[int, float]:
         """Returns trade prices indexed by timestamp."""
-        return {ts: t.price for ts, t in self.trades.items()}
+        trades = self.partitions['trades']
+        return self._cached('trade_prices', lambda: dict(zip(trades.timestamps.tolist(), trades.values['price'].tolist())))
 
     @property
     def OHLC(self) -> Optional[dict[str, float]]:
@@ -1057,17 +1226,34 @@ class EventHistory(History):
         Returns:
             dict[str, float] | None: OHLC structure or None if no trades.
         """
-        trade_prices = self.trade_prices
-        if trade_prices:
-            values = list(trade_prices.values())
-            return {
-                "open": values[0],
-                "high": max(values),
-                "low": min(values),
-                "close": values[-1],
-            }
+        prices = self.partitions['trades'].values['price']
+        if len(prices):
+            return self._cached('OHLC', lambda: {
+                "open": float(prices[0]),
+                "high": float(prices.max()),
+                "low": float(prices.min()),
+                "close": float(prices[-1]),
+            })
         return None
 
+    @staticmethod
+    def _total(values: np.ndarray) -> float:
+        # np.cumsum adds in order, so the total matches the builtin sum exactly where np.sum would sum pairwise
+        return float(np.cumsum(values)[-1]) if len(values) else 0
+
+    def _signed_quantities(self, kind: str) -> np.ndarray:
+        partition = self.partitions[kind]
+        return self._cached(f'{kind}_signed_quantities', lambda: np.where(
+            partition.values['side'] == OrderDirection.BUY, partition.values['quantity'], -partition.values['quantity']
+        ))
+
+    def _imbalance(self, kind: str) -> float:
+        values = self.partitions[kind].values
+        return (
+            self._total(np.where(values['side'] == OrderDirection.BUY, values['quantity'], 0.0))
+            - self._total(np.where(values['side'] == OrderDirection.SELL, values['quantity'], 0.0))
+        )
+
     @property
     def traded_volume(self) -> float:
         """
@@ -1076,12 +1262,16 @@ class EventHistory(History):
         Returns:
             float: Total traded value.
         """
-        return sum(t.quantity * t.price for t in self.trades.values())
+        values = self.partitions['trades'].values
+        return self._cached('traded_volume', lambda: self._total(values['quantity'] * values['price']))
 
     @property
     def traded_volumes(self) -> dict[int, float]:
         """Returns traded volume per timestamp."""
-        return {ts: t.quantity * t.price for ts, t in self.trades.items()}
+        trades = self.partitions['trades']
+        return self._cached('traded_volumes', lambda: dict(zip(
+            trades.timestamps.tolist(), (trades.values['quantity'] * trades.values['price']).tolist()
+        )))
 
     @property
     def trade_imbalance(self) -> float:
@@ -1091,10 +1281,7 @@ class EventHistory(History):
         Returns:
             float: Net trade imbalance.
         """
-        return (
-            sum(t.quantity for t in self.trades.values() if t.side == OrderDirection.BUY)
-            - sum(t.quantity for t in self.trades.values() if t.side == OrderDirection.SELL)
-        )
+        return self._cached('trade_imbalance', lambda: self._imbalance('trades'))
 
     @property
     def trade_imbalances(self) -> dict[int, float]:
@@ -1104,13 +1291,9 @@ class EventHistory(History):
         Returns:
             dict[int, float]: Time-indexed cumulative trade imbalance.
         """
-        return dict(zip(
-            self.trades.keys(),
-            accumulate(
-                t.quantity if t.side == OrderDirection.BUY else -t.quantity
-                for t in self.trades.values()
-            )
-        ))
+        return self._cached('trade_imbalances', lambda: dict(zip(
+            self.partitions['trades'].timestamps.tolist(), np.cumsum(self._signed_quantities('trades')).tolist()
+        )))
 
     @property
     def order_volume(self) -> float:
@@ -1120,12 +1303,13 @@ class EventHistory(History):
         Returns:
             float: Total order volume.
         """
-        return sum(o.quantity for o in self.orders.values())
+        return self._cached('order_volume', lambda: self._total(self.partitions['orders'].values['quantity']))
 
     @property
     def order_volumes(self) -> dict[int, float]:
         """Returns order volume per timestamp."""
-        return {ts: o.quantity for ts, o in self.orders.items()}
+        orders = self.partitions['orders']
+        return self._cached('order_volumes', lambda: dict(zip(orders.timestamps.tolist(), orders.values['quantity'].tolist())))
 
     @property
     def order_imbalance(self) -> float:
@@ -1135,10 +1319,7 @@ class EventHistory(History):
         Returns:
             float: Net order imbalance.
         """
-        return (
-            sum(o.quantity for o in self.orders.values() if o.side == OrderDirection.BUY)
-            - sum(o.quantity for o in self.orders.values() if o.side == OrderDirection.SELL)
-        )
+        return self._cached('order_imbalance', lambda: self._imbalance('orders'))
 
     @property
     def order_imbalances(self) -> dict[int, float]:
@@ -1148,13 +1329,9 @@ class EventHistory(History):
         Returns:
             dict[int, float]: Time-indexed cumulative order imbalance.
         """
-        return dict(zip(
-            self.orders.keys(),
-            accumulate(
-                o.quantity if o.side == OrderDirection.BUY else -o.quantity
-                for o in self.orders.values()
-            )
-        ))
+        return self._cached('order_imbalances', lambda: dict(zip(
+            self.partitions['orders'].timestamps.tolist(), np.cumsum(self._signed_quantities('orders')).tolist()
+        )))
 
     def append(self, new_history: 'EventHistory') -> 'EventHistory':
         """
@@ -1166,14 +1343,13 @@ class EventHistory(History):
         Returns:
             EventHistory: Self, with updated events and time range.
         """
-        # Fast in-place update of event dict (assumes timestamps are unique)
-        self.events.update(new_history.events)
+        self._extend(new_history.partitions)
         self.end = new_history.end
 
         # Apply retention window if specified
         if self.retention_mins is not None:
             retention_threshold = self.end - self.retention_mins * 60_000_000_000
-            self.events = {ts: event for ts, event in self.events.items() if ts >= retention_threshold}
+            self._evict(retention_threshold)
             self.start = max(self.start, retention_threshold)
 
         return self
@@ -1188,8 +1364,10 @@ class EventHistory(History):
         Returns:
             dict[int, float]: Time-series of trade prices.
         """
-        trades = {time: trade.price for time, trade in self.trades.items()}
-        return self.sample(trades, sampling_secs) if sampling_secs else trades
+        if sampling_secs:
+            trades = self.partitions['trades']
+            return self.resample(trades.timestamps, trades.values['price'], sampling_secs)
+        return self.trade_prices
 
     def ohlc(self, interval: float) -> dict[int, dict[str, float]]:
         """
@@ -1213,33 +1391,26 @@ class EventHistory(History):
         Returns:
             dict[int, float | None]: Time-indexed average trade price.
         """
-        sampled: dict[int, Optional[float]] = {}
-        last_val: Optional[float] = None
-
-        for ts, prices in self.bucket(self.trade_price(), interval).items():
-            if prices:
-                sampled[ts] = float(np.mean(prices))
-                last_val = prices[-1]
-            elif last_val is not None:
-                sampled[ts] = last_val
-            else:
-                sampled[ts] = None
-
-        return sampled
+        return self.sample(self.trade_price(), interval, 'mean')
 
 class L2History(History):
     """
-    Represents the historical record of L2Snapshots and trades over time.
+    Represents the historical record of L2 order book states and trades over time.
+
+    The book states are held in columnar form: an array of timestamps together with arrays of shape `(rows, depth)` holding the bid and
+    ask prices and quantities at each level, ordered from the best price outwards and padded with NaN where fewer levels exist.
+    Rows are appended into pre-allocated storage which is doubled in size as required, and retention is applied by advancing the
+    index of the first retained row, so that appending a state is amortized O(1).  Time series queries are computed directly from
+    the arrays.  The `level_snapshots` property reconstructs `L2Snapshot` objects for compatibility; since only the aggregate quantity
+    at each level is held, the individual orders of the levels are not retained.
 
     Attributes:
-        snapshots (dict[int, L2Snapshot]): Mapping of timestamps to L2Snapshot instances.
         trades (dict[int, TradeInfo]): Mapping of timestamps to TradeInfo instances.
         start (int): The earliest timestamp in the history.
         end (int): The latest timestamp in the history.
         retention_mins (int | None): Optional retention window in minutes. If set, older data will be purged.
     """
 
-    snapshots: dict[int, L2Snapshot]
     trades: dict[int, TradeInfo]
     start : int
     end : int
@@ -1260,45 +1431,230 @@ class L2History(History):
             trades (dict[int, TradeInfo]): Initial trades to populate history.
             retention_mins (int | None): Optional retention window in minutes.
         """
-        self.snapshots = snapshots
+        depth = max([max(len(snapshot.bids), len(snapshot.asks)) for snapshot in snapshots.values()] + [1])
+        self._allocate(max(len(snapshots), 1), depth)
+        for snapshot in snapshots.values():
+            self._write(self._end, snapshot)
+            self._end += 1
         self.trades = trades
         self.start = list(snapshots.keys())[0] - publish_interval
         self.end = list(snapshots.keys())[-1]
         self.retention_mins = retention_mins
 
-    def append(self, new_history: 'L2History') -> 'L2History':
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps: np.ndarray,
+        bid_prices: np.ndarray,
+        bid_quantities: np.ndarray,
+        ask_prices: np.ndarray,
+        ask_quantities: np.ndarray,
+        trades: dict[int, TradeInfo],
+        publish_interval: int,
+        retention_mins: int | None = None
+    ) -> 'L2History':
         """
-        Append another L2History instance to this history.
+        Construct an L2History directly from columnar book states.
 
-        Merges snapshots and trades, then applies retention logic if enabled.
+        Args:
+            timestamps (np.ndarray): Timestamps of the book states, of shape `(rows,)`.
+            bid_prices (np.ndarray): Bid prices from the best level outwards, of shape `(rows, depth)` and padded with NaN.
+            bid_quantities (np.ndarray): Quantities at the bid levels, of shape `(rows, depth)`.
+            ask_prices (np.ndarray): Ask prices from the best level outwards, of shape `(rows, depth)` and padded with NaN.
+            ask_quantities (np.ndarray): Quantities at the ask levels, of shape `(rows, depth)`.
+            trades (dict[int, TradeInfo]): Trades to populate history.
+            publish_interval (int): Interval between state updates, used to set the start of the history.
+            retention_mins (int | None): Optional retention window in minutes.
+
+        Returns:
+            L2History: The constructed history.
+        """
+        history = cls.__new__(cls)
+        history._times = np.array(timestamps, dtype=np.int64)
+        history._bid_prices = np.array(bid_prices, dtype=np.float64)
+        history._bid_quantities = np.array(bid_quantities, dtype=np.float64)
+        history._ask_prices = np.array(ask_prices, dtype=np.float64)
+        history._ask_quantities = np.array(ask_quantities, dtype=np.float64)
+        history._begin = 0
+        history._end = len(history._times)
+        history._level_snapshots = None
+        history.trades = trades
+        history.start = int(history._times[0]) - publish_interval
+        history.end = int(history._times[-1])
+        history.retention_mins = retention_mins
+        return history
+
+    def _allocate(self, capacity: int, depth: int) -> None:
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._bid_prices = np.full((capacity, depth), np.nan)
+        self._bid_quantities = np.full((capacity, depth), np.nan)
+        self._ask_prices = np.full((capacity, depth), np.nan)
+        self._ask_quantities = np.full((capacity, depth), np.nan)
+        self._begin = 0
+        self._end = 0
+        self._level_snapshots = None
+
+    def _columns(self) -> list[np.ndarray]:
+        return [self._bid_prices, self._bid_quantities, self._ask_prices, self._ask_quantities]
+
+    def _reserve(self, rows: int, depth: int) -> None:
+        # Ensures that `rows` further rows of at least `depth` levels can be written after the last row, compacting the storage
+        # to discard rows removed by retention and doubling its capacity where required
+        capacity, current_depth = self._bid_prices.shape
+        if self._end + rows <= capacity and depth <= current_depth:
+            return
+        size = len(self)
+        timestamps = self.timestamps
+        columns = [self.bid_prices, self.bid_quantities, self.ask_prices, self.ask_quantities]
+        self._allocate(max(2 * capacity, size + rows), max(depth, current_depth))
+        self._times[:size] = timestamps
+        for target, source in zip(self._columns(), columns):
+            target[:size, :current_depth] = source
+        self._end = size
+
+    def _write(self, row: int, snapshot: L2Snapshot) -> None:
+        # Writes the levels of a snapshot from the best price outwards (bids descending and asks ascending), whatever their order in the snapshot
+        self._level_snapshots = None
+        self._times[row] = snapshot.timestamp
+        for prices, quantities, levels in [(self._bid_prices, self._bid_quantities, sorted(snapshot.bids.items(), reverse=True)),
+                                           (self._ask_prices, self._ask_quantities, sorted(snapshot.asks.items()))]:
+            prices[row] = np.nan
+            quantities[row] = np.nan
+            n = len(levels)
+            prices[row, :n] = [price for price, _ in levels]
+            quantities[row, :n] = [level.quantity for _, level in levels]
+
+    def _levels(self, prices: np.ndarray, quantities: np.ndarray) -> dict[float, LevelInfo]:
+        return {price : LevelInfo.model_construct(p=price, q=quantity, o=None) for price, quantity in zip(prices.tolist(), quantities.tolist()) if price == price}
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Timestamps of the book states held in the history."""
+        return self._times[self._begin:self._end]
+
+    @property
+    def bid_prices(self) -> np.ndarray:
+        """Bid prices of the book states from the best level outwards, padded with NaN."""
+        return self._bid_prices[self._begin:self._end]
+
+    @property
+    def bid_quantities(self) -> np.ndarray:
+        """Quantities at the bid levels of the book states, padded with NaN."""
+        return self._bid_quantities[self._begin:self._end]
+
+    @property
+    def ask_prices(self) -> np.ndarray:
+        """Ask prices of the book states from the best level outwards, padded with NaN."""
+        return self._ask_prices[self._begin:self._end]
+
+    @property
+    def ask_quantities(self) -> np.ndarray:
+        """Quantities at the ask levels of the book states, padded with NaN."""
+        return self._ask_quantities[self._begin:self._end]
+
+    def __len__(self) -> int:
+        return self._end - self._begin
+
+    def snapshot(self, index: int) -> L2Snapshot:
+        """
+        Reconstruct the snapshot at the specified position in the history.
 
         Args:
-            new_history (L2History): The history instance to append.
+            index (int): Position of the book state; negative values index from the latest state.
 
         Returns:
-            L2History: Updated history instance with merged data.
+            L2Snapshot: The book state; individual orders are not retained in the history.
+        """
+        row = self._begin + (index if index >= 0 else len(self) + index)
+        return L2Snapshot.model_construct(
+            timestamp=int(self._times[row]),
+            bids=self._levels(self._bid_prices[row], self._bid_quantities[row]),
+            asks=self._levels(self._ask_prices[row], self._ask_quantities[row])
+        )
+
+    def latest(self) -> L2Snapshot:
+        """
+        Reconstruct the most recent snapshot in the history.
+        """
+        return self.snapshot(-1)
+
+    @property
+    def level_snapshots(self) -> dict[int, L2Snapshot]:
+        """
+        Mapping of timestamps to the reconstructed L2Snapshot instances.
+
+        The snapshots are lossy: levels hold only the aggregate quantity at each price, without the individual orders.  They are
+        reconstructed once and cached until the history is next modified; the mapping returned is a copy, but the snapshots are
+        shared between accesses and must not be modified.
+        """
+        if self._level_snapshots is None:
+            self._level_snapshots = {int(self._times[row]) : self.snapshot(row - self._begin) for row in range(self._begin, self._end)}
+        return dict(self._level_snapshots)
+
+    @property
+    def snapshots(self) -> dict[int, L2Snapshot]:
+        """
+        Read-only alias of `level_snapshots`, retained for existing callers.
         """
-        # Merge and sort snapshots and trades
-        self.snapshots = dict(list(sorted((self.snapshots | new_history.snapshots).items())))
-        self.trades = dict(list(sorted((self.trades | new_history.trades).items())))
-        self.end = list(self.snapshots.keys())[-1]
+        return self.level_snapshots
 
-        # Apply retention if configured
+    def _extend(self, timestamps: np.ndarray, columns: list[np.ndarray]) -> None:
+        # Appends rows which all follow the latest row in time
+        rows, depth = columns[0].shape
+        self._level_snapshots = None
+        self._reserve(rows, depth)
+        self._times[self._end:self._end + rows] = timestamps
+        for target, source in zip(self._columns(), columns):
+            target[self._end:self._end + rows] = np.nan
+            target[self._end:self._end + rows, :depth] = source
+        self._end += rows
+
+    def _retain(self) -> None:
+        # Discards the states and trades prior to the retention window
+        self._level_snapshots = None
         if self.retention_mins:
             min_time = self.end - self.retention_mins * 60_000_000_000  # nanoseconds
-            # Remove old snapshots
-            for t in list(self.snapshots):
-                if t < min_time:
-                    del self.snapshots[t]
-                else:
-                    break
-            # Remove old trades
+            self._begin += int(np.searchsorted(self.timestamps, min_time, side='left'))
             for t in list(self.trades):
                 if t < min_time:
                     del self.trades[t]
                 else:
                     break
-        self.start = list(self.snapshots.keys())[0]
+        self.start = int(self._times[self._begin])
+
+    def append(self, new_history: 'L2History') -> 'L2History':
+        """
+        Append another L2History instance to this history.
+
+        Merges book states and trades, then applies retention logic if enabled.  Where the timestamps of the histories overlap, the
+        book states of the appended history take precedence.
+
+        Args:
+            new_history (L2History): The history instance to append.
+
+        Returns:
+            L2History: Updated history instance with merged data.
+        """
+        columns = [new_history.bid_prices, new_history.bid_quantities, new_history.ask_prices, new_history.ask_quantities]
+        if len(self) == 0 or new_history.timestamps[0] > self._times[self._end - 1]:
+            self._extend(new_history.timestamps, columns)
+        else:
+            # Merge out-of-order states, retaining the latest entry for each timestamp in time order
+            depth = max(self._bid_prices.shape[1], columns[0].shape[1])
+            def pad(array):
+                return np.pad(array, ((0, 0), (0, depth - array.shape[1])), constant_values=np.nan)
+            timestamps = np.concatenate([self.timestamps, new_history.timestamps])
+            merged = [np.concatenate([pad(own), pad(new)]) for own, new in zip([self.bid_prices, self.bid_quantities, self.ask_prices, self.ask_quantities], columns)]
+            _, last = np.unique(timestamps[::-1], return_index=True)
+            rows = len(timestamps) - 1 - last
+            self._allocate(len(rows), depth)
+            self._extend(timestamps[rows], [column[rows] for column in merged])
+        if self.trades and new_history.trades and min(new_history.trades) <= max(self.trades):
+            self.trades = dict(list(sorted((self.trades | new_history.trades).items())))
+        else:
+            self.trades.update(new_history.trades)
+        self.end = int(self._times[self._end - 1])
+        self._retain()
         return self
 
     def insert(self, snapshot : L2Snapshot):
@@ -1308,10 +1664,21 @@ class L2History(History):
         Args:
             snapshot (L2Snapshot): The snapshot to insert.
         """
-        self.snapshots[snapshot.timestamp] = snapshot
-        self.snapshots = dict(list(sorted((self.snapshots).items())))
-        self.end = list(self.snapshots.keys())[-1]
-        self.start = list(self.snapshots.keys())[0]
+        if len(self) == 0 or snapshot.timestamp > self._times[self._end - 1]:
+            self._reserve(1, max(len(snapshot.bids), len(snapshot.asks)))
+            self._write(self._end, snapshot)
+            self._end += 1
+        else:
+            snapshots = self.level_snapshots
+            snapshots[snapshot.timestamp] = snapshot
+            snapshots = dict(list(sorted(snapshots.items())))
+            depth = max([max(len(s.bids), len(s.asks)) for s in snapshots.values()] + [self._bid_prices.shape[1]])
+            self._allocate(len(snapshots), depth)
+            for s in snapshots.values():
+                self._write(self._end, s)
+                self._end += 1
+        self.end = int(self._times[self._end - 1])
+        self.start = int(self._times[self._begin])
 
     def reconcile(self, existing_volumes: dict[str, dict[float, float]], config: MarketSimulationConfig, depth: int) -> None:
         """
@@ -1322,12 +1689,52 @@ class L2History(History):
             config (MarketSimulationConfig): Simulation configuration.
             depth (int): Depth of order book to retain.
         """
-        for time in self.snapshots:
-            self.snapshots[time] = self.snapshots[time].reconcile(existing_volumes, config, depth)
-    
+        if len(existing_volumes['bid']) == 0 and len(existing_volumes['ask']) == 0:
+            # The levels are held sorted by `_write`, so only truncation to the retained depth is required
+            if depth:
+                self._level_snapshots = None
+                for column in self._columns():
+                    column[self._begin:self._end, depth:] = np.nan
+            return
+        snapshots = [self.snapshot(i).reconcile(existing_volumes, config, depth) for i in range(len(self))]
+        self._reserve(0, max([max(len(s.bids), len(s.asks)) for s in snapshots] + [1]))
+        for row, snapshot in enumerate(snapshots, start=self._begin):
+            self._write(row, snapshot)
+
     def ohlc(self, interval: float):
         return self.sample(self.trade(), interval, 'ohlc')
 
+    def _series(self, values: np.ndarray, sampling_secs: float | None) -> dict[int, float]:
+        if sampling_secs:
+            return self.resample(self.timestamps, values, sampling_secs)
+        return dict(zip(self.timestamps.tolist(), values.tolist()))
+
+    def best_bids(self) -> np.ndarray:
+        """Best bid price of each book state, or NaN where there are no bids."""
+        return np.fmax.reduce(self.bid_prices, axis=1)
+
+    def best_asks(self) -> np.ndarray:
+        """Best ask price of each book state, or NaN where there are no asks."""
+        return np.fmin.reduce(self.ask_prices, axis=1)
+
+    def midquotes(self) -> np.ndarray:
+        """Midquote of each book state."""
+        return (self.best_bids() + self.best_asks()) / 2
+
+    def imbalances(self, depth: int | None = None) -> np.ndarray:
+        """
+        Order book imbalance of each book state over the specified number of levels (all levels if None).
+        """
+        levels = depth if depth else self._bid_prices.shape[1]
+        # Cumulative sums accumulate in level order, giving results identical to summing the levels sequentially
+        def total(quantities):
+            quantities = np.nan_to_num(quantities[:, :levels], nan=0.0)
+            return np.cumsum(quantities, axis=1)[:, -1] if quantities.shape[1] > 0 else np.zeros(len(quantities))
+        bid_volumes = total(self.bid_quantities)
+        ask_volumes = total(self.ask_quantities)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (bid_volumes - ask_volumes) / (bid_volumes + ask_volumes)
+
     def midquote(self, sampling_secs: float | None = None) -> dict[int, float]:
         """
         Compute the midquote (average of best bid and ask) over time.
@@ -1338,11 +1745,7 @@ class L2History(History):
         Returns:
             dict[int, float]: Time series of midquotes.
         """
-        midquotes = {
-            time: (snapshot.best_bid() + snapshot.best_ask()) / 2
-            for time, snapshot in self.snapshots.items()
-        }
-        return self.sample(midquotes, sampling_secs) if sampling_secs else midquotes
+        return self._series(self.midquotes(), sampling_secs)
 
     def bid(self, sampling_secs: float | None = None) -> dict[int, float]:
         """
@@ -1354,8 +1757,7 @@ class L2History(History):
         Returns:
             dict[int, float]: Time series of best bid prices.
         """
-        bids = {time: snapshot.best_bid() for time, snapshot in self.snapshots.items()}
-        return self.sample(bids, sampling_secs) if sampling_secs else bids
+        return self._series(self.best_bids(), sampling_secs)
 
     def ask(self, sampling_secs: float | None = None) -> dict[int, float]:
         """
@@ -1367,8 +1769,7 @@ class L2History(History):
         Returns:
             dict[int, float]: Time series of best ask prices.
         """
-        asks = {time: snapshot.best_ask() for time, snapshot in self.snapshots.items()}
-        return self.sample(asks, sampling_secs) if sampling_secs else asks
+        return self._series(self.best_asks(), sampling_secs)
 
     def trade(self, sampling_secs: float | None = None) -> dict[int, float]:
         """
@@ -1394,8 +1795,7 @@ class L2History(History):
         Returns:
             dict[int, float]: Time series of imbalance values.
         """
-        imbalance = {time: snapshot.imbalance(depth) for time, snapshot in self.snapshots.items()}
-        return self.sample(imbalance, sampling_secs) if sampling_secs else imbalance
+        return self._series(self.imbalances(depth), sampling_secs)
 
     def mean_imbalance(self, depth: int | None = None) -> float:
         """
@@ -1644,7 +2044,7 @@ class Book(BaseModel):
         
     def process_history(
         self, 
-        history: dict[int, L2Snapshot], 
+        history: dict[int, L2Snapshot] | L2History, 
         trades: dict[int, TradeInfo], 
         timestamp: int, 
         config: MarketSimulationConfig, 
@@ -1655,8 +2055,8 @@ class Book(BaseModel):
         Processes an existing L2 history with the current book state.
 
         Args:
-            history (dict[int, L2Snapshot]): Dictionary of previous snapshots indexed by timestamp.
-            trades (dict[int, TradeInfo]): Dictionary of trades indexed by timestamp.
+            history (dict[int, L2Snapshot] | L2History): Dictionary of previous snapshots indexed by timestamp, or a history already constructed from them.
+            trades (dict[int, TradeInfo]): Dictionary of trades indexed by timestamp; ignored if `history` is an L2History.
             timestamp (int): Current timestamp for the new snapshot.
             config (MarketSimulationConfig): Configuration settings for volume precision and publish intervals.
             retention_mins (int): Retention period for keeping history (in minutes).
@@ -1671,26 +2071,27 @@ class Book(BaseModel):
         # Generate a snapshot of the current book state at the given timestamp
         target_snapshot: L2Snapshot = self.snapshot(timestamp)
 
-        # Compare the last snapshot in history with the target snapshot to check for discrepancies
-        pre_matched, pre_discrepancies, pre_existing_volumes = (
-            list(history.values())[-1].compare(target_snapshot, config)
-        )
+        if isinstance(history, L2History):
+            history_obj: L2History = history
+            last_snapshot = history.latest()
+        else:
+            last_snapshot = list(history.values())[-1]
+            # Build a new history object from the provided snapshots and trades
+            history_obj: L2History = L2History(
+                snapshots=history, 
+                trades=trades, 
+                retention_mins=retention_mins,
+                publish_interval=config.publish_interval
+            )
 
-        # Build a new history object from the provided snapshots and trades
-        history_obj: L2History = L2History(
-            snapshots=history, 
-            trades=trades, 
-            retention_mins=retention_mins,
-            publish_interval=config.publish_interval
-        )
+        # Compare the last snapshot in history with the target snapshot to check for discrepancies
+        pre_matched, pre_discrepancies, pre_existing_volumes = last_snapshot.compare(target_snapshot, config)
 
         # Attempt to reconcile discrepancies by applying existing volume corrections
         history_obj.reconcile(pre_existing_volumes, config, depth)
 
         # After reconciliation, compare again to detect any remaining mismatches
-        matched, discrepancies, existing_volumes = (
-            list(history_obj.snapshots.values())[-1].compare(target_snapshot, config)
-        )
+        matched, discrepancies, existing_volumes = history_obj.latest().compare(target_snapshot, config)
 
         # Insert the target snapshot into the history
         history_obj.insert(target_snapshot)
@@ -1794,7 +2195,7 @@ class Book(BaseModel):
         # Apply determined existing volumes to attempt to reconcile any discrepancies
         history_obj.reconcile(pre_existing_volumes, config, depth)
         # Check if any remaining discrepancies after reconciliation
-        matched, discrepancies, existing_volumes = list(history_obj.snapshots.values())[-1].compare(target_snapshot, config)
+        matched, discrepancies, existing_volumes = history_obj.latest().compare(target_snapshot, config)
         # Add the target snapshot to the history
         history_obj.insert(target_snapshot)
 
@@ -1821,7 +2222,7 @@ class Book(BaseModel):
                 - list[str]: List of discrepancies found.
         """
         new_history, matched, discrepancies = self.history(
-            snapshot=list(history.snapshots.values())[-1],
+            snapshot=history.latest(),
             config=config,
             retention_mins=history.retention_mins,
             depth=depth
@@ -2326,11 +2727,12 @@ class LazyBooks(Mapping):
     Lazily-parsed collection of order books.
 
     Attributes:
-        _raw_books (dict[int, dict]): Raw book data keyed by book_id.
+        _raw_books (Mapping[int, dict]): Raw book data keyed by book_id.
         _parsed_books (dict[int, LazyBook]): Cache of parsed LazyBook objects.
     """
-    def __init__(self, raw_books: dict):
-        self._raw_books = {int(k): v for k, v in raw_books.items()}
+    def __init__(self, raw_books: Mapping):
+        # Mappings other than dicts (e.g. `taos.im.utils.compress.BookIndex`) decode each book on access, and are retained as they are
+        self._raw_books = {int(k): v for k, v in raw_books.items()} if isinstance(raw_books, dict) else raw_books
         self._parsed_books = {}
 
     def __getitem__(self, book_id: int):
@@ -2356,6 +2758,11 @@ class LazyBooks(Mapping):
         """Return dict of fully parsed Book objects keyed by book_id."""
         return {book_id: lb.parse() for book_id, lb in self.items()}
 
+    def prefetch(self, book_ids=None, workers: int = 0) -> None:
+        """Decode the raw data of the given books (or all books) in advance where sent in a book-indexed container."""
+        if hasattr(self._raw_books, "prefetch"):
+            self._raw_books.prefetch(book_ids, workers)
+
 
 class LazyAccount:
     """
@@ -2451,4 +2858,79 @@ class LazyAccounts(Mapping):
         return {
             uid: {book_id: la.parse() for book_id, la in books.items()}
             for uid, books in self.items()
-        }
\ No newline at end of file
+        }
+
+class LazyMsgpackMapping(Mapping):
+    """
+    Mapping whose values are msgpack-encoded and decoded individually on first access.
+
+    Used to ingest the simulator state directly from shared memory: the map is indexed without decoding its values, which remain as
+    `msgspec.Raw` slices referencing the source buffer until they are accessed.  Decoded values are cached and may be mutated in place.
+    Encoding the mapping with `msgspec.msgpack` (see `taos.im.utils.compress`) writes any undecoded values verbatim.
+
+    Attributes:
+        _raw (dict[int, msgspec.Raw]): Undecoded values keyed by integer ID.
+        _decoded (dict[int, Any]): Cache of decoded values.
+        decode_time (float): Total time spent decoding values.
+    """
+    def __init__(self, raw : msgspec.Raw | bytes | memoryview):
+        self._raw = {int(k) : v for k, v in msgspec.msgpack.decode(raw, type=dict[Any, msgspec.Raw]).items()}
+        self._decoded = {}
+        self.decode_time = 0.0
+        self._detached = False
+
+    def __getitem__(self, key : int):
+        if key not in self._decoded:
+            start = time.time()
+            self._decoded[key] = msgspec.msgpack.decode(self._raw[key])
+            self.decode_time += time.time() - start
+        return self._decoded[key]
+
+    def __setitem__(self, key : int, value):
+        self._raw.setdefault(key, None)
+        self._decoded[key] = value
+
+    def __contains__(self, key):
+        return key in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    @property
+    def decoded(self) -> int:
+        """Number of values which have been decoded."""
+        return len(self._decoded)
+
+    def encodable_value(self, key : int):
+        """
+        Returns the decoded value for the key if it has been accessed, and otherwise the undecoded `msgspec.Raw` value, which can be written verbatim by `msgspec.msgpack`.
+        """
+        return self._decoded[key] if key in self._decoded else self._raw[key]
+
+    def encodable(self) -> dict:
+        """
+        Returns a dictionary suitable for encoding with `msgspec.msgpack`, containing decoded values where available and raw values otherwise.
+        """
+        return {k : self.encodable_value(k) for k in self._raw}
+
+    def detach(self) -> int:
+        """
+        Copies all undecoded values out of the source buffer so that the buffer can be released.
+        Must not be called while the mapping is being accessed from another thread; subsequent calls have no effect.
+
+        Returns:
+            int: Number of bytes copied.
+        """
+        if self._detached: return 0
+        self._detached = True
+        copied = 0
+        for k, raw in self._raw.items():
+            if k in self._decoded:
+                self._raw[k] = None
+            elif isinstance(raw, msgspec.Raw):
+                self._raw[k] = raw.copy()
+                copied += len(raw)
+        return copied
@@ -0,0 +1,316 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Read-only views of the state update data transmitted to miners.
+
+The view classes are `msgspec.Struct` types which are decoded directly from the msgpack (or JSON) encoded state, so that no
+intermediate dicts or pydantic models are created.  They expose the same attribute names as the corresponding pydantic
+models (e.g. `book.bids[0].price`, `event.quantity`), and can be converted to the pydantic model explicitly with `parse`, which
+constructs the models without validation in the same way as the lazily-parsed classes in `taos.im.protocol.models`.
+"""
+import msgspec
+from msgspec import field
+from typing import Any, ClassVar, Union
+from taos.common.protocol import BaseModel
+from taos.im.protocol.models import Order, LevelInfo, TradeInfo, Cancellation, Book, Balance, Fees, Loan, Account, OrderCurrency
+from taos.im.protocol.events import *
+
+class View(msgspec.Struct, kw_only=True, gc=False):
+    """
+    Base class for views of state update data.
+
+    Attributes:
+        model (type[BaseModel]): The pydantic model class represented by the view.
+    """
+    model : ClassVar[type[BaseModel]]
+
+    def parse(self) -> BaseModel:
+        """Return the data of the view as an instance of the corresponding pydantic model, constructed without validation."""
+        data = {name : parse(getattr(self, attr)) for attr, name in zip(self.__struct_fields__, self.__struct_encode_fields__)}
+        config = self.__struct_config__
+        if config.tag_field:
+            data[config.tag_field] = config.tag
+        return self.model.model_construct(**data)
+
+class TaggedView(View, kw_only=True, tag_field='y'):
+    """
+    Base class for views of events identified by a type tag, which is held in the `y` field of the encoded data.
+    """
+    @property
+    def type(self) -> str:
+        return self.__struct_config__.tag
+
+# Book data
+
+class OrderView(TaggedView, kw_only=True, tag='o'):
+    """View of an `Order`."""
+    model : ClassVar = Order
+    id : int = field(name='i')
+    client_id : int | None = field(name='c', default=None)
+    timestamp : int = field(name='t')
+    quantity : float = field(name='q')
+    side : int = field(name='s')
+    price : float | None = field(name='p', default=None)
+    leverage : float = field(name='l', default=0.0)
+
+class TradeInfoView(TaggedView, kw_only=True, tag='t'):
+    """View of a `TradeInfo`."""
+    model : ClassVar = TradeInfo
+    id : int = field(name='i')
+    side : int = field(name='s')
+    timestamp : int = field(name='t')
+    quantity : float = field(name='q')
+    price : float = field(name='p')
+    taker_id : int = field(name='Ti')
+    taker_agent_id : int = field(name='Ta')
+    taker_fee : float | None = field(name='Tf', default=None)
+    maker_id : int = field(name='Mi')
+    maker_agent_id : int = field(name='Ma')
+    maker_fee : float | None = field(name='Mf', default=None)
+
+class CancellationView(TaggedView, kw_only=True, tag='c'):
+    """View of a `Cancellation`."""
+    model : ClassVar = Cancellation
+    orderId : int = field(name='i')
+    timestamp : int | None = field(name='t', default=None)
+    price : float | None = field(name='p', default=None)
+    quantity : float | None = field(name='q', default=None)
+
+class LevelView(View, kw_only=True):
+    """View of a `LevelInfo`."""
+    model : ClassVar = LevelInfo
+    price : float = field(name='p')
+    quantity : float = field(name='q')
+    orders : list[OrderView] | None = field(name='o', default=None)
+
+class BookView(View, kw_only=True):
+    """View of a `Book`."""
+    model : ClassVar = Book
+    id : int = field(name='i')
+    bids : list[LevelView] = field(name='b', default_factory=list)
+    asks : list[LevelView] = field(name='a', default_factory=list)
+    events : list[OrderView | TradeInfoView | CancellationView] | None = field(name='e', default=None)
+
+    @property
+    def trades(self) -> dict[int, TradeInfoView]:
+        return {t.timestamp : t for t in self.events or [] if t.type == 't'}
+
+    @property
+    def orders(self) -> dict[int, OrderView]:
+        return {o.timestamp : o for o in self.events or [] if o.type == 'o'}
+
+    @property
+    def cancellations(self) -> dict[int, CancellationView]:
+        return {c.timestamp : c for c in self.events or [] if c.type == 'c'}
+
+    @property
+    def trade_prices(self) -> dict[int, float]:
+        return {ts : t.price for ts, t in self.trades.items()}
+
+    @property
+    def last_trade(self) -> TradeInfoView:
+        trades = self.trades
+        return trades[max(trades)]
+
+# Account data
+
+class BalanceView(View, kw_only=True):
+    """View of a `Balance`."""
+    model : ClassVar = Balance
+    currency : str | None = field(name='c', default=None)
+    total : float = field(name='t')
+    free : float = field(name='f')
+    reserved : float = field(name='r')
+    initial : float | None = field(name='i', default=None)
+
+class FeesView(View, kw_only=True):
+    """View of a `Fees`."""
+    model : ClassVar = Fees
+    volume_traded : float = field(name='v')
+    maker_fee_rate : float = field(name='m')
+    taker_fee_rate : float = field(name='t')
+
+class LoanView(View, kw_only=True):
+    """View of a `Loan`."""
+    model : ClassVar = Loan
+    order_id : int = field(name='i')
+    amount : float = field(name='a')
+    currency : OrderCurrency = field(name='c')
+    base_collateral : float = field(name='bc')
+    quote_collateral : float = field(name='qc')
+
+class AccountView(View, kw_only=True):
+    """View of an `Account`."""
+    model : ClassVar = Account
+    agent_id : int = field(name='i')
+    book_id : int = field(name='b')
+    base_balance : BalanceView = field(name='bb')
+    quote_balance : BalanceView = field(name='qb')
+    base_loan : float = field(name='bl', default=0.0)
+    quote_loan : float = field(name='ql', default=0.0)
+    base_collateral : float = field(name='bc', default=0.0)
+    quote_collateral : float = field(name='qc', default=0.0)
+    orders : list[OrderView] = field(name='o', default_factory=list)
+    loans : dict[int, LoanView] = field(name='l', default_factory=dict)
+    fees : FeesView | None = field(name='f', default=None)
+    traded_volume : float | None = field(name='v', default=None)
+
+    @property
+    def own_quote(self) -> float:
+        return self.quote_balance.total - self.quote_loan + self.quote_collateral
+
+    @property
+    def own_base(self) -> float:
+        return self.base_balance.total - self.base_loan + self.base_collateral
+
+# Notices
+
+class NoticeView(TaggedView, kw_only=True):
+    """Base class for views of the events notified to agents."""
+    timestamp : int = field(name='t')
+    agentId : int | None = field(name='a', default=None)
+
+class SimulationStartView(NoticeView, kw_only=True, tag='ESS'):
+    """View of a `SimulationStartEvent`."""
+    model : ClassVar = SimulationStartEvent
+    logDir : str = field(name='l')
+
+class SimulationEndView(NoticeView, kw_only=True, tag='ESE'):
+    """View of a `SimulationEndEvent`."""
+    model : ClassVar = SimulationEndEvent
+
+class OrderPlacementView(NoticeView, kw_only=True):
+    """Base class for views of `OrderPlacementEvent`s."""
+    bookId : int | None = field(name='b', default=None)
+    orderId : int | None = field(name='o', default=None)
+    clientOrderId : int | None = field(name='c', default=None)
+    side : int = field(name='s')
+    quantity : float = field(name='q')
+    success : bool = field(name='u')
+    message : str = field(name='m')
+    leverage : float = field(name='l', default=0.0)
+    settleFlag : int = field(name='f', default=-2)
+
+class LimitOrderPlacementView(OrderPlacementView, kw_only=True, tag='RDPOL'):
+    """View of a successful `LimitOrderPlacementEvent`."""
+    model : ClassVar = LimitOrderPlacementEvent
+    price : float = field(name='p')
+
+class LimitOrderRejectionView(LimitOrderPlacementView, kw_only=True, tag='ERDPOL'):
+    """View of a failed `LimitOrderPlacementEvent`."""
+
+class MarketOrderPlacementView(OrderPlacementView, kw_only=True, tag='RDPOM'):
+    """View of a successful `MarketOrderPlacementEvent`."""
+    model : ClassVar = MarketOrderPlacementEvent
+    currency : OrderCurrency = field(name='r')
+
+class MarketOrderRejectionView(MarketOrderPlacementView, kw_only=True, tag='ERDPOM'):
+    """View of a failed `MarketOrderPlacementEvent`."""
+
+class OrderCancellationView(View, kw_only=True):
+    """View of an `OrderCancellationEvent`."""
+    model : ClassVar = OrderCancellationEvent
+    type : str = field(name='y', default='RDCO1')
+    timestamp : int = field(name='t')
+    bookId : int = field(name='b')
+    orderId : int = field(name='o')
+    quantity : float | None = field(name='q', default=None)
+    success : bool = field(name='u')
+    message : str = field(name='m')
+
+class OrderCancellationsView(NoticeView, kw_only=True, tag='RDCO'):
+    """View of a successful `OrderCancellationsEvent`."""
+    model : ClassVar = OrderCancellationsEvent
+    bookId : int | None = field(name='b', default=None)
+    cancellations : list[OrderCancellationView] = field(name='c', default_factory=list)
+
+class OrderCancellationsRejectionView(OrderCancellationsView, kw_only=True, tag='ERDCO'):
+    """View of a failed `OrderCancellationsEvent`."""
+
+class ClosePositionView(View, kw_only=True):
+    """View of a `ClosePositionEvent`."""
+    model : ClassVar = ClosePositionEvent
+    type : str = field(name='y', default='RDCP1')
+    timestamp : int = field(name='t')
+    bookId : int = field(name='b')
+    orderId : int = field(name='o')
+    quantity : float | None = field(name='q', default=None)
+    success : bool = field(name='u')
+    message : str = field(name='m')
+
+class ClosePositionsView(NoticeView, kw_only=True, tag='RDCP'):
+    """View of a successful `ClosePositionsEvent`."""
+    model : ClassVar = ClosePositionsEvent
+    bookId : int | None = field(name='b', default=None)
+    closes : list[ClosePositionView] = field(name='o', default_factory=list)
+
+class ClosePositionsRejectionView(ClosePositionsView, kw_only=True, tag='ERDCP'):
+    """View of a failed `ClosePositionsEvent`."""
+
+class TradeView(NoticeView, kw_only=True, tag='ET'):
+    """View of a `TradeEvent`."""
+    model : ClassVar = TradeEvent
+    bookId : int | None = field(name='b', default=None)
+    tradeId : int = field(name='i')
+    clientOrderId : int | None = field(name='c', default=None)
+    takerAgentId : int = field(name='Ta')
+    takerOrderId : int = field(name='Ti')
+    takerFee : float = field(name='Tf')
+    makerAgentId : int = field(name='Ma')
+    makerOrderId : int = field(name='Mi')
+    makerFee : float = field(name='Mf')
+    side : int = field(name='s')
+    price : float = field(name='p')
+    quantity : float = field(name='q')
+
+class ResetAgentView(NoticeView, kw_only=True, tag='RDRA1'):
+    """View of a `ResetAgentEvent`."""
+    model : ClassVar = ResetAgentEvent
+    success : bool = field(name='u')
+    message : str = field(name='m')
+
+class ResetAgentsView(NoticeView, kw_only=True, tag='RDRA'):
+    """View of a successful `ResetAgentsEvent`."""
+    model : ClassVar = ResetAgentsEvent
+    resets : list[ResetAgentView] = field(name='r', default_factory=list)
+
+class ResetAgentsRejectionView(ResetAgentsView, kw_only=True, tag='ERDRA'):
+    """View of a failed `ResetAgentsEvent`."""
+
+FinanceNoticeView = Union[
+    SimulationStartView, SimulationEndView,
+    LimitOrderPlacementView, LimitOrderRejectionView, MarketOrderPlacementView, MarketOrderRejectionView,
+    OrderCancellationsView, OrderCancellationsRejectionView, ClosePositionsView, ClosePositionsRejectionView,
+    TradeView, ResetAgentsView, ResetAgentsRejectionView
+]
+
+class PayloadView(msgspec.Struct, kw_only=True, gc=False):
+    """
+    View of the compressed payload of a state update.  The configuration and response are small and are decoded as plain data,
+    to be validated into their pydantic models on assignment to the state update.
+    """
+    books : dict[int, BookView] | None = None
+    accounts : dict[int, dict[int, AccountView]] | None = None
+    notices : dict[int, list[FinanceNoticeView]] | None = None
+    config : dict | None = None
+    response : dict | None = None
+
+BooksView = dict[int, BookView]
+
+def parse(value : Any) -> Any:
+    """
+    Convert views to their pydantic models, including views held in (possibly nested) dicts and lists.
+
+    Args:
+        value (Any): A view, or a dict or list containing views.
+
+    Returns:
+        Any: The value with all views replaced by the corresponding pydantic models.
+    """
+    if isinstance(value, View):
+        return value.parse()
+    if isinstance(value, dict):
+        return {key : parse(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [parse(item) for item in value]
+    return value
@@ -1,6 +1,8 @@
 # SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
 # SPDX-License-Identifier: MIT
+import os
 import re
+import numpy as np
 
 def duration_from_timestamp(timestamp : int) -> str:
     seconds, nanoseconds = divmod(timestamp, 1_000_000_000)
@@ -26,5 +28,61 @@ def timestamp_from_duration(duration: str) -> int:
     total_seconds = (((days * 24 + hours) * 60 + minutes) * 60) + seconds
     return total_seconds * 1_000_000_000 + nanoseconds
         
+def timestamps_from_durations(durations) -> np.ndarray:
+    """
+    Vectorized equivalent of `timestamp_from_duration` for a sequence of durations formatted by `duration_from_timestamp`.
+
+    The time components occupy fixed positions relative to the end of each duration, so their digits are gathered from a byte
+    matrix and combined with their place values in a single pass; the day count precedes the `d ` separator where present.
+
+    Args:
+        durations: Sequence or array of duration strings.
+
+    Returns:
+        np.ndarray: Timestamps in nanoseconds.
+    """
+    durations = np.asarray(durations, dtype=np.bytes_)
+    if durations.size == 0:
+        return np.empty(0, dtype=np.int64)
+    width = durations.dtype.itemsize
+    chars = durations.view(np.uint8).reshape(-1, width)
+    lengths = np.count_nonzero(chars, axis=1)
+    digits = chars.astype(np.int64) - ord('0')
+    rows = np.arange(len(chars))[:, None]
+    def number(first, last):
+        # Value of the digits at offsets [first, last) from the end of each duration
+        columns = digits[rows, lengths[:, None] - np.arange(first, last, -1)]
+        return columns @ (10 ** np.arange(first - last - 1, -1, -1, dtype=np.int64))
+    seconds = (number(18, 16) * 60 + number(15, 13)) * 60 + number(12, 10)
+    if width > 20:
+        # Day count occupies the leading `length - 20` characters
+        day_digits = np.where(np.arange(width - 20) < (lengths - 20)[:, None], digits[:, :width - 20], 0)
+        place = np.clip((lengths - 21)[:, None] - np.arange(width - 20), 0, None)
+        seconds += np.sum(day_digits * 10 ** place, axis=1) * 86400
+    return seconds * 1_000_000_000 + number(9, 0)
+
 def normalize(lower, upper, value):
-    return (max(min(value, upper), lower) + upper) / (upper - lower)
\ No newline at end of file
+    """
+    Maps a value clipped to `[lower, upper]` onto the unit interval.  Arrays are normalized elementwise.
+    """
+    if isinstance(value, np.ndarray):
+        return (np.clip(value, lower, upper) + upper) / (upper - lower)
+    return (max(min(value, upper), lower) + upper) / (upper - lower)
+
+
+def load_fundamental_prices(log_dir : str, block_count : int, books_per_block : int) -> dict[int, float]:
+    """
+    Reads the latest fundamental price of each book from the fundamental price logs of each simulation block in `log_dir`.
+    """
+    prices = {}
+    for block in range(block_count):
+        block_file = os.path.join(log_dir, f'fundamental.{block * books_per_block}-{books_per_block * (block + 1) - 1}.csv')
+        fp_line = None
+        book_ids = None
+        for line in open(block_file, 'r').readlines():
+            if not book_ids:
+                book_ids = [int(col) for col in line.split(',') if col != "Timestamp\n"]
+            if line.strip() != '':
+                fp_line = line
+        prices = prices | {book_ids[i] : float(price) for i, price in enumerate(fp_line.strip().split(',')[:-1])}
+    return prices
@@ -1,86 +1,185 @@
 # SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
 # SPDX-License-Identifier: MIT
+import time
+import base64
+import threading
 import zstandard as zstd
 import zlib, lz4.frame
 import pybase64
-import base64
 import msgspec
-from typing import Literal
+import struct
+import numpy as np
+from collections.abc import Mapping
+from typing import Any, Iterable, Literal, get_args
 from concurrent.futures import ThreadPoolExecutor
+from taos import __spec_version__
+from taos.im.utils.dictionary import load_dictionary, DICTIONARY_ID
+
+# zstd contexts are costly to construct relative to the compression of a small payload and may not be shared between threads,
+# so each thread retains its own compressor for each level and dictionary, and decompressor for each dictionary
+_contexts = threading.local()
+
+def _zstd_compressor(level: int, dictionary: zstd.ZstdCompressionDict | None = None) -> zstd.ZstdCompressor:
+    cache = _contexts.__dict__.setdefault("compressors", {})
+    key = (level, dictionary.dict_id() if dictionary else 0)
+    if key not in cache:
+        cache[key] = zstd.ZstdCompressor(level=level, dict_data=dictionary)
+    return cache[key]
+
+def _zstd_decompressor(dict_id: int = 0) -> zstd.ZstdDecompressor:
+    cache = _contexts.__dict__.setdefault("decompressors", {})
+    if dict_id not in cache:
+        dictionary = load_dictionary(dict_id) if dict_id else None
+        if dict_id and dictionary is None:
+            raise ValueError(f"zstd dictionary {dict_id} is not available")
+        cache[dict_id] = zstd.ZstdDecompressor(dict_data=dictionary)
+    return cache[dict_id]
+
+def _zstd_dict_compress(raw: bytes, level: int) -> bytes:
+    dictionary = load_dictionary(DICTIONARY_ID)
+    if dictionary is None:
+        raise ValueError(f"No zstd dictionary is available for version {__spec_version__}")
+    return _zstd_compressor(level, dictionary).compress(raw)
+
+def _zstd_decompress(raw: bytes) -> bytes:
+    # The ID of the dictionary used to compress a frame (0 if none) is recorded in the frame header
+    return _zstd_decompressor(zstd.get_frame_parameters(raw).dict_id).decompress(raw)
 
 compressors = {
     "zlib": zlib.compress,
     "lz4": lz4.frame.compress,
-    "zstd": lambda raw, level: zstd.ZstdCompressor(level=level).compress(raw),
+    "zstd": lambda raw, level: _zstd_compressor(level).compress(raw),
+    "zstd_dict": _zstd_dict_compress,
 }
 
 decompressors = {
     "zlib": zlib.decompress,
     "lz4": lz4.frame.decompress,
-    "zstd": lambda raw: zstd.ZstdDecompressor().decompress(raw),
+    "zstd": _zstd_decompress,
+    "zstd_dict": _zstd_decompress,
 }
 
-json_encoder = msgspec.json.Encoder()
-msgpack_encoder = msgspec.msgpack.Encoder()
+# Text encodings with which compressed data is embedded in the synapse; base85 output is 6% smaller than base64, but is much
+# slower to produce.  Raw bytes cannot be embedded, since synapses are transmitted as JSON.
+transports = {
+    "base64": (lambda raw: pybase64.b64encode(raw).decode("ascii"), pybase64.b64decode),
+    "base85": (lambda raw: base64.b85encode(raw).decode("ascii"), base64.b85decode),
+}
+
+Engine = Literal["zlib", "lz4", "zstd", "zstd_dict"]
+Transport = Literal["base64", "base85"]
+
+# Books may be sent as a book-indexed container in place of a single compressed blob: a header giving the ID, offset and length
+# of each book, followed by the individually compressed frame of each book, so that each book can be decompressed and decoded alone.
+BOOK_INDEX_MAGIC = b"TBI"
+BOOK_INDEX_VERSION = 1
+BOOK_INDEX_HEADER = struct.Struct("<3sBI")
+BOOK_INDEX_ENTRY = np.dtype([("book_id", "<i8"), ("offset", "<u8"), ("length", "<u8")])
+
+def _msgpack_hook(obj):
+    # Lazily-decoded mappings are encoded with undecoded values written through verbatim as msgpack
+    if hasattr(obj, "encodable"):
+        return obj.encodable()
+    raise NotImplementedError(f"Objects of type {type(obj)} are not supported")
+
+def _json_hook(obj):
+    # Lazily-decoded mappings must be fully decoded for JSON encoding
+    if hasattr(obj, "encodable"):
+        return dict(obj.items())
+    raise NotImplementedError(f"Objects of type {type(obj)} are not supported")
+
+json_encoder = msgspec.json.Encoder(enc_hook=_json_hook)
+msgpack_encoder = msgspec.msgpack.Encoder(enc_hook=_msgpack_hook)
+
+def encode(payload, version: int = 45) -> bytes:
+    """
+    Serialize a payload using either JSON (legacy, version < 45) or Msgpack (version >= 45).
+    """
+    if version < 45:
+        return json_encoder.encode(payload)
+    return msgpack_encoder.encode(payload)
+
+def decode(raw: bytes, version: int = 45, type: Any = Any):
+    """
+    Deserialize a payload encoded with `encode`.
+
+    If a `type` is given, the payload is decoded directly into instances of that type (e.g. `msgspec.Struct` views); string keys
+    are accepted for integer-keyed mappings.
+    """
+    if version < 45:
+        return msgspec.json.decode(raw, type=type, strict=False)
+    return msgspec.msgpack.decode(raw, type=type, strict=False)
+
+def compress_encoded(
+    raw: bytes,
+    level: int = 1,
+    engine: Engine = "lz4",
+    transport: Transport = "base64",
+) -> str:
+    """
+    Compress an already-serialized payload, wrapped in Base64 (or Base85) text.
+    """
+    return transports[transport][0](compressors[engine](raw, level))
 
 def compress(
     payload,
     level: int = 1,
-    engine: Literal["zlib", "lz4", "zstd"] = "lz4",
+    engine: Engine = "lz4",
     version: int = 45,
+    transport: Transport = "base64",
 ) -> str | None:
     """
     Compress a payload using either JSON (legacy, version < 45)
-    or Msgpack (version >= 45), wrapped in Base64 text.
+    or Msgpack (version >= 45), wrapped in Base64 (or Base85) text.
     """
     try:
-        if version < 45:
-            raw = json_encoder.encode(payload)
-        else:
-            raw = msgpack_encoder.encode(payload)
-
-        compressed = compressors[engine](raw, level)
-        return base64.standard_b64encode(compressed).decode("ascii")
+        return compress_encoded(encode(payload, version), level, engine, transport)
     except Exception as ex:
         print(f"Failed to compress! {ex}")
         return None
 
 def decompress(
     payload: str | dict,
-    engine: Literal["zlib", "lz4", "zstd"] = "lz4",
+    engine: Engine = "lz4",
     version: int = 45,
+    books_type: Any = Any,
+    payload_type: Any = Any,
+    transport: Transport = "base64",
 ) -> dict | None:
     """
     Decompress payload using the correct codec depending on version.
     - version < 45 → JSON
     - version >= 45 → Msgpack
-    Supports Base64-encoded transport, and old dict container format.
+    Supports Base64 or Base85-encoded transport (as given by `transport`), and old dict container format.
+
+    The books and the remaining payload can be decoded directly into specific types by passing `books_type` (a `dict[int, ...]`
+    type) and `payload_type`; where `payload_type` is a `msgspec.Struct`, its fields are returned as the entries of the result.
+    Books sent in a book-indexed container (see `compress_books`) are returned as a `BookIndex`, which decodes each book on access.
     """
     try:
+        text_decode = transports[transport][1]
         if isinstance(payload, str):
-            decoded = pybase64.b64decode(payload)
+            decoded = text_decode(payload)
             raw = decompressors[engine](decoded)
-
-            if version < 45:
-                return msgspec.json.decode(raw)
-            return msgspec.msgpack.decode(raw)
+            decompressed = decode(raw, version, payload_type)
+            return msgspec.structs.asdict(decompressed) if isinstance(decompressed, msgspec.Struct) else decompressed
 
         else:
             # Legacy container with 'payload' and 'books'
-            decoded_main = pybase64.b64decode(payload["payload"])
+            decoded_main = text_decode(payload["payload"])
             raw_main = decompressors[engine](decoded_main)
-            if version < 45:
-                decompressed_payload = msgspec.json.decode(raw_main)
-            else:
-                decompressed_payload = msgspec.msgpack.decode(raw_main)
+            decompressed_payload = decode(raw_main, version, payload_type)
+            if isinstance(decompressed_payload, msgspec.Struct):
+                decompressed_payload = msgspec.structs.asdict(decompressed_payload)
+                decompressed_payload.pop("books", None)
 
             if payload.get("books"):
-                decoded_books = pybase64.b64decode(payload["books"])
-                raw_books = decompressors[engine](decoded_books)
-                if version < 45:
-                    books = msgspec.json.decode(raw_books)
+                decoded_books = text_decode(payload["books"])
+                if is_book_index(decoded_books):
+                    books = BookIndex(decoded_books, engine, version, Any if books_type is Any else get_args(books_type)[1])
                 else:
-                    books = msgspec.msgpack.decode(raw_books)
+                    raw_books = decompressors[engine](decoded_books)
+                    books = decode(raw_books, version, books_type)
             else:
                 books = {}
 
@@ -90,40 +189,136 @@ def decompress(
         print(f"Failed to decompress! {ex}")
         return None
 
-def compress_batch(axon_synapses: dict, batch, compressed_books: str, level: int = 1, engine: str = "lz4", version: int = 45) -> dict:
-    for uid in batch:
-        axon_synapses[uid].books = None
-        payload = {
-            "accounts": axon_synapses[uid].accounts,
-            "notices": axon_synapses[uid].notices,
-            "config": axon_synapses[uid].config,
-            "response": axon_synapses[uid].response,
-        }
-        axon_synapses[uid].accounts = None
-        axon_synapses[uid].notices = None
-        axon_synapses[uid].config = None
-        axon_synapses[uid].response = None
-        axon_synapses[uid].compressed = {
-            "books": compressed_books,
-            "payload": compress(payload, level=level, engine=engine, version=version),
-        }
-    return axon_synapses
+def _map_chunks(fn, items : list, workers : int) -> list:
+    """
+    Applies `fn` to each item, splitting the items into contiguous chunks which are processed concurrently in a thread pool of
+    `workers` threads (0 => no parallelization).  Results are returned in the order of the items.
+    """
+    if workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    size = -(-len(items) // workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunks = pool.map(lambda chunk: [fn(item) for item in chunk], [items[i:i + size] for i in range(0, len(items), size)])
+        return [result for chunk in chunks for result in chunk]
 
-def batch_compress(
-    axon_synapses: dict,
-    compressed_books: str,
-    batches: list[list[int]],
+def batch_compress_encoded(
+    payloads: dict[int, bytes],
     level: int = 1,
-    engine: str = "lz4",
-    version: int = 45,
-) -> dict:
-    compressed_batches = []
-    with ThreadPoolExecutor(max_workers=len(batches)) as pool:
-        tasks = [
-            pool.submit(compress_batch, axon_synapses, batch, compressed_books,  level, engine, version)
-            for batch in batches
-        ]
-        for task in tasks:
-            compressed_batches.append(task.result())
-    compressed_synapses = {k: v for d in compressed_batches for k, v in d.items()}
-    return compressed_synapses
+    engine: Engine = "lz4",
+    workers: int = 0,
+    transport: Transport = "base64",
+) -> dict[int, str]:
+    """
+    Compress a set of already-serialized payloads, wrapping each in Base64 (or Base85) text.
+
+    The compression libraries release the GIL while compressing, so the payloads are split into contiguous
+    chunks which are compressed concurrently in a thread pool of `workers` threads (0 => no parallelization).
+    """
+    compressed = _map_chunks(lambda raw: compress_encoded(raw, level, engine, transport), list(payloads.values()), workers)
+    return dict(zip(payloads.keys(), compressed))
+
+def compress_books(
+    books: dict[int, bytes],
+    level: int = 1,
+    engine: Engine = "lz4",
+    workers: int = 0,
+    transport: Transport = "base64",
+) -> str:
+    """
+    Compress a set of individually serialized books into a book-indexed container, wrapped in Base64 (or Base85) text.
+
+    The container consists of a header (`BOOK_INDEX_HEADER`) giving the number of books, an index entry (`BOOK_INDEX_ENTRY`) for each
+    book giving its ID and the offset and length of its frame relative to the end of the index, and the compressed frame of each book.
+    The frames are compressed concurrently in a thread pool of `workers` threads (0 => no parallelization).
+    """
+    frames = _map_chunks(lambda raw: compressors[engine](raw, level), list(books.values()), workers)
+    index = np.zeros(len(frames), dtype=BOOK_INDEX_ENTRY)
+    index["book_id"] = list(books.keys())
+    index["length"] = [len(frame) for frame in frames]
+    index["offset"] = np.cumsum(index["length"]) - index["length"]
+    container = b"".join([BOOK_INDEX_HEADER.pack(BOOK_INDEX_MAGIC, BOOK_INDEX_VERSION, len(frames)), index.tobytes(), *frames])
+    return transports[transport][0](container)
+
+def is_book_index(raw: bytes) -> bool:
+    """
+    Returns True if the (text-decoded) data is a book-indexed container produced by `compress_books`.
+    """
+    return len(raw) >= BOOK_INDEX_HEADER.size and raw[:len(BOOK_INDEX_MAGIC)] == BOOK_INDEX_MAGIC
+
+class BookIndex(Mapping):
+    """
+    Mapping from book ID to the books held in a book-indexed container, which are decompressed and decoded individually on first access.
+
+    Books can be decoded in advance with `prefetch`, which decompresses the frames concurrently in a thread pool since the compression
+    libraries release the GIL.
+
+    Attributes:
+        engine (str): Compression library used for the frames.
+        version (int): Protocol version with which the books were serialized.
+        type (Any): Type into which each book is decoded.
+        decode_time (float): Total time spent decompressing and decoding books.
+    """
+    def __init__(self, raw: bytes, engine: Engine = "lz4", version: int = 45, type: Any = Any):
+        magic, container_version, count = BOOK_INDEX_HEADER.unpack_from(raw)
+        if magic != BOOK_INDEX_MAGIC or container_version > BOOK_INDEX_VERSION:
+            raise ValueError(f"Unsupported book index container (version {container_version})")
+        index = np.frombuffer(raw, dtype=BOOK_INDEX_ENTRY, count=count, offset=BOOK_INDEX_HEADER.size)
+        start = BOOK_INDEX_HEADER.size + index.nbytes
+        self._view = memoryview(raw)
+        self._frames = {
+            book_id : (start + offset, start + offset + length)
+            for book_id, offset, length in zip(index["book_id"].tolist(), index["offset"].tolist(), index["length"].tolist())
+        }
+        self._decoded = {}
+        self.engine = engine
+        self.version = version
+        self.type = type
+        self.decode_time = 0.0
+
+    def _decompress(self, book_id: int) -> bytes:
+        begin, end = self._frames[book_id]
+        return decompressors[self.engine](self._view[begin:end])
+
+    def __getitem__(self, book_id: int):
+        if book_id not in self._decoded:
+            start = time.time()
+            self._decoded[book_id] = decode(self._decompress(book_id), self.version, self.type)
+            self.decode_time += time.time() - start
+        return self._decoded[book_id]
+
+    def __contains__(self, book_id):
+        return book_id in self._frames
+
+    def __iter__(self):
+        return iter(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def decoded(self) -> int:
+        """Number of books which have been decoded."""
+        return len(self._decoded)
+
+    def prefetch(self, book_ids: Iterable[int] | None = None, workers: int = 0) -> None:
+        """
+        Decompresses and decodes the given books (or all books) which have not yet been accessed.
+
+        Args:
+            book_ids (Iterable[int] | None): IDs of the books to decode; all books if None.
+            workers (int): Number of threads with which to decompress the frames (0 => no parallelization).
+        """
+        start = time.time()
+        pending = [book_id for book_id in (self._frames if book_ids is None else book_ids) if book_id not in self._decoded]
+        for book_id, raw in zip(pending, _map_chunks(self._decompress, pending, workers)):
+            self._decoded[book_id] = decode(raw, self.version, self.type)
+        self.decode_time += time.time() - start
+
+    def as_type(self, type: Any) -> "BookIndex":
+        """
+        Returns a mapping of the same container which decodes the books into the given type; books already decoded are not shared.
+        """
+        other = BookIndex.__new__(BookIndex)
+        other._view, other._frames, other._decoded = self._view, self._frames, {}
+        other.engine, other.version, other.type, other.decode_time = self.engine, self.version, type, 0.0
+        return other
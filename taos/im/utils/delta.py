@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+from collections.abc import Mapping
+
+# Book fields containing price levels, with the direction in which the levels are sorted (True => descending price)
+LEVEL_FIELDS = {"b" : True, "a" : False}
+
+def level_delta(previous : list[dict], current : list[dict]) -> dict:
+    """
+    Computes the difference between two lists of price levels, keyed by level price.
+
+    Args:
+        previous (list[dict]): Price levels in the reference book.
+        current (list[dict]): Price levels in the current book.
+
+    Returns:
+        dict: Prices of the levels removed since the reference (`d`), and the levels added or changed (`u`).
+    """
+    previous_levels = {level["p"] : level for level in previous}
+    current_prices = {level["p"] for level in current}
+    return {
+        "d" : [price for price in previous_levels if price not in current_prices],
+        "u" : [level for level in current if previous_levels.get(level["p"]) != level]
+    }
+
+def apply_level_delta(previous : list[dict], delta : dict, descending : bool) -> list[dict]:
+    """
+    Reconstructs a list of price levels from a reference list and the output of `level_delta`.
+    """
+    levels = {level["p"] : level for level in previous}
+    for price in delta["d"]:
+        del levels[price]
+    for level in delta["u"]:
+        levels[level["p"]] = level
+    return [levels[price] for price in sorted(levels, reverse=descending)]
+
+def books_delta(previous : Mapping[int, dict], current : Mapping[int, dict]) -> dict[int, dict]:
+    """
+    Delta-encodes the raw books of a state update against those of a previous update.
+
+    The price levels of books present in the reference are replaced with the output of `level_delta`; all other fields,
+    and books which are not present in the reference, are included in full.
+
+    Args:
+        previous (Mapping[int, dict]): Raw books of the reference state update, keyed by book ID.
+        current (Mapping[int, dict]): Raw books of the current state update, keyed by book ID.
+
+    Returns:
+        dict[int, dict]: Delta-encoded books keyed by book ID.
+    """
+    delta = {}
+    for book_id, book in current.items():
+        reference = previous.get(book_id)
+        if reference is None:
+            delta[book_id] = book
+            continue
+        delta[book_id] = {
+            field : level_delta(reference.get(field) or [], value or []) if field in LEVEL_FIELDS else value
+            for field, value in book.items()
+        }
+    return delta
+
+def apply_books_delta(previous : Mapping[int, dict], delta : Mapping[int, dict]) -> dict[int, dict]:
+    """
+    Reconstructs the full raw books of a state update from the books of the reference update and the output of `books_delta`.
+
+    Raises:
+        KeyError: If the delta references a book or price level which is not present in the reference.
+    """
+    books = {}
+    for book_id, book in delta.items():
+        books[book_id] = {
+            field : apply_level_delta(previous[book_id].get(field) or [], value, LEVEL_FIELDS[field]) if field in LEVEL_FIELDS and isinstance(value, Mapping) else value
+            for field, value in book.items()
+        }
+    return books
@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Pre-trained zstd dictionaries for the compression of synapse payloads.
+
+The books and account payloads sent to miners are small, highly repetitive msgpack documents, for which zstd achieves a much better
+ratio when primed with a dictionary trained on recorded payloads.  Dictionaries are distributed with the package in the
+`dictionaries` directory and are versioned alongside `__spec_version__`: the dictionary ID is derived from the spec version of the
+release for which it was trained (see `dictionary_id`), and is written into the header of every zstd frame compressed with it, so
+that the receiver can select the matching dictionary without any further signalling.
+
+To train the dictionary for the current version from a directory of recorded simulator states (msgpack-encoded, one per file):
+
+    python -m taos.im.utils.dictionary --states <directory> [--size 112640]
+"""
+import os
+import argparse
+import msgspec
+import zstandard as zstd
+from functools import lru_cache
+from taos import __spec_version__
+
+DICTIONARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dictionaries")
+DEFAULT_SIZE = 112_640
+# Dictionary IDs below 32768 are reserved by the zstd format for registration, and must not be used for private dictionaries
+DICTIONARY_ID_BASE = 32768
+
+def dictionary_id(version : int = __spec_version__) -> int:
+    """
+    Returns the ID of the dictionary trained for the given spec version.
+    """
+    return DICTIONARY_ID_BASE + version
+
+DICTIONARY_ID = dictionary_id()
+
+def dictionary_path(dict_id : int, directory : str = DICTIONARY_DIR) -> str:
+    """
+    Returns the path of the dictionary file with the given ID.
+    """
+    return os.path.join(directory, f"zstd-{dict_id}.dict")
+
+@lru_cache(maxsize=None)
+def load_dictionary(dict_id : int = DICTIONARY_ID, directory : str = DICTIONARY_DIR) -> zstd.ZstdCompressionDict | None:
+    """
+    Loads the dictionary with the given ID (by default, that for the current spec version).
+
+    Args:
+        dict_id (int): ID of the dictionary.
+        directory (str): Directory containing the dictionary files.
+
+    Returns:
+        zstd.ZstdCompressionDict | None: The dictionary, or None if it is not available.
+    """
+    path = dictionary_path(dict_id, directory)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return zstd.ZstdCompressionDict(f.read())
+
+def state_samples(state : dict) -> list[bytes]:
+    """
+    Returns the msgpack-encoded documents compressed for transmission to miners from a decoded simulator state: each book, and the
+    accounts and notices of each agent.
+    """
+    samples = [msgspec.msgpack.encode(book) for book in (state.get("books") or {}).values()]
+    for uid, accounts in (state.get("accounts") or {}).items():
+        samples.append(msgspec.msgpack.encode({"accounts" : {uid : accounts}, "notices" : {uid : (state.get("notices") or {}).get(uid, [])}}))
+    return samples
+
+def train_dictionary(samples : list[bytes], dict_id : int = DICTIONARY_ID, size : int = DEFAULT_SIZE) -> zstd.ZstdCompressionDict:
+    """
+    Trains a zstd dictionary on the given samples.
+
+    Args:
+        samples (list[bytes]): Encoded payloads representative of those to be compressed.
+        dict_id (int): ID to assign to the dictionary.
+        size (int): Maximum size of the dictionary in bytes.
+
+    Returns:
+        zstd.ZstdCompressionDict: The trained dictionary.
+    """
+    return zstd.train_dictionary(size, samples, dict_id=dict_id)
+
+def save_dictionary(dictionary : zstd.ZstdCompressionDict, directory : str = DICTIONARY_DIR) -> str:
+    """
+    Writes a dictionary to the file corresponding to its ID, returning the path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = dictionary_path(dictionary.dict_id(), directory)
+    with open(path, "wb") as f:
+        f.write(dictionary.as_bytes())
+    return path
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=str, required=True, help="Directory of recorded msgpack-encoded simulator states.")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="Maximum dictionary size in bytes.")
+    parser.add_argument("--version", type=int, default=__spec_version__, help="Spec version for which the dictionary is trained (defaults to the current version).")
+    parser.add_argument("--output", type=str, default=DICTIONARY_DIR, help="Directory to which the dictionary is written.")
+    args = parser.parse_args()
+
+    samples = []
+    for name in sorted(os.listdir(args.states)):
+        with open(os.path.join(args.states, name), "rb") as f:
+            samples.extend(state_samples(msgspec.msgpack.decode(f.read())))
+    dictionary = train_dictionary(samples, dictionary_id(args.version), args.size)
+    print(f"Trained dictionary {dictionary.dict_id()} for version {args.version} ({len(dictionary.as_bytes())} bytes) on {len(samples)} samples : {save_dictionary(dictionary, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Scheduling of the queries sent to miners with each state update.
+
+Queries are started in priority order, paced by a token bucket and limited in the number in flight in total and to each host.
+The time at which each query is actually sent, relative to the start of the dispatch, is recorded for each UID: since the
+process time of a miner is measured by the dendrite from the moment its query is sent, these offsets show how long each miner
+waited behind the others, and so how far the ordering and pacing of the queries affects the delays applied to their responses.
+
+Responses are collected until all have arrived or the collection policy is met: a `quorum` of the queries have been answered, or a
+deadline given by a percentile of the recent process times has passed since the last query was sent.  Each response collected is
+passed to `on_result` as it arrives, so that it can be processed while the remaining queries are in flight.  Queries not yet
+sent when the collection policy is met (e.g. waiting on the concurrency or host limits) are not sent.  Those already sent are left
+to complete, and their responses held in `late` until taken by `take_late`, so that they are still counted in the miner
+statistics; errors raised by them are logged, and any not complete by the next dispatch are cancelled.
+"""
+import math
+import time
+import random
+import asyncio
+import numpy as np
+import bittensor as bt
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable
+
+# Orders in which queries may be dispatched:
+#   uid     : ascending UID
+#   random  : a new random permutation for each dispatch, so that no UID is systematically sent its query before the others
+#   fastest : ascending smoothed process time, so that the miners which have responded fastest are queried first
+ORDERS = ['uid', 'random', 'fastest']
+# Number of recent process times over which the deadline percentile is taken, and the number required before it is applied
+RECENT_PROCESS_TIMES = 4096
+MIN_PROCESS_TIMES = 100
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate at which queries are started.
+
+    Args:
+        rate (float): Tokens added per second; if not positive, the rate is unlimited.
+        burst (int): Maximum number of tokens held, and so the number of queries which can be started at once.
+    """
+    def __init__(self, rate : float, burst : int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.perf_counter()
+
+    async def acquire(self) -> None:
+        """
+        Waits until a token is available and takes it.
+        """
+        if self.rate <= 0: return
+        while True:
+            now = time.perf_counter()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class DispatchScheduler:
+    """
+    Dispatches the queries to miners for a state update.
+
+    The results collected from the latest dispatch and the send-time offsets of its queries are held in `results` and `offsets`.
+
+    Args:
+        uids (int): Number of UIDs in the subnet.
+        rate (float): Maximum number of queries started per second; unlimited if not positive.
+        burst (int): Number of queries which may be started at once before `rate` applies.
+        concurrency (int): Maximum number of queries in flight; unlimited if not positive.
+        host_limit (int): Maximum number of queries in flight to a single host; unlimited if not positive.
+        order (str): Order in which queries are started, one of `ORDERS`.
+        quorum (float): Fraction of the queries which, once answered, ends the collection; all are awaited if 1.
+        deadline_percentile (float): Percentile of the recent process times after which, following the sending of the last query,
+            the collection ends; not applied if 0.
+        smoothing (float): Weight of the latest process time in the smoothed process time of each UID used by the `fastest` order.
+        seed (int | None): Seed of the random number generator used by the `random` order.
+    """
+    def __init__(self, uids : int, rate : float = 0.0, burst : int = 1, concurrency : int = 0, host_limit : int = 0,
+                 order : str = 'random', quorum : float = 1.0, deadline_percentile : float = 0.0, smoothing : float = 0.1,
+                 seed : int | None = None):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown dispatch order '{order}' (expected one of {ORDERS})")
+        if not 0 < quorum <= 1:
+            raise ValueError(f"Dispatch quorum must be greater than 0 and at most 1 (got {quorum})")
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.host_limit = host_limit
+        self.order = order
+        self.quorum = quorum
+        self.deadline_percentile = deadline_percentile
+        self.smoothing = smoothing
+        self.rng = random.Random(seed)
+        # Smoothed process time of each UID; UIDs which have not yet been observed are placed first by the `fastest` order
+        self.process_times = np.zeros(uids, dtype=np.float64)
+        self.observed = np.zeros(uids, dtype=bool)
+        self.recent = deque(maxlen=RECENT_PROCESS_TIMES)
+        self.results : dict[int, Any] = {}
+        self.offsets : dict[int, float] = {}
+        # Responses which arrived after the collection of their dispatch ended, and the queries of that dispatch still in flight
+        self.late : dict[int, Any] = {}
+        self._outstanding : list[asyncio.Task] = []
+
+    def observe(self, uid : int, process_time : float) -> None:
+        """
+        Updates the smoothed process time of a UID with that of its latest query.
+        """
+        self.recent.append(process_time)
+        if uid >= len(self.process_times):
+            self.process_times = np.concatenate([self.process_times, np.zeros(uid + 1 - len(self.process_times))])
+            self.observed = np.concatenate([self.observed, np.zeros(uid + 1 - len(self.observed), dtype=bool)])
+        if self.observed[uid]:
+            self.process_times[uid] += self.smoothing * (process_time - self.process_times[uid])
+        else:
+            self.process_times[uid] = process_time
+            self.observed[uid] = True
+
+    def reset(self, uid : int) -> None:
+        """
+        Discards the process time history of a UID (e.g. when it is registered to a new miner).
+        """
+        if uid < len(self.observed):
+            self.process_times[uid] = 0.0
+            self.observed[uid] = False
+
+    def prioritize(self, uids : list[int]) -> list[int]:
+        """
+        Returns the UIDs in the order in which their queries are to be started.
+        """
+        if self.order == 'random':
+            uids = list(uids)
+            self.rng.shuffle(uids)
+            return uids
+        if self.order == 'fastest':
+            times = {uid : self.process_times[uid] if uid < len(self.process_times) else 0.0 for uid in uids}
+            return sorted(uids, key=lambda uid: (times[uid], uid))
+        return sorted(uids)
+
+    def deadline(self) -> float | None:
+        """
+        Returns the time in seconds after the last query is sent at which the collection ends, or None if no deadline applies.
+        """
+        if self.deadline_percentile <= 0 or len(self.recent) < MIN_PROCESS_TIMES:
+            return None
+        return float(np.percentile(np.fromiter(self.recent, dtype=np.float64, count=len(self.recent)), self.deadline_percentile))
+
+    @staticmethod
+    def _retrieve(task : asyncio.Task) -> None:
+        # Errors raised by queries completing after the collection of their dispatch has ended are logged rather than propagated
+        if not task.cancelled() and task.exception() is not None:
+            bt.logging.warning(f"Late {task.get_name()} failed : {task.exception()}")
+
+    def take_late(self) -> dict[int, Any]:
+        """
+        Returns the responses which have arrived since the end of the collection of their dispatch, removing them.
+        """
+        late, self.late = self.late, {}
+        return late
+
+    async def dispatch(self, uids : list[int], send : Callable[[int], Awaitable[Any]], hosts : dict[int, str] | None = None,
+                       on_result : Callable[[int, Any], None] | None = None, timeout : float | None = None) -> dict[int, Any]:
+        """
+        Sends the queries to the given UIDs and collects their results until all have arrived, the collection policy is met or
+        `timeout` expires.
+
+        Args:
+            uids (list[int]): UIDs to be queried.
+            send (Callable[[int], Awaitable[Any]]): Coroutine function sending the query to a UID and returning its result.
+            hosts (dict[int, str] | None): Host serving each UID, to which `host_limit` applies.
+            on_result (Callable[[int, Any], None] | None): Called with each UID and its result as it is collected.  It is called on the
+                event loop, and should hand off any lengthy processing so as not to delay the queries in flight.
+            timeout (float | None): Time in seconds from the start of the dispatch after which the collection ends regardless.
+
+        Returns:
+            dict[int, Any]: The results collected, keyed by UID in order of arrival.
+        """
+        start = time.perf_counter()
+        end = start + timeout if timeout is not None else math.inf
+        # Queries of the previous dispatch which are still in flight are abandoned
+        for task in self._outstanding:
+            task.cancel()
+        self._outstanding = []
+        self.results, self.offsets = {}, {}
+        results, offsets = self.results, self.offsets
+        collecting = True
+        required = math.inf
+        bucket = TokenBucket(self.rate, self.burst)
+        limit = asyncio.Semaphore(self.concurrency) if self.concurrency > 0 else None
+        host_limits = {}
+
+        async def query(uid):
+            host = hosts.get(uid) if hosts and self.host_limit > 0 else None
+            if host is not None and host not in host_limits:
+                host_limits[host] = asyncio.Semaphore(self.host_limit)
+            async with host_limits[host] if host is not None else nullcontext(), limit if limit else nullcontext():
+                # Queries which obtain a slot only once the collection policy has been met are not sent
+                if not collecting or len(results) >= required or time.perf_counter() >= end:
+                    return
+                offsets[uid] = time.perf_counter() - start
+                result = await send(uid)
+            if not collecting:
+                self.late[uid] = result
+                return
+            results[uid] = result
+            if on_result:
+                on_result(uid, result)
+
+        tasks, queried = [], {}
+        # Taken before the queries are started, so that the time spent computing it is not counted against the collection
+        deadline = self.deadline()
+        try:
+            for uid in self.prioritize(uids):
+                await bucket.acquire()
+                if time.perf_counter() >= end: break
+                task = asyncio.create_task(query(uid), name=f"query_{uid}")
+                tasks.append(task)
+                queried[task] = uid
+            sent = time.perf_counter()
+            if deadline is not None:
+                end = min(end, sent + deadline)
+            required = math.ceil(self.quorum * len(tasks))
+            pending = set(tasks)
+            while pending and len(results) < required:
+                remaining = end - time.perf_counter()
+                if remaining <= 0: break
+                done, pending = await asyncio.wait(pending, timeout=None if math.isinf(remaining) else remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Errors raised in sending a query or in processing its result are propagated
+                    task.result()
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            collecting = False
+        # Queries which have not been sent by the end of the collection are not sent; those in flight are left to complete as late
+        self._outstanding = []
+        for task in pending:
+            task.add_done_callback(self._retrieve)
+            if task.done(): continue
+            if queried[task] in offsets:
+                self._outstanding.append(task)
+            else:
+                task.cancel()
+        return results
+
+    def summary(self) -> dict[str, float]:
+        """
+        Returns the mean, median and maximum send-time offset of the latest dispatch, in seconds.
+        """
+        offsets = np.fromiter(self.offsets.values(), dtype=np.float64, count=len(self.offsets))
+        if len(offsets) == 0:
+            return {'mean' : 0.0, 'median' : 0.0, 'max' : 0.0}
+        return {'mean' : float(offsets.mean()), 'median' : float(np.median(offsets)), 'max' : float(offsets.max())}
@@ -3,75 +3,172 @@
 from loky.backend.context import set_start_method
 set_start_method('forkserver', force=True)
 from loky import get_reusable_executor, as_completed
+from bisect import bisect_left, insort
 import time
-import copy
+import numpy as np
 
-def history(snapshot, events, volume_decimals):
-    history = {snapshot['timestamp']: copy.deepcopy(snapshot)}
+BID = 0
+ASK = 1
+SIDES = ('bids', 'asks')
+
+class L2Deltas:
+    """
+    Compact record of the evolution of an order book through a sequence of events.
+
+    Holds the initial snapshot together with a single change record for each event, giving the timestamp of the event and the side,
+    price and resulting quantity of the level it modified.  Events which do not modify any level are recorded with side -1, and
+    events which remove a level are recorded with a quantity of NaN.  Snapshots of the book after each event are only constructed
+    when requested via `snapshots`.
+
+    Attributes:
+        initial (dict): The snapshot from which reconstruction started, in the `L2Snapshot.model_dump()` format.
+        timestamps (np.ndarray): Timestamp of each event in the order applied.
+        sides (np.ndarray): Side of the level modified by each event (0=BID, 1=ASK, -1=None).
+        prices (np.ndarray): Price of the level modified by each event.
+        quantities (np.ndarray): Quantity at the modified level after each event, or NaN if the level was removed.
+    """
+    def __init__(self, initial : dict, timestamps : list[int], sides : list[int], prices : list[float], quantities : list[float]):
+        self.initial = initial
+        self.timestamps = np.array(timestamps, dtype=np.int64)
+        self.sides = np.array(sides, dtype=np.int8)
+        self.prices = np.array(prices, dtype=np.float64)
+        self.quantities = np.array(quantities, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def _replay(self, depth : int | None):
+        # Yields the timestamp, the prices of the retained bid and ask levels from the best price outwards, and the levels on
+        # each side, for the initial state and after the last of the events at each event timestamp
+        levels = [dict(self.initial['bids']), dict(self.initial['asks'])]
+        prices = [sorted(levels[BID]), sorted(levels[ASK])]
+        def retained():
+            bids = prices[BID][::-1][:depth] if depth else prices[BID][::-1]
+            asks = prices[ASK][:depth] if depth else prices[ASK]
+            return bids, asks
+        yield self.initial['timestamp'], *retained(), levels
+        timestamps = self.timestamps.tolist()
+        changes = zip(timestamps, self.sides.tolist(), self.prices.tolist(), self.quantities.tolist())
+        for i, (timestamp, side, price, quantity) in enumerate(changes):
+            if side >= 0:
+                if quantity != quantity:
+                    del levels[side][price]
+                    del prices[side][bisect_left(prices[side], price)]
+                elif price in levels[side]:
+                    levels[side][price] = {**levels[side][price], 'q' : quantity}
+                else:
+                    levels[side][price] = {'p' : price, 'q' : quantity, 'o' : None}
+                    insort(prices[side], price)
+            # Only the state after the last of the events sharing a timestamp is retained
+            if i + 1 == len(timestamps) or timestamps[i + 1] != timestamp:
+                yield timestamp, *retained(), levels
+
+    def snapshots(self, depth : int | None = None) -> dict[int, dict]:
+        """
+        Materializes the snapshot of the book at the initial timestamp and after the last event at each event timestamp.
+
+        The snapshots are identical to those produced by replaying the events against copies of the initial snapshot and then sorting
+        and truncating the levels with `L2Snapshot.sort(depth)`.
+
+        Args:
+            depth (int | None): Number of levels to include on each side; all levels are included if None.
+
+        Returns:
+            dict[int, dict]: Snapshots in the `L2Snapshot.model_dump()` format indexed by timestamp.
+        """
+        return {
+            timestamp : {
+                'timestamp' : timestamp,
+                'bids' : {price : dict(levels[BID][price]) for price in bids},
+                'asks' : {price : dict(levels[ASK][price]) for price in asks}
+            } for timestamp, bids, asks, levels in self._replay(depth)
+        }
+
+    def arrays(self, depth : int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Materializes the same book states as `snapshots` in the columnar format used by `L2History.from_arrays`.
+
+        Args:
+            depth (int): Number of levels to include on each side.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The timestamps of the states, and the bid prices, bid quantities,
+            ask prices and ask quantities of shape `(states, depth)` ordered from the best level outwards and padded with NaN.
+        """
+        timestamps, rows = [], []
+        padding = [np.nan] * depth
+        for timestamp, bids, asks, levels in self._replay(depth):
+            if timestamps and timestamps[-1] == timestamp:
+                rows.pop()
+                timestamps.pop()
+            timestamps.append(timestamp)
+            rows.append((
+                (bids + padding)[:depth], ([levels[BID][price]['q'] for price in bids] + padding)[:depth],
+                (asks + padding)[:depth], ([levels[ASK][price]['q'] for price in asks] + padding)[:depth]
+            ))
+        columns = np.array(rows, dtype=np.float64).reshape(len(rows), 4, depth)
+        return np.array(timestamps, dtype=np.int64), columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3]
+
+def history(snapshot : dict, events : list[dict], volume_decimals : int) -> tuple[L2Deltas, dict[int, dict]]:
+    """
+    Replays the events of a book against the snapshot of its previous state, recording the change to the book caused by each event.
+
+    Args:
+        snapshot (dict): Snapshot of the book prior to the events, in the `L2Snapshot.model_dump()` format.
+        events (list[dict]): Order, trade and cancellation events in the `model_dump()` format.
+        volume_decimals (int): Precision to which level quantities are rounded.
+
+    Returns:
+        tuple[L2Deltas, dict[int, dict]]: The record of changes to the book, and the trades indexed by timestamp.
+    """
+    quantities = [{price : level['q'] for price, level in snapshot['bids'].items()}, {price : level['q'] for price, level in snapshot['asks'].items()}]
+    ask_prices = sorted(quantities[ASK])
     trades = {}
+    record = ([], [], [], [])
+    def change(timestamp, side, price, quantity):
+        record[0].append(timestamp)
+        record[1].append(side)
+        record[2].append(price)
+        record[3].append(quantity)
+    def remove(timestamp, side, price, volume):
+        # Reduces the quantity at an existing level, removing the level if it is fully depleted
+        if price not in quantities[side]:
+            change(timestamp, -1, 0.0, 0.0)
+            return
+        quantity = round(quantities[side][price] - volume, volume_decimals)
+        if quantity == 0.0:
+            del quantities[side][price]
+            if side == ASK:
+                del ask_prices[bisect_left(ask_prices, price)]
+            change(timestamp, side, price, np.nan)
+        else:
+            quantities[side][price] = quantity
+            change(timestamp, side, price, quantity)
+
     # Apply events in chronological order
     for event in sorted(events, key=lambda x: x['t']):
-        match event:
-            case o if event['y'] == 'o':
+        match event['y']:
+            case 'o':
                 # Place new order
-                if o['s'] == 0:
-                    if o['p'] not in snapshot['bids']:
-                        snapshot['bids'][o['p']] = {'p':o['p'], 'q':0.0, 'o':None}
-                    snapshot['bids'][o['p']]['q'] = round(
-                        snapshot['bids'][o['p']]['q'] + o['q'],
-                        volume_decimals
-                    )
-                else:
-                    if o['p'] not in snapshot['asks']:
-                        snapshot['asks'][o['p']] =  {'p':o['p'], 'q':0.0, 'o':None}
-                    snapshot['asks'][o['p']]['q'] = round(
-                        snapshot['asks'][o['p']]['q'] + o['q'],
-                        volume_decimals
-                    )
-
-            case t if event['y'] == 't':
+                side = BID if event['s'] == 0 else ASK
+                if event['p'] not in quantities[side]:
+                    quantities[side][event['p']] = 0.0
+                    if side == ASK:
+                        insort(ask_prices, event['p'])
+                quantities[side][event['p']] = round(quantities[side][event['p']] + event['q'], volume_decimals)
+                change(event['t'], side, event['p'], quantities[side][event['p']])
+            case 't':
                 # Record trade
-                trades[t['t']] = t
-                if t['s'] == 0:
-                    if t['p'] in snapshot['asks']:
-                        snapshot['asks'][t['p']]['q'] = round(
-                            snapshot['asks'][t['p']]['q'] - t['q'],
-                            volume_decimals
-                        )
-                        if snapshot['asks'][t['p']]['q'] == 0.0:
-                            del snapshot['asks'][t['p']]
-                else:
-                    if t['p'] in snapshot['bids']:
-                        snapshot['bids'][t['p']]['q'] = round(
-                            snapshot['bids'][t['p']]['q'] - t['q'],
-                            volume_decimals
-                        )
-                        if snapshot['bids'][t['p']]['q'] == 0.0:
-                            del snapshot['bids'][t['p']]
-
-            case c if event['y'] == 'c':
+                trades[event['t']] = event
+                remove(event['t'], ASK if event['s'] == 0 else BID, event['p'], event['q'])
+            case 'c':
                 # Cancel existing order
-                if c['p'] >= min(snapshot['asks'].keys()):
-                    if c['p'] in snapshot['asks']:
-                        snapshot['asks'][c['p']]['q'] = round(
-                            snapshot['asks'][c['p']]['q'] - c['q'],
-                            volume_decimals
-                        )
-                        if snapshot['asks'][c['p']]['q'] == 0.0:
-                            del snapshot['asks'][c['p']]
-                else:
-                    if c['p'] in snapshot['bids']:
-                        snapshot['bids'][c['p']]['q'] = round(
-                            snapshot['bids'][c['p']]['q'] - c['q'],
-                            volume_decimals
-                        )
-                        if snapshot['bids'][c['p']]['q'] == 0.0:
-                            del snapshot['bids'][c['p']]
-
-        # Add snapshot to history after each update
-        snapshot['timestamp'] = event['t']
-        history[event['t']] = copy.deepcopy(snapshot)
-    return history, trades
+                if not ask_prices:
+                    raise ValueError(f"Unable to determine side of cancellation at {event['p']} with no ask levels")
+                remove(event['t'], ASK if event['p'] >= ask_prices[0] else BID, event['p'], event['q'])
+            case _:
+                change(event['t'], -1, 0.0, 0.0)
+    return L2Deltas(snapshot, *record), trades
     
 def history_batch(snapshots, events, volume_decimals):
     start = time.time()
@@ -86,4 +183,4 @@ def batch_history(snapshots, events, batches, volume_decimals):
     for task in as_completed(tasks):
         result = task.result()        
         history_batches.append(result)
-    return {int(k): v for d in history_batches for k, v in d.items()}
\ No newline at end of file
+    return {int(k): v for d in history_batches for k, v in d.items()}
@@ -0,0 +1,229 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import numpy as np
+
+class InventoryHistory:
+    """
+    Fixed-size ring buffer holding the recent inventory values of every UID on every book.
+
+    Values are stored in a single float64 array of shape `(uids, lookback, books)` which is written in place once per step.
+    All UIDs share the same timestamp ring; `counts` records how many of the most recent observations are valid for each UID
+    so that a UID can be reset without disturbing the history of the others.  Observations which could not be made for a UID
+    are held as NaN, and the returns adjoining them are excluded from the Sharpe calculations.
+    """
+    def __init__(self, uids : int, lookback : int, books : int):
+        self.values = np.zeros((uids, lookback, books), dtype=np.float64)
+        self.timestamps = np.zeros(lookback, dtype=np.int64)
+        self.counts = np.zeros(uids, dtype=np.int64)
+        # Index of the slot which will receive the next observation
+        self.head = 0
+        # Number of slots which have been written since the buffer was created
+        self.size = 0
+        # Set while `values` is held by a snapshot, in which case it is copied before it is next written
+        self._shared = False
+
+    @property
+    def uids(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def lookback(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def books(self) -> int:
+        return self.values.shape[2]
+
+    def count(self, uid : int) -> int:
+        """
+        Returns the number of valid observations currently held for the UID.
+        """
+        return int(self.counts[uid])
+
+    def append(self, timestamp : int, values : np.ndarray) -> None:
+        """
+        Writes the inventory values of all UIDs observed at `timestamp` into the next slot of the ring.
+
+        Args:
+            timestamp (int) : Simulation timestamp of the observation
+            values (np.ndarray) : Array of shape `(uids, books)` containing the inventory value of each UID on each book
+        """
+        if self._shared:
+            self.values = self.values.copy()
+            self._shared = False
+        self.values[:, self.head, :] = values
+        self.timestamps[self.head] = timestamp
+        self.head = (self.head + 1) % self.lookback
+        self.size = min(self.size + 1, self.lookback)
+        np.minimum(self.counts + 1, self.lookback, out=self.counts)
+
+    def slots(self, n : int) -> np.ndarray:
+        """
+        Returns the ring indices of the `n` most recent observations in chronological order.
+        """
+        return (self.head - n + np.arange(n)) % self.lookback
+
+    def window(self, uid : int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the valid observations of a UID in chronological order.
+
+        Args:
+            uid (int) : UID for which to retrieve the history
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Timestamps of shape `(n,)` and inventory values of shape `(n, books)`.
+            These are views onto the ring where the window does not wrap around the end of the buffer, and copies otherwise.
+        """
+        n = int(self.counts[uid])
+        start = self.head - n
+        if start >= 0:
+            return self.timestamps[start:self.head], self.values[uid, start:self.head]
+        idx = self.slots(n)
+        return self.timestamps[idx], self.values[uid, idx]
+
+    def reset(self, uid : int) -> None:
+        """
+        Discards all observations held for the UID.
+        """
+        self.counts[uid] = 0
+
+    def reshape(self, uids : int, lookback : int, books : int) -> None:
+        """
+        Re-allocates the ring with new dimensions, retaining the most recent observations which fit.
+        Books or UIDs which did not previously exist are initialized to zero.
+        """
+        if (uids, lookback, books) == self.values.shape: return
+        n = min(self.size, lookback)
+        idx = self.slots(n)
+        values = np.zeros((uids, lookback, books), dtype=np.float64)
+        timestamps = np.zeros(lookback, dtype=np.int64)
+        u = min(uids, self.uids)
+        b = min(books, self.books)
+        values[:u, :n, :b] = self.values[:u][:, idx][:, :, :b]
+        timestamps[:n] = self.timestamps[idx]
+        counts = np.zeros(uids, dtype=np.int64)
+        counts[:u] = np.minimum(self.counts[:u], n)
+        self.values, self.timestamps, self.counts = values, timestamps, counts
+        self.head = n % lookback
+        self.size = n
+        self._shared = False
+
+    def rebase(self, offset : int) -> None:
+        """
+        Shifts all held timestamps back by `offset`, discarding any observations which would then fall at or after `offset`.
+        Used to carry history across into a new simulation whose clock restarts at zero.
+        """
+        idx = self.slots(self.size)
+        self.timestamps[idx] -= offset
+        drop = int(np.count_nonzero(self.timestamps[idx] >= offset))
+        if drop > 0:
+            self.head = (self.head - drop) % self.lookback
+            self.size -= drop
+            np.maximum(self.counts - drop, 0, out=self.counts)
+
+    def to_dict(self) -> dict:
+        """
+        Returns a msgpack-serializable representation of the store with the arrays encoded as raw bytes.
+        """
+        return {
+            "shape" : list(self.values.shape),
+            "head" : self.head,
+            "size" : self.size,
+            "values" : self.values.tobytes(),
+            "timestamps" : self.timestamps.tobytes(),
+            "counts" : self.counts.tobytes()
+        }
+
+    def snapshot(self) -> dict:
+        """
+        Returns the representation of `to_dict` without copying the values, which are given as the array itself.
+
+        The array is shared with the snapshot until `release` is called with it: if the store is written to in the meantime, the
+        array is first copied so that the snapshot continues to hold the values at the time it was taken.
+        """
+        self._shared = True
+        return {
+            "shape" : list(self.values.shape),
+            "head" : self.head,
+            "size" : self.size,
+            "values" : self.values,
+            "timestamps" : self.timestamps.tobytes(),
+            "counts" : self.counts.tobytes()
+        }
+
+    def release(self, values : np.ndarray) -> None:
+        """
+        Releases the values array held by a snapshot, allowing it to be written in place again.
+        """
+        if values is self.values:
+            self._shared = False
+
+    @classmethod
+    def from_dict(cls, state : dict) -> 'InventoryHistory':
+        """
+        Reconstructs a store from the output of `to_dict`, or of `snapshot` as loaded from a checkpoint, in which case the values
+        array is adopted by the store without being copied.
+        """
+        uids, lookback, books = state["shape"]
+        store = cls(uids, lookback, books)
+        if isinstance(state["values"], np.ndarray):
+            store.values = state["values"].reshape(uids, lookback, books)
+        else:
+            store.values = np.frombuffer(state["values"], dtype=np.float64).reshape(uids, lookback, books).copy()
+        store.timestamps = np.frombuffer(state["timestamps"], dtype=np.int64).copy()
+        store.counts = np.frombuffer(state["counts"], dtype=np.int64).copy()
+        store.head = state["head"]
+        store.size = state["size"]
+        return store
+
+    @classmethod
+    def from_legacy(cls, history : dict, uids : int, lookback : int, books : int) -> 'InventoryHistory':
+        """
+        Constructs a store from the legacy `{uid : {timestamp : {book_id : value}}}` inventory history structure.
+        The history of each UID is aligned to the most recent timestamps observed over all UIDs.
+        """
+        store = cls(uids, lookback, books)
+        timestamps = sorted({t for uid_history in history.values() for t in uid_history})[-lookback:]
+        n = len(timestamps)
+        store.timestamps[:n] = timestamps
+        store.head = n % lookback
+        store.size = n
+        for uid, uid_history in history.items():
+            if uid >= uids: continue
+            items = list(uid_history.items())[-n:] if n > 0 else []
+            for i, (_, book_values) in enumerate(items):
+                for book_id, value in book_values.items():
+                    if book_id < books:
+                        store.values[uid, n - len(items) + i, book_id] = value
+            store.counts[uid] = len(items)
+        return store
+
+    @classmethod
+    def from_state(cls, state : dict, uids : int, lookback : int, books : int) -> 'InventoryHistory':
+        """
+        Loads a store from saved validator state, migrating the legacy dictionary format and adjusting the dimensions as required.
+        """
+        if "values" in state:
+            store = cls.from_dict(state)
+            store.reshape(uids, lookback, books)
+            return store
+        return cls.from_legacy(state, uids, lookback, books)
+
+    def save(self, path : str) -> None:
+        """
+        Saves the store to an uncompressed `.npz` archive.
+        """
+        np.savez(path, values=self.values, timestamps=self.timestamps, counts=self.counts, cursor=np.array([self.head, self.size], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path : str) -> 'InventoryHistory':
+        """
+        Loads a store from a `.npz` archive written by `save`.
+        """
+        with np.load(path) as data:
+            store = cls(*data["values"].shape)
+            store.values = data["values"]
+            store.timestamps = data["timestamps"]
+            store.counts = data["counts"]
+            store.head, store.size = (int(v) for v in data["cursor"])
+        return store
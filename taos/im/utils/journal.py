@@ -0,0 +1,298 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import io
+import os
+import csv
+import atexit
+import mmap
+import struct
+import msgspec
+import numpy as np
+import pandas as pd
+from threading import Thread, Lock, Event
+from taos.im.utils import duration_from_timestamp, timestamps_from_durations
+
+# Types of event recorded in the journal
+ORDER = 0
+CANCELLATION = 1
+TRADE = 2
+
+# Column names of the rows recorded for each type of event; the first column is always the event timestamp
+COLUMNS = {
+    ORDER : [
+        'timestamp', 'bookId', 'orderId', 'clientOrderId',
+        'side', 'price', 'currency', 'quantity', 'leverage', 'settleFlag',
+        'success', 'message'
+    ],
+    CANCELLATION : [
+        'timestamp', 'bookId', 'orderId', 'quantity', 'success', 'message'
+    ],
+    TRADE : [
+        'timestamp', 'bookId', 'tradeId', 'clientOrderId',
+        'takerAgentId', 'takerOrderId', 'takerFee',
+        'makerAgentId', 'makerOrderId', 'makerFee',
+        'side', 'price', 'quantity'
+    ]
+}
+
+# Files to which each type of event is written in CSV format
+CSV_FILES = {ORDER : 'orders.csv', CANCELLATION : 'cancellations.csv', TRADE : 'trades.csv'}
+# File to which all events are written in msgpack format
+MSGPACK_FILE = 'events.journal'
+
+# Each msgpack record is preceded by its length as a little-endian unsigned 32-bit integer
+PREFIX = struct.Struct('<I')
+
+# Each journal file is accompanied by an index with an entry for every batch of rows written, giving the latest event timestamp
+# in the batch and the offset in bytes of the start of the batch, so that loading can begin from the retention window
+INDEX_SUFFIX = '.index'
+INDEX_ENTRY = np.dtype([('timestamp', '<i8'), ('offset', '<u8')])
+
+class EventJournal:
+    """
+    Buffered writer for the order, cancellation and trade events of an agent within a single simulation.
+
+    Recorded rows are held in memory and written by a background thread every `flush_interval` seconds (or sooner if more than
+    `max_buffered` rows are pending) through file handles which remain open for the lifetime of the journal, so that recording an
+    event does not require any file system access.  Two formats are supported:
+
+    - `csv` : Rows for each type of event are appended to separate CSV files (`orders.csv`, `cancellations.csv`, `trades.csv`).
+    - `msgpack` : Rows for all events are appended to a single file (`events.journal`) as length-prefixed msgpack arrays of the
+      form `[kind, *row]`, which can be loaded quickly with `read_journal`.
+
+    Each write of a batch of rows to a file also appends an entry to the index file of the same name with suffix `.index`, giving
+    the latest timestamp in the batch and the offset at which it starts (see `seek`).
+
+    Args:
+        directory (str): Directory in which the journal files are written.
+        format (str): Journal format; one of `csv` or `msgpack`.
+        flush_interval (float): Maximum time in seconds for which rows are buffered before being written.
+        max_buffered (int): Number of pending rows at which a write is triggered immediately.
+    """
+    def __init__(self, directory : str, format : str = 'csv', flush_interval : float = 1.0, max_buffered : int = 10_000):
+        if format not in ('csv', 'msgpack'):
+            raise ValueError(f"Unknown journal format '{format}' : must be one of 'csv', 'msgpack'")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.format = format
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._pending : list[tuple[int, list]] = []
+        self._pending_lock = Lock()
+        self._write_lock = Lock()
+        self._wake = Event()
+        self._closed = False
+        self._files = {}
+        self._encoder = msgspec.msgpack.Encoder()
+        self._thread = Thread(target=self._run, daemon=True, name=f"journal-{os.path.basename(directory)}")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, kind : int, row : list) -> None:
+        """
+        Queues a row for writing to the journal.
+
+        Args:
+            kind (int): Type of the event (`ORDER`, `CANCELLATION` or `TRADE`).
+            row (list): Values of the columns listed in `COLUMNS[kind]`, with the timestamp given in nanoseconds.
+        """
+        with self._pending_lock:
+            self._pending.append((kind, row))
+            if len(self._pending) >= self.max_buffered:
+                self._wake.set()
+
+    def _file(self, kind : int):
+        key = kind if self.format == 'csv' else None
+        if key not in self._files:
+            path = os.path.join(self.directory, CSV_FILES[kind] if self.format == 'csv' else MSGPACK_FILE)
+            if self.format == 'msgpack':
+                # Discard any record left incomplete by a previous process, so that new records are not appended after it
+                length = journal_length(path)
+                if os.path.isfile(path) and os.path.getsize(path) > length:
+                    os.truncate(path, length)
+            self._files[key] = (open(path, mode='ab'), open(path + INDEX_SUFFIX, mode='ab'))
+        return self._files[key]
+
+    def _encode(self, batch : list[tuple[int, list]], header : bool) -> bytes:
+        if self.format == 'csv':
+            text = io.StringIO(newline='')
+            writer = csv.writer(text)
+            if header:
+                writer.writerow(COLUMNS[batch[0][0]])
+            writer.writerows([duration_from_timestamp(row[0])] + row[1:] for _, row in batch)
+            return text.getvalue().encode()
+        records = [self._encoder.encode([kind] + row) for kind, row in batch]
+        return b''.join(PREFIX.pack(len(record)) + record for record in records)
+
+    def flush(self) -> int:
+        """
+        Writes all pending rows to the journal files.
+
+        Returns:
+            int: The number of rows written.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            batches = {}
+            for kind, row in pending:
+                batches.setdefault(kind if self.format == 'csv' else None, []).append((kind, row))
+            for batch in batches.values():
+                data, index = self._file(batch[0][0])
+                offset = data.tell()
+                data.write(self._encode(batch, header=offset == 0))
+                data.flush()
+                entry = np.array([(max(row[0] for _, row in batch), offset)], dtype=INDEX_ENTRY)
+                index.write(entry.tobytes())
+                index.flush()
+            return len(pending)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """
+        Stops the background writer, writes any pending rows and closes the journal files.
+        """
+        atexit.unregister(self.close)
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        with self._write_lock:
+            for data, index in self._files.values():
+                data.close()
+                index.close()
+            self._files.clear()
+
+def _records(view : memoryview, offset : int = 0):
+    """Yields the start and end offsets of each complete record in a msgpack-format journal, starting from the given offset."""
+    while offset + PREFIX.size <= len(view):
+        length, = PREFIX.unpack_from(view, offset)
+        if offset + PREFIX.size + length > len(view):
+            return
+        yield offset + PREFIX.size, offset + PREFIX.size + length
+        offset += PREFIX.size + length
+
+def journal_length(path : str) -> int:
+    """
+    Returns the length in bytes of the complete records in a msgpack-format journal file.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            return max((end for _, end in _records(view)), default=0)
+        finally:
+            view.release()
+
+def read_index(path : str) -> np.ndarray:
+    """
+    Loads the index entries of a journal file which refer to data present in the file.
+
+    Args:
+        path (str): Path to the journal file (not the index).
+
+    Returns:
+        np.ndarray: Index entries with fields `timestamp` and `offset`, or an empty array if the file has no usable index.
+    """
+    index_path = path + INDEX_SUFFIX
+    if not os.path.isfile(path) or not os.path.isfile(index_path):
+        return np.empty(0, dtype=INDEX_ENTRY)
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    entries = np.frombuffer(data[:len(data) - len(data) % INDEX_ENTRY.itemsize], dtype=INDEX_ENTRY)
+    entries = entries[entries['offset'] < os.path.getsize(path)]
+    # Files written before the index was introduced have rows which are not covered by it
+    if not len(entries) or entries['offset'][0] != 0:
+        return np.empty(0, dtype=INDEX_ENTRY)
+    return entries
+
+def seek(path : str, threshold : int | None) -> int:
+    """
+    Returns the offset in a journal file from which reading will include all rows with timestamp at or after the threshold.
+
+    Args:
+        path (str): Path to the journal file.
+        threshold (int | None): Earliest timestamp required, or None to read the whole file.
+
+    Returns:
+        int: Offset in bytes of the first batch which may contain rows at or after the threshold.
+    """
+    entries = read_index(path)
+    if threshold is None or not len(entries):
+        return 0
+    # A batch can only contain rows at or after the threshold if its own latest timestamp is; rows written after the last
+    # indexed batch are not covered by the index, so reading begins no later than the last indexed batch
+    first = int(np.searchsorted(np.maximum.accumulate(entries['timestamp']), threshold, side='left'))
+    return int(entries['offset'][min(first, len(entries) - 1)])
+
+def latest_timestamp(path : str) -> int | None:
+    """
+    Returns the latest event timestamp recorded in the index of a journal file, or None if the file has no usable index.
+    """
+    entries = read_index(path)
+    return int(entries['timestamp'].max()) if len(entries) else None
+
+def read_journal(path : str, threshold : int | None = None) -> dict[int, list[list]]:
+    """
+    Loads the rows recorded in a msgpack-format journal file.
+
+    The file is memory-mapped and each record decoded directly from the mapping, starting from the batch located using the index
+    if a threshold is given.  A truncated record at the end of the file (e.g. if the process was terminated while writing) is
+    ignored.
+
+    Args:
+        path (str): Path to the journal file.
+        threshold (int | None): Earliest timestamp of the rows to load, or None to load all rows.
+
+    Returns:
+        dict[int, list[list]]: The recorded rows for each type of event, in the order written.
+    """
+    rows = {kind : [] for kind in COLUMNS}
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return rows
+    decoder = msgspec.msgpack.Decoder(list)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            for start, end in _records(view, seek(path, threshold)):
+                kind, *row = decoder.decode(view[start:end])
+                if threshold is None or row[0] >= threshold:
+                    rows[kind].append(row)
+        finally:
+            view.release()
+    return rows
+
+def read_csv(path : str, kind : int, threshold : int | None = None) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Loads the rows recorded in a CSV-format journal file.
+
+    Reading starts from the batch located using the index if a threshold is given; the rows are parsed with pandas, with all
+    columns read as strings, and the timestamps converted with `timestamps_from_durations`.
+
+    Args:
+        path (str): Path to the CSV file.
+        kind (int): Type of the events recorded in the file.
+        threshold (int | None): Earliest timestamp of the rows to load, or None to load all rows.
+
+    Returns:
+        tuple[np.ndarray, pd.DataFrame]: Timestamps of the loaded rows in nanoseconds, and the rows.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=np.int64), pd.DataFrame(columns=COLUMNS[kind], dtype=str)
+    offset = seek(path, threshold)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        frame = pd.read_csv(f, header=0 if offset == 0 else None, names=COLUMNS[kind], dtype=str, keep_default_na=False)
+    timestamps = timestamps_from_durations(frame['timestamp'].to_numpy())
+    if threshold is not None:
+        retained = timestamps >= threshold
+        timestamps, frame = timestamps[retained], frame[retained]
+    return timestamps, frame
@@ -0,0 +1,413 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Prometheus collector for the book, agent and miner metrics published by the validator.
+
+Rather than setting a labelled gauge child for every level, book and agent at each report (several hundred thousand label
+lookups per step for a full subnet), the values of all metrics at a step are assembled into NumPy arrays held by a
+`MetricsSnapshot`.  Publishing a report then only requires replacing the snapshot held by the `MetricsCollector`, and the metric
+families are generated from the arrays of the latest snapshot when Prometheus scrapes the endpoint.  Values which are NaN in the
+arrays are not published.
+
+The families produced carry the same names and labels as the gauges which they replace, so that existing dashboards and queries
+are unaffected.
+
+The arrays are assembled by `book_metrics`, `agent_metrics` and `trade_labels` from the validator attributes which they read, so
+that the same metrics can be produced either within the validator (`taos.im.validator.report`) or by the out-of-process exporter
+(`taos.im.neurons.exporter`) from the snapshots published by the validator.
+"""
+import numpy as np
+import pandas as pd
+from prometheus_client.registry import Collector
+from prometheus_client.core import GaugeMetricFamily
+
+from taos.im.utils import duration_from_timestamp
+from taos.im.utils.volume import ROLES, ROLE_INDEX
+
+# Number of levels published on each side of each book
+BOOK_LEVELS = 21
+# Number of levels on each side of each book included in the labels of the `books` snapshot family
+BOOK_SNAPSHOT_LEVELS = 5
+
+# Metrics published for every level of each book
+LEVEL_METRICS = ['bid', 'bid_vol', 'bid_vol_sum', 'ask', 'ask_vol', 'ask_vol_sum']
+# Metrics published once per book (at level 0)
+BOOK_METRICS = ['mid', 'fundamental_price', 'trade_price', 'trade_volume', 'trade_buy_volume', 'trade_sell_volume']
+# Metrics published for each agent in each book
+AGENT_METRICS = [
+    'base_balance_initial', 'quote_balance_initial', 'wealth_initial',
+    'base_balance_total', 'base_balance_free', 'base_balance_reserved',
+    'quote_balance_total', 'quote_balance_free', 'quote_balance_reserved',
+    'base_loan', 'base_collateral', 'quote_loan', 'quote_collateral',
+    'fees_traded_volume', 'fees_maker_rate', 'fees_taker_rate',
+    'inventory_value', 'pnl',
+    'daily_volume', 'daily_maker_volume', 'daily_taker_volume', 'daily_self_volume',
+    'activity_factor', 'sharpe', 'weighted_sharpe'
+]
+# Metrics published for each miner over all books
+MINER_METRICS = [
+    'total_base_balance', 'total_base_loan', 'total_base_collateral',
+    'total_quote_balance', 'total_quote_loan', 'total_quote_collateral',
+    'total_inventory_value', 'pnl',
+    'total_daily_volume', 'total_daily_maker_volume', 'total_daily_taker_volume', 'total_daily_self_volume',
+    'average_daily_volume', 'average_daily_maker_volume', 'average_daily_taker_volume', 'average_daily_self_volume',
+    'min_daily_volume', 'min_daily_maker_volume', 'min_daily_taker_volume', 'min_daily_self_volume',
+    'activity_factor', 'sharpe', 'activity_weighted_normalized_median_sharpe', 'sharpe_penalty', 'sharpe_score',
+    'unnormalized_score', 'score', 'placement',
+    'trust', 'consensus', 'incentive', 'emission',
+    'requests', 'success', 'failures', 'timeouts', 'rejections', 'call_time', 'send_offset',
+    'inventory_value_change', 'pnl_change'
+]
+# Miner metrics which are only included in the labels of the `miners` snapshot family
+MINER_LABEL_METRICS = ['inventory_value_change', 'pnl_change']
+# Miner metrics published from the request statistics, which are refreshed less frequently than the other metrics
+MINER_STATS_METRICS = ['requests', 'success', 'failures', 'timeouts', 'rejections', 'call_time', 'send_offset']
+
+# Number of recent trades published for each book, and for each miner in each book
+RECENT_TRADES = 25
+RECENT_MINER_TRADES = 5
+
+LEVEL_INDEX = {name : i for i, name in enumerate(LEVEL_METRICS)}
+BOOK_INDEX = {name : i for i, name in enumerate(BOOK_METRICS)}
+AGENT_INDEX = {name : i for i, name in enumerate(AGENT_METRICS)}
+MINER_INDEX = {name : i for i, name in enumerate(MINER_METRICS)}
+
+# Labels of the `miners` snapshot family following the agent ID, with the miner metric from which the value of each is taken
+MINERS_LABELS = {
+    'placement' : 'placement', 'base_balance' : 'total_base_balance', 'base_loan' : 'total_base_loan', 'base_collateral' : 'total_base_collateral',
+    'quote_balance' : 'total_quote_balance', 'quote_loan' : 'total_quote_loan', 'quote_collateral' : 'total_quote_collateral',
+    'inventory_value' : 'total_inventory_value', 'inventory_value_change' : 'inventory_value_change', 'pnl' : 'pnl', 'pnl_change' : 'pnl_change',
+    'min_daily_volume' : 'min_daily_volume', 'activity_factor' : 'activity_factor', 'sharpe' : 'sharpe', 'sharpe_penalty' : 'sharpe_penalty',
+    'sharpe_score' : 'sharpe_score', 'unnormalized_score' : 'unnormalized_score', 'score' : 'score'
+}
+
+TRADE_LABELS = [
+    'timestamp', 'timestamp_str', 'book_id', 'agent_id', 'trade_id',
+    'aggressing_order_id', 'aggressing_agent_id', 'resting_order_id', 'resting_agent_id',
+    'maker_fee', 'taker_fee', 'price', 'volume', 'side'
+]
+MINER_TRADE_LABELS = ['timestamp', 'timestamp_str', 'book_id', 'uid', 'role', 'price', 'volume', 'side', 'fee']
+
+def record_trades(recent_trades : dict[int, list], bookId : int, trades : list) -> None:
+    """
+    Appends new trades to the recent trades of a book, retaining the latest `RECENT_TRADES`.
+    """
+    if trades:
+        recent_trades[bookId] = (recent_trades[bookId] + trades)[-RECENT_TRADES:]
+
+def record_miner_trade(recent_miner_trades : dict[int, dict[int, list]], uid : int, trade) -> None:
+    """
+    Appends a trade notified to a miner to its recent trades in the book, once for each role (`maker` and/or `taker`) in which
+    the miner participated, retaining the latest `RECENT_MINER_TRADES`.
+    """
+    book_trades = recent_miner_trades[uid][trade.bookId]
+    if trade.makerAgentId == uid: book_trades.append([trade, 'maker'])
+    if trade.takerAgentId == uid: book_trades.append([trade, 'taker'])
+    recent_miner_trades[uid][trade.bookId] = book_trades[-RECENT_MINER_TRADES:]
+
+class MetricsSnapshot:
+    """
+    Values of the book, agent and miner metrics at a simulation step.
+
+    Args:
+        timestamp (int): Simulation timestamp of the step.
+        levels (np.ndarray): `LEVEL_METRICS` for each book and level, of shape (books, BOOK_LEVELS, len(LEVEL_METRICS)).
+        books (np.ndarray): `BOOK_METRICS` for each book, of shape (books, len(BOOK_METRICS)).
+        agents (np.ndarray): `AGENT_METRICS` for each agent in each book, of shape (uids, books, len(AGENT_METRICS)).
+        miners (np.ndarray): `MINER_METRICS` for each agent, of shape (uids, len(MINER_METRICS)).
+        trades (list[tuple]): Values of the `TRADE_LABELS` for each of the recent trades in the books.
+        miner_trades (list[tuple]): Values of the `MINER_TRADE_LABELS` for each of the recent trades of the miners.
+    """
+    def __init__(self, timestamp : int, levels : np.ndarray, books : np.ndarray, agents : np.ndarray, miners : np.ndarray,
+                 trades : list[tuple], miner_trades : list[tuple]):
+        self.timestamp = timestamp
+        self.levels = levels
+        self.books = books
+        self.agents = agents
+        self.miners = miners
+        self.trades = trades
+        self.miner_trades = miner_trades
+
+    @classmethod
+    def empty(cls, uids : int = 0, books : int = 0) -> 'MetricsSnapshot':
+        """
+        Returns a snapshot in which no metrics are published.
+        """
+        return cls(
+            timestamp=0,
+            levels=np.full((books, BOOK_LEVELS, len(LEVEL_METRICS)), np.nan),
+            books=np.full((books, len(BOOK_METRICS)), np.nan),
+            agents=np.full((uids, books, len(AGENT_METRICS)), np.nan),
+            miners=np.full((uids, len(MINER_METRICS)), np.nan),
+            trades=[], miner_trades=[]
+        )
+
+def _published(values : np.ndarray) -> tuple[list, list]:
+    """
+    Returns the indices and values of the elements of an array which are not NaN.
+    """
+    mask = ~np.isnan(values)
+    return np.argwhere(mask).tolist(), values[mask].tolist()
+
+def _label(value : float) -> int | float | None:
+    """
+    Returns the value of a metric as included in the labels of a snapshot family.
+    """
+    return None if np.isnan(value) else value
+
+class MetricsCollector(Collector):
+    """
+    Generates the `book_gauges`, `agent_gauges`, `miner_gauges`, `books`, `miners`, `trades` and `miner_trades` metric families
+    from the latest `MetricsSnapshot` when the registry is scraped.
+
+    Args:
+        wallet (str): Hotkey address of the validator, applied as the `wallet` label of all metrics.
+        netuid (int): Subnet UID, applied as the `netuid` label of all metrics.
+    """
+    def __init__(self, wallet : str, netuid : int):
+        self.wallet = wallet
+        self.netuid = str(netuid)
+        self.snapshot = MetricsSnapshot.empty()
+
+    def update(self, snapshot : MetricsSnapshot) -> None:
+        """
+        Replaces the snapshot from which metrics are generated.
+        """
+        self.snapshot = snapshot
+
+    def _families(self) -> dict[str, GaugeMetricFamily]:
+        return {
+            'book_gauges' : GaugeMetricFamily('book_gauges', 'Gauge summaries for book-related metrics.',
+                                              labels=['wallet', 'netuid', 'book_id', 'level', 'book_gauge_name']),
+            'agent_gauges' : GaugeMetricFamily('agent_gauges', 'Gauge summaries for agent-related metrics.',
+                                               labels=['wallet', 'netuid', 'book_id', 'agent_id', 'agent_gauge_name']),
+            'miner_gauges' : GaugeMetricFamily('miner_gauges', 'Gauge summaries for miner-related metrics.',
+                                               labels=['wallet', 'netuid', 'agent_id', 'miner_gauge_name']),
+            'books' : GaugeMetricFamily('books', 'Gauge summaries for book snapshot metrics.',
+                                        labels=['wallet', 'netuid', 'timestamp', 'timestamp_str', 'book_id']
+                                        + [f'{side}{suffix}_{level}' for side in ['bid', 'ask'] for level in range(BOOK_SNAPSHOT_LEVELS, 0, -1) for suffix in ['', '_vol']]
+                                        + ['book_gauge_name']),
+            'miners' : GaugeMetricFamily('miners', 'Gauge summaries for miner metrics.',
+                                         labels=['wallet', 'netuid', 'timestamp', 'timestamp_str', 'agent_id'] + list(MINERS_LABELS) + ['miner_gauge_name']),
+            'trades' : GaugeMetricFamily('trades', 'Gauge summaries for trade metrics.',
+                                         labels=['wallet', 'netuid'] + TRADE_LABELS + ['trade_gauge_name']),
+            'miner_trades' : GaugeMetricFamily('miner_trades', 'Gauge summaries for agent trade metrics.',
+                                               labels=['wallet', 'netuid'] + MINER_TRADE_LABELS + ['miner_trade_gauge_name']),
+        }
+
+    def describe(self):
+        return list(self._families().values())
+
+    def collect(self):
+        snapshot = self.snapshot
+        families = self._families()
+        wallet, netuid = self.wallet, self.netuid
+        timestamp, timestamp_str = str(snapshot.timestamp), duration_from_timestamp(snapshot.timestamp)
+
+        book_gauges = families['book_gauges']
+        for (bookId, level, metric), value in zip(*_published(snapshot.levels)):
+            book_gauges.add_metric([wallet, netuid, str(bookId), str(level), LEVEL_METRICS[metric]], value)
+        for (bookId, metric), value in zip(*_published(snapshot.books)):
+            book_gauges.add_metric([wallet, netuid, str(bookId), '0', BOOK_METRICS[metric]], value)
+
+        # Book snapshots are published for books having orders on both sides
+        books = families['books']
+        top = np.nan_to_num(snapshot.levels[:, BOOK_SNAPSHOT_LEVELS - 1::-1, [LEVEL_INDEX['bid'], LEVEL_INDEX['bid_vol'], LEVEL_INDEX['ask'], LEVEL_INDEX['ask_vol']]], nan=0).tolist()
+        for bookId in np.flatnonzero(~np.isnan(snapshot.books[:, BOOK_INDEX['mid']])).tolist():
+            bids = [str(value if value else 0) for level in top[bookId] for value in level[:2]]
+            asks = [str(value if value else 0) for level in top[bookId] for value in level[2:]]
+            books.add_metric([wallet, netuid, timestamp, timestamp_str, str(bookId)] + bids + asks + ['books'], 1.0)
+
+        agent_gauges = families['agent_gauges']
+        for (agentId, bookId, metric), value in zip(*_published(snapshot.agents)):
+            agent_gauges.add_metric([wallet, netuid, str(bookId), str(agentId), AGENT_METRICS[metric]], value)
+
+        miner_gauges = families['miner_gauges']
+        label_metrics = [MINER_INDEX[name] for name in MINER_LABEL_METRICS]
+        for (agentId, metric), value in zip(*_published(snapshot.miners)):
+            if metric not in label_metrics:
+                miner_gauges.add_metric([wallet, netuid, str(agentId), MINER_METRICS[metric]], value)
+
+        # Miner snapshots are published for all miners having a score
+        miners = families['miners']
+        columns = [MINER_INDEX[name] for name in MINERS_LABELS.values()]
+        for agentId in np.flatnonzero(~np.isnan(snapshot.miners[:, MINER_INDEX['score']])).tolist():
+            values = [_label(value) for value in snapshot.miners[agentId, columns].tolist()]
+            values[0] = int(values[0])
+            miners.add_metric([wallet, netuid, timestamp, timestamp_str, str(agentId)] + [str(value) for value in values] + ['miners'], 1.0)
+
+        for trade in snapshot.trades:
+            families['trades'].add_metric([wallet, netuid] + [str(value) for value in trade] + ['trades'], 1.0)
+        for trade in snapshot.miner_trades:
+            families['miner_trades'].add_metric([wallet, netuid] + [str(value) for value in trade] + ['miner_trades'], 1.0)
+
+        yield from families.values()
+
+def _fundamental_price(validator, bookId : int) -> float:
+    """
+    Returns the latest fundamental price of a book, or NaN if it is not available.
+    """
+    price = validator.fundamental_price.get(bookId)
+    if isinstance(price, pd.Series):
+        price = price.iloc[-1]
+    return float(price) if price else np.nan
+
+def book_metrics(validator, previous : MetricsSnapshot) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Assembles the level and book metrics from the latest simulation state.
+
+    Trade metrics of books in which no trades occurred since the previous report retain their previous values.
+
+    Args:
+        validator: The validator, or an object exposing the same attributes (see `taos.im.neurons.exporter`).
+        previous (MetricsSnapshot): The previously published snapshot.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The level metrics and book metrics arrays.
+    """
+    book_count = validator.simulation.book_count
+    levels = np.full((book_count, BOOK_LEVELS, len(LEVEL_INDEX)), np.nan)
+    books = np.full((book_count, len(BOOK_INDEX)), np.nan)
+    if previous.books.shape == books.shape:
+        books[:, BOOK_INDEX['trade_price']:] = previous.books[:, BOOK_INDEX['trade_price']:]
+    for bookId, book in validator.last_state.books.items():
+        for side, offset in [('b', LEVEL_INDEX['bid']), ('a', LEVEL_INDEX['ask'])]:
+            if book[side]:
+                side_levels = np.array([(level['p'], level['q']) for level in book[side][:BOOK_LEVELS]])
+                levels[bookId, :len(side_levels), offset:offset + 2] = side_levels
+                levels[bookId, :len(side_levels), offset + 2] = np.cumsum(side_levels[:, 1])
+        if book['b'] and book['a']:
+            books[bookId, BOOK_INDEX['mid']] = (book['b'][0]['p'] + book['a'][0]['p']) / 2
+        books[bookId, BOOK_INDEX['fundamental_price']] = _fundamental_price(validator, bookId)
+        trades = [(event['p'], event['q'], event['s']) for event in book['e'] if event['y'] == 't'] if book['e'] else None
+        if trades:
+            prices, quantities, sides = np.array(trades).T
+            books[bookId, BOOK_INDEX['trade_price']:] = [prices[-1], quantities.sum(), quantities[sides == 0].sum(), quantities[sides == 1].sum()]
+    return levels, books
+
+def agent_metrics(validator, previous : MetricsSnapshot, volume_totals : np.ndarray, scores : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Assembles the agent and miner metrics from the latest simulation state and the validator scoring state.
+
+    Request statistics are only refreshed (and the accumulated statistics reset) every 100 publishing intervals, retaining their
+    previous values otherwise.
+
+    Args:
+        validator: The validator, or an object exposing the same attributes (see `taos.im.neurons.exporter`).
+        previous (MetricsSnapshot): The previously published snapshot.
+        volume_totals (np.ndarray): Trade volume totals over the assessment period, of shape (uids, books, roles).
+        scores (np.ndarray): Scores of all UIDs.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The agent metrics and miner metrics arrays.
+    """
+    uids, book_count = validator.subnet_info.max_uids, validator.simulation.book_count
+    agents = np.full((uids, book_count, len(AGENT_INDEX)), np.nan)
+    miners = np.full((uids, len(MINER_INDEX)), np.nan)
+    stats = slice(MINER_INDEX['requests'], MINER_INDEX['send_offset'] + 1)
+    if previous.miners.shape == miners.shape:
+        miners[:, stats] = previous.miners[:, stats]
+    publish_stats = validator.simulation_timestamp % (validator.simulation.publish_interval * 100) == 0
+
+    volume_totals = np.round(volume_totals, validator.simulation.volumeDecimals)
+    placements = np.empty(len(scores), dtype=np.int64)
+    placements[np.argsort(-scores, kind='stable')] = np.arange(len(scores))
+    placements, scores = placements.tolist(), scores.tolist()
+    metagraph = {name : [float(value) for value in getattr(validator.metagraph, name)] for name in ['trust', 'consensus', 'incentive', 'emission']}
+
+    balances = slice(AGENT_INDEX['base_balance_total'], AGENT_INDEX['fees_taker_rate'] + 1)
+    volumes = slice(AGENT_INDEX['daily_volume'], AGENT_INDEX['daily_self_volume'] + 1)
+    for agentId, accounts in (validator.last_state.accounts or {}).items():
+        if agentId < 0: continue
+        initial_balances = validator.initial_balances[agentId]
+        agents[agentId, :, AGENT_INDEX['base_balance_initial']:AGENT_INDEX['wealth_initial'] + 1] = [
+            [initial_balances[bookId]['BASE'], initial_balances[bookId]['QUOTE'], initial_balances[bookId]['WEALTH']]
+            if initial_balances[bookId]['BASE'] is not None else [np.nan] * 3
+            for bookId in range(book_count)
+        ]
+        if validator.inventory_history.count(agentId) < 3: continue
+
+        # Agent balances, inventory, volumes and scores in each book
+        book_ids = list(accounts.keys())
+        agents[agentId, book_ids, balances] = [
+            (account['bb']['t'], account['bb']['f'], account['bb']['r'], account['qb']['t'], account['qb']['f'], account['qb']['r'],
+             account['bl'], account['bc'], account['ql'], account['qc'], account['f']['v'], account['f']['m'], account['f']['t'])
+            for account in accounts.values()
+        ]
+        _, inventory_values = validator.inventory_history.window(agentId)
+        agents[agentId, :, AGENT_INDEX['inventory_value']] = inventory_values[-1]
+        agents[agentId, :, AGENT_INDEX['pnl']] = inventory_values[-1] - inventory_values[0]
+        agents[agentId, :, volumes] = volume_totals[agentId]
+        activity_factors = np.array([validator.activity_factors[agentId][bookId] for bookId in range(book_count)])
+        agents[agentId, :, AGENT_INDEX['activity_factor']] = activity_factors
+        sharpes = validator.sharpe_values[agentId]
+        if sharpes:
+            agents[agentId, :, AGENT_INDEX['sharpe']] = [sharpes['books'][bookId] for bookId in range(book_count)]
+            if 'books_weighted' in sharpes:
+                agents[agentId, :, AGENT_INDEX['weighted_sharpe']] = [sharpes['books_weighted'][bookId] for bookId in range(book_count)]
+
+        # Miner totals over all books
+        agent = agents[agentId, book_ids]
+        miner = miners[agentId]
+        for name, metric, decimals in [
+            ('total_base_balance', 'base_balance_total', validator.simulation.baseDecimals), ('total_base_loan', 'base_loan', validator.simulation.baseDecimals),
+            ('total_base_collateral', 'base_collateral', validator.simulation.baseDecimals), ('total_quote_balance', 'quote_balance_total', validator.simulation.quoteDecimals),
+            ('total_quote_loan', 'quote_loan', validator.simulation.quoteDecimals), ('total_quote_collateral', 'quote_collateral', validator.simulation.quoteDecimals)
+        ]:
+            miner[MINER_INDEX[name]] = round(agent[:, AGENT_INDEX[metric]].sum(), decimals)
+        total_inventory = inventory_values.sum(axis=1)
+        miner[MINER_INDEX['total_inventory_value']] = total_inventory[-1]
+        miner[MINER_INDEX['pnl']] = total_inventory[-1] - total_inventory[0]
+        miner[MINER_INDEX['inventory_value_change']] = total_inventory[-1] - total_inventory[-2]
+        miner[MINER_INDEX['pnl_change']] = miner[MINER_INDEX['pnl']] - (total_inventory[-2] - total_inventory[0])
+        for role, suffix in zip(ROLES, ['', '_maker', '_taker', '_self']):
+            role_volumes = volume_totals[agentId, :, ROLE_INDEX[role]]
+            miner[MINER_INDEX[f'total_daily{suffix}_volume']] = round(role_volumes.sum(), validator.simulation.volumeDecimals)
+            miner[MINER_INDEX[f'average_daily{suffix}_volume']] = round(miner[MINER_INDEX[f'total_daily{suffix}_volume']] / book_count, validator.simulation.volumeDecimals)
+            miner[MINER_INDEX[f'min_daily{suffix}_volume']] = role_volumes.min()
+        miner[MINER_INDEX['activity_factor']] = activity_factors.mean()
+        if sharpes:
+            miner[MINER_INDEX['sharpe']] = sharpes['median']
+            for name, key in [('activity_weighted_normalized_median_sharpe', 'activity_weighted_normalized_median'), ('sharpe_penalty', 'penalty'), ('sharpe_score', 'score')]:
+                if key in sharpes:
+                    miner[MINER_INDEX[name]] = sharpes[key]
+        miner[MINER_INDEX['unnormalized_score']] = validator.unnormalized_scores[agentId]
+        miner[MINER_INDEX['score']] = scores[agentId]
+        miner[MINER_INDEX['placement']] = placements[agentId]
+        for name, values in metagraph.items():
+            miner[MINER_INDEX[name]] = values[agentId] if len(values) > agentId else 0.0
+
+        if publish_stats:
+            miner_stats = validator.miner_stats[agentId]
+            miner[stats] = [
+                miner_stats['requests'],
+                miner_stats['requests'] - miner_stats['failures'] - miner_stats['timeouts'] - miner_stats['rejections'],
+                miner_stats['failures'], miner_stats['timeouts'], miner_stats['rejections'],
+                sum(miner_stats['call_time']) / len(miner_stats['call_time']) if len(miner_stats['call_time']) > 0 else 0,
+                sum(miner_stats['send_offset']) / len(miner_stats['send_offset']) if len(miner_stats['send_offset']) > 0 else 0
+            ]
+            validator.miner_stats[agentId] = {'requests': 0, 'timeouts': 0, 'failures': 0, 'rejections': 0, 'call_time': [], 'send_offset': []}
+    return agents, miners
+
+def trade_labels(validator) -> tuple[list[tuple], list[tuple]]:
+    """
+    Assembles the labels of the recent trades in each book and the recent trades of each miner.
+
+    Args:
+        validator: The validator, or an object exposing the same attributes (see `taos.im.neurons.exporter`).
+    Returns:
+        tuple[list[tuple], list[tuple]]: Labels of the book trades and of the miner trades.
+    """
+    trades = [
+        (trade.timestamp, duration_from_timestamp(trade.timestamp), bookId, trade.taker_agent_id, trade.id,
+         trade.taker_id, trade.taker_agent_id, trade.maker_id, trade.maker_agent_id,
+         trade.maker_fee, trade.taker_fee, trade.price, trade.quantity, trade.side)
+        for bookId, book_trades in validator.recent_trades.items() for trade in book_trades
+    ]
+    miner_trades = [
+        (miner_trade.timestamp, duration_from_timestamp(miner_trade.timestamp), miner_trade.bookId, uid, role,
+         miner_trade.price, miner_trade.quantity,
+         miner_trade.side if role == 'taker' else int(not miner_trade.side),
+         miner_trade.makerFee if role == 'maker' else miner_trade.takerFee)
+        for uid, book_miner_trades in validator.recent_miner_trades.items()
+        for book_trades in book_miner_trades.values() for miner_trade, role in book_trades
+    ]
+    return trades, miner_trades
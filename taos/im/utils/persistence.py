@@ -0,0 +1,589 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Incremental persistence of the validator state as periodic checkpoints and a write-ahead log of the changes made at each step.
+
+A checkpoint holds the complete state of the validator and is written every `neuron.checkpoint_interval` steps (and on the start
+and end of a simulation).  Between checkpoints, the changes made by each reward pass are appended to the log as a record holding
+the new inventory row, the volumes changed in the latest volume bucket, the scores and the other small per-UID values which are
+replaced at every step.  Loading the state reads the checkpoint and replays the records which follow it, so that the state is
+recovered as of the latest completed reward pass.
+
+Both are captured at a consistent point (under the `state_lock` of the validator, which is held across each reward pass and any other
+change to the scoring state) but written in the background: records by a writer thread, and checkpoints by the caller's own
+thread.  The two large arrays of a checkpoint (the inventory history values and the volume buckets) are not copied when it is
+captured; instead they are shared with the checkpoint until it has been written, and copied by the `InventoryHistory` or
+`VolumeLedger` only if written to in the meantime.
+
+Directory layout:
+
+- `checkpoint.mp` : Versioned msgpack header holding the state, followed by the raw data of the arrays which it refers to.
+- `<sequence>.wal` : Length-prefixed msgpack records following the checkpoint taken after record `<sequence>`.
+
+The sharpe values are not recorded in the log, as they are recomputed in full from the inventory history by the next reward pass.
+
+Checkpoints are loaded by mapping the file into memory: the arrays are aligned within the file so that they are used in place,
+being read from disk only as they are accessed and copied privately only where written.  The recent trades are held encoded as
+a single array, to be decoded and materialized by `decode_trades` once the validator has started.  Checkpoints written with an
+earlier `SCHEMA_VERSION` are brought up to date by the `MIGRATIONS` on loading, and can be migrated in place ahead of time with:
+
+    python -m taos.im.utils.persistence <state directory>
+"""
+import os
+import mmap
+import atexit
+import struct
+import argparse
+import msgspec
+import numpy as np
+from pydantic import BaseModel
+from threading import Thread, Lock, Event
+
+from taos.im.utils.snapshot import encode_array, decode_array
+from taos.im.protocol.models import TradeInfo
+from taos.im.protocol.events import TradeEvent
+
+CHECKPOINT_FILE = 'checkpoint.mp'
+LOG_SUFFIX = '.wal'
+# Records are preceded by their length as a little-endian unsigned 32-bit integer, as were the headers of version 1 checkpoints
+PREFIX = struct.Struct('<I')
+# Checkpoint header: magic number, schema version and length of the encoded state
+HEADER = struct.Struct('<4sII')
+MAGIC = b'TSCP'
+# Version of the checkpoint schema written by `StateLog.capture`:
+#   1 : Unaligned arrays, with the recent trades held in the state
+#   2 : Arrays aligned to `ALIGNMENT` bytes, with the recent trades encoded as an array; the number of UIDs and books is recorded
+SCHEMA_VERSION = 2
+ALIGNMENT = 64
+# Extension type with which the arrays held in a checkpoint are referenced from its header
+ARRAY_EXT = 1
+
+class Checkpoint:
+    """
+    Checkpoint of the validator state captured by `StateLog.capture`, awaiting writing by `StateLog.write`.
+
+    Args:
+        sequence (int): Sequence number of the latest record reflected in the checkpoint.
+        header (bytes): Encoded state, referencing the arrays by their offset following the header.
+        arrays (list[np.ndarray]): Arrays referenced by the header, in order.
+        offsets (list[int]): Offsets of the arrays from the end of the header, as referenced by the header.
+        stores (list): The `InventoryHistory` and `VolumeLedger` which share arrays with the checkpoint until it is written.
+    """
+    def __init__(self, sequence : int, header : bytes, arrays : list[np.ndarray], offsets : list[int], stores : list):
+        self.sequence = sequence
+        self.header = header
+        self.arrays = arrays
+        self.offsets = offsets
+        self.stores = stores
+
+    @property
+    def start(self) -> int:
+        """
+        Offset in the file of the data of the arrays.
+        """
+        return aligned(HEADER.size + len(self.header))
+
+    @property
+    def size(self) -> int:
+        return self.start + (self.offsets[-1] + self.arrays[-1].nbytes if self.arrays else 0)
+
+    def write(self, path : str) -> None:
+        """
+        Writes the checkpoint to a temporary file, padding the arrays to their offsets, and moves it into place at `path`.
+        """
+        with open(path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MAGIC, SCHEMA_VERSION, len(self.header)))
+            f.write(self.header)
+            position = HEADER.size + len(self.header)
+            for array, offset in zip(self.arrays, self.offsets):
+                f.write(bytes(self.start + offset - position))
+                f.write(array.data)
+                position = self.start + offset + array.nbytes
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def release(self) -> None:
+        """
+        Releases the arrays shared with the inventory history and volume ledger.
+        """
+        for store in self.stores:
+            for array in self.arrays:
+                store.release(array)
+
+def aligned(offset : int) -> int:
+    """
+    Rounds an offset up to the next multiple of `ALIGNMENT`.
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _enc_hook(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise NotImplementedError(f"Cannot encode {type(obj)} in checkpoint")
+
+def encode_checkpoint(state : dict) -> tuple[bytes, list[np.ndarray], list[int]]:
+    """
+    Encodes a state for writing as a checkpoint.
+
+    Arrays in the state are replaced by references to their data, which follows the header in the checkpoint without being copied.
+
+    Returns:
+        tuple[bytes, list[np.ndarray], list[int]]: The header, the arrays which it references and their offsets.
+    """
+    arrays, offsets = [], []
+    offset = 0
+    def enc_hook(obj):
+        nonlocal offset
+        if isinstance(obj, np.ndarray):
+            array = np.ascontiguousarray(obj)
+            offset = aligned(offset)
+            arrays.append(array)
+            offsets.append(offset)
+            reference = msgspec.msgpack.encode([array.dtype.str, list(array.shape), offset])
+            offset += array.nbytes
+            return msgspec.msgpack.Ext(ARRAY_EXT, reference)
+        return _enc_hook(obj)
+    header = msgspec.msgpack.Encoder(enc_hook=enc_hook).encode(state)
+    return header, arrays, offsets
+
+def encode_trades(recent_trades : dict, recent_miner_trades : dict) -> np.ndarray:
+    """
+    Encodes the recent trades of each book and of each miner as an array of bytes, to be held in a checkpoint.
+    Pydantic models are encoded as their fields, in the form expected by `model_construct`.
+    """
+    encoded = msgspec.msgpack.Encoder(enc_hook=_enc_hook).encode({'recent_trades' : recent_trades, 'recent_miner_trades' : recent_miner_trades})
+    return np.frombuffer(encoded, dtype=np.uint8)
+
+def decode_trades(trades : np.ndarray | dict) -> tuple[dict, dict]:
+    """
+    Materializes the recent trades of each book and of each miner.
+
+    Args:
+        trades (np.ndarray | dict): The trades as encoded by `encode_trades`, or as held in the legacy simulation state file.
+
+    Returns:
+        tuple[dict, dict]: The recent trades of each book and of each miner.
+    """
+    if isinstance(trades, np.ndarray):
+        trades = msgspec.msgpack.decode(trades)
+    recent_trades = {book_id : [TradeInfo.model_construct(**t) for t in book_trades] for book_id, book_trades in trades["recent_trades"].items()}
+    recent_miner_trades = {uid : {book_id : [[TradeEvent.model_construct(**t), r] for t, r in book_trades] for book_id, book_trades in uid_miner_trades.items()} for uid, uid_miner_trades in trades["recent_miner_trades"].items()}
+    return recent_trades, recent_miner_trades
+
+def _migrate_1(state : dict) -> dict:
+    # The recent trades are encoded as an array, and the dimensions of the state recorded from those of the inventory history
+    simulation, validator = state['simulation'], state['validator']
+    simulation['trades'] = encode_trades(simulation.pop('recent_trades'), simulation.pop('recent_miner_trades'))
+    validator['uids'], _, validator['books'] = validator['inventory_history']['shape']
+    return state
+
+# Migrations by which a checkpoint state of each schema version is brought up to the next version
+MIGRATIONS = {
+    1 : _migrate_1
+}
+
+def migrate(state : dict, version : int) -> dict:
+    """
+    Applies the migrations required to bring a checkpoint state of the given schema version up to `SCHEMA_VERSION`.
+    """
+    for v in range(version, SCHEMA_VERSION):
+        state = MIGRATIONS[v](state)
+    return state
+
+def read_checkpoint(path : str) -> dict | None:
+    """
+    Loads a checkpoint written by `StateLog.write`, migrating it to the current schema if required.
+
+    The file is mapped into memory copy-on-write, and the arrays are returned as views onto the mapping; these are writable, but
+    writes are private to the process and are not reflected in the file.
+
+    Returns:
+        dict | None: The state in the current schema, with the arrays which it references loaded, or None if there is no
+        checkpoint.  The schema version in which the checkpoint was written is given by `version`.
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, length = HEADER.unpack_from(mm, 0)
+    if magic == MAGIC:
+        header = mm[HEADER.size:HEADER.size + length]
+        start = aligned(HEADER.size + length)
+    else:
+        # Version 1 checkpoints are preceded only by the length of the header
+        version = 1
+        length, = PREFIX.unpack_from(mm, 0)
+        header = mm[PREFIX.size:PREFIX.size + length]
+        start = PREFIX.size + length
+    def ext_hook(code, data):
+        dtype, shape, offset = msgspec.msgpack.decode(data)
+        return np.frombuffer(mm, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=start + offset).reshape(shape)
+    state = migrate(msgspec.msgpack.decode(header, ext_hook=ext_hook), version)
+    state['version'] = version
+    return state
+
+def read_records(path : str):
+    """
+    Yields the complete records in a log segment, ignoring a truncated record at the end of the file (e.g. if the process was
+    terminated while writing).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + PREFIX.size <= len(data):
+        length, = PREFIX.unpack_from(data, offset)
+        if offset + PREFIX.size + length > len(data):
+            return
+        yield msgspec.msgpack.decode(data[offset + PREFIX.size:offset + PREFIX.size + length])
+        offset += PREFIX.size + length
+
+def records_length(path : str) -> int:
+    """
+    Returns the length in bytes of the complete records in a log segment.
+    """
+    if not os.path.isfile(path):
+        return 0
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + PREFIX.size <= size:
+            f.seek(offset)
+            length, = PREFIX.unpack(f.read(PREFIX.size))
+            if offset + PREFIX.size + length > size:
+                break
+            offset += PREFIX.size + length
+    return offset
+
+class StateLog:
+    """
+    Checkpoints and write-ahead log of the validator state, held in a directory.
+
+    Records are encoded when the step is recorded, and written by a background thread which is woken for each record.
+
+    Args:
+        directory (str): Directory in which the checkpoint and log segments are written.
+    """
+    def __init__(self, directory : str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+        # Sequence number of the latest record, and of the latest record reflected in the latest checkpoint captured
+        self.sequence = 0
+        self.base = 0
+        # UIDs reset and UIDs for which initial balances were set since the latest record
+        self.resets = set()
+        self.balances = set()
+        self._hotkeys = None
+        self._encoder = msgspec.msgpack.Encoder()
+        # Encoded records and segment rotations awaiting writing, in order
+        self._pending : list[tuple[int, bytes | None]] = []
+        self._lock = Lock()
+        self._pending_lock = Lock()
+        self._write_lock = Lock()
+        self._checkpoint_lock = Lock()
+        self._wake = Event()
+        self._closed = False
+        self._file = None
+        self._segment = 0
+        self._thread = Thread(target=self._run, daemon=True, name="state-log")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _segment_path(self, base : int) -> str:
+        return os.path.join(self.directory, f"{base:012d}{LOG_SUFFIX}")
+
+    def _segments(self) -> list[int]:
+        return sorted(int(name[:-len(LOG_SUFFIX)]) for name in os.listdir(self.directory) if name.endswith(LOG_SUFFIX))
+
+    def reset(self, uid : int) -> None:
+        """
+        Notes that the scoring state of the UID has been reset, to be applied before the next record on replay.
+        """
+        self.resets.add(uid)
+        self.balances.add(uid)
+
+    def update_balances(self, uid : int) -> None:
+        """
+        Notes that initial balances of the UID have been set, to be included in the next record.
+        """
+        self.balances.add(uid)
+
+    def record(self, validator) -> int:
+        """
+        Captures the changes made to the validator state by the latest reward pass and queues them for writing to the log.
+
+        Args:
+            validator (taos.im.neurons.validator.Validator): Validator instance.
+
+        Returns:
+            int: Sequence number of the record.
+        """
+        history, ledger = validator.inventory_history, validator.trade_volumes
+        with self._lock:
+            resets, self.resets = self.resets, set()
+            balances, self.balances = self.balances, set()
+            latest = (history.head - 1) % history.lookback
+            label, indices, volumes = ledger.changes()
+            hotkeys = list(validator.hotkeys)
+            self.sequence += 1
+            record = {
+                'sequence' : self.sequence,
+                'step' : validator.step,
+                'simulation_timestamp' : validator.simulation_timestamp,
+                'resets' : sorted(resets),
+                'deregistered_uids' : list(validator.deregistered_uids),
+                'hotkeys' : hotkeys if hotkeys != self._hotkeys else None,
+                'initial_balances' : {uid : validator.initial_balances[uid] for uid in balances if uid in validator.initial_balances},
+                'inventory' : {
+                    'timestamp' : int(history.timestamps[latest]),
+                    'values' : encode_array(history.values[:, latest]),
+                    'counts' : encode_array(history.counts)
+                } if history.size > 0 else None,
+                'volumes' : {
+                    'timestamp' : ledger.timestamp,
+                    'label' : label,
+                    'indices' : encode_array(indices.astype(np.int32)),
+                    'values' : encode_array(volumes)
+                },
+                'scores' : encode_array(validator.scores.detach().cpu().numpy().astype(np.float32)),
+                'activity_factors' : validator.activity_factors,
+                'unnormalized_scores' : validator.unnormalized_scores
+            }
+            self._hotkeys = hotkeys
+            data = self._encoder.encode(record)
+            with self._pending_lock:
+                self._pending.append((self.sequence, data))
+        self._wake.set()
+        return self.sequence
+
+    def apply(self, validator, record : dict) -> None:
+        """
+        Applies a record to the validator state.  An inventory row already held in the history (at the timestamp of the latest row)
+        is not appended again.
+
+        Raises:
+            ValueError: If the inventory row of the record precedes the latest row in the history, which indicates that the state
+                was changed without being recorded (e.g. rebased at the start of a simulation without a checkpoint being written).
+        """
+        history, ledger = validator.inventory_history, validator.trade_volumes
+        for uid in record['resets']:
+            history.reset(uid)
+            ledger.reset(uid)
+        validator.initial_balances.update(record['initial_balances'])
+        inventory = record['inventory']
+        if inventory:
+            values = decode_array(inventory['values'])
+            if values.shape != (history.uids, history.books):
+                history.reshape(values.shape[0], history.lookback, values.shape[1])
+                ledger.reshape(values.shape[0], values.shape[1])
+            latest = int(history.timestamps[(history.head - 1) % history.lookback]) if history.size > 0 else None
+            if latest is None or inventory['timestamp'] > latest:
+                history.append(inventory['timestamp'], values)
+            elif inventory['timestamp'] < latest:
+                raise ValueError(f"Record {record['sequence']} holds inventory at {inventory['timestamp']}, preceding the latest inventory in the history at {latest}")
+            history.counts[:] = decode_array(inventory['counts'])
+        volumes = record['volumes']
+        ledger.apply_changes(volumes['timestamp'], volumes['label'], decode_array(volumes['indices']), decode_array(volumes['values']))
+        validator.scores = validator.scores.new_tensor(decode_array(record['scores']))
+        validator.activity_factors = record['activity_factors']
+        validator.unnormalized_scores = record['unnormalized_scores']
+        validator.deregistered_uids = record['deregistered_uids']
+        if record['hotkeys'] is not None:
+            validator.hotkeys = record['hotkeys']
+        validator.step = record['step']
+        validator.simulation_timestamp = record['simulation_timestamp']
+
+    def capture(self, validator) -> Checkpoint:
+        """
+        Captures a checkpoint of the complete validator state.  Records made after the checkpoint is captured are written to a new
+        log segment, which replaces the previous segments once the checkpoint has been written.
+
+        Args:
+            validator (taos.im.neurons.validator.Validator): Validator instance.
+
+        Returns:
+            Checkpoint: The checkpoint, to be passed to `write`.
+        """
+        with self._lock:
+            state = {
+                'sequence' : self.sequence,
+                'simulation' : {
+                    'label' : validator.simulation.label(),
+                    'start_time' : validator.start_time,
+                    'start_timestamp' : validator.start_timestamp,
+                    'step_rates' : validator.step_rates,
+                    'initial_balances' : validator.initial_balances,
+                    'trades' : encode_trades(validator.recent_trades, validator.recent_miner_trades),
+                    'pending_notices' : validator.pending_notices,
+                    'simulation.logDir' : validator.simulation.logDir
+                },
+                'validator' : {
+                    'uids' : validator.inventory_history.uids,
+                    'books' : validator.inventory_history.books,
+                    'step' : validator.step,
+                    'simulation_timestamp' : validator.simulation_timestamp,
+                    'hotkeys' : validator.hotkeys,
+                    'scores' : validator.scores.detach().cpu().numpy().astype(np.float32),
+                    'activity_factors' : validator.activity_factors,
+                    'inventory_history' : validator.inventory_history.snapshot(),
+                    'sharpe_values' : validator.sharpe_values,
+                    'unnormalized_scores' : validator.unnormalized_scores,
+                    'trade_volumes' : validator.trade_volumes.snapshot(),
+                    'deregistered_uids' : validator.deregistered_uids
+                }
+            }
+            header, arrays, offsets = encode_checkpoint(state)
+            self.base = self.sequence
+            with self._pending_lock:
+                self._pending.append((self.base, None))
+        return Checkpoint(self.base, header, arrays, offsets, [validator.inventory_history, validator.trade_volumes])
+
+    def write(self, checkpoint : Checkpoint) -> None:
+        """
+        Writes a checkpoint, replacing the previous checkpoint and removing the log segments which precede it.
+        """
+        try:
+            with self._checkpoint_lock:
+                checkpoint.write(self.checkpoint_path)
+                # The segment rotation queued on capture must be applied before the previous segments are removed
+                self.flush()
+                for base in self._segments():
+                    if base < checkpoint.sequence:
+                        os.remove(self._segment_path(base))
+        finally:
+            checkpoint.release()
+
+    def load(self) -> dict | None:
+        """
+        Loads the latest checkpoint, waiting for any pending records to be written.
+
+        Returns:
+            dict | None: The checkpoint state as read by `read_checkpoint`, with `simulation` and `validator` entries holding the
+            state captured by `capture`, or None if no checkpoint has been written.
+        """
+        self.flush()
+        with self._checkpoint_lock:
+            state = read_checkpoint(self.checkpoint_path)
+        self.base = self.sequence = state['sequence'] if state else 0
+        return state
+
+    def replay(self, validator) -> int:
+        """
+        Applies the records following the loaded checkpoint to the validator state.
+
+        Returns:
+            int: Number of records applied.
+        """
+        count = 0
+        with self._checkpoint_lock:
+            for base in self._segments():
+                for record in read_records(self._segment_path(base)):
+                    if record['sequence'] > self.sequence:
+                        self.apply(validator, record)
+                        self.sequence = record['sequence']
+                        count += 1
+        with self._write_lock:
+            # Subsequent records are appended to the segment following the loaded checkpoint
+            self._close_segment()
+            self._segment = self.base
+        self._hotkeys = list(validator.hotkeys)
+        return count
+
+    def clear(self) -> None:
+        """
+        Discards the checkpoint and all log segments.
+        """
+        self.flush()
+        with self._checkpoint_lock, self._write_lock:
+            self._close_segment()
+            for base in self._segments():
+                os.remove(self._segment_path(base))
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+            self.base = self.sequence = self._segment = 0
+            self.resets, self.balances = set(), set()
+
+    def _close_segment(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def flush(self) -> int:
+        """
+        Writes all pending records to the log.
+
+        Returns:
+            int: The number of records written.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            count = 0
+            for sequence, data in pending:
+                if data is None:
+                    self._close_segment()
+                    self._segment = sequence
+                    continue
+                if not self._file:
+                    path = self._segment_path(self._segment)
+                    # Discard any record left incomplete by a previous process, so that new records are not appended after it
+                    length = records_length(path)
+                    if os.path.isfile(path) and os.path.getsize(path) > length:
+                        os.truncate(path, length)
+                    self._file = open(path, 'ab')
+                self._file.write(PREFIX.pack(len(data)))
+                self._file.write(data)
+                count += 1
+            if self._file:
+                self._file.flush()
+            return count
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """
+        Stops the background writer, writes any pending records and closes the log.
+        """
+        atexit.unregister(self.close)
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        with self._write_lock:
+            self._close_segment()
+
+def migrate_checkpoint(directory : str) -> int:
+    """
+    Rewrites the checkpoint in a state directory in the current schema, if it was written with an earlier one.
+
+    Returns:
+        int: The schema version with which the checkpoint was written, or 0 if there is no checkpoint.
+    """
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    state = read_checkpoint(path)
+    if not state:
+        return 0
+    version = state.pop('version')
+    if version < SCHEMA_VERSION:
+        header, arrays, offsets = encode_checkpoint(state)
+        Checkpoint(state['sequence'], header, arrays, offsets, []).write(path)
+    return version
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrates the validator state checkpoint in a state directory to the current schema.")
+    parser.add_argument("directory", type=str, help="State directory (`state` within the validator `neuron.full_path`).")
+    args = parser.parse_args()
+    version = migrate_checkpoint(args.directory)
+    if not version:
+        print(f"No checkpoint in {args.directory}.")
+    elif version < SCHEMA_VERSION:
+        print(f"Migrated checkpoint in {args.directory} from schema version {version} to {SCHEMA_VERSION}.")
+    else:
+        print(f"Checkpoint in {args.directory} is already at schema version {SCHEMA_VERSION}.")
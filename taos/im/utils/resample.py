@@ -0,0 +1,158 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+from typing import Any, Literal
+import numpy as np
+
+AGGREGATIONS = ('open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count')
+
+class Buckets:
+    """
+    Assignment of the elements of a time series to fixed-length intervals.
+
+    Elements are assigned to the interval `(start + (k - 1) * interval, start + k * interval]` containing their timestamp, and each
+    non-empty interval is identified by its upper bound.  Elements with timestamps outside `[start, end]` are discarded.  The
+    positions of the retained elements are held grouped by interval in contiguous runs, preserving their original order within each
+    run, so that aggregations can be computed over all intervals at once with `np.ufunc.reduceat`.
+
+    Attributes:
+        keys (np.ndarray): Upper-bound timestamp of each non-empty interval, in order of first appearance in the series.
+        index (np.ndarray): Positions in the series of the retained elements, grouped by interval.
+        offsets (np.ndarray): Offset into `index` at which the run of each interval begins.
+        order (np.ndarray | None): Permutation taking the runs into order of first appearance, or None if they are already in order.
+    """
+    def __init__(self, timestamps : np.ndarray, start : int, end : int, interval : float):
+        interval_ns = int(interval * 1_000_000_000)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        positions = np.flatnonzero((timestamps >= start) & (timestamps <= end))
+        bucket_index = (timestamps[positions] - start) // interval_ns + 1
+        self.order = None
+        if len(bucket_index) > 1 and np.any(bucket_index[1:] < bucket_index[:-1]):
+            # Series which are not in time order are grouped with a stable sort, and the groups put back in order of first appearance
+            grouping = np.argsort(bucket_index, kind='stable')
+            positions = positions[grouping]
+            bucket_index = bucket_index[grouping]
+        self.index = positions
+        self.offsets = np.flatnonzero(np.r_[True, bucket_index[1:] != bucket_index[:-1]]) if len(bucket_index) else np.empty(0, dtype=np.int64)
+        self.keys = start + bucket_index[self.offsets] * interval_ns
+        if len(self.offsets) > 1:
+            first = positions[self.offsets]
+            if np.any(first[1:] < first[:-1]):
+                self.order = np.argsort(first, kind='stable')
+                self.keys = self.keys[self.order]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _ordered(self, values : np.ndarray) -> np.ndarray:
+        return values if self.order is None else values[self.order]
+
+    def counts(self) -> np.ndarray:
+        """Number of elements in each interval."""
+        return self._ordered(np.diff(np.r_[self.offsets, len(self.index)]))
+
+    def first(self, values : np.ndarray) -> np.ndarray:
+        """First value in each interval."""
+        return self._ordered(values[self.index[self.offsets]])
+
+    def last(self, values : np.ndarray) -> np.ndarray:
+        """Last value in each interval."""
+        return self._ordered(values[self.index[np.r_[self.offsets[1:], len(self.index)] - 1]])
+
+    def reduce(self, ufunc : np.ufunc, values : np.ndarray) -> np.ndarray:
+        """Reduction of the values in each interval with the given ufunc."""
+        return self._ordered(ufunc.reduceat(values[self.index], self.offsets))
+
+    def split(self, values : list[Any]) -> list[list[Any]]:
+        """Values in each interval as lists, in the original order of the series."""
+        ends = np.r_[self.offsets[1:], len(self.index)]
+        index = self.index.tolist()
+        runs = [[values[i] for i in index[begin:end]] for begin, end in zip(self.offsets.tolist(), ends.tolist())]
+        return runs if self.order is None else [runs[i] for i in self.order.tolist()]
+
+def _extreme(buckets : Buckets, values : np.ndarray, ufunc : np.ufunc, initial : np.ndarray | None = None) -> np.ndarray:
+    """
+    Maximum (`np.fmax`) or minimum (`np.fmin`) of the values in each interval, optionally including an additional value per interval.
+
+    The builtin `max` and `min` return the first element of a sequence whose first element is NaN and otherwise ignore NaN; this
+    is reproduced by reducing with the NaN-ignoring ufunc and restoring NaN where the first value in the interval is NaN.
+    """
+    extremes = buckets.reduce(ufunc, values)
+    if initial is not None:
+        extremes = ufunc(extremes, initial)
+    if values.dtype.kind == 'f':
+        extremes = np.where(np.isnan(buckets.first(values)), np.nan, extremes)
+    return extremes
+
+def bucket(timestamps : np.ndarray, values : list[Any], start : int, end : int, interval : float) -> dict[int, list[Any]]:
+    """
+    Buckets a time series into intervals based on timestamp.
+
+    Args:
+        timestamps (np.ndarray): Timestamps of the series elements.
+        values (list[Any]): Values of the series elements.
+        start (int): Timestamp from which intervals are measured; elements before this time are discarded.
+        end (int): Elements after this time are discarded.
+        interval (float): Bucket size in seconds.
+
+    Returns:
+        dict[int, list[Any]]: Buckets indexed by upper-bound timestamps.
+    """
+    buckets = Buckets(timestamps, start, end, interval)
+    return dict(zip(buckets.keys.tolist(), buckets.split(values)))
+
+def sample(
+    timestamps : np.ndarray,
+    values : np.ndarray,
+    start : int,
+    end : int,
+    interval : float,
+    method : Literal['open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count'] = 'close'
+) -> dict[int, Any]:
+    """
+    Aggregates a time series over regular intervals.
+
+    Only intervals containing at least one element are included.  For `ohlc`, the open of each interval is the close of the
+    preceding interval (or the first value for the first interval), and is included in the high and low.
+
+    Args:
+        timestamps (np.ndarray): Timestamps of the series elements.
+        values (np.ndarray): Values of the series elements.
+        start (int): Timestamp from which intervals are measured; elements before this time are discarded.
+        end (int): Elements after this time are discarded.
+        interval (float): Interval length in seconds.
+        method (str): Aggregation; one of 'open', 'high', 'low', 'close', 'ohlc', 'mean', 'sum', 'count'.
+
+    Returns:
+        dict[int, Any]: Aggregated series indexed by the upper-bound timestamp of each interval.
+    """
+    if method not in AGGREGATIONS:
+        raise ValueError(f"Unknown sampling method '{method}' : must be one of {AGGREGATIONS}")
+    values = np.asarray(values)
+    buckets = Buckets(timestamps, start, end, interval)
+    keys = buckets.keys.tolist()
+    if not len(buckets):
+        return {}
+    if method == 'open':
+        result = buckets.first(values)
+    elif method == 'close':
+        result = buckets.last(values)
+    elif method == 'high':
+        result = _extreme(buckets, values, np.fmax)
+    elif method == 'low':
+        result = _extreme(buckets, values, np.fmin)
+    elif method == 'sum':
+        result = buckets.reduce(np.add, values)
+    elif method == 'count':
+        result = buckets.counts()
+    elif method == 'mean':
+        result = buckets.reduce(np.add, values.astype(np.float64)) / buckets.counts()
+    else:
+        close = buckets.last(values)
+        open_ = np.r_[buckets.first(values)[:1], close[:-1]]
+        high = _extreme(buckets, values, np.fmax, open_)
+        low = _extreme(buckets, values, np.fmin, open_)
+        return {
+            ts : {'open' : o, 'high' : h, 'low' : l, 'close' : c}
+            for ts, o, h, l, c in zip(keys, open_.tolist(), high.tolist(), low.tolist(), close.tolist())
+        }
+    return dict(zip(keys, result.tolist()))
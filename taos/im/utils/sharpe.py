@@ -3,6 +3,7 @@
 from loky.backend.context import set_start_method
 set_start_method('forkserver', force=True)
 from loky import get_reusable_executor
+import numpy as np
 
 from taos.im.utils import normalize
 
@@ -14,7 +15,8 @@ def sharpe(uid, inventory_values, lookback, norm_min, norm_max, min_lookback, gr
     Args:
         self (taos.im.neurons.validator.Validator) : Validator instance
         uid (int) : UID of miner being scored
-        inventory_values (Dict[Dict[int, float]]) : Array of last `config.scoring.sharpe.lookback` inventory values for the miner
+        inventory_values (Dict[Dict[int, float]] | tuple[np.ndarray, np.ndarray]) : Last `config.scoring.sharpe.lookback` inventory values for the miner, either as a
+            dictionary keyed by timestamp and book ID or as a tuple of timestamps and a `(timestamps, books)` array of values as returned by `InventoryHistory.window`
 
     Returns:
     dict: A dictionary containing all relevant calculated Sharpe values for the UID.  This includes Sharpe for their total inventory value and Sharpe calculated on each book along with
@@ -23,17 +25,22 @@ def sharpe(uid, inventory_values, lookback, norm_min, norm_max, min_lookback, gr
     import traceback
     import numpy as np
     try:
-        if uid in deregistered_uids or len(inventory_values) < min(min_lookback, lookback): return None
+        if isinstance(inventory_values, tuple):
+            timestamps, np_inventory_values = inventory_values
+        else:
+            timestamps = list(inventory_values.keys())
+            np_inventory_values = np.array([list(iv.values()) for iv in inventory_values.values()])
+        if uid in deregistered_uids or len(timestamps) < min(min_lookback, lookback): return None
         sharpe_values = {'books' : {}}
         # Calculate the per-book Sharpe ratio values
-        np_inventory_values = np.array([list(iv.values()) for iv in inventory_values.values()]).T
-        timestamps = list(inventory_values.keys())
         changeover = [i for i in range(len(timestamps)-1) if timestamps[i+1] >= timestamps[i] + grace_period]
         bookId = 0
-        for book_inventory_values in np_inventory_values:
+        for book_inventory_values in np_inventory_values.T:
             returns = (book_inventory_values[1:] - book_inventory_values[:-1])
             if len(changeover) > 0:
                 returns = np.delete(returns, changeover)
+            # Returns adjoining a skipped (NaN) observation are excluded
+            returns = returns[~np.isnan(returns)]
             std = returns.std()
             sharpe_values['books'][bookId] = np.sqrt(len(returns)) * (returns.mean() / std) if std != 0.0 else 0.0
             bookId += 1
@@ -44,10 +51,11 @@ def sharpe(uid, inventory_values, lookback, norm_min, norm_max, min_lookback, gr
         sharpe_values['median'] = np.median(all_sharpes)            
             
         # Calculate the total Sharpe ratio value using inventories summed over all books
-        total_inventory_values = np.array([sum(list(inventory_value.values())) for inventory_value in inventory_values.values()])
+        total_inventory_values = np_inventory_values.sum(axis=1)
         returns = (total_inventory_values[1:] - total_inventory_values[:-1])
         if len(changeover) > 0:
             returns = np.delete(returns, changeover)
+        returns = returns[~np.isnan(returns)]
         std = returns.std()
         sharpe_values['total'] = np.sqrt(len(returns)) * (returns.mean() / std) if std != 0.0 else 0.0
         
@@ -72,4 +80,247 @@ def batch_sharpe(inventory_values, batches, lookback, norm_min, norm_max, min_lo
     for task in tasks:
         result = task.result()
         sharpe_batches.append(result)
-    return {int(k): v for d in sharpe_batches for k, v in d.items()}
\ No newline at end of file
+    return {int(k): v for d in sharpe_batches for k, v in d.items()}
+
+def ring_continuity(timestamps, grace_period):
+    """
+    Flags, for each slot of a timestamp ring, whether the return ending at that slot is free of a simulation changeover
+    (i.e. the gap from the preceding slot is less than `grace_period`).
+    """
+    continuous = np.empty(len(timestamps), dtype=bool)
+    continuous[1:] = timestamps[1:] < timestamps[:-1] + grace_period
+    continuous[0] = timestamps[0] < timestamps[-1] + grace_period
+    return continuous
+
+def ring_returns(values, timestamps, counts, head, rows, grace_period):
+    """
+    Materializes the returns held in the ring for the given rows along with the mask of returns which are valid for scoring.
+    Returns adjoining a skipped (NaN) observation are masked, and zeroed so that they do not propagate into the masked sums.
+
+    Args:
+        values (np.ndarray) : Inventory value ring of shape `(uids, lookback, books)`
+        timestamps (np.ndarray) : Timestamp ring of shape `(lookback,)` shared by all UIDs
+        counts (np.ndarray) : Number of valid observations held for each UID
+        head (int) : Index of the ring slot which will receive the next observation
+        rows (np.ndarray) : UIDs for which to compute returns
+        grace_period (int) : Minimum timestamp gap indicating a simulation changeover
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Returns of shape `(rows, lookback, books)` and float mask of shape `(rows, lookback)`.
+    """
+    size = values.shape[1]
+    # Number of steps since the observation at each slot was written
+    age = (head - 1 - np.arange(size)) % size
+    chunk = values[rows]
+    returns = np.empty_like(chunk)
+    np.subtract(chunk[:, 1:], chunk[:, :-1], out=returns[:, 1:])
+    np.subtract(chunk[:, 0], chunk[:, -1], out=returns[:, 0])
+    valid = (age < np.expand_dims(counts[rows] - 1, 1)) & ring_continuity(timestamps, grace_period)
+    skipped = np.isnan(returns)
+    if skipped.any():
+        valid &= ~skipped.any(axis=2)
+        returns[skipped] = 0.0
+    return returns, valid.astype(np.float64)
+
+def sharpe_ratio(mean, std, n):
+    """
+    Evaluates `sqrt(n) * mean / std` elementwise, yielding zero where the standard deviation vanishes.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std != 0.0, np.sqrt(n) * mean / std, 0.0)
+
+def sharpe_values(rows, book_sharpes, total_sharpes, norm_min, norm_max) -> dict:
+    """
+    Assembles the per-UID Sharpe dictionaries in the format returned by `sharpe` from `(rows, books)` and `(rows,)` arrays of ratios.
+    """
+    averages = book_sharpes.mean(axis=1)
+    medians = np.median(book_sharpes, axis=1)
+    return {
+        int(row) : {
+            'books' : dict(enumerate(book_sharpes[i].tolist())),
+            'average' : float(averages[i]),
+            'median' : float(medians[i]),
+            'total' : float(total_sharpes[i]),
+            'normalized_average' : normalize(norm_min, norm_max, float(averages[i])),
+            'normalized_median' : normalize(norm_min, norm_max, float(medians[i])),
+            'normalized_total' : normalize(norm_min, norm_max, float(total_sharpes[i]))
+        } for i, row in enumerate(rows)
+    }
+
+def sharpe_ring(values, timestamps, counts, head, uids, lookback, norm_min, norm_max, min_lookback, grace_period, deregistered_uids, chunk_size=16) -> dict:
+    """
+    Calculates Sharpe ratios for many UIDs at once directly from the ring buffer arrays of an `InventoryHistory`.
+
+    Returns are evaluated in ring order, so that no reordering copy of the history is required: the return held at each slot is the difference
+    between the value at that slot and the value at the preceding slot.  Returns which fall outside the valid window of a UID, and returns spanning
+    a simulation changeover (timestamp gap of at least `grace_period`), are excluded by masking rather than deletion.  Results are identical to
+    those of `sharpe` evaluated on the chronologically ordered history of each UID.
+
+    Args:
+        values (np.ndarray) : Inventory value ring of shape `(uids, lookback, books)`
+        timestamps (np.ndarray) : Timestamp ring of shape `(lookback,)` shared by all UIDs
+        counts (np.ndarray) : Number of valid observations held for each UID
+        head (int) : Index of the ring slot which will receive the next observation
+        uids (np.ndarray) : UIDs to be evaluated, indexing the leading axis of `values` and `counts`
+        chunk_size (int) : Number of UIDs for which returns are materialized at once, bounding the temporary memory required
+
+    Returns:
+        dict: Dictionary mapping each UID to its Sharpe values in the format returned by `sharpe`, or None where the UID is not eligible for scoring.
+    """
+    uids = np.asarray(uids, dtype=np.int64)
+    eligible = (counts[uids] >= min(min_lookback, lookback)) & ~np.isin(uids, list(deregistered_uids))
+
+    def ratio(returns, mask, n):
+        # Population standard deviation over the masked returns
+        mean = (returns * mask).sum(axis=1) / n
+        std = np.sqrt((((returns - np.expand_dims(mean, 1)) * mask) ** 2).sum(axis=1) / n)
+        return sharpe_ratio(mean, std, n)
+
+    results = {int(uid) : None for uid in uids}
+    for start in range(0, len(uids), chunk_size):
+        rows = uids[start:start + chunk_size][eligible[start:start + chunk_size]]
+        if len(rows) == 0: continue
+        returns, mask = ring_returns(values, timestamps, counts, head, rows, grace_period)
+        n = np.maximum(mask.sum(axis=1), 1.0)
+        results.update(sharpe_values(rows, ratio(returns, mask[:, :, None], n[:, None]), ratio(returns.sum(axis=2), mask, n), norm_min, norm_max))
+    return results
+
+def batch_sharpe_ring(inventory_history, batches, lookback, norm_min, norm_max, min_lookback, grace_period, deregistered_uids):
+    """
+    Distributes `sharpe_ring` over a process pool, shipping each worker only the slice of the ring belonging to its batch of UIDs.
+    """
+    pool = get_reusable_executor(max_workers=len(batches))
+    # Workers receive their slice re-indexed from zero, with deregistered UIDs translated into that indexing
+    tasks = [(batch, pool.submit(sharpe_ring, inventory_history.values[batch], inventory_history.timestamps, inventory_history.counts[batch], inventory_history.head, np.arange(len(batch)),
+                         lookback, norm_min, norm_max, min_lookback, grace_period, [i for i, uid in enumerate(batch) if uid in deregistered_uids])) for batch in batches]
+    return {int(batch[k]) : v for batch, task in tasks for k, v in task.result().items()}
+
+# Sum of squared deviations, relative to the sum of squared returns added and removed since the last recomputation, below which the
+# running statistics of a window may be dominated by cancellation error and are recomputed from the ring
+VARIANCE_TOLERANCE = 1e-10
+
+class RollingSharpe:
+    """
+    Sliding-window estimator of the per-book and total Sharpe ratios of every UID.
+
+    Running means and sums of squared deviations of the valid returns in each UID's window are maintained with Welford's algorithm,
+    adding the newest return and removing the evicted one as each observation is written to the `InventoryHistory` ring.
+    The cost of a step is therefore proportional to `uids x books` regardless of the lookback.  To bound the accumulation of
+    floating point error, the statistics are recomputed exactly from the ring once every `lookback` updates.
+
+    Adding and removing returns leaves a residue in the sums of squared deviations of the order of the largest returns processed,
+    which is significant once those returns have left the window (e.g. for an idle miner, whose ratio would otherwise be large and
+    spurious).  The squared returns processed since the last recomputation are therefore accumulated alongside, and the statistics of
+    any UID whose sum of squared deviations falls below `VARIANCE_TOLERANCE` relative to them are recomputed exactly from the ring.
+    """
+    def __init__(self, history, grace_period : int):
+        self.grace_period = grace_period
+        self.resync(history)
+
+    def resync(self, history, chunk_size : int = 16) -> None:
+        """
+        Recomputes the statistics of all UIDs exactly from the contents of the ring.
+        The final column of the statistics arrays holds the values for inventory summed over all books.
+        """
+        self.n = np.zeros(history.uids, dtype=np.float64)
+        self.mean = np.zeros((history.uids, history.books + 1), dtype=np.float64)
+        self.m2 = np.zeros((history.uids, history.books + 1), dtype=np.float64)
+        self.scale = np.zeros((history.uids, history.books + 1), dtype=np.float64)
+        self.recompute(history, np.arange(history.uids), chunk_size)
+        self.updates = 0
+
+    def recompute(self, history, rows : np.ndarray, chunk_size : int = 16) -> None:
+        """
+        Recomputes the statistics of the given UIDs exactly from the contents of the ring.
+        """
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            returns, mask = ring_returns(history.values, history.timestamps, history.counts, history.head, chunk, self.grace_period)
+            returns = np.concatenate([returns, returns.sum(axis=2, keepdims=True)], axis=2)
+            mask = mask[:, :, None]
+            n = mask.sum(axis=1)
+            mean = (returns * mask).sum(axis=1) / np.maximum(n, 1.0)
+            self.n[chunk] = n[:, 0]
+            self.mean[chunk] = mean
+            self.m2[chunk] = (((returns - mean[:, None]) * mask) ** 2).sum(axis=1)
+            self.scale[chunk] = ((returns * mask) ** 2).sum(axis=1)
+
+    def reset(self, uid : int) -> None:
+        """
+        Discards the statistics held for the UID.
+        """
+        self.n[uid] = 0.0
+        self.mean[uid] = 0.0
+        self.m2[uid] = 0.0
+        self.scale[uid] = 0.0
+
+    def _add(self, rows, returns) -> None:
+        n = self.n[rows] + 1.0
+        mean = self.mean[rows]
+        delta = returns - mean
+        mean = mean + delta / n[:, None]
+        self.m2[rows] += delta * (returns - mean)
+        self.scale[rows] += returns ** 2
+        self.mean[rows] = mean
+        self.n[rows] = n
+
+    def _remove(self, rows, returns) -> None:
+        n = self.n[rows] - 1.0
+        mean = self.mean[rows]
+        delta = returns - mean
+        mean = np.where(n[:, None] > 0, mean - delta / np.maximum(n, 1.0)[:, None], 0.0)
+        self.m2[rows] = np.where(n[:, None] > 0, np.maximum(self.m2[rows] - delta * (returns - mean), 0.0), 0.0)
+        self.scale[rows] += returns ** 2
+        self.mean[rows] = mean
+        self.n[rows] = n
+
+    def update(self, history, timestamp : int, values : np.ndarray) -> None:
+        """
+        Updates the statistics for a new observation.  Must be called immediately before the observation is appended to `history`,
+        since the evicted return is read from the slot which is about to be overwritten.
+
+        Args:
+            history (taos.im.utils.inventory.InventoryHistory) : Inventory history store to which the observation will be appended
+            timestamp (int) : Simulation timestamp of the observation
+            values (np.ndarray) : Array of shape `(uids, books)` containing the inventory value of each UID on each book
+        """
+        def observed(rows, returns):
+            # Returns adjoining a skipped (NaN) observation are neither added nor removed, as they are excluded by `ring_returns`
+            keep = ~np.isnan(returns).any(axis=1)
+            return rows[keep], returns[keep]
+        if self.updates >= history.lookback:
+            self.resync(history)
+        self.updates += 1
+        size, head = history.lookback, history.head
+        if size < 2: return
+        # Remove the return between the two oldest observations of UIDs whose window is full, unless it spanned a changeover
+        following = (head + 1) % size
+        if history.timestamps[following] < history.timestamps[head] + self.grace_period:
+            rows = np.flatnonzero(history.counts == size)
+            if len(rows) > 0:
+                rows, returns = observed(rows, history.values[rows, following] - history.values[rows, head])
+                self._remove(rows, np.concatenate([returns, returns.sum(axis=1, keepdims=True)], axis=1))
+        # Add the return between the latest held observation and the new observation
+        previous = (head - 1) % size
+        if timestamp < history.timestamps[previous] + self.grace_period:
+            rows = np.flatnonzero(history.counts > 0)
+            if len(rows) > 0:
+                rows, returns = observed(rows, values[rows] - history.values[rows, previous])
+                self._add(rows, np.concatenate([returns, returns.sum(axis=1, keepdims=True)], axis=1))
+
+    def sharpe(self, history, uids, lookback, norm_min, norm_max, min_lookback, deregistered_uids) -> dict:
+        """
+        Calculates the Sharpe values of the given UIDs from the current statistics.
+
+        Returns:
+            dict: Dictionary mapping each UID to its Sharpe values in the format returned by `sharpe`, or None where the UID is not eligible for scoring.
+        """
+        uids = np.asarray(uids, dtype=np.int64)
+        rows = uids[(history.counts[uids] >= min(min_lookback, lookback)) & ~np.isin(uids, list(deregistered_uids))]
+        # Statistics which may be dominated by cancellation error are replaced by their exact values
+        cancelled = rows[(self.m2[rows] < VARIANCE_TOLERANCE * self.scale[rows]).any(axis=1)]
+        if len(cancelled) > 0:
+            self.recompute(history, cancelled)
+        n = np.maximum(self.n[rows], 1.0)[:, None]
+        ratios = sharpe_ratio(self.mean[rows], np.sqrt(self.m2[rows] / n), n)
+        return {int(uid) : None for uid in uids} | sharpe_values(rows, ratios[:, :-1], ratios[:, -1], norm_min, norm_max)
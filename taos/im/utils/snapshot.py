@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+"""
+Ring of fixed-size slots in a memory-mapped file, through which the validator publishes per-step snapshots to other processes.
+
+A single writer publishes each snapshot into the next slot of the ring with a sequence number, and any number of readers in other
+processes can read the latest or any of the `slots` most recent snapshots without coordinating with the writer.  Each slot is
+guarded by its sequence number: the writer clears it before writing the payload and sets it once the payload is complete, and a
+reader only accepts a payload if the sequence number of the slot is that requested both before and after copying it, so that
+incomplete or overwritten snapshots are never returned.
+
+The file is intended to be placed in a memory-backed file system (by default under `/dev/shm`), where the slots occupy memory only
+as they are written, so that publishing a snapshot costs little more than copying it.
+"""
+import os
+import mmap
+import struct
+import numpy as np
+
+# Names of the rings, within `reporting.snapshot_dir`, to which the validator publishes the raw state updates received from the
+# simulator and its scoring state following each reward calculation
+STATE_RING = 'state.ring'
+VALIDATOR_RING = 'validator.ring'
+# Attributes of the simulation config included in the validator snapshots
+SIMULATION_FIELDS = ['book_count', 'block_count', 'books_per_block', 'logDir', 'publish_interval', 'baseDecimals', 'quoteDecimals', 'volumeDecimals']
+
+# File header: magic number, format version, number of slots, slot capacity in bytes and sequence number of the latest snapshot
+HEADER = struct.Struct('<4sIIQQ')
+MAGIC = b'TAOS'
+VERSION = 1
+# Slot header: sequence number of the snapshot held in the slot (zero while being written) and length of the payload in bytes
+SLOT_HEADER = struct.Struct('<QQ')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = HEADER.size - SEQUENCE.size
+
+def encode_array(array : np.ndarray) -> dict:
+    """
+    Returns a msgpack-serializable representation of an array holding its raw data.
+    """
+    array = np.ascontiguousarray(array)
+    return {'dtype' : array.dtype.str, 'shape' : list(array.shape), 'data' : array.data}
+
+def decode_array(encoded : dict) -> np.ndarray:
+    """
+    Reconstructs an array from the representation returned by `encode_array`.
+    """
+    return np.frombuffer(encoded['data'], dtype=np.dtype(encoded['dtype'])).reshape(encoded['shape'])
+
+class SnapshotRing:
+    """
+    Memory-mapped ring of snapshots.
+
+    Args:
+        path (str): Path of the ring file.
+        slots (int): Number of slots in the ring; only used when creating the ring.
+        slot_size (int): Maximum size of a snapshot in bytes; only used when creating the ring.
+        create (bool): If True, the ring is (re-)created for writing; otherwise an existing ring is opened for reading.
+    """
+    def __init__(self, path : str, slots : int = 4, slot_size : int = 256 * 1024 * 1024, create : bool = False):
+        self.path = path
+        if create:
+            # The ring is created under a temporary name and moved into place, so that readers of a previous ring are unaffected
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, slots, slot_size, 0))
+                f.truncate(HEADER.size + slots * (SLOT_HEADER.size + slot_size))
+            os.replace(path + '.tmp', path)
+        self.file = open(path, 'r+b' if create else 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+        magic, version, self.slots, self.slot_size, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} snapshot ring")
+
+    @property
+    def sequence(self) -> int:
+        """
+        Sequence number of the latest complete snapshot (0 if none has been published).
+        """
+        return SEQUENCE.unpack_from(self.mm, SEQUENCE_OFFSET)[0]
+
+    def replaced(self) -> bool:
+        """
+        Returns True if the ring has since been re-created (e.g. by a restarted validator), in which case it must be re-opened.
+        """
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _offset(self, sequence : int) -> int:
+        return HEADER.size + (sequence % self.slots) * (SLOT_HEADER.size + self.slot_size)
+
+    def publish(self, *parts : bytes | memoryview) -> int:
+        """
+        Writes a snapshot, consisting of the concatenation of `parts`, into the next slot of the ring.
+
+        Args:
+            *parts (bytes | memoryview): Consecutive parts of the snapshot.
+
+        Returns:
+            int: Sequence number of the snapshot.
+        """
+        length = sum(len(part) for part in parts)
+        if length > self.slot_size:
+            raise ValueError(f"Snapshot of {length} bytes exceeds the slot size of {self.path} ({self.slot_size} bytes)")
+        sequence = self.sequence + 1
+        offset = self._offset(sequence)
+        SLOT_HEADER.pack_into(self.mm, offset, 0, 0)
+        position = offset + SLOT_HEADER.size
+        for part in parts:
+            self.mm[position:position + len(part)] = part
+            position += len(part)
+        SLOT_HEADER.pack_into(self.mm, offset, sequence, length)
+        SEQUENCE.pack_into(self.mm, SEQUENCE_OFFSET, sequence)
+        return sequence
+
+    def read(self, sequence : int) -> bytes | None:
+        """
+        Copies the snapshot with the given sequence number out of the ring.
+
+        Returns:
+            bytes | None: The snapshot, or None if it is no longer (or not yet) held in the ring.
+        """
+        if sequence <= 0:
+            return None
+        offset = self._offset(sequence)
+        slot_sequence, length = SLOT_HEADER.unpack_from(self.mm, offset)
+        if slot_sequence != sequence:
+            return None
+        payload = self.mm[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + length]
+        if SEQUENCE.unpack_from(self.mm, offset)[0] != sequence:
+            return None
+        return payload
+
+    def close(self) -> None:
+        self.mm.close()
+        self.file.close()
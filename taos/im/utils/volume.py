@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import math
+import numpy as np
+
+ROLES = ['total', 'maker', 'taker', 'self']
+ROLE_INDEX = {role : i for i, role in enumerate(ROLES)}
+
+class VolumeLedger:
+    """
+    Time-bucketed ring buffer of the trading volume of every UID on every book, split by role.
+
+    Volumes are accumulated into buckets of width `sampling_interval`, each labelled with the end of the interval it covers
+    (`ceil(timestamp / sampling_interval) * sampling_interval`).  Enough buckets are held to cover `assessment_period`, and the oldest
+    bucket is overwritten as each new one is opened.  Windowed volume totals are answered from prefix sums over the buckets in
+    chronological order, which are computed once and reused until the ledger is next modified.
+
+    The ledger is modified only by the reward thread, but totals are also read from the reporting threads.  The prefix sums are
+    therefore published in a single assignment, tagged with the `generation` of the ledger from which they were computed, and are
+    recomputed by a reader which finds them tagged with an earlier generation.
+    """
+    def __init__(self, uids : int, books : int, sampling_interval : int, assessment_period : int, volume_decimals : int):
+        self.sampling_interval = int(sampling_interval)
+        self.assessment_period = int(assessment_period)
+        self.volume_decimals = volume_decimals
+        capacity = math.ceil(self.assessment_period / self.sampling_interval) + 2
+        self.volumes = np.zeros((uids, books, len(ROLES), capacity), dtype=np.float64)
+        self.times = np.zeros(capacity, dtype=np.int64)
+        # Index of the slot which will receive the next bucket
+        self.head = 0
+        # Number of buckets which have been opened since the ledger was created
+        self.size = 0
+        # Latest timestamp passed to `advance`; buckets ending before `timestamp - assessment_period` are excluded from totals
+        self.timestamp = 0
+        # Incremented on every modification, invalidating the prefix sums computed before it
+        self.generation = 0
+        self._prefix = None
+        # Set while `volumes` is held by a snapshot, in which case it is copied before it is next written
+        self._shared = False
+        # Flat indices of the volumes in the latest bucket recorded since the last call to `changes`
+        self._changed = []
+
+    @property
+    def uids(self) -> int:
+        return self.volumes.shape[0]
+
+    @property
+    def books(self) -> int:
+        return self.volumes.shape[1]
+
+    @property
+    def capacity(self) -> int:
+        return self.volumes.shape[3]
+
+    def sample(self, timestamp : int) -> int:
+        """
+        Returns the label of the bucket into which volume traded at `timestamp` is accumulated.
+        """
+        return math.ceil(timestamp / self.sampling_interval) * self.sampling_interval
+
+    def slots(self) -> np.ndarray:
+        """
+        Returns the ring indices of the held buckets in chronological order.
+        """
+        return (self.head - self.size + np.arange(self.size)) % self.capacity
+
+    def advance(self, timestamp : int) -> None:
+        """
+        Moves the ledger forward to `timestamp`, opening a new bucket for the sampling interval containing it if required.
+        Opening a bucket overwrites the oldest held bucket once the ring is full.
+        """
+        self.timestamp = timestamp
+        self._open(self.sample(timestamp))
+        self.generation += 1
+
+    def _own(self) -> None:
+        # Copies the volumes before they are written if they are held by a snapshot
+        if self._shared:
+            self.volumes = self.volumes.copy()
+            self._shared = False
+
+    def _open(self, label : int) -> None:
+        # Opens a new bucket with the given label unless it is already the latest bucket
+        if self.size == 0 or label > self.times[(self.head - 1) % self.capacity]:
+            self._own()
+            self.volumes[..., self.head] = 0.0
+            self.times[self.head] = label
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def record(self, uids, books, roles, volumes) -> None:
+        """
+        Adds traded volume into the latest bucket, rounding the bucket total to `volume_decimals` after each addition.
+
+        Args:
+            uids (array-like) : UIDs of the agents which traded
+            books (array-like) : Book IDs on which the trades occurred
+            roles (array-like) : Indices into `ROLES` of the role in which each volume is to be recorded
+            volumes (array-like) : Traded volumes in quote currency
+        """
+        if len(volumes) == 0: return
+        self._own()
+        latest = (self.head - 1) % self.capacity
+        for uid, book, role, volume in zip(uids, books, roles, volumes):
+            self.volumes[uid, book, role, latest] = round(float(self.volumes[uid, book, role, latest]) + volume, self.volume_decimals)
+        self._changed.append(np.ravel_multi_index((uids, books, roles), self.volumes.shape[:3]))
+        self.generation += 1
+
+    def latest(self) -> np.ndarray:
+        """
+        Returns the volumes in the most recently opened bucket as an array of shape `(uids, books, roles)`.
+        """
+        if self.size == 0:
+            return np.zeros(self.volumes.shape[:3], dtype=np.float64)
+        return self.volumes[..., (self.head - 1) % self.capacity]
+
+    def totals(self, since : int | None = None) -> np.ndarray:
+        """
+        Returns the total volumes in buckets labelled at or after `since` as an array of shape `(uids, books, roles)`.
+
+        Args:
+            since (int) : Earliest bucket label to include; defaults to the start of the assessment period ending at the latest timestamp
+
+        Returns:
+            np.ndarray: Volume totals for each UID, book and role.
+        """
+        start = self.timestamp - self.assessment_period
+        since = start if since is None else max(since, start)
+        # The cache is read once, and replaced rather than modified, so that it is never seen part way through an update
+        cached = self._prefix
+        if cached is None or cached[0] != self.generation:
+            generation = self.generation
+            slots = self.slots()
+            cached = (generation, self.times[slots], np.cumsum(self.volumes[..., slots], axis=3))
+            self._prefix = cached
+        _, times, prefix = cached
+        first = int(np.searchsorted(times, since, side='left'))
+        if first >= len(times):
+            return np.zeros(self.volumes.shape[:3], dtype=np.float64)
+        return prefix[..., -1] - (prefix[..., first - 1] if first > 0 else 0.0)
+
+    def reset(self, uid : int) -> None:
+        """
+        Discards all volume held for the UID.
+        """
+        self._own()
+        self.volumes[uid] = 0.0
+        self.generation += 1
+
+    def reshape(self, uids : int, books : int) -> None:
+        """
+        Re-allocates the ledger for a new number of UIDs or books, retaining the volumes which fit.
+        """
+        if (uids, books) == self.volumes.shape[:2]: return
+        volumes = np.zeros((uids, books, len(ROLES), self.capacity), dtype=np.float64)
+        u = min(uids, self.uids)
+        b = min(books, self.books)
+        volumes[:u, :b] = self.volumes[:u, :b]
+        self.volumes = volumes
+        self.generation += 1
+        self._shared = False
+        self._changed = []
+
+    def rebase(self, offset : int) -> None:
+        """
+        Shifts all bucket labels back by `offset`, discarding any buckets which would then fall at or after `offset`.
+        Used to carry volume history across into a new simulation whose clock restarts at zero.
+        """
+        slots = self.slots()
+        self.times[slots] -= offset
+        drop = int(np.count_nonzero(self.times[slots] >= offset))
+        if drop > 0:
+            self.head = (self.head - drop) % self.capacity
+            self.size -= drop
+        self.timestamp -= offset
+        self.generation += 1
+
+    def to_dict(self) -> dict:
+        """
+        Returns a msgpack-serializable representation of the ledger with the arrays encoded as raw bytes.
+        """
+        return {
+            "shape" : list(self.volumes.shape),
+            "sampling_interval" : self.sampling_interval,
+            "assessment_period" : self.assessment_period,
+            "head" : self.head,
+            "size" : self.size,
+            "timestamp" : self.timestamp,
+            "volumes" : self.volumes.tobytes(),
+            "times" : self.times.tobytes()
+        }
+
+    def snapshot(self) -> dict:
+        """
+        Returns the representation of `to_dict` without copying the volumes, which are given as the array itself.
+
+        The array is shared with the snapshot until `release` is called with it: if the ledger is written to in the meantime, the
+        array is first copied so that the snapshot continues to hold the volumes at the time it was taken.
+        """
+        self._shared = True
+        return {
+            "shape" : list(self.volumes.shape),
+            "sampling_interval" : self.sampling_interval,
+            "assessment_period" : self.assessment_period,
+            "head" : self.head,
+            "size" : self.size,
+            "timestamp" : self.timestamp,
+            "volumes" : self.volumes,
+            "times" : self.times.tobytes()
+        }
+
+    def release(self, volumes : np.ndarray) -> None:
+        """
+        Releases the volumes array held by a snapshot, allowing it to be written in place again.
+        """
+        if volumes is self.volumes:
+            self._shared = False
+
+    def changes(self) -> tuple[int | None, np.ndarray, np.ndarray]:
+        """
+        Returns the label of the latest bucket (None if no bucket has been opened) with the flat indices into its volumes of shape
+        `(uids, books, roles)` and the values of the volumes recorded in it since the previous call, from which the bucket can
+        be brought up to date with `apply_changes`.
+        """
+        changed, self._changed = self._changed, []
+        if self.size == 0:
+            return None, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        latest = (self.head - 1) % self.capacity
+        indices = np.unique(np.concatenate(changed)) if changed else np.empty(0, dtype=np.int64)
+        return int(self.times[latest]), indices, self.volumes[..., latest].ravel()[indices]
+
+    def apply_changes(self, timestamp : int, label : int | None, indices : np.ndarray, values : np.ndarray) -> None:
+        """
+        Moves the ledger forward to `timestamp` and applies the changes returned by `changes` to the latest bucket, first opening
+        it with the given label if required.
+        """
+        self.timestamp = timestamp
+        if label is None: return
+        self._open(label)
+        self._own()
+        latest = (self.head - 1) % self.capacity
+        bucket = self.volumes[..., latest].copy()
+        bucket.ravel()[indices] = values
+        self.volumes[..., latest] = bucket
+        self.generation += 1
+
+    @classmethod
+    def from_state(cls, state : dict, uids : int, books : int, sampling_interval : int, assessment_period : int, volume_decimals : int) -> 'VolumeLedger':
+        """
+        Loads a ledger from the output of `to_dict` or `snapshot`, or from the legacy `{uid : {book_id : {role : {time : volume}}}}` structure.
+        The buckets are re-sampled if the configured sampling interval or assessment period have changed.
+        """
+        ledger = cls(uids, books, sampling_interval, assessment_period, volume_decimals)
+        if "volumes" in state:
+            shape = state["shape"]
+            volumes = np.frombuffer(state["volumes"], dtype=np.float64).reshape(shape)
+            times = np.frombuffer(state["times"], dtype=np.int64)
+            slots = (state["head"] - state["size"] + np.arange(state["size"])) % shape[3]
+            if state["sampling_interval"] == ledger.sampling_interval and state["assessment_period"] == ledger.assessment_period:
+                if isinstance(state["volumes"], np.ndarray) and volumes.shape == ledger.volumes.shape:
+                    # Volumes loaded from a checkpoint are adopted by the ledger without being copied
+                    ledger.volumes = volumes
+                else:
+                    u, b = min(uids, shape[0]), min(books, shape[1])
+                    ledger.volumes[:u, :b] = volumes[:u, :b]
+                ledger.times[:] = times
+                ledger.head, ledger.size = state["head"], state["size"]
+            else:
+                for slot in slots:
+                    ledger._load_bucket(int(times[slot]), volumes[..., slot])
+            ledger.timestamp = state["timestamp"]
+        else:
+            buckets = {}
+            for uid, uid_volumes in state.items():
+                if uid >= uids: continue
+                for book_id, role_volumes in uid_volumes.items():
+                    if book_id >= books: continue
+                    for role, volumes in role_volumes.items():
+                        for time, volume in volumes.items():
+                            buckets.setdefault(time, []).append((uid, book_id, ROLE_INDEX[role], volume))
+            for time in sorted(buckets):
+                ledger._load_bucket(time, buckets[time])
+            ledger.timestamp = max(buckets) if buckets else 0
+        return ledger
+
+    def _load_bucket(self, time : int, volumes) -> None:
+        # Volumes are given either as an array of shape `(uids, books, roles)` or as a list of `(uid, book, role, volume)` entries
+        # Labels which are not positive have been rebased from a previous simulation and are retained as they are
+        self._open(self.sample(time) if time > 0 else time)
+        bucket = self.volumes[..., (self.head - 1) % self.capacity]
+        if isinstance(volumes, np.ndarray):
+            u, b = min(self.uids, volumes.shape[0]), min(self.books, volumes.shape[1])
+            bucket[:u, :b] += volumes[:u, :b]
+        else:
+            for uid, book_id, role, volume in volumes:
+                bucket[uid, book_id, role] += volume
+        self.volumes[..., (self.head - 1) % self.capacity] = np.round(bucket, self.volume_decimals)
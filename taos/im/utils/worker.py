@@ -0,0 +1,50 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import queue
+import traceback
+import bittensor as bt
+from threading import Thread
+from typing import Callable
+
+class BackgroundWorker:
+    """
+    Executes submitted tasks one at a time, in the order submitted, on a single daemon thread.
+
+    Exceptions raised by a task are logged and do not stop the worker.
+
+    Args:
+        name (str): Name of the worker thread.
+    """
+    def __init__(self, name : str):
+        self._queue : queue.Queue[tuple[Callable, tuple]] = queue.Queue()
+        self._thread = Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks submitted which have not yet completed."""
+        return self._queue.unfinished_tasks
+
+    def submit(self, task : Callable, *args) -> None:
+        """
+        Queues a task for execution.
+
+        Args:
+            task (Callable): The function to execute.
+            *args: Arguments with which to call the function.
+        """
+        self._queue.put((task, args))
+
+    def join(self) -> None:
+        """Blocks until all submitted tasks have completed."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            task, args = self._queue.get()
+            try:
+                task(*args)
+            except Exception as ex:
+                bt.logging.error(f"Background task {getattr(task, '__name__', task)} failed : {ex}\n{traceback.format_exc()}")
+            finally:
+                self._queue.task_done()
@@ -23,13 +23,18 @@ import bittensor as bt
 import uvloop
 import asyncio
 import aiohttp
+import msgspec
+import numpy as np
 from typing import List
 
 from taos.im.neurons.validator import Validator
 from taos.im.protocol import FinanceAgentResponse, FinanceEventNotification, MarketSimulationStateUpdate
+from taos.im.protocol.models import LazyMsgpackMapping
 from taos.im.protocol.instructions import *
 from taos.im.validator.reward import set_delays
-from taos.im.utils.compress import compress, batch_compress
+from taos.im.utils.compress import encode, compress_encoded, compress_books, batch_compress_encoded
+from taos.im.utils.delta import books_delta
+from taos.im.utils.volume import ROLE_INDEX
 import multiprocessing
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
@@ -101,7 +106,7 @@ def validate_responses(self : Validator, synapses : dict[int, MarketSimulationSt
                 synapse.response = None
                 continue
             volume_cap =  round(self.config.scoring.activity.capital_turnover_cap * (self.simulation.miner_wealth), self.simulation.volumeDecimals)
-            miner_volumes = {book_id : round(sum(book_volume['total'].values()), self.simulation.volumeDecimals) for book_id, book_volume in self.trade_volumes[uid].items()}        
+            miner_volumes = np.round(self.trade_volumes.totals()[uid, :, ROLE_INDEX['total']], self.simulation.volumeDecimals)
             for instruction in synapse.response.instructions:
                 try:
                     if instruction.agentId != uid or instruction.type == 'RESET_AGENT':
@@ -152,16 +157,134 @@ def update_stats(self : Validator, synapses : dict[int, MarketSimulationStateUpd
     Returns:
         None
     """
+    offsets = self.dispatch_scheduler.offsets
     for uid, synapse in synapses.items():
         self.miner_stats[uid]['requests'] += 1
+        if uid in offsets:
+            self.miner_stats[uid]['send_offset'].append(offsets[uid])
         if synapse.is_timeout:
             self.miner_stats[uid]['timeouts'] += 1
+            self.dispatch_scheduler.observe(uid, self.config.neuron.timeout)
         elif synapse.is_failure or synapse.response is None:
             self.miner_stats[uid]['failures'] += 1
         elif synapse.is_blacklist:
             self.miner_stats[uid]['rejections'] += 1
         elif synapse.dendrite.process_time:            
             self.miner_stats[uid]['call_time'].append(synapse.dendrite.process_time)
+            self.dispatch_scheduler.observe(uid, float(synapse.dendrite.process_time))
+
+def prepare_axon_synapses(self : Validator, synapse : MarketSimulationStateUpdate) -> dict[int, MarketSimulationStateUpdate]:
+    """
+    Serializes and compresses the state update into the synapses to be sent to each miner.
+
+    The books and simulation config are shared by all miners, and so are serialized once; the books are compressed once and the
+    encoded config is embedded verbatim in each miner payload.  Each miner payload is then encoded directly from the state data,
+    with any accounts or notices which have not been accessed since ingestion written through in their original msgpack encoding.
+    Compression of the payloads is performed in a thread pool, since the compression libraries release the GIL.
+
+    Where `compression.book_deltas` is enabled, miners which declared support for book deltas (`book_deltas` set on their response) and
+    received the previous update are sent only the changes to the books since that update, with the full books sent to all miners every
+    `compression.keyframe_interval` steps and to all other miners at every step.
+
+    Where `compression.indexed_books` is enabled, the full books are sent as a book-indexed container in which each book is compressed
+    separately (in the thread pool), so that miners can decompress and decode only the books they require.
+
+    The compressed data is embedded in the synapses as text in the encoding given by `compression.transport`.
+
+    Args:
+        self (taos.im.neurons.validator.Validator): The intelligent markets simulation validator.
+        synapse (MarketSimulationStateUpdate): The market state update synapse to be forwarded to miners.
+
+    Returns:
+        dict[int, MarketSimulationStateUpdate]: Compressed synapses to be sent to each UID.
+    """
+    level = self.config.compression.level
+    engine = self.config.compression.engine
+    transport = self.config.compression.transport
+    workers = self.config.compression.parallel_workers if self.config.compression.parallel_workers >= 0 else multiprocessing.cpu_count() // 2
+    use_msgpack = synapse.version >= 45
+
+    uids = range(len(self.metagraph.axons))
+    start = time.time()
+    books = synapse.books
+    delta_uids = set()
+    if self.config.compression.book_deltas:
+        # The books are fully decoded to be retained as the reference for the next delta
+        books = dict(synapse.books.items())
+        if self.book_reference is not None and self.step % self.config.compression.keyframe_interval != 0:
+            delta_uids = self.book_delta_uids
+    indexed_books = self.config.compression.indexed_books and use_msgpack
+    if indexed_books:
+        # Each book is encoded and compressed separately into a book-indexed container, so that miners can decode books individually
+        encoded_books = {
+            book_id : encode(books.encodable_value(book_id) if isinstance(books, LazyMsgpackMapping) else books[book_id], synapse.version)
+            for book_id in books
+        }
+        encoded_size = sum(len(book) for book in encoded_books.values())
+    else:
+        encoded_books = encode(books, synapse.version)
+        encoded_size = len(encoded_books)
+    encode_time = time.time() - start
+    start = time.time()
+    keyframe_uids = [uid for uid in uids if uid not in delta_uids]
+    compressed_books = None
+    if keyframe_uids:
+        compressed_books = compress_books(encoded_books, level, engine, workers, transport) if indexed_books else compress_encoded(encoded_books, level, engine, transport)
+    bt.logging.info(f"Compressed books{' [Indexed]' if indexed_books else ''} ({encoded_size} -> {len(compressed_books) if compressed_books else 0} bytes | {len(keyframe_uids)} UIDs | Encode {encode_time:.4f}s | Compress {time.time()-start:.4f}s).")
+    sent_bytes = len(compressed_books) * len(keyframe_uids) if compressed_books else 0
+    reference_timestamp, compressed_delta = None, None
+    if delta_uids:
+        start = time.time()
+        reference_timestamp, reference_books = self.book_reference
+        encoded_delta = encode(books_delta(reference_books, books), synapse.version)
+        compressed_delta = compress_encoded(encoded_delta, level, engine, transport)
+        sent_bytes += len(compressed_delta) * len(delta_uids)
+        bt.logging.info(f"Compressed book delta ({len(encoded_delta)} -> {len(compressed_delta)} bytes | {len(delta_uids)} UIDs | {time.time()-start:.4f}s).")
+    if self.config.compression.book_deltas:
+        self.book_reference = (synapse.timestamp, books)
+    self.prometheus_validator_gauges.labels(
+        wallet=self.wallet.hotkey.ss58_address, netuid=self.config.netuid, validator_gauge_name="books_compression_ratio"
+    ).set(encoded_size * len(uids) / sent_bytes if sent_bytes else 0.0)
+
+    start = time.time()
+    serialized_config = synapse.config.model_dump(mode='json')
+    if use_msgpack:
+        serialized_config = msgspec.Raw(encode(serialized_config, synapse.version))
+    def entry(field, uid):
+        return field.encodable_value(uid) if use_msgpack and isinstance(field, LazyMsgpackMapping) else field[uid]
+    payloads = {
+        uid : encode({
+            "accounts" : {uid : entry(synapse.accounts, uid)},
+            "notices" : {uid : entry(synapse.notices, uid)},
+            "config" : serialized_config,
+            "response" : None
+        }, synapse.version) for uid in uids
+    }
+    bt.logging.info(f"Encoded payloads ({sum(len(payload) for payload in payloads.values())} bytes | {time.time()-start:.4f}s).")
+
+    start = time.time()
+    compressed_payloads = batch_compress_encoded(payloads, level, engine, workers, transport)
+    bt.logging.info(f"Compressed payloads ({sum(len(payload) for payload in compressed_payloads.values())} bytes | {workers} workers | {time.time()-start:.4f}s).")
+
+    start = time.time()
+    template = synapse.model_copy(update={
+        "books" : None,
+        "accounts" : None,
+        "notices" : None,
+        "config" : None,
+        "response" : None,
+        "compression_engine" : engine,
+        "compression_transport" : transport
+    })
+    axon_synapses = {
+        uid : template.model_copy(update={
+            "books_reference" : reference_timestamp if uid in delta_uids else None,
+            "compressed" : {"books" : compressed_delta if uid in delta_uids else compressed_books, "payload" : compressed_payloads[uid]}
+        })
+        for uid in uids
+    }
+    bt.logging.info(f"Created axon synapses ({time.time()-start:.4f}s).")
+    return axon_synapses
 
 async def forward(self: Validator, synapse: MarketSimulationStateUpdate) -> List[FinanceAgentResponse]:
     """
@@ -186,124 +309,84 @@ async def forward(self: Validator, synapse: MarketSimulationStateUpdate) -> List
     await DendriteManager.configure_session(self)
 
     synapse_start = time.time()
-    start = time.time()
-    compressed_books = compress(
-        synapse.books,
-        level=self.config.compression.level,
-        engine=self.config.compression.engine,
-        version=synapse.version,
-    )
-    bt.logging.info(f"Compressed books ({time.time()-start:.4f}s).")
-    
-    serialized_config = synapse.config.model_dump(mode='json')
-    def create_axon_synapse(uid):
-        return synapse.model_copy(update={
-            "accounts": {uid: synapse.accounts[uid]},
-            "notices": {uid: synapse.notices[uid]},
-            "config" : serialized_config
-        })
+    axon_synapses = prepare_axon_synapses(self, synapse)
+    bt.logging.info(f"Prepared axon synapses ({time.time()-synapse_start:.4f}s).")
 
     start = time.time()
-    axon_synapses = {uid: create_axon_synapse(uid) for uid in range(len(self.metagraph.axons))}
-    bt.logging.info(f"Created axon synapses ({time.time()-start:.4f}s)")
-    
-    if self.config.compression.parallel_workers == 0:
-        def compress_axon_synapse(synapse):
-            return synapse.compress(
-                level=self.config.compression.level,
-                engine=self.config.compression.engine,
-                compressed_books=compressed_books
+
+    async def query_uid(uid):
+        try:
+            return await asyncio.wait_for(
+                self.dendrite(
+                    axons=self.metagraph.axons[uid],
+                    synapse=axon_synapses[uid],
+                    timeout=self.config.neuron.timeout,
+                    deserialize=False
+                ),
+                timeout=self.config.neuron.query_timeout
+            )
+        except asyncio.TimeoutError:
+            bt.logging.warning(f"Wall-clock timeout after {self.config.neuron.query_timeout}s while querying UID {uid}")
+            axon_synapses[uid] = self.dendrite.preprocess_synapse_for_request(
+                self.metagraph.axons[uid],
+                axon_synapses[uid],
+                self.config.neuron.timeout
             )
+            axon_synapses[uid].dendrite.status_code = 408
+            return axon_synapses[uid]
 
-        axon_synapses = {uid: compress_axon_synapse(axon_synapses[uid]) for uid in range(len(self.metagraph.axons))}
-    else:
-        num_processes = self.config.compression.parallel_workers if self.config.compression.parallel_workers > 0 else multiprocessing.cpu_count() // 2
-        batches = [self.metagraph.uids[i:i+int(256/num_processes)] for i in range(0, 256, int(256/num_processes))]
-        axon_synapses = batch_compress(
-            axon_synapses,
-            compressed_books,
-            batches,
-            level=self.config.compression.level,
-            engine=self.config.compression.engine,
-            version=synapse.version
-        )        
-    bt.logging.info(f"Compressed synapses ({time.time()-synapse_start:.4f}s).")
+    # Responses which arrived after the collection of the previous state update ended are counted in the miner statistics
+    scheduler = self.dispatch_scheduler
+    late_responses = scheduler.take_late()
+    if late_responses:
+        update_stats(self, late_responses)
+        bt.logging.debug(f"Recorded {len(late_responses)} late responses to the previous query.")
 
-    start = time.time()
-    sem = asyncio.Semaphore(len(self.metagraph.axons))
+    # Each response is validated and delayed as it arrives, while the remaining queries are in flight.  The processing is run on the
+    # response executor rather than on the event loop, where it would hold back the sending of the remaining queries and the reading
+    # of their responses, and so inflate the process times from which their delays and the `fastest` dispatch order are derived.
+    loop = asyncio.get_running_loop()
+    counts = [0, 0, 0, 0, 0]
+    processing_time = 0.0
+    processing = []
+    def process(uid, response):
+        nonlocal processing_time
+        process_start = time.time()
+        for i, count in enumerate(validate_responses(self, {uid : response})):
+            counts[i] += count
+        responses.extend(set_delays(self, {uid : response}))
+        processing_time += time.time() - process_start
 
-    async def query_uid(uid):
-        async with sem:
-            try:
-                response = await asyncio.wait_for(
-                    self.dendrite(
-                        axons=self.metagraph.axons[uid],
-                        synapse=axon_synapses[uid],
-                        timeout=self.config.neuron.timeout,
-                        deserialize=False
-                    ),
-                    timeout=self.config.neuron.query_timeout
-                )
-                return uid, response
-            except asyncio.TimeoutError:
-                bt.logging.warning(f"Wall-clock timeout after {self.config.neuron.query_timeout}s while querying UID {uid}")
-                axon_synapses[uid] = self.dendrite.preprocess_synapse_for_request(
-                    self.metagraph.axons[uid],
-                    axon_synapses[uid],
-                    self.config.neuron.timeout
-                )
-                axon_synapses[uid].dendrite.status_code = 408
-                return uid, axon_synapses[uid]
-
-    async def run_all_queries():
-        tasks = []
-        for uid in range(len(self.metagraph.axons)):
-            if uid in self.deregistered_uids:
-                continue
-            tasks.append(asyncio.create_task(query_uid(uid)))
-            await asyncio.sleep(0.002)  # 2ms stagger
-
-        synapse_responses = {}
-        for coro in asyncio.as_completed(tasks):
-            uid, response = await coro
-            synapse_responses[uid] = response
-        return synapse_responses
-
-    try:
-        synapse_responses = await asyncio.wait_for(
-            run_all_queries(),
-            timeout=self.config.neuron.global_query_timeout
-        )
-    except asyncio.TimeoutError:
+    def collect(uid, response):
+        processing.append(loop.run_in_executor(self.response_executor, process, uid, response))
+
+    # Queries are started in the order and at the pace configured by `neuron.dispatch`, recording the offset at which each is sent,
+    # and responses are collected until all have arrived or the configured quorum or deadline is reached
+    uids = [uid for uid in range(len(self.metagraph.axons)) if uid not in self.deregistered_uids]
+    synapse_responses = await scheduler.dispatch(
+        uids, query_uid, hosts={uid : self.metagraph.axons[uid].ip for uid in uids},
+        on_result=collect, timeout=self.config.neuron.global_query_timeout
+    )
+    if time.time() - start >= self.config.neuron.global_query_timeout:
         bt.logging.warning(f"Global dendrite query timeout after {self.config.neuron.global_query_timeout}s")
-        # Gather results from completed tasks
-        synapse_responses = {}
-        for task in asyncio.all_tasks():
-            if task.done():
-                try:
-                    uid, response = task.result()
-                    synapse_responses[uid] = response
-                except Exception:
-                    pass
+    offsets = scheduler.summary()
 
-    bt.logging.info(f"Dendrite call completed ({time.time()-start:.4f}s | "
+    bt.logging.info(f"Dendrite call completed ({time.time()-start:.4f}s | {len(synapse_responses)} / {len(uids)} Collected | "
+                    f"Send Offset {offsets['mean']:.4f}s Mean / {offsets['max']:.4f}s Max ({scheduler.order}) | "
                     f"Timeout {self.config.neuron.timeout}s / {self.config.neuron.query_timeout}s / {self.config.neuron.global_query_timeout}s).")
+    # All collected responses must be processed before the results are counted and returned
+    await asyncio.gather(*processing)
+    bt.logging.info(f"Validated Responses and Set Delays ({processing_time:.4f}s).")
     self.dendrite.synapse_history = self.dendrite.synapse_history[-10:]
-    
-    # Validate the miner responses
-    start = time.time()
-    total_responses, total_instructions, success, timeouts, failures = validate_responses(self, synapse_responses)
-    bt.logging.info(f"Validated Responses ({time.time()-start:.4f}s).")
+    total_responses, total_instructions, success, timeouts, failures = counts
+    if self.config.compression.book_deltas:
+        # Only miners which have declared support for book deltas and are known to have received the latest books are sent deltas in the next update
+        self.book_delta_uids = {uid for uid, response in synapse_responses.items() if response.is_success and response.book_deltas and not response.keyframe_required}
     
     # Update miner statistics
     start = time.time()
     update_stats(self, synapse_responses)
     bt.logging.debug(f"Updated Stats ({time.time()-start:.4f}s).")
-    
-    # Set simulation delays and add modified responses
-    start = time.time()
-    responses.extend(set_delays(self, synapse_responses))
-    bt.logging.debug(f"Set Delays ({time.time()-start:.4f}s).")
     bt.logging.trace(f"Responses: {responses}")    
     bt.logging.info(f"Received {total_responses} valid responses containing {total_instructions} instructions "
                     f"({success} SUCCESS | {timeouts} TIMEOUTS | {failures} FAILURES).")
@@ -19,18 +19,19 @@
 # DEALINGS IN THE SOFTWARE.
 
 import torch
-import math
 import traceback
 import random
 import bittensor as bt
 import numpy as np
-from typing import Dict
 from taos.im.neurons.validator import Validator
 from taos.im.protocol import MarketSimulationStateUpdate, FinanceAgentResponse
 from taos.im.protocol.models import Account, Book, TradeInfo
 from taos.im.protocol.events import TradeEvent
 from taos.im.utils import normalize
-from taos.im.utils.sharpe import sharpe, batch_sharpe
+from taos.im.utils.sharpe import batch_sharpe_ring
+from taos.im.utils.metrics import record_trades, record_miner_trade
+from taos.im.utils.inventory import InventoryHistory
+from taos.im.utils.volume import ROLE_INDEX
 
 def get_inventory_value(account : Account, book : Book, method='midquote') -> float:
     """
@@ -63,74 +64,82 @@ def get_inventory_value(account : Account, book : Book, method='midquote') -> fl
                     break
             return (account['qb']['t'] - account['ql'] + account['qc']) + liq_value
 
-def score_inventory_value(self : Validator, uid : int, inventory_values : Dict[int, Dict[int,float]]) -> float:
+def score_sharpes(self : Validator, uids : np.ndarray) -> np.ndarray:
     """
-    Calculates the new score value for a specific UID
+    Calculates the new score values for a set of UIDs in a single vectorized pass over their `(uids, books)` Sharpe and activity matrices.
+    The activity factors, activity-weighted Sharpes, outlier penalties and scores are written back into `activity_factors` and `sharpe_values`.
 
     Args:
         self (taos.im.neurons.validator.Validator) : Validator instance
-        uid (int) : UID of miner being scored
-        inventory_values (Dict[Dict[int, float]]) : Array of last `config.scoring.sharpe.lookback` inventory values for the miner
+        uids (np.ndarray) : UIDs of the miners being scored; all must have Sharpe values available
 
-    Returns: 
-        float: The new score value for the given UID.
+    Returns:
+        np.ndarray: The new score value for each of the given UIDs.
     """
-    if not self.sharpe_values[uid]: return 0.0
-    sharpes = self.sharpe_values[uid]['books']
-    normalized_sharpes = {book_id : normalize(self.config.scoring.sharpe.normalization_min, self.config.scoring.sharpe.normalization_max, sharpe) for book_id, sharpe in sharpes.items()}
+    if len(uids) == 0: return np.zeros(0)
+    book_ids = range(self.simulation.book_count)
+    sharpes = np.array([[self.sharpe_values[uid]['books'][book_id] for book_id in book_ids] for uid in uids], dtype=np.float64)
+    norm_min, norm_max = self.config.scoring.sharpe.normalization_min, self.config.scoring.sharpe.normalization_max
+    normalized_sharpes = normalize(norm_min, norm_max, sharpes)
     # The maximum volume to be traded by a miner in a `trade_volume_assessment_period` (24H) is `capital_turnover_cap` (10) times the initial miner capital
     volume_cap =  round(self.config.scoring.activity.capital_turnover_cap * (self.simulation.miner_wealth), self.simulation.volumeDecimals)
     # Calculate the volume traded by miners on each book in the period over which Sharpe values were calculated
-    miner_volumes = {book_id : 0 for book_id in self.trade_volumes[uid]}
-    for book_id, book_volume in self.trade_volumes[uid].items():
-        for t, volume in sorted(book_volume['total'].items(), reverse=True):
-            if t >= self.simulation_timestamp - self.config.scoring.sharpe.lookback * self.simulation.publish_interval:
-                miner_volumes[book_id] += volume
-            else:
-                break
+    miner_volumes = self.trade_volumes.totals(self.simulation_timestamp - self.config.scoring.sharpe.lookback * self.simulation.publish_interval)[uids, :, ROLE_INDEX['total']]
     # Calculate the factor to be multiplied on the Sharpes when there has been no trading activity in the previous Sharpe assessment window
     # This factor is designed to reduce the activity multiplier by half after each `sharpe.lookback` steps of inactivity
     inactivity_decay_factor = (2 ** (-1 / self.config.scoring.sharpe.lookback))
-    latest_volumes = {book_id : list(book_volume['total'].values())[-1] if len(book_volume['total']) > 0 else 0.0 for book_id, book_volume in self.trade_volumes[uid].items()}
+    latest_volumes = self.trade_volumes.latest()[uids, :, ROLE_INDEX['total']]
     # Calculate the activity factors to be multiplied onto the Sharpes to obtain the final values for assessment
     # If the miner has traded in the previous Sharpe assessment window, the factor is equal to the ratio of the miner trading volume to the cap
     # If the miner has not traded, their existing activity factor is decayed by the factor defined above so as to halve the miner score over each Sharpe assessment window where they remain inactive
-    self.activity_factors[uid] = {book_id : min(1 + (miner_volume / volume_cap), 2.0) if latest_volumes[book_id] > 0 else self.activity_factors[uid][book_id] * inactivity_decay_factor for book_id, miner_volume in miner_volumes.items()}
+    previous_activity_factors = np.array([[self.activity_factors[uid][book_id] for book_id in book_ids] for uid in uids], dtype=np.float64)
+    activity_factors = np.where(latest_volumes > 0, np.minimum(1 + (miner_volumes / volume_cap), 2.0), previous_activity_factors * inactivity_decay_factor)
     # Calculate the activity-weighted Sharpes by multiplying the activity factors onto the normalized volume-weighted Sharpes - this magnifies wins and losses occurring in periods with higher trading volumes
-    activity_weighted_normalized_sharpes = [(activity_factor if activity_factor < 1 or normalized_sharpes[book_id] > 0.5 else 2 - activity_factor) * normalized_sharpes[book_id] for book_id, activity_factor in self.activity_factors[uid].items()]
-    self.sharpe_values[uid]['books_weighted'] = {book_id : weighted_sharpe for book_id, weighted_sharpe in enumerate(activity_weighted_normalized_sharpes)}
-    # Define a function which uses the 1.5 rule to detect left-hand outliers in the activity-weighted Sharpes
-    def detect_outliers(sharpes):
-        data = np.array(sharpes)
-        q1 = np.percentile(data, 25)
-        q3 = np.percentile(data, 75)
-        iqr = q3 - q1
-        lower_threshold = q1 - 1.5 * iqr
-        outliers = data[data < lower_threshold]
-        return outliers
+    weighted_sharpes = np.where((activity_factors < 1) | (normalized_sharpes > 0.5), activity_factors, 2 - activity_factors) * normalized_sharpes
+    # Use the 1.5 rule to detect left-hand outliers in the activity-weighted Sharpes of each miner
     # Outliers detected here are activity-weighted Sharpes which are significantly lower than those achieved on other books
-    outliers = detect_outliers(activity_weighted_normalized_sharpes)
+    q1, q3 = np.percentile(weighted_sharpes, [25, 75], axis=1)
+    outliers = weighted_sharpes < (q1 - 1.5 * (q3 - q1))[:, None]
+    outlier_counts = outliers.sum(axis=1)
+    outlier_means = np.where(outliers, weighted_sharpes, 0.0).sum(axis=1) / np.maximum(outlier_counts, 1)
     # A penalty equal to 67% of the difference between the mean outlier value and the value at the centre of the possible activity weighted Sharpe values is calculated
-    outlier_penalty = (0.5 - np.mean(outliers))/1.5 if len(outliers) > 0 and np.mean(outliers) < 0.5 else 0
+    outlier_penalties = np.abs(np.where((outlier_counts > 0) & (outlier_means < 0.5), (0.5 - outlier_means) / 1.5, 0.0))
     # The median of the activity weighted Sharpes provides the base score for the miner
-    activity_weighted_normalized_median = np.median(activity_weighted_normalized_sharpes)
+    medians = np.median(weighted_sharpes, axis=1)
     # The penalty factor is subtracted from the base score to punish particularly poor performance on any particular book
-    sharpe_score = max(activity_weighted_normalized_median - abs(outlier_penalty), 0.0)
-    
-    self.sharpe_values[uid]['activity_weighted_normalized_median'] = activity_weighted_normalized_median
-    self.sharpe_values[uid]['penalty'] = abs(outlier_penalty)
-    self.sharpe_values[uid]['score'] = sharpe_score
-    return self.reward_weights['sharpe'] * sharpe_score
+    sharpe_scores = np.maximum(medians - outlier_penalties, 0.0)
 
-def score_inventory_values(self, inventory_values):
+    for i, uid in enumerate(uids.tolist()):
+        self.activity_factors[uid] = dict(enumerate(activity_factors[i].tolist()))
+        self.sharpe_values[uid]['books_weighted'] = dict(enumerate(weighted_sharpes[i].tolist()))
+        self.sharpe_values[uid]['activity_weighted_normalized_median'] = float(medians[i])
+        self.sharpe_values[uid]['penalty'] = float(outlier_penalties[i])
+        self.sharpe_values[uid]['score'] = float(sharpe_scores[i])
+    return self.reward_weights['sharpe'] * sharpe_scores
+
+def score_inventory_values(self, inventory_values : InventoryHistory):
+    """
+    Calculates the Sharpe values of all UIDs from the inventory history ring and derives the new scores.
+
+    Args:
+        self (taos.im.neurons.validator.Validator) : Validator instance
+        inventory_values (taos.im.utils.inventory.InventoryHistory) : Inventory history store of the validator
+
+    Returns:
+        dict: The new score value for each UID.
+    """
+    uids = np.asarray(self.metagraph.uids, dtype=np.int64)
     if self.config.scoring.sharpe.parallel_workers == 0:
-        self.sharpe_values = {uid.item() : sharpe(uid, inventory_values[uid], self.config.scoring.sharpe.lookback, self.config.scoring.sharpe.normalization_min, self.config.scoring.sharpe.normalization_max, self.config.scoring.sharpe.min_lookback, self.simulation.grace_period, self.deregistered_uids) for uid in self.metagraph.uids}
+        # Sharpe values are obtained from the sliding-window statistics maintained as each observation is recorded
+        self.sharpe_values = self.sharpe_statistics.sharpe(inventory_values, uids, self.config.scoring.sharpe.lookback, self.config.scoring.sharpe.normalization_min, self.config.scoring.sharpe.normalization_max, self.config.scoring.sharpe.min_lookback, self.deregistered_uids)
     else:
-        num_processes = self.config.scoring.sharpe.parallel_workers
-        batches = [self.metagraph.uids[i:i+int(256/num_processes)] for i in range(0,256,int(256/num_processes))]
-        self.sharpe_values = batch_sharpe(inventory_values, batches, self.config.scoring.sharpe.lookback, self.config.scoring.sharpe.normalization_min, self.config.scoring.sharpe.normalization_max, self.config.scoring.sharpe.min_lookback, self.simulation.grace_period, self.deregistered_uids)
+        # Exact recomputation over the full window is distributed over processes, each receiving only the slice of the ring for its UIDs
+        batches = np.array_split(uids, self.config.scoring.sharpe.parallel_workers)
+        self.sharpe_values = batch_sharpe_ring(inventory_values, batches, self.config.scoring.sharpe.lookback, self.config.scoring.sharpe.normalization_min, self.config.scoring.sharpe.normalization_max, self.config.scoring.sharpe.min_lookback, self.simulation.grace_period, self.deregistered_uids)
 
-    inventory_scores = {uid : score_inventory_value(self, uid, self.inventory_history[uid]) for uid in self.metagraph.uids}
+    # Miners without Sharpe values (insufficient history or deregistered) receive a zero score
+    scored_uids = np.array([uid for uid in uids if self.sharpe_values[int(uid)]], dtype=np.int64)
+    inventory_scores = {int(uid) : 0.0 for uid in uids} | dict(zip(scored_uids.tolist(), score_sharpes(self, scored_uids).tolist()))
     return inventory_scores
 
 def reward(self : Validator, synapse : MarketSimulationStateUpdate) -> list[float]:
@@ -145,61 +154,54 @@ def reward(self : Validator, synapse : MarketSimulationStateUpdate) -> list[floa
         list[float]: The new score values for all uids in the subnet.
     """
     for bookId, book in synapse.books.items():                
-        trades = [TradeInfo.model_construct(**event) for event in book['e'] if event['y'] == 't']
-        if trades:
-            self.recent_trades[bookId].extend(trades)
-            self.recent_trades[bookId] = self.recent_trades[bookId][-25:]
+        record_trades(self.recent_trades, bookId, [TradeInfo.model_construct(**event) for event in book['e'] if event['y'] == 't'])
+    # Open the volume bucket for the current sampling interval; buckets older than `trade_volume_assessment_period` drop out of the ledger totals
+    self.trade_volumes.advance(synapse.timestamp)
+    volume_uids, volume_books, volume_roles, volumes = [], [], [], []
+    inventory_values = np.zeros((self.inventory_history.uids, self.inventory_history.books), dtype=np.float64)
     for uid in self.metagraph.uids:
         try:
-            sampled_timestamp = math.ceil(synapse.timestamp / self.config.scoring.activity.trade_volume_sampling_interval) * self.config.scoring.activity.trade_volume_sampling_interval
-            # Prune the trading volume history of the miner to exclude values prior to the latest `trade_volume_assessment_period`
-            for book_id, role_trades in self.trade_volumes[uid].items():
-                for role, trades in role_trades.items():
-                    for time in sorted(trades.keys()):
-                        if time < synapse.timestamp - self.config.scoring.activity.trade_volume_assessment_period:                                
-                            del self.trade_volumes[uid][book_id][role][time]
-                        else:
-                            break
-                if not sampled_timestamp in self.trade_volumes[uid][book_id]['total']:
-                    self.trade_volumes[uid][book_id]['total'][sampled_timestamp] = 0.0
-                    self.trade_volumes[uid][book_id]['maker'][sampled_timestamp] = 0.0
-                    self.trade_volumes[uid][book_id]['taker'][sampled_timestamp] = 0.0
-                    self.trade_volumes[uid][book_id]['self'][sampled_timestamp] = 0.0
-                    
-            # Update trade volume history with new trades since the previous step            
+            # Collect the volumes of new trades since the previous step to be recorded in the ledger
             trades = [TradeEvent.model_construct(**notice) for notice in synapse.notices[uid] if notice['y'] in ['EVENT_TRADE',"ET"]]
             for trade in trades:
-                roles = (["maker"] if trade.makerAgentId == uid else []) + (["taker"] if trade.takerAgentId == uid else [])
-                for role in roles:
-                    self.recent_miner_trades[trade.makerAgentId if role == "maker" else trade.takerAgentId][trade.bookId].append([trade, role])
-                self.recent_miner_trades[uid][trade.bookId] = self.recent_miner_trades[uid][trade.bookId][-5:]
-                
-                self.trade_volumes[uid][trade.bookId]['total'][sampled_timestamp] = round(self.trade_volumes[uid][trade.bookId]['total'][sampled_timestamp] + trade.quantity * trade.price, self.simulation.volumeDecimals)
-                if trade.makerAgentId == trade.takerAgentId:                
-                    self.trade_volumes[uid][trade.bookId]['self'][sampled_timestamp] = round(self.trade_volumes[uid][trade.bookId]['self'][sampled_timestamp] + trade.quantity * trade.price, self.simulation.volumeDecimals)
+                record_miner_trade(self.recent_miner_trades, uid, trade)
+
+                trade_roles = [ROLE_INDEX['total']]
+                if trade.makerAgentId == trade.takerAgentId:
+                    trade_roles.append(ROLE_INDEX['self'])
                 elif trade.makerAgentId == uid:
-                    self.trade_volumes[uid][trade.bookId]['maker'][sampled_timestamp] = round(self.trade_volumes[uid][trade.bookId]['maker'][sampled_timestamp] + trade.quantity * trade.price, self.simulation.volumeDecimals)
+                    trade_roles.append(ROLE_INDEX['maker'])
                 elif trade.takerAgentId == uid:
-                    self.trade_volumes[uid][trade.bookId]['taker'][sampled_timestamp] = round(self.trade_volumes[uid][trade.bookId]['taker'][sampled_timestamp] + trade.quantity * trade.price, self.simulation.volumeDecimals)
+                    trade_roles.append(ROLE_INDEX['taker'])
+                for role in trade_roles:
+                    volume_uids.append(uid)
+                    volume_books.append(trade.bookId)
+                    volume_roles.append(role)
+                    volumes.append(trade.quantity * trade.price)
             
             for bookId, account in synapse.accounts[uid].items():                    
                 if self.initial_balances[uid][bookId]['BASE'] == None:
                     self.initial_balances[uid][bookId]['BASE'] = account['bb']['t']
+                    self.state_log.update_balances(uid)
                 if self.initial_balances[uid][bookId]['QUOTE'] == None:
                     self.initial_balances[uid][bookId]['QUOTE'] = account['qb']['t']
                 if self.initial_balances[uid][bookId]['WEALTH'] == None:
                     self.initial_balances[uid][bookId]['WEALTH'] = get_inventory_value(synapse.accounts[uid][bookId], synapse.books[bookId])
+                    self.state_log.update_balances(uid)
             
-            # Calculate the current value of the agent's inventory and append to the history array
+            # Calculate the current value of the agent's inventory; agents without accounts retain a zero value
             if uid in synapse.accounts:
-                self.inventory_history[uid][synapse.timestamp] = {book_id : get_inventory_value(synapse.accounts[uid][book_id], book) - self.initial_balances[uid][book_id]['WEALTH'] for book_id, book in synapse.books.items()}
-            else:
-                self.inventory_history[uid][synapse.timestamp] = {book_id : 0.0 for book_id in synapse.books}
-            # Prune the inventory history
-            self.inventory_history[uid] = dict(list(self.inventory_history[uid].items())[-self.config.scoring.sharpe.lookback:])
+                for book_id, book in synapse.books.items():
+                    inventory_values[uid, book_id] = get_inventory_value(synapse.accounts[uid][book_id], book) - self.initial_balances[uid][book_id]['WEALTH']
         except Exception as ex:
             bt.logging.error(f"Failed to update reward data for UID {uid} at step {self.step} : {traceback.format_exc()}")
-            
+            # The observation of the UID is skipped: it is held as NaN, and the returns adjoining it are excluded from the Sharpe calculation
+            inventory_values[uid] = np.nan
+    self.trade_volumes.record(volume_uids, volume_books, volume_roles, volumes)
+    # Write the inventory values of all UIDs into the history ring, overwriting the oldest observation once `lookback` values are held
+    self.sharpe_statistics.update(self.inventory_history, synapse.timestamp, inventory_values)
+    self.inventory_history.append(synapse.timestamp, inventory_values)
+
     inventory_scores = score_inventory_values(self, self.inventory_history)
     return list(inventory_scores.values())
     
@@ -6,7 +6,7 @@ import asyncio
 import random
 import bittensor as bt
 
-from typing import List
+from typing import Callable, List
 
 
 class MockSubtensor(bt.MockSubtensor):
@@ -56,14 +56,24 @@ class MockMetagraph(bt.metagraph):
 class MockDendrite(bt.dendrite):
     """
     Replaces a real bittensor network request with a mock request that just returns some static response for all axons that are passed and adds some random delay.
+
+    Where a `responder` is given, it is called with each axon and a copy of the synapse as received by the axon, and the synapse it
+    returns is used as the response, allowing the handling of requests by miners to be simulated offline.
+
+    Args:
+        wallet (bt.wallet): Wallet of the querying neuron.
+        responder (Callable[[bt.axon, bt.Synapse], bt.Synapse] | None): Function simulating the handling of a request by the miner serving an axon.
+        process_time (Callable[[bt.axon], float] | None): Function returning the simulated processing time in seconds of the miner serving an axon; uniform in [0, 1) if None.
     """
 
-    def __init__(self, wallet):
+    def __init__(self, wallet, responder: Callable[[bt.axon, bt.Synapse], bt.Synapse] | None = None, process_time: Callable[[bt.axon], float] | None = None):
         super().__init__(wallet)
+        self.responder = responder
+        self.process_time = process_time
 
     async def forward(
         self,
-        axons: List[bt.axon],
+        axons: List[bt.axon] | bt.axon,
         synapse: bt.Synapse = bt.Synapse(),
         timeout: float = 12,
         deserialize: bool = True,
@@ -84,9 +94,13 @@ class MockDendrite(bt.dendrite):
                 # Attach some more required data so it looks real
                 s = self.preprocess_synapse_for_request(axon, s, timeout)
                 # We just want to mock the response, so we'll just fill in some data
-                process_time = random.random()
+                process_time = self.process_time(axon) if self.process_time else random.random()
                 if process_time < timeout:
-                    s.dendrite.process_time = str(time.time() - start_time)
+                    if self.responder:
+                        dendrite = s.dendrite
+                        s = self.responder(axon, s)
+                        s.dendrite = dendrite
+                    s.dendrite.process_time = str(process_time if self.process_time else time.time() - start_time)
                     # Update the status code and status message of the dendrite to match the axon
                     s.dendrite.status_code = 200
                     s.dendrite.status_message = "OK"
@@ -102,6 +116,9 @@ class MockDendrite(bt.dendrite):
                 else:
                     return s
 
+            # As for `bt.dendrite`, a single response is returned where a single axon is queried
+            if not isinstance(axons, list):
+                return await single_axon_response(0, axons)
             return await asyncio.gather(
                 *(
                     single_axon_response(i, target_axon)
@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import pytest
+from typing import Any
+
+from taos.im.utils.compress import (
+    encode, decode, compress, decompress, compress_books, is_book_index, BookIndex, transports
+)
+
+def make_books(count : int = 6) -> dict[int, dict]:
+    return {
+        book_id : {
+            "i" : book_id,
+            "b" : [{"p" : 100.0 - 0.01 * level, "q" : 1.0 + level, "o" : None} for level in range(1, 11)],
+            "a" : [{"p" : 100.0 + 0.01 * level, "q" : 2.0 + level, "o" : None} for level in range(1, 11)],
+            "e" : []
+        } for book_id in range(count)
+    }
+
+@pytest.mark.parametrize("engine", ["zlib", "lz4", "zstd"])
+@pytest.mark.parametrize("transport", ["base64", "base85"])
+def test_book_index_round_trip(engine, transport):
+    books = make_books()
+    text = compress_books({book_id : encode(book) for book_id, book in books.items()}, engine=engine, workers=2, transport=transport)
+    raw = transports[transport][1](text)
+    assert is_book_index(raw)
+    index = BookIndex(raw, engine=engine)
+    assert len(index) == len(books) and list(index) == list(books)
+    # Books are decoded individually on access
+    assert index[3] == books[3]
+    assert index.decoded == 1
+    index.prefetch(workers=2)
+    assert index.decoded == len(books)
+    assert dict(index.items()) == books
+
+def test_book_index_through_decompress():
+    books = make_books()
+    payload = {"accounts" : {0 : {}}, "notices" : {0 : []}, "config" : None, "response" : None}
+    compressed = {
+        "books" : compress_books({book_id : encode(book) for book_id, book in books.items()}, engine="lz4"),
+        "payload" : compress(payload, engine="lz4", version=45)
+    }
+    decompressed = decompress(compressed, "lz4", 45)
+    assert isinstance(decompressed["books"], BookIndex)
+    assert dict(decompressed["books"].items()) == books
+    assert decompressed["notices"] == {0 : []}
+
+def test_book_index_as_type():
+    books = make_books(2)
+    raw = transports["base64"][1](compress_books({book_id : encode(book) for book_id, book in books.items()}))
+    index = BookIndex(raw)
+    index.prefetch()
+    bids = index.as_type(dict[str, Any])
+    assert bids.decoded == 0
+    assert bids[1]["b"] == books[1]["b"]
+
+def test_book_index_rejects_other_data():
+    assert not is_book_index(b"\x00" * 16)
+    with pytest.raises(ValueError):
+        BookIndex(b"TBI\xff" + bytes(4))
+
+@pytest.mark.parametrize("version", [44, 45])
+def test_encode_decode_round_trip(version):
+    books = make_books(2)
+    assert {int(k) : v for k, v in decode(encode(books, version), version).items()} == books
+
+def test_zstd_dictionary_id_outside_reserved_range(monkeypatch):
+    import zstandard as zstd
+    from taos.im.utils import compress as module
+    from taos.im.utils.dictionary import train_dictionary, state_samples, DICTIONARY_ID
+    assert DICTIONARY_ID >= 32768
+    books = make_books(64)
+    dictionary = train_dictionary(state_samples({"books" : books}) * 8, size=4096)
+    assert dictionary.dict_id() == DICTIONARY_ID
+    monkeypatch.setattr(module, "load_dictionary", lambda dict_id: dictionary if dict_id == DICTIONARY_ID else None)
+    raw = module.compressors["zstd_dict"](encode(books[0]), 3)
+    assert zstd.get_frame_parameters(raw).dict_id == DICTIONARY_ID
+    assert decode(module.decompressors["zstd_dict"](raw)) == books[0]
@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import random
+import pytest
+
+from taos.im.utils.delta import books_delta, apply_books_delta
+from taos.im.utils.compress import encode, decode
+
+def random_book(rng : random.Random, mid : float, depth : int = 20) -> dict:
+    return {
+        "i" : 0,
+        "b" : [{"p" : round(mid - 0.01 * (i + 1), 2), "q" : round(rng.uniform(0.1, 10), 4), "o" : None} for i in range(depth)],
+        "a" : [{"p" : round(mid + 0.01 * (i + 1), 2), "q" : round(rng.uniform(0.1, 10), 4), "o" : None} for i in range(depth)],
+        "e" : [{"y" : "t", "p" : mid, "q" : 1.0}]
+    }
+
+def step_book(rng : random.Random, book : dict) -> dict:
+    """
+    Moves the book by changing quantities, removing some levels and adding others.
+    """
+    book = {field : [dict(level) for level in value] if isinstance(value, list) else value for field, value in book.items()}
+    for side, sign in [("b", -1), ("a", 1)]:
+        levels = book[side]
+        for level in rng.sample(levels, k=min(3, len(levels))):
+            level["q"] = round(rng.uniform(0.1, 10), 4)
+        for level in rng.sample(levels, k=min(2, len(levels))):
+            levels.remove(level)
+        outer = levels[-1]["p"] if levels else 100.0
+        levels.append({"p" : round(outer + sign * 0.01, 2), "q" : 1.0, "o" : None})
+        levels.sort(key=lambda level: level["p"], reverse=(side == "b"))
+    book["e"] = []
+    return book
+
+@pytest.mark.parametrize("version", [44, 45])
+def test_books_delta_round_trip(version):
+    rng = random.Random(0)
+    books = {book_id : random_book(rng, 100.0 + book_id) for book_id in range(4)}
+    for _ in range(25):
+        current = {book_id : step_book(rng, book) for book_id, book in books.items()}
+        # A book appears which is not present in the reference, and is sent in full
+        current[9] = random_book(rng, 50.0)
+        delta = decode(encode(books_delta(books, current), version), version)
+        rebuilt = {int(book_id) : book for book_id, book in apply_books_delta(books, {int(k) : v for k, v in delta.items()}).items()}
+        assert rebuilt == current
+        books = {book_id : book for book_id, book in current.items() if book_id != 9}
+
+def test_books_delta_empty_sides():
+    previous = {0 : {"b" : [{"p" : 1.0, "q" : 1.0}], "a" : None}}
+    current = {0 : {"b" : [], "a" : [{"p" : 2.0, "q" : 1.0}]}}
+    assert apply_books_delta(previous, books_delta(previous, current)) == current
+
+def test_apply_books_delta_missing_reference():
+    current = {0 : random_book(random.Random(1), 100.0)}
+    delta = books_delta(current, current)
+    with pytest.raises(KeyError):
+        apply_books_delta({}, delta)
+
+def test_rebuild_books_declares_support():
+    protocol = pytest.importorskip("taos.im.protocol")
+    rng = random.Random(2)
+    reference = {0 : random_book(rng, 100.0)}
+    current = {0 : step_book(rng, reference[0])}
+    cache = {}
+
+    keyframe = protocol.MarketSimulationStateUpdate(timestamp=1)
+    assert not keyframe.book_deltas
+    assert keyframe.rebuild_books(reference, cache) == reference
+    assert keyframe.book_deltas
+
+    update = protocol.MarketSimulationStateUpdate(timestamp=2, books_reference=1)
+    assert update.rebuild_books(books_delta(reference, current), cache) == current
+    assert update.book_deltas and not update.keyframe_required
+
+    # A delta against books which are not held is rejected, and a keyframe requested
+    stale = protocol.MarketSimulationStateUpdate(timestamp=4, books_reference=3)
+    assert stale.rebuild_books(books_delta(reference, current), cache) == {}
+    assert stale.keyframe_required
@@ -0,0 +1,207 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import time
+import asyncio
+import pytest
+
+from taos.im.utils import dispatch as module
+from taos.im.utils.dispatch import DispatchScheduler, TokenBucket, MIN_PROCESS_TIMES
+
+UIDS = 10
+
+def miner(latencies : dict[int, float], sent : list[int], fail : set[int] = set()):
+    """
+    Returns a coroutine function simulating the query of each UID, which responds after its latency, recording the UIDs queried in `sent`.
+    """
+    async def send(uid : int) -> int:
+        sent.append(uid)
+        await asyncio.sleep(latencies[uid])
+        if uid in fail:
+            raise RuntimeError(f"Query to UID {uid} failed")
+        return uid
+    return send
+
+def latencies(fast : float = 0.01, slow : float = 0.3, slow_uids : range = range(5, UIDS)) -> dict[int, float]:
+    return {uid : slow if uid in slow_uids else fast for uid in range(UIDS)}
+
+def test_dispatch_collects_all():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid')
+        sent, collected = [], []
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(slow=0.02), sent), on_result=lambda uid, result: collected.append(uid))
+        assert results == {uid : uid for uid in collected} and sorted(results) == list(range(UIDS))
+        assert sorted(scheduler.offsets) == list(range(UIDS))
+    asyncio.run(run())
+
+def test_dispatch_quorum_and_late_responses():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid', quorum=0.5)
+        sent = []
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(), sent))
+        # Collection ends once half of the queries have been answered, and the remainder are held as late once they arrive
+        assert sorted(results) == list(range(5))
+        assert scheduler.take_late() == {}
+        await asyncio.sleep(0.4)
+        assert scheduler.take_late() == {uid : uid for uid in range(5, UIDS)}
+        assert scheduler.take_late() == {}
+    asyncio.run(run())
+
+def test_dispatch_deadline():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid', deadline_percentile=50)
+        for _ in range(MIN_PROCESS_TIMES):
+            scheduler.observe(0, 0.05)
+        sent = []
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(slow=1.0), sent))
+        assert sorted(results) == list(range(5))
+        # Queries still in flight when the next dispatch starts are abandoned
+        await scheduler.dispatch([0], miner(latencies(), []))
+        await asyncio.sleep(0.05)
+        assert all(task.cancelled() for task in asyncio.all_tasks() if task.get_name().startswith("query_"))
+    asyncio.run(run())
+
+def test_dispatch_timeout():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid')
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(), []), timeout=0.1)
+        assert sorted(results) == list(range(5))
+    asyncio.run(run())
+
+def test_unsent_queries_cancelled():
+    async def run():
+        # Only one query is in flight at a time, so that the queries waiting on the limit when the quorum is met are not sent
+        scheduler = DispatchScheduler(UIDS, order='uid', concurrency=1, quorum=0.3)
+        sent = []
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(), sent))
+        assert sorted(results) == [0, 1, 2]
+        await asyncio.sleep(0.1)
+        assert sent == [0, 1, 2] and sorted(scheduler.offsets) == [0, 1, 2]
+        assert scheduler.take_late() == {}
+    asyncio.run(run())
+
+def test_unsent_queries_cancelled_per_host():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid', host_limit=1, quorum=0.2)
+        sent = []
+        hosts = {uid : "a" if uid < 5 else "b" for uid in range(UIDS)}
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(slow=0.01), sent), hosts=hosts)
+        assert sorted(results) == [0, 5]
+        await asyncio.sleep(0.1)
+        assert sorted(sent) == [0, 5]
+    asyncio.run(run())
+
+def test_late_errors_logged(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(module.bt.logging, "warning", lambda message: warnings.append(message))
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid', quorum=0.5)
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(), [], fail={7}))
+        assert sorted(results) == list(range(5))
+        await asyncio.sleep(0.4)
+        assert sorted(scheduler.take_late()) == [5, 6, 8, 9]
+    asyncio.run(run())
+    assert len(warnings) == 1 and "query_7" in warnings[0]
+
+def test_errors_during_collection_propagated():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid')
+        with pytest.raises(RuntimeError):
+            await scheduler.dispatch(list(range(UIDS)), miner(latencies(), [], fail={2}))
+    asyncio.run(run())
+
+def test_token_bucket_burst_and_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, burst=3)
+        start = time.perf_counter()
+        times = []
+        for _ in range(7):
+            await bucket.acquire()
+            times.append(time.perf_counter() - start)
+        # The burst is taken at once, after which a token is taken every 1 / rate seconds
+        assert max(times[:3]) < 0.02
+        assert times[3] >= 0.045 and times[-1] >= 4 / 20 - 0.01
+        assert all(later - earlier >= 0.045 for earlier, later in zip(times[3:], times[4:]))
+    asyncio.run(run())
+
+def test_token_bucket_unlimited():
+    async def run():
+        bucket = TokenBucket(rate=0, burst=1)
+        start = time.perf_counter()
+        for _ in range(1000):
+            await bucket.acquire()
+        assert time.perf_counter() - start < 0.1
+    asyncio.run(run())
+
+def test_dispatch_paced_by_rate():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid', rate=50, burst=4)
+        results = await scheduler.dispatch(list(range(UIDS)), miner(latencies(slow=0.01), []))
+        assert sorted(results) == list(range(UIDS))
+        offsets = [scheduler.offsets[uid] for uid in range(UIDS)]
+        assert max(offsets[:4]) < 0.02
+        assert offsets[-1] >= (UIDS - 4) / 50 - 0.01
+        assert scheduler.summary()['max'] == max(offsets)
+    asyncio.run(run())
+
+@pytest.mark.parametrize("concurrency,host_limit", [(3, 0), (0, 2), (3, 2)])
+def test_dispatch_concurrency_cap(concurrency, host_limit):
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='uid', concurrency=concurrency, host_limit=host_limit)
+        hosts = {uid : uid % 2 for uid in range(UIDS)}
+        in_flight, peak, peak_host = {0 : 0, 1 : 0}, [0], [0]
+        async def send(uid):
+            in_flight[hosts[uid]] += 1
+            peak[0] = max(peak[0], sum(in_flight.values()))
+            peak_host[0] = max(peak_host[0], *in_flight.values())
+            await asyncio.sleep(0.02)
+            in_flight[hosts[uid]] -= 1
+            return uid
+        results = await scheduler.dispatch(list(range(UIDS)), send, hosts=hosts)
+        assert sorted(results) == list(range(UIDS))
+        assert peak[0] == (concurrency if concurrency else 2 * host_limit)
+        assert peak_host[0] <= (host_limit if host_limit else concurrency)
+    asyncio.run(run())
+
+def test_prioritize_uid():
+    scheduler = DispatchScheduler(UIDS, order='uid')
+    assert scheduler.prioritize([7, 2, 9, 0]) == [0, 2, 7, 9]
+
+def test_prioritize_random():
+    uids = list(range(UIDS))
+    scheduler = DispatchScheduler(UIDS, order='random', seed=1)
+    orders = [scheduler.prioritize(uids) for _ in range(5)]
+    # Each dispatch is sent in a new permutation, reproducible from the seed, and the UIDs given are not modified
+    assert all(sorted(order) == uids for order in orders)
+    assert len({tuple(order) for order in orders}) > 1
+    scheduler = DispatchScheduler(UIDS, order='random', seed=1)
+    assert [scheduler.prioritize(uids) for _ in range(5)] == orders
+    assert uids == list(range(UIDS))
+
+def test_prioritize_fastest():
+    scheduler = DispatchScheduler(UIDS, order='fastest', smoothing=0.5)
+    for uid, process_time in [(0, 0.4), (1, 0.1), (2, 0.3), (3, 0.1), (4, 0.2)]:
+        scheduler.observe(uid, process_time)
+    # UIDs not yet observed are placed first, and ties are broken by UID
+    assert scheduler.prioritize([4, 3, 2, 1, 0, 5]) == [5, 1, 3, 4, 2, 0]
+    # Process times are smoothed, so that a single fast response moves a UID forward only partially
+    scheduler.observe(0, 0.0)
+    assert scheduler.prioritize([0, 1, 2, 3, 4]) == [1, 3, 0, 4, 2]
+    scheduler.reset(0)
+    assert scheduler.prioritize([0, 1, 2, 3, 4])[0] == 0
+    # UIDs beyond those allocated are treated as unobserved
+    assert scheduler.prioritize([UIDS + 1, 1])[0] == UIDS + 1
+
+def test_dispatch_in_priority_order():
+    async def run():
+        scheduler = DispatchScheduler(UIDS, order='fastest', concurrency=1)
+        for uid in range(UIDS):
+            scheduler.observe(uid, 1.0 - uid / UIDS)
+        sent = []
+        await scheduler.dispatch(list(range(UIDS)), miner(latencies(slow=0.001, fast=0.001), sent))
+        assert sent == list(reversed(range(UIDS)))
+    asyncio.run(run())
+
+@pytest.mark.parametrize("quorum", [0.0, -0.5, 1.5])
+def test_invalid_quorum(quorum):
+    with pytest.raises(ValueError):
+        DispatchScheduler(UIDS, quorum=quorum)
@@ -0,0 +1,51 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import numpy as np
+import pytest
+
+models = pytest.importorskip("taos.im.protocol.models")
+L2History, L2Snapshot, LevelInfo = models.L2History, models.L2Snapshot, models.LevelInfo
+
+PUBLISH_INTERVAL = 1_000_000_000
+
+def snapshot(timestamp : int, bids : dict[float, float], asks : dict[float, float]) -> L2Snapshot:
+    return L2Snapshot(
+        timestamp=timestamp,
+        bids={price : LevelInfo(price=price, quantity=quantity, orders=None) for price, quantity in bids.items()},
+        asks={price : LevelInfo(price=price, quantity=quantity, orders=None) for price, quantity in asks.items()}
+    )
+
+def unsorted_history() -> L2History:
+    return L2History({
+        PUBLISH_INTERVAL : snapshot(PUBLISH_INTERVAL, {100.0 : 1.0, 99.0 : 1.0, 101.0 : 3.0}, {103.0 : 1.0, 102.0 : 1.0, 104.0 : 1.0})
+    }, {}, PUBLISH_INTERVAL)
+
+def test_unsorted_levels_held_best_first():
+    history = unsorted_history()
+    assert history.bid_prices[0].tolist() == [101.0, 100.0, 99.0]
+    assert history.ask_prices[0].tolist() == [102.0, 103.0, 104.0]
+    assert list(history.latest().bids) == [101.0, 100.0, 99.0]
+
+def test_reconcile_without_discrepancies_truncates_best_levels():
+    history = unsorted_history()
+    history.reconcile({'bid' : {}, 'ask' : {}}, None, 2)
+    latest = history.latest()
+    assert list(latest.bids) == [101.0, 100.0]
+    assert list(latest.asks) == [102.0, 103.0]
+    assert np.isclose(history.imbalances()[0], (4.0 - 2.0) / (4.0 + 2.0))
+
+def test_reconcile_matches_snapshot_reconcile():
+    bids, asks = {100.0 : 1.0, 99.0 : 2.0, 101.0 : 3.0}, {103.0 : 1.0, 102.0 : 2.0, 104.0 : 4.0}
+    for depth in [1, 2, 3]:
+        history = unsorted_history()
+        history.reconcile({'bid' : {}, 'ask' : {}}, None, depth)
+        expected = snapshot(PUBLISH_INTERVAL, bids, asks).sort(depth)
+        assert list(history.latest().bids) == list(expected.bids)
+        assert list(history.latest().asks) == list(expected.asks)
+
+def test_snapshots_alias():
+    history = unsorted_history()
+    assert history.snapshots.keys() == history.level_snapshots.keys()
+    assert list(history.snapshots[PUBLISH_INTERVAL].bids) == [101.0, 100.0, 99.0]
+    with pytest.raises(AttributeError):
+        history.snapshots = {}
@@ -0,0 +1,238 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import os
+import msgspec
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+torch = pytest.importorskip("torch")
+
+from taos.im.utils.inventory import InventoryHistory
+from taos.im.utils.volume import VolumeLedger, ROLES
+from taos.im.utils import persistence
+from taos.im.utils.persistence import StateLog, read_checkpoint, migrate_checkpoint, decode_trades, CHECKPOINT_FILE, SCHEMA_VERSION
+from taos.im.protocol.models import TradeInfo
+from taos.im.protocol.events import TradeEvent
+
+UIDS, BOOKS, LOOKBACK = 6, 3, 20
+PUBLISH_INTERVAL = 1_000_000_000
+SAMPLING_INTERVAL = 5_000_000_000
+ASSESSMENT_PERIOD = 60_000_000_000
+
+def make_validator() -> SimpleNamespace:
+    return SimpleNamespace(
+        simulation=SimpleNamespace(label=lambda: 'test', logDir=None),
+        step=0, simulation_timestamp=0, start_time=0.0, start_timestamp=0, step_rates=[],
+        hotkeys=[f"hotkey{uid}" for uid in range(UIDS)], deregistered_uids=[],
+        scores=torch.zeros(UIDS, dtype=torch.float32),
+        inventory_history=InventoryHistory(UIDS, LOOKBACK, BOOKS),
+        trade_volumes=VolumeLedger(UIDS, BOOKS, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4),
+        initial_balances={uid : {book : {'BASE' : None, 'QUOTE' : None, 'WEALTH' : None} for book in range(BOOKS)} for uid in range(UIDS)},
+        activity_factors={uid : {book : 0.0 for book in range(BOOKS)} for uid in range(UIDS)},
+        sharpe_values={uid : None for uid in range(UIDS)},
+        unnormalized_scores={uid : 0.0 for uid in range(UIDS)},
+        recent_trades={book : [] for book in range(BOOKS)},
+        recent_miner_trades={uid : {book : [] for book in range(BOOKS)} for uid in range(UIDS)},
+        pending_notices={uid : [] for uid in range(UIDS)}
+    )
+
+def advance(validator : SimpleNamespace, rng : np.random.Generator) -> None:
+    """
+    Applies the changes made to the state by a reward pass.
+    """
+    history, ledger = validator.inventory_history, validator.trade_volumes
+    validator.step += 1
+    validator.simulation_timestamp += PUBLISH_INTERVAL
+    ledger.advance(validator.simulation_timestamp)
+    n = UIDS * 2
+    ledger.record(rng.integers(0, UIDS, n), rng.integers(0, BOOKS, n), rng.integers(0, len(ROLES), n), np.round(rng.random(n) * 100, 4))
+    history.append(validator.simulation_timestamp, rng.normal(0, 100, size=(UIDS, BOOKS)))
+    validator.scores = torch.tensor(rng.random(UIDS), dtype=torch.float32)
+    validator.activity_factors = {uid : dict(enumerate(rng.random(BOOKS).tolist())) for uid in range(UIDS)}
+
+def rebase(validator : SimpleNamespace) -> None:
+    """
+    Carries the state into a new simulation, as `Validator.onStart`.
+    """
+    validator.trade_volumes.rebase(validator.simulation_timestamp)
+    validator.inventory_history.rebase(validator.simulation_timestamp)
+    validator.simulation_timestamp = 0
+
+def restore(directory : str) -> SimpleNamespace:
+    """
+    Restores the state from the checkpoint and log as `Validator.load_state`.
+    """
+    log = StateLog(directory)
+    try:
+        state = log.load()
+        simulation_state, validator_state = state["simulation"], state["validator"]
+        validator = SimpleNamespace(
+            step=validator_state["step"], simulation_timestamp=validator_state["simulation_timestamp"],
+            hotkeys=validator_state["hotkeys"], deregistered_uids=validator_state["deregistered_uids"],
+            scores=torch.tensor(validator_state["scores"]),
+            initial_balances=simulation_state["initial_balances"],
+            activity_factors=validator_state["activity_factors"], unnormalized_scores=validator_state["unnormalized_scores"],
+            inventory_history=InventoryHistory.from_state(validator_state["inventory_history"], UIDS, LOOKBACK, BOOKS),
+            trade_volumes=VolumeLedger.from_state(validator_state["trade_volumes"], UIDS, BOOKS, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+        )
+        log.replay(validator)
+    finally:
+        log.close()
+    return validator
+
+def assert_restored(restored : SimpleNamespace, validator : SimpleNamespace) -> None:
+    assert restored.step == validator.step
+    assert restored.simulation_timestamp == validator.simulation_timestamp
+    for uid in range(UIDS):
+        for expected, actual in zip(validator.inventory_history.window(uid), restored.inventory_history.window(uid)):
+            assert np.array_equal(expected, actual)
+    assert np.array_equal(restored.inventory_history.counts, validator.inventory_history.counts)
+    assert np.array_equal(restored.trade_volumes.totals(), validator.trade_volumes.totals())
+    assert torch.equal(restored.scores, validator.scores)
+    assert restored.activity_factors == validator.activity_factors
+
+def run(log : StateLog, validator : SimpleNamespace, rng : np.random.Generator, steps : int, checkpoint_interval : int = 0) -> None:
+    for _ in range(steps):
+        advance(validator, rng)
+        log.record(validator)
+        if checkpoint_interval and validator.step % checkpoint_interval == 0:
+            log.write(log.capture(validator))
+
+def test_checkpoint_and_replay(tmp_path):
+    rng = np.random.default_rng(0)
+    validator = make_validator()
+    log = StateLog(str(tmp_path))
+    log.write(log.capture(validator))
+    # Records follow several checkpoints, and wrap the inventory history
+    run(log, validator, rng, 2 * LOOKBACK + 7, checkpoint_interval=15)
+    log.close()
+    assert_restored(restore(str(tmp_path)), validator)
+
+def test_checkpoint_captured_before_records_written(tmp_path):
+    rng = np.random.default_rng(1)
+    validator = make_validator()
+    log = StateLog(str(tmp_path))
+    run(log, validator, rng, 5)
+    # The checkpoint shares its arrays with the state until written, and so is unaffected by the steps which follow its capture
+    checkpoint = log.capture(validator)
+    run(log, validator, rng, 3)
+    log.write(checkpoint)
+    run(log, validator, rng, 4)
+    log.close()
+    assert_restored(restore(str(tmp_path)), validator)
+
+def test_replay_across_rebase(tmp_path):
+    rng = np.random.default_rng(2)
+    validator = make_validator()
+    log = StateLog(str(tmp_path))
+    log.write(log.capture(validator))
+    run(log, validator, rng, LOOKBACK + 5)
+    # The rebased state is checkpointed before any further step is recorded, as on the start of a simulation
+    rebase(validator)
+    log.write(log.capture(validator))
+    run(log, validator, rng, 9)
+    log.close()
+    assert_restored(restore(str(tmp_path)), validator)
+
+def test_replay_rejects_unrecorded_rebase(tmp_path):
+    rng = np.random.default_rng(3)
+    validator = make_validator()
+    log = StateLog(str(tmp_path))
+    log.write(log.capture(validator))
+    run(log, validator, rng, LOOKBACK + 5)
+    # Without a checkpoint of the rebased state, the records which follow cannot be applied to the state held in the log
+    rebase(validator)
+    run(log, validator, rng, 3)
+    log.close()
+    with pytest.raises(ValueError):
+        restore(str(tmp_path))
+
+def add_trades(validator : SimpleNamespace) -> None:
+    for book in range(BOOKS):
+        validator.recent_trades[book] = [
+            TradeInfo.model_construct(y="t", i=book * 10 + i, s=i % 2, t=PUBLISH_INTERVAL * i, q=1.0 + i, p=100.0 + book, Ti=2 * i, Ta=book, Tf=0.01, Mi=2 * i + 1, Ma=UIDS - 1, Mf=None)
+            for i in range(3)
+        ]
+    validator.recent_miner_trades[1][2] = [[TradeEvent.model_construct(y="ET", t=PUBLISH_INTERVAL, a=1, b=2, i=20, c=None, Ta=1, Ti=4, Tf=0.01, Ma=UIDS - 1, Mi=5, Mf=-0.005, s=0, p=102.0, q=1.0), "taker"]]
+
+def write_v1_checkpoint(path : str, validator : SimpleNamespace, sequence : int) -> None:
+    """
+    Writes the state in the schema of version 1 checkpoints: the header preceded only by its length, followed by the unaligned
+    array data, with the recent trades held in the state and no dimensions recorded.
+    """
+    state = {
+        'sequence' : sequence,
+        'simulation' : {
+            'label' : validator.simulation.label(),
+            'start_time' : validator.start_time,
+            'start_timestamp' : validator.start_timestamp,
+            'step_rates' : validator.step_rates,
+            'initial_balances' : validator.initial_balances,
+            'recent_trades' : validator.recent_trades,
+            'recent_miner_trades' : validator.recent_miner_trades,
+            'pending_notices' : validator.pending_notices,
+            'simulation.logDir' : validator.simulation.logDir
+        },
+        'validator' : {
+            'step' : validator.step,
+            'simulation_timestamp' : validator.simulation_timestamp,
+            'hotkeys' : validator.hotkeys,
+            'scores' : validator.scores.numpy().astype(np.float32),
+            'activity_factors' : validator.activity_factors,
+            'inventory_history' : validator.inventory_history.snapshot(),
+            'sharpe_values' : validator.sharpe_values,
+            'unnormalized_scores' : validator.unnormalized_scores,
+            'trade_volumes' : validator.trade_volumes.snapshot(),
+            'deregistered_uids' : validator.deregistered_uids
+        }
+    }
+    arrays, offset = [], 0
+    def enc_hook(obj):
+        nonlocal offset
+        if isinstance(obj, np.ndarray):
+            array = np.ascontiguousarray(obj)
+            arrays.append(array)
+            reference = msgspec.msgpack.encode([array.dtype.str, list(array.shape), offset])
+            offset += array.nbytes
+            return msgspec.msgpack.Ext(persistence.ARRAY_EXT, reference)
+        return persistence._enc_hook(obj)
+    header = msgspec.msgpack.Encoder(enc_hook=enc_hook).encode(state)
+    with open(path, 'wb') as f:
+        f.write(persistence.PREFIX.pack(len(header)))
+        f.write(header)
+        for array in arrays:
+            f.write(array.data)
+
+def assert_checkpoint(state : dict, validator : SimpleNamespace) -> None:
+    simulation_state, validator_state = state["simulation"], state["validator"]
+    assert (validator_state["uids"], validator_state["books"]) == (UIDS, BOOKS)
+    assert np.array_equal(validator_state["scores"], validator.scores.numpy())
+    recent_trades, recent_miner_trades = decode_trades(simulation_state["trades"])
+    assert sum(len(trades) for trades in recent_trades.values()) == 3 * BOOKS
+    assert {book : [t.model_dump() for t in trades] for book, trades in recent_trades.items()} == {book : [t.model_dump() for t in trades] for book, trades in validator.recent_trades.items()}
+    event, role = recent_miner_trades[1][2][0]
+    assert isinstance(event, TradeEvent) and event.model_dump() == validator.recent_miner_trades[1][2][0][0].model_dump() and role == "taker"
+    assert recent_miner_trades[0] == {book : [] for book in range(BOOKS)}
+
+def test_v1_checkpoint_migrated(tmp_path):
+    rng = np.random.default_rng(4)
+    validator = make_validator()
+    log = StateLog(str(tmp_path))
+    run(log, validator, rng, LOOKBACK + 3)
+    log.close()
+    add_trades(validator)
+    path = os.path.join(str(tmp_path), CHECKPOINT_FILE)
+    write_v1_checkpoint(path, validator, validator.step)
+    # The checkpoint is migrated on reading, and the state restored from it as from a checkpoint of the current schema
+    state = read_checkpoint(path)
+    assert state["version"] == 1
+    assert_checkpoint(state, validator)
+    assert_restored(restore(str(tmp_path)), validator)
+    # Migrating in place rewrites the checkpoint in the current schema, after which it is left unchanged
+    assert migrate_checkpoint(str(tmp_path)) == 1
+    state = read_checkpoint(path)
+    assert state["version"] == SCHEMA_VERSION == 2
+    assert_checkpoint(state, validator)
+    assert migrate_checkpoint(str(tmp_path)) == 2
+    assert_restored(restore(str(tmp_path)), validator)
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import numpy as np
+import pytest
+
+from taos.im.utils.inventory import InventoryHistory
+from taos.im.utils.sharpe import sharpe_batch, RollingSharpe
+
+GRACE_PERIOD = 120_000_000_000
+UIDS, BOOKS, LOOKBACK = 8, 3, 40
+PARAMS = dict(lookback=LOOKBACK, norm_min=-10.0, norm_max=10.0, min_lookback=LOOKBACK // 2, deregistered_uids=[2])
+
+def expected_sharpes(history : InventoryHistory) -> dict:
+    """
+    Sharpe values of every UID as evaluated by the per-UID implementation on the chronologically ordered window.
+    """
+    windows = {}
+    for uid in range(history.uids):
+        timestamps, values = history.window(uid)
+        windows[uid] = {int(t) : dict(enumerate(v.tolist())) for t, v in zip(timestamps, values)}
+    return sharpe_batch(windows, grace_period=GRACE_PERIOD, **PARAMS)
+
+def assert_matches(history : InventoryHistory, rolling : RollingSharpe) -> None:
+    expected = expected_sharpes(history)
+    result = rolling.sharpe(history, np.arange(history.uids), **PARAMS)
+    for uid in range(history.uids):
+        a, b = expected[uid], result[uid]
+        assert (a is None) == (b is None), f"Eligibility mismatch for UID {uid}"
+        if a is None: continue
+        assert np.allclose(list(a['books'].values()), list(b['books'].values())), f"Book Sharpe mismatch for UID {uid}"
+        for key in ['average', 'median', 'total', 'normalized_average', 'normalized_median', 'normalized_total']:
+            assert np.isclose(a[key], b[key]), f"{key} mismatch for UID {uid}"
+
+def run(steps : int, idle_from : dict[int, int], changeover : int | None = None, reset : dict[int, int] | None = None,
+        skip : dict[int, list[int]] | None = None, seed : int = 0):
+    """
+    Drives the history and estimator with random walks, holding the inventory of each UID in `idle_from` constant from the given step
+    and skipping the observations of each UID in `skip` at the given steps, and checks the estimator against the per-UID
+    implementation after every step.
+    """
+    rng = np.random.default_rng(seed)
+    history = InventoryHistory(UIDS, LOOKBACK, BOOKS)
+    rolling = RollingSharpe(history, GRACE_PERIOD)
+    values = np.zeros((UIDS, BOOKS))
+    timestamp = 0
+    for step in range(steps):
+        timestamp += 3600_000_000_000 if step == changeover else 1_000_000_000
+        active = np.array([[0.0 if step >= idle_from.get(uid, steps) else 1.0] for uid in range(UIDS)])
+        values += rng.normal(0, 10, size=(UIDS, BOOKS)) * active
+        observed = values.copy()
+        for uid, steps_skipped in (skip or {}).items():
+            if step in steps_skipped:
+                observed[uid] = np.nan
+        rolling.update(history, timestamp, observed)
+        history.append(timestamp, observed)
+        for uid, reset_step in (reset or {}).items():
+            if step == reset_step:
+                history.reset(uid)
+                rolling.reset(uid)
+        assert_matches(history, rolling)
+    return history, rolling
+
+def test_rolling_matches_batch():
+    run(3 * LOOKBACK + 7, {})
+
+def test_rolling_matches_batch_across_changeover_and_reset():
+    run(3 * LOOKBACK + 7, {}, changeover=2 * LOOKBACK + 3, reset={1 : 2 * LOOKBACK + 11})
+
+@pytest.mark.parametrize("idle_from", [0, LOOKBACK // 3, LOOKBACK + LOOKBACK // 3, 2 * LOOKBACK - 5])
+def test_rolling_idle_window(idle_from):
+    # Windows which are constant from the start, or become constant part way between recomputations of the statistics
+    history, rolling = run(3 * LOOKBACK + 13, {3 : idle_from, 4 : 2 * LOOKBACK + 13})
+    result = rolling.sharpe(history, np.arange(UIDS), **PARAMS)
+    assert result[3]['total'] == 0.0
+    assert all(value == 0.0 for value in result[3]['books'].values())
+
+def test_rolling_skipped_observations():
+    # A skipped observation excludes the returns adjoining it, without discarding the rest of the window
+    skipped = [5, 6, LOOKBACK + 3, 2 * LOOKBACK + 1]
+    history, rolling = run(3 * LOOKBACK + 7, {}, skip={1 : skipped, 6 : [LOOKBACK - 1]})
+    assert history.count(1) == LOOKBACK
+    result = rolling.sharpe(history, np.arange(UIDS), **PARAMS)
+    assert result[1] is not None and np.isfinite(result[1]['total'])
+    timestamps, values = history.window(1)
+    returns = np.diff(values.sum(axis=1))
+    returns = returns[~np.isnan(returns)]
+    assert np.isclose(result[1]['total'], np.sqrt(len(returns)) * returns.mean() / returns.std())
+
+def test_rolling_after_outlier_evicted():
+    # A return far larger than the others leaves the window; the variance of the remaining returns must not be lost with it
+    rng = np.random.default_rng(4)
+    history = InventoryHistory(UIDS, LOOKBACK, BOOKS)
+    rolling = RollingSharpe(history, GRACE_PERIOD)
+    values = np.zeros((UIDS, BOOKS))
+    for step in range(2 * LOOKBACK - 5):
+        values += rng.normal(0, 1, size=(UIDS, BOOKS)) + (1e8 if step == 3 else 0.0)
+        rolling.update(history, (step + 1) * 1_000_000_000, values)
+        history.append((step + 1) * 1_000_000_000, values)
+    result = rolling.sharpe(history, np.arange(UIDS), **PARAMS)
+    for uid in range(UIDS):
+        if uid in PARAMS['deregistered_uids']: continue
+        _, window = history.window(uid)
+        for book, returns in enumerate(np.diff(window, axis=0).T):
+            assert np.isclose(result[uid]['books'][book], np.sqrt(len(returns)) * returns.mean() / returns.std())
+        returns = np.diff(window.sum(axis=1))
+        assert np.isclose(result[uid]['total'], np.sqrt(len(returns)) * returns.mean() / returns.std())
@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2025 Rayleigh Research <to@rayleigh.re>
+# SPDX-License-Identifier: MIT
+import threading
+import numpy as np
+
+from taos.im.utils.volume import VolumeLedger, ROLES
+
+SAMPLING_INTERVAL = 10
+ASSESSMENT_PERIOD = 100
+
+def expected_totals(ledger : VolumeLedger) -> np.ndarray:
+    labels = ledger.times[ledger.slots()]
+    return ledger.volumes[..., ledger.slots()][..., labels >= ledger.timestamp - ASSESSMENT_PERIOD].sum(axis=3)
+
+def test_totals_follow_modifications():
+    rng = np.random.default_rng(0)
+    ledger = VolumeLedger(4, 2, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+    for timestamp in range(1, 300, 3):
+        ledger.advance(timestamp)
+        ledger.record(rng.integers(0, 4, 3), rng.integers(0, 2, 3), rng.integers(0, len(ROLES), 3), np.round(rng.random(3), 4))
+        assert np.allclose(ledger.totals(), expected_totals(ledger))
+        if timestamp % 50 == 1:
+            ledger.reset(1)
+            assert np.allclose(ledger.totals(), expected_totals(ledger))
+
+def test_stale_prefix_not_used():
+    ledger = VolumeLedger(2, 1, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+    ledger.advance(5)
+    ledger.record([0], [0], [0], [1.0])
+    ledger.totals()
+    stale = ledger._prefix
+    ledger.record([0], [0], [0], [2.0])
+    # A reader which computed the prefix sums before the modification publishes them after it
+    ledger._prefix = stale
+    assert ledger.totals()[0, 0, 0] == 3.0
+
+def test_totals_read_while_modified():
+    rng = np.random.default_rng(1)
+    ledger = VolumeLedger(8, 4, SAMPLING_INTERVAL, ASSESSMENT_PERIOD, 4)
+    stop, errors = threading.Event(), []
+    def read():
+        while not stop.is_set():
+            try:
+                assert ledger.totals().shape == (8, 4, len(ROLES))
+            except Exception as ex:
+                errors.append(ex)
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for timestamp in range(1, 2000):
+        ledger.advance(timestamp)
+        ledger.record(rng.integers(0, 8, 4), rng.integers(0, 4, 4), rng.integers(0, len(ROLES), 4), np.round(rng.random(4), 4))
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not errors
+    assert np.allclose(ledger.totals(), expected_totals(ledger))